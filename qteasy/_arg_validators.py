@@ -135,6 +135,13 @@ def _valid_qt_kwargs():
              'level':     1,
              'text':      '实盘交易调试模式，True: 调试模式，False: 正常模式'},
 
+        'live_trade_strategy_workers':
+            {'Default':   0,
+             'Validator': lambda value: isinstance(value, int) and value >= 0,
+             'level':     4,
+             'text':      '实盘交易时并发运行策略的线程数量，大于等于0的整数，为0或1时逐个运行策略，大于1时\n'
+                          '同一运行时间点上的成员策略（以及互不依赖的策略组）在线程池中同时运行'},
+
         'live_trade_init_cash':
             {'Default':   1000000.0,
              'Validator': lambda value: isinstance(value, (int, float))
@@ -488,6 +495,27 @@ def _valid_qt_kwargs():
              'text':      '是否生成回测信号过程追踪，以pd.DataFrame形式给出回测过程中交易信号\n'
                           '中间过程变量的变化情况，便于交易策略的调试和分析'},
 
+        'signal_cache':
+            {'Default':   False,
+             'Validator': lambda value: isinstance(value, bool),
+             'level':     4,
+             'text':      '回测时是否在磁盘上缓存生成的交易信号，为True时按策略、参数、数据和运行时间表生成指纹，\n'
+                          '再次回测同样的策略和数据时（例如只修改交易费用或资金计划）直接读取缓存的交易信号。\n'
+                          '交易信号依赖交易过程数据或启用了trace_log时不使用缓存'},
+
+        'signal_cache_file_path':
+            {'Default':   'signal_cache/',
+             'Validator': lambda value: isinstance(value, str),
+             'level':     4,
+             'text':      '交易信号缓存文件的存储路径，支持相对路径（相对QT_ROOT_PATH）、绝对路径及以~开头的家目录路径'},
+
+        'profile_strategies':
+            {'Default':   False,
+             'Validator': lambda value: isinstance(value, bool),
+             'level':     4,
+             'text':      '回测及优化时是否统计策略运行耗时，为True时按策略和运行阶段（数据窗口、信号生成、\n'
+                          '信号混合等）统计调用次数与耗时，结果显示在回测和优化结果报告中'},
+
         'benchmark_asset':
             {'Default':   '000300.SH',  # TODO: 未来版本支持多个基准
              'Validator': lambda value: isinstance(value, str)
@@ -649,6 +677,17 @@ def _valid_qt_kwargs():
                           '- back/b/adj     - 对于股票，使用后复权价格回测，对于基金，使用复权净值回测；\n'
                           '- forward/f/accu - 对于股票，使用前复权价格回测，对于基金，使用复权净值回测'},
 
+        'data_dtype':
+            {'Default':   'float64',
+             'Validator': lambda value: isinstance(value, str)
+                                        and value.lower() in ['float64', 'float32'],
+             'level':     4,
+             'text':      '回测、优化及实盘运行时读取的历史数据及数据缓冲区的浮点精度：\n'
+                          '- float64        - 默认值，使用双精度浮点数；\n'
+                          '- float32        - 使用单精度浮点数，历史数据占用的内存与带宽减半，适合\n'
+                          '                 分钟级多年回测，累积收益等累积类计算仍以双精度进行，\n'
+                          '                 交易策略获得的数据窗口一次性转换为双精度'},
+
         'PT_buy_threshold':
             {'Default':   0.,
              'Validator': lambda value: isinstance(value, (float, int)) and (0 <= value < 1),
@@ -9,7 +9,9 @@
 # ======================================
 
 import logging
+import os
 import time
+import zipfile
 import pandas as pd
 import numpy as np
 from numba import njit
@@ -947,6 +949,66 @@ def generate_cash_invest_and_delivery_arrays(invest_cash_plan: CashPlan,
     return cash_investment_array, cash_inflation_array, day_changes
 
 
+def read_signal_cache(cache_path: str, fingerprint: str) -> Optional[tuple]:
+    """ 从磁盘缓存中读取与指纹对应的Operator运行结果，参见Operator.get_signal_fingerprint()
+
+    Parameters
+    ----------
+    cache_path: str
+        信号缓存文件所在的目录
+    fingerprint: str
+        Operator运行结果的指纹
+
+    Returns
+    -------
+    tuple of (list, np.ndarray, np.ndarray) or None
+        (每条交易信号的信号类型, 每条交易信号对应的步骤索引, 交易信号)，缓存不存在或无法读取时返回None
+    """
+    file_name = os.path.join(cache_path, f'signals_{fingerprint}.npz')
+    if not os.path.exists(file_name):
+        return None
+    try:
+        with np.load(file_name, allow_pickle=False) as cached:
+            signal_types = [str(stype) for stype in cached['signal_types']]
+            step_indices = cached['step_indices']
+            signals = cached['signals']
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        # 缓存文件损坏时视为没有缓存，重新生成的信号会覆盖该文件
+        return None
+    return signal_types, step_indices, signals
+
+
+def write_signal_cache(cache_path: str, fingerprint: str, op_result: tuple) -> str:
+    """ 将Operator运行结果写入磁盘缓存，参见read_signal_cache()
+
+    Parameters
+    ----------
+    cache_path: str
+        信号缓存文件所在的目录，不存在时自动创建
+    fingerprint: str
+        Operator运行结果的指纹
+    op_result: tuple of (list, np.ndarray, np.ndarray)
+        Operator.run_all_steps()的结果
+
+    Returns
+    -------
+    str
+        缓存文件的完整路径
+    """
+    os.makedirs(cache_path, exist_ok=True)
+    signal_types, step_indices, signals = op_result
+    file_name = os.path.join(cache_path, f'signals_{fingerprint}.npz')
+    # 先写入临时文件再替换，避免同时运行的回测读到写了一半的缓存
+    temp_file_name = f'{file_name}.{os.getpid()}.tmp'
+    with open(temp_file_name, 'wb') as f:
+        np.savez(f,
+                 signal_types=np.array(signal_types, dtype=str),
+                 step_indices=np.asarray(step_indices),
+                 signals=np.asarray(signals))
+    os.replace(temp_file_name, file_name)
+    return file_name
+
+
 # 定义一个Backtester类，该类包含一个operator对象，同时包含与operator回测相关的所有属性，同时提供回测结果的生成方法
 class Backtester:
     """ Backtester类用于对operator对象进行回测操作。
@@ -991,6 +1053,8 @@ class Backtester:
                  benchmark_data: Optional[Union[pd.DataFrame, pd.Series]] = None,
                  evaluate_price_data: Optional[pd.DataFrame] = None,
                  enable_tracing: bool = False,
+                 enable_profiling: bool = False,
+                 signal_cache_path: Optional[str] = None,
                  logger: Optional[logging.Logger] = None):
         """ 初始化Backtester对象，设置operator对象和回测参数，初始化回测结果存储表格
 
@@ -1029,6 +1093,13 @@ class Backtester:
             交易价格数据，记录每一个运行交易记录时间戳中的各个资产的交易价格
         enable_tracing: bool, optional, default=False
             是否启用回测过程的性能追踪功能，默认值为False
+        enable_profiling: bool, optional, default=False
+            是否记录每个策略和策略组运行的调用次数与耗时（参见Operator.enable_profiling()），
+            记录结果保存在strategy_profile属性和回测结果的'strategy_profile'中
+        signal_cache_path: str, optional
+            交易信号缓存目录，给出时把生成的交易信号按Operator.get_signal_fingerprint()保存在该目录中，
+            再次回测同样的策略、参数和数据时（例如只修改了交易费用或资金计划）直接读取缓存的交易信号；
+            交易信号依赖交易过程数据、启用了追踪或策略属性中有无法写入指纹的对象时不使用缓存
         logger: Optional[logging.Logger]
             可选的日志记录器对象，用于记录回测过程中的日志信息
         """
@@ -1077,6 +1148,7 @@ class Backtester:
 
         self.op_run_time = 0.0  # operator运行时间，单位秒
         self.backtest_run_time = 0.0  # 回测运行时间，单位秒
+        self.strategy_profile: Optional[pd.DataFrame] = None  # 启用运行剖析时，各个策略和策略组的运行耗时统计
 
         # 1，检查operator对象是否已经准备好，否则raise error, TOOD: 是否有必要？
         # op.is_ready(raise_error=True)
@@ -1113,24 +1185,41 @@ class Backtester:
         self.benchmark_data = benchmark_data
         self.evaluate_price_data = evaluate_price_data
         self.enable_tracing = enable_tracing
+        self.enable_profiling = enable_profiling
+        self.signal_cache_path = signal_cache_path
+        self.signal_cache_hit = False  # 本次回测的交易信号是否读取自缓存
 
         if logger is not None:
             logger.info('Start backtest operator...')
 
-    def run(self) -> 'Backtester':
-        """ 执行回测计算，生成回测结果数据并存入对象属性中"""
+    def run(self, op_result: Optional[tuple] = None) -> 'Backtester':
+        """ 执行回测计算，生成回测结果数据并存入对象属性中
+
+        Parameters
+        ----------
+        op_result: tuple, optional
+            预先生成的Operator运行结果(信号类型, 步骤索引, 交易信号)，例如参数优化时由
+            Operator.run_all_steps_batch()批量生成的结果。给出时直接使用这些交易信号回测，不再运行Operator，
+            仅适用于交易信号不依赖交易过程数据且未启用追踪的情况
+        """
+        if (op_result is not None) and (self.enable_tracing or self.op.check_dynamic_data()):
+            raise ValueError('op_result can not be used when tracing is enabled or the operator depends on '
+                             'trading process data')
         self.op.set_shares(self.shares)
 
         if self.enable_tracing:
             self.op.enable_tracing()
         else:
             self.op.disable_tracing()
+        if self.enable_profiling:
+            # 每次回测重新开始记录；未要求记录时保留Operator原有的设置（例如在参数优化过程中持续记录）
+            self.op.enable_profiling()
 
         # 1，如果operator的交易信号不依赖于回测数据，调用函数backtest_operator_independently()处理回测信号
         if not self.op.check_dynamic_data():
             if self.logger is not None:
                 self.logger.info('Backtest operator with only static data...')
-            signals = self._backtest_static_operator()
+            signals = self._backtest_static_operator(op_result=op_result)
         # 2，如果operator的交易信号依赖于回测数据，调用函数backtest_operator_dependently()处理回测信号
         else:
             if self.logger is not None:
@@ -1138,6 +1227,9 @@ class Backtester:
             signals = self._backtest_dynamic_operator()
 
         self.op_signals = signals
+        if self.enable_profiling:
+            self.strategy_profile = self.op.get_profile()
+            self.op.disable_profiling()
         if self.logger is not None:
             self.logger.info('Backtest completed.')
 
@@ -1161,22 +1253,18 @@ class Backtester:
         self.trade_log_df = None
         self.summary_df = None
 
-    def _backtest_static_operator(self) -> np.ndarray:
+    def _backtest_static_operator(self, op_result: Optional[tuple] = None) -> np.ndarray:
         """处理operator的交易信号仅包含静态数据类型（不依赖交易结果的数据）的情况:
 
+        op_result不为None时直接使用其中预先生成的交易信号
         """
         # 1，调用operator.run()生成完整的交易信号清单，并计算保存运行时间
-        stypes = np.zeros(self.op.get_signal_count(), dtype=int)
-        s_indices = np.zeros(self.op.get_signal_count(), dtype=int)
-        signals = np.zeros((self.op.get_signal_count(), self.share_count), dtype=float)
-        signal_index = 0
-
+        #  策略实现了realize_all()时，operator一次性生成整段时间轴上的交易信号
         st = time.time()
-        for stype, s_index, signal in self.op.run_strategies(steps=range(len(self.op.group_timing_table))):
-            stypes[signal_index] = SIGNAL_TYPE_ID[stype]
-            s_indices[signal_index] = s_index
-            signals[signal_index, :] = signal
-            signal_index += 1
+        if op_result is None:
+            op_result = self._run_operator_with_cache()
+        signal_types, s_indices, signals = op_result
+        stypes = np.array([SIGNAL_TYPE_ID[stype] for stype in signal_types], dtype=int)
         et = time.time()
         self.op_run_time = et - st
 
@@ -1205,6 +1293,28 @@ class Backtester:
 
         return signals
 
+    def _run_operator_with_cache(self) -> tuple:
+        """ 运行operator生成全部交易信号，设置了signal_cache_path时优先读取缓存的交易信号
+
+        启用追踪时需要运行策略以记录追踪数据，策略中有无法写入指纹的对象时无法确定缓存是否有效，都不使用缓存
+        """
+        if (self.signal_cache_path is None) or self.enable_tracing:
+            return self.op.run_all_steps(share_count=self.share_count)
+
+        fingerprint = self.op.get_signal_fingerprint(share_count=self.share_count)
+        if fingerprint is None:
+            return self.op.run_all_steps(share_count=self.share_count)
+        op_result = read_signal_cache(self.signal_cache_path, fingerprint)
+        if (op_result is not None) and (op_result[2].shape == (self.n_signals, self.share_count)):
+            self.signal_cache_hit = True
+            if self.logger is not None:
+                self.logger.info(f'Using cached signals {fingerprint}...')
+            return op_result
+
+        op_result = self.op.run_all_steps(share_count=self.share_count)
+        write_signal_cache(self.signal_cache_path, fingerprint, op_result)
+        return op_result
+
     def _backtest_dynamic_operator(self) -> np.ndarray:
         """处理operator的交易信号包含动态数据类型(依赖交易结果的数据类型)的情况:
 
@@ -1437,6 +1547,7 @@ class Backtester:
 
         self.backtest_result['op_run_time'] = self.op_run_time
         self.backtest_result['loop_run_time'] = self.backtest_run_time
+        self.backtest_result['strategy_profile'] = self.strategy_profile
 
         return self.backtest_result
 
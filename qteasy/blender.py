@@ -9,6 +9,9 @@
 #   blender string parsers.
 # ======================================
 
+from functools import lru_cache
+from typing import Callable
+
 import numpy as np
 from numba import njit
 
@@ -507,6 +510,37 @@ _AVAILABLE_FUNCTIONS = {'abs':      abs,
                         }
 
 
+def _resolve_blend_func(func_str):
+    """ 解析混合函数名，返回混合函数对象、函数名以及函数名中包含的附加参数
+
+    Parameters
+    ----------
+    func_str: str
+        交易信号混合函数名，例如'avgpos_3_0.5'
+
+    Returns
+    -------
+    tuple of (callable, str, tuple of float)
+
+    Raises
+    ------
+    TypeError: func_str不是字符串
+    KeyError: func_str不是可用的函数名
+    """
+    if not isinstance(func_str, str):
+        raise TypeError(f'func_str should be a string, got {type(func_str)} instead')
+
+    # 分离函数名和附加参数（附加参数的个数不限，受实际定义的函数限制）
+    func_name_args = func_str.split('_')
+    func_name, *additional_args = func_name_args
+    func = _AVAILABLE_FUNCTIONS.get(func_name)
+    if func is None:
+        raise KeyError(f'function ({func_name}) is not available')
+    # 将所有的附加参数处理为float类型，便于传入func处理
+    additional_args = tuple(float(item) for item in additional_args)
+    return func, func_name, additional_args
+
+
 def run_blend_func(func_str, *args):
     """ 根据func_str（一个代表混合函数的字符串解析出正确的函，并返回正确结果
 
@@ -534,17 +568,7 @@ def run_blend_func(func_str, *args):
     >>> run_blend_func('avg_pos-3-0.5', args)
     avg_pos(3, 0.5, *args)
     """
-    if not isinstance(func_str, str):
-        raise TypeError(f'func_str should be a string, got {type(func_str)} instead')
-
-    # 分离函数名和附加参数（附加参数的个数不限，受实际定义的函数限制）
-    func_name_args = func_str.split('_')
-    func_name, *additional_args = func_name_args
-    func = _AVAILABLE_FUNCTIONS.get(func_name)
-    if func is None:
-        raise KeyError(f'function ({func_name}) is not available')
-    # 将所有的附加参数处理为float类型，便于传入func处理
-    additional_args = tuple(float(item) for item in additional_args)
+    func, func_name, additional_args = _resolve_blend_func(func_str)
     try:
         res = func(*additional_args, *args)
     except Exception as e:
@@ -673,6 +697,9 @@ def blender_parser(blender_string):
 def signal_blend(op_signals, blender):
     """ 选股策略混合器，将各个选股策略生成的选股蒙板按规则混合成一个蒙板
 
+    混合表达式在第一次使用时由compile_blender()编译为混合函数并缓存，此后使用同一个表达式混合时
+    不再需要逐个解析表达式中的token
+
     Parameters
     ----------
     op_signals:
@@ -682,33 +709,128 @@ def signal_blend(op_signals, blender):
     -------
     s: ndarray, 混合完成的选股蒙板
     """
-    exp = blender[:]  # 混合表达式的逆波兰式，可以直接读取后计算
-    s = []  # 信号栈，用来存储所有需要操作的交易信号
-    while exp:
-        token = exp[-1]
+    return _compile_blender_cached(tuple(blender))(op_signals)
+
+
+@lru_cache(maxsize=128)
+def _compile_blender_cached(blender: tuple) -> Callable:
+    """ 缓存编译后的混合函数，blender必须为tuple才能作为缓存的键"""
+    return compile_blender(list(blender))
+
+
+def compile_blender(blender: list) -> Callable:
+    """ 将blender_parser()生成的前缀表达式编译为混合函数
+
+    逐个解析表达式中的token需要在每次混合时重复进行字符串匹配和按名称查找混合函数。编译时按照与
+    signal_blend()相同的顺序读取前缀表达式，但信号栈中存放的不是交易信号，而是计算交易信号的闭包：
+    策略序号、数字、运算符以及混合函数（包括函数名中的附加参数）在编译时全部确定，得到一棵闭包树，
+    每次混合时只需要从树根开始计算。
+
+    除unify按行计算外，所有的运算符和混合函数都逐个元素计算，因此编译后的混合函数既可以混合一个
+    运行时间点上各个策略的交易信号（一维数组），也可以一次混合各个策略在多个运行时间点上的交易信号
+    （形状为(步骤数, 股票数量)的二维数组），两者的结果逐行相同。
+
+    Parameters
+    ----------
+    blender: list of str
+        blender_parser()生成的前缀表达式
+
+    Returns
+    -------
+    Callable
+        混合函数，接受各个策略的交易信号组成的序列op_signals，返回混合后的交易信号
+
+    Raises
+    ------
+    KeyError: 表达式中包含不可用的混合函数
+
+    Examples
+    --------
+    >>> blend = compile_blender(blender_parser('s0 + s1 * s2'))
+    >>> blend([1, 2, 3])
+    7
+    >>> blend([np.array([[1., 0.], [0., 1.]]), np.ones((2, 2)), np.full((2, 2), 2.)])
+    array([[3., 2.],
+           [2., 3.]])
+    """
+    nodes = []  # 闭包栈，与signal_blend()中的信号栈一一对应
+    for token in reversed(blender):
         if token[-1] == ')':
-            # 如果碰到函数，解析函数的参数数量，并弹出信号栈内的适当个交易信号，应用函数得到结果，压入信号栈
-            token = exp.pop()
-            arg_count = int(token[-2])
-            func_name = token[0:-3]
-            args = tuple(s.pop() for i in range(arg_count))
-            res = run_blend_func(func_name, *args)
-            s.append(res)
-        elif token in '~not':
-            # 如果碰到一元运算符，弹出信号栈内的交易信号，得到结果，再压入信号栈
-            s.append(_operate(s.pop(), None, exp.pop()))
-        elif token in '+-*/^&|andor':
-            # 如果碰到二元运算符，弹出信号栈内两个交易信号，得到结果，再压入信号栈
-            s.append(_operate(s.pop(), s.pop(), exp.pop()))
+            # 函数token的格式为"函数名(参数个数)"，在编译时解析函数与附加参数，并弹出相应个数的参数闭包
+            func_str, arg_count = token[:-1].rsplit('(', 1)
+            arg_nodes = tuple(nodes.pop() for _ in range(int(arg_count)))
+            nodes.append(_compile_func_node(func_str, arg_nodes))
+        elif token in ('~', 'not'):
+            nodes.append(_compile_unary_node(nodes.pop()))
+        elif token in ('+', '-', '*', '/', '^', '&', '|', 'and', 'or'):
+            n1 = nodes.pop()
+            n2 = nodes.pop()
+            nodes.append(_compile_binary_node(n1, n2, token))
         elif BLENDER_STRATEGY_INDEX_IDENTIFIER.match(token):
-            # 如果是index，直接读取交易信号并压入信号栈
-            sig_index = int(exp.pop()[1:])
-            s.append(op_signals[sig_index])
-        else:  # exp[-1].isnum():
-            # 如果是数字，直接作为数字压入信号栈
-            s.append(float(exp.pop()))
-
-    return s[0]
+            nodes.append(_compile_index_node(int(token[1:])))
+        else:
+            nodes.append(_compile_number_node(float(token)))
+
+    return nodes[0]
+
+
+def _compile_index_node(sig_index):
+    """ 读取第sig_index个策略的交易信号"""
+    def node(op_signals):
+        return op_signals[sig_index]
+    return node
+
+
+def _compile_number_node(value):
+    """ 常数"""
+    def node(op_signals):
+        return value
+    return node
+
+
+def _compile_unary_node(n1):
+    """ 一元运算符，'~'与'not'均为取负"""
+    def node(op_signals):
+        return -1 * n1(op_signals)
+    return node
+
+
+def _compile_binary_node(n1, n2, op):
+    """ 二元运算符，n1与n2与_operate()的参数顺序相同"""
+    if op == '+':
+        def node(op_signals):
+            return n2(op_signals) + n1(op_signals)
+    elif op in ('and', '&', '*'):
+        def node(op_signals):
+            return n2(op_signals) * n1(op_signals)
+    elif op == '-':
+        def node(op_signals):
+            return n2(op_signals) - n1(op_signals)
+    elif op == '/':
+        def node(op_signals):
+            return n2(op_signals) / n1(op_signals)
+    elif op in ('or', '|'):
+        def node(op_signals):
+            return 1 - (1 - n2(op_signals)) * (1 - n1(op_signals))
+    else:
+        # 其余运算符（如'^'）在混合时由_operate()报错，与逐个解析token时的行为相同
+        def node(op_signals):
+            return _operate(n1(op_signals), n2(op_signals), op)
+    return node
+
+
+def _compile_func_node(func_str, arg_nodes):
+    """ 混合函数，函数对象和附加参数在编译时解析，参数顺序与run_blend_func()相同"""
+    func, func_name, additional_args = _resolve_blend_func(func_str)
+
+    def node(op_signals):
+        args = tuple(arg(op_signals) for arg in arg_nodes)
+        try:
+            return func(*additional_args, *args)
+        except Exception as e:
+            raise Exception(f'Error raised while executing blending function {func_name}({additional_args}, '
+                            f'{args}), error message: \n{e}') from e
+    return node
 
 
 def _exp_to_token(string):
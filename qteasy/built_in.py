@@ -16,7 +16,10 @@ from qteasy.datatypes import DataType, StgData
 from qteasy.strategy import BaseStrategy, RuleIterator, FactorSorter, GeneralStg
 from qteasy.tafuncs import (
     sma,
+    sma_2d,
     ema,
+    ema_2d,
+    sarext_2d,
     trix,
     bbands,
     adosc,
@@ -29,7 +32,6 @@ from qteasy.tafuncs import (
     tema,
     trima,
     wma,
-    sarext,
     adx,
     aroon,
     aroonosc,
@@ -57,6 +59,40 @@ from qteasy.tafuncs import (
 )
 
 
+def _shift_rows(arr: np.ndarray, periods: int) -> np.ndarray:
+    """ 将数组沿第0轴向后平移periods行，前面空出的行填充为nan
+
+    用于在realize_all()中以整段时间轴的方式实现realize()中h[-periods - 1]一类的取值
+    """
+    res = np.full(arr.shape, np.nan)
+    if periods < len(arr):
+        res[periods:] = arr[:len(arr) - periods]
+    return res
+
+
+def _fits_window(stg: BaseStrategy, lookback: int) -> bool:
+    """ 判断需要向前lookback行数据的计算在策略的数据窗口内是否可以完成
+
+    如果数据窗口的长度不足，逐步运行时realize()得到的是nan值，而realize_all()在完整的数据缓存上
+    计算会得到有效值，此时realize_all()应该返回None，让策略回到逐步运行的方式
+    """
+    return lookback < min(stg.data_window_lengths.values())
+
+
+def _has_interior_nan(*arrays: np.ndarray) -> bool:
+    """ 判断数据中是否有非前导的nan值，即某列第一个有效值之后出现的nan
+
+    ta-lib的滚动计算 （滚动求和、区间极值等）遇到nan后，此后的结果全部成为nan；逐步运行时只有包含该nan的
+    数据窗口受影响，因此在完整数据缓存上一次计算的结果与逐步运行不同，此时realize_all()应该返回None，
+    让策略回到逐步运行的方式。前导的nan会被ta-lib跳过，不影响结果
+    """
+    for arr in arrays:
+        valid = ~np.isnan(arr)
+        if np.any(np.maximum.accumulate(valid, axis=0) & ~valid):
+            return True
+    return False
+
+
 # Built-in Rolling timing strategies:
 def built_in_list(stg_id: str = None) -> list:
     """  获取内置交易策略ID的列表,可以通过stg_id进行模糊匹配
@@ -322,23 +358,29 @@ class CROSSLINE(RuleIterator):
                 description='Moving average crossline strategy, determine long/short position according '
                             'to the cross point of long and short term moving average prices ',
                 data_types=DataType('close', freq='d', asset_type='ANY'),
+                vectorized=True,
         )
         if par_values:
             self.update_par_values(*par_values)
 
     def realize(self):
         s, l, m = self.get_pars('s', 'l', 'm')
-        # 临时处理措施，在策略实现层对传入的数据切片，后续应该在策略实现层以外事先对数据切片，保证传入的数据符合data_types参数即可
+        # 策略以向量化方式运行，h为(窗口长度, 股票数量)的二维数组，同时计算所有股票长短均线之间的距离
         h = self.get_data('close_ANY_d')
-        # 计算长短均线之间的距离
-        diff = (sma(h, l) - sma(h, s))[-1]
+        diff = (sma_2d(h, l) - sma_2d(h, s))[-1]
         m = m * l
-        if diff < -m:
-            return 1
-        elif diff > m:
-            return -1
-        else:
-            return 0
+        return np.select([diff < -m, diff > m], [1., -1.], default=0.)
+
+    def realize_all(self):
+        s, l, m = self.get_pars('s', 'l', 'm')
+        if not _fits_window(self, max(s, l) - 1):
+            return None
+        h = self.get_data('close_ANY_d')
+        if _has_interior_nan(h):
+            return None
+        diff = sma_2d(h, l) - sma_2d(h, s)
+        m = m * l
+        return np.select([diff < -m, diff > m], [1., -1.], default=0.)
 
 
 class CDL(RuleIterator):
@@ -435,6 +477,17 @@ class SoftBBand(RuleIterator):
             sig = 0
         return sig
 
+    def realize_all(self):
+        p, u, d, m = self.get_pars('p', 'u', 'd', 'm')
+        # 仅SMA/WMA/TRIMA等有限长度的均线在整段时间轴上的结果与逐个窗口计算的结果相同
+        if (m not in (0, 2, 5)) or (not _fits_window(self, p - 1)):
+            return None
+        h = self.get_data('close_ANY_d')
+        if _has_interior_nan(h):
+            return None
+        hi, mid, low = bbands(h, p, u, d, m)
+        return np.select([h < low, h > hi], [-0.333, 0.1], default=0.)
+
 
 class BBand(RuleIterator):
     """ 布林带线交易策略，根据股价与布林带上轨和布林带下轨之间的关系确定多空，
@@ -479,7 +532,7 @@ class BBand(RuleIterator):
 
         # 计算指数的指数移动平均价格
         price = self.get_data('close_ANY_d')
-        upper, middle, lower = bbands(close=price, timeperiod=span, nbdevup=upper, nbdevdn=lower)
+        upper, middle, lower = self.indicator('bbands', 'close_ANY_d', timeperiod=span, nbdevup=upper, nbdevdn=lower)
         # 生成BBANDS操作信号判断:
         # 1, 当avg_price从上至下穿过布林带上缘时，产生空头建仓或平多仓信号 -1
         # 2, 当avg_price从下至上穿过布林带下缘时，产生多头建仓或平空仓信号 +1
@@ -491,6 +544,21 @@ class BBand(RuleIterator):
         else:
             return 0.
 
+    def realize_all(self):
+        span, upper, lower = self.get_pars('span', 'upper', 'lower')
+        if not _fits_window(self, span):
+            return None
+        price = self.get_data('close_ANY_d')
+        if _has_interior_nan(price):
+            return None
+        upper, middle, lower = bbands(close=price, timeperiod=span, nbdevup=upper, nbdevdn=lower)
+        price_prev, upper_prev, lower_prev = _shift_rows(price, 1), _shift_rows(upper, 1), _shift_rows(lower, 1)
+        return np.select(
+                [(price_prev >= upper_prev) & (price < upper), (price_prev <= lower_prev) & (price > lower)],
+                [1., -1.],
+                default=0.,
+        )
+
 
 # Built-in Single-cross-line strategies:
 # these strateges are basically adopting same philosaphy:
@@ -533,12 +601,22 @@ class SCRSSMA(RuleIterator):
     def realize(self):
         rng = self.get_pars('rng')
         h = self.get_data('close_ANY_d')
-        diff = (sma(h, rng) - h)[-1]
+        diff = self.indicator('sma', 'close_ANY_d', rng)[-1] - h[-1]
         if diff < 0:
             return 1
         else:
             return -1
 
+    def realize_all(self):
+        rng = self.get_pars('rng')
+        if not _fits_window(self, rng - 1):
+            return None
+        h = self.get_data('close_ANY_d')
+        if _has_interior_nan(h):
+            return None
+        diff = sma(h, rng) - h
+        return np.where(diff < 0, 1., -1.)
+
 
 class SCRSDEMA(RuleIterator):
     """ 单均线交叉策略——DEMA均线(双重指数平滑移动平均线): 根据股价与DEMA均线的相对位置设定持仓比例
@@ -869,12 +947,22 @@ class SCRSTRIMA(RuleIterator):
     def realize(self):
         p = self.get_pars('p')
         h = self.get_data('close_ANY_d')
-        diff = (trima(h, p) - h)[-1]
+        diff = self.indicator('trima', 'close_ANY_d', p)[-1] - h[-1]
         if diff < 0:
             return 1
         else:
             return 0
 
+    def realize_all(self):
+        p = self.get_pars('p')
+        if not _fits_window(self, p - 1):
+            return None
+        h = self.get_data('close_ANY_d')
+        if _has_interior_nan(h):
+            return None
+        diff = trima(h, p) - h
+        return np.where(diff < 0, 1., 0.)
+
 
 class SCRSWMA(RuleIterator):
     """ 单均线交叉策略——WMA均线(加权移动平均线): 根据股价与WMA均线的相对位置设定持仓比例
@@ -911,12 +999,22 @@ class SCRSWMA(RuleIterator):
     def realize(self):
         p = self.get_pars('p')
         h = self.get_data('close_ANY_d')
-        diff = (wma(h, p) - h)[-1]
+        diff = self.indicator('wma', 'close_ANY_d', p)[-1] - h[-1]
         if diff < 0:
             return 1
         else:
             return 0
 
+    def realize_all(self):
+        p = self.get_pars('p')
+        if not _fits_window(self, p - 1):
+            return None
+        h = self.get_data('close_ANY_d')
+        if _has_interior_nan(h):
+            return None
+        diff = wma(h, p) - h
+        return np.where(diff < 0, 1., 0.)
+
 
 # Built-in Double-cross-line strategies:
 # these strateges are basically adopting same philosaphy:
@@ -962,13 +1060,22 @@ class DCRSSMA(RuleIterator):
 
     def realize(self):
         l, s = self.get_pars('l', 's')
-        h = self.get_data('close_ANY_d')
-        diff = (sma(h, l) - sma(h, s))[-1]
+        diff = self.indicator('sma', 'close_ANY_d', l)[-1] - self.indicator('sma', 'close_ANY_d', s)[-1]
         if diff < 0:
             return 1
         else:
             return -1
 
+    def realize_all(self):
+        l, s = self.get_pars('l', 's')
+        if not _fits_window(self, max(l, s) - 1):
+            return None
+        h = self.get_data('close_ANY_d')
+        if _has_interior_nan(h):
+            return None
+        diff = sma(h, l) - sma(h, s)
+        return np.where(diff < 0, 1., -1.)
+
 
 class DCRSDEMA(RuleIterator):
     """ 双均线交叉策略——DEMA均线(简单移动平均线):
@@ -1278,13 +1385,22 @@ class DCRSTRIMA(RuleIterator):
 
     def realize(self):
         lp, sp = self.get_pars('lp', 'sp')
-        h = self.get_data('close_ANY_d')
-        diff = (trima(h, lp) - trima(h, sp))[-1]
+        diff = self.indicator('trima', 'close_ANY_d', lp)[-1] - self.indicator('trima', 'close_ANY_d', sp)[-1]
         if diff < 0:
             return 1
         else:
             return -1
 
+    def realize_all(self):
+        lp, sp = self.get_pars('lp', 'sp')
+        if not _fits_window(self, max(lp, sp) - 1):
+            return None
+        h = self.get_data('close_ANY_d')
+        if _has_interior_nan(h):
+            return None
+        diff = trima(h, lp) - trima(h, sp)
+        return np.where(diff < 0, 1., -1.)
+
 
 class DCRSWMA(RuleIterator):
     """ 双均线交叉策略——WMA均线(加权移动平均线):
@@ -1322,13 +1438,22 @@ class DCRSWMA(RuleIterator):
 
     def realize(self):
         lp, sp = self.get_pars('lp', 'sp')
-        h = self.get_data('close_ANY_d')
-        diff = (wma(h, lp) - wma(h, sp))[-1]
+        diff = self.indicator('wma', 'close_ANY_d', lp)[-1] - self.indicator('wma', 'close_ANY_d', sp)[-1]
         if diff < 0:
             return 1
         else:
             return -1
 
+    def realize_all(self):
+        lp, sp = self.get_pars('lp', 'sp')
+        if not _fits_window(self, max(lp, sp) - 1):
+            return None
+        h = self.get_data('close_ANY_d')
+        if _has_interior_nan(h):
+            return None
+        diff = wma(h, lp) - wma(h, sp)
+        return np.where(diff < 0, 1., -1.)
+
 
 # Built-in Sloping strategies:
 # these strateges are basically adopting same philosaphy:
@@ -1375,8 +1500,7 @@ class SLPSMA(RuleIterator):
 
     def realize(self):
         f, n = self.get_pars('f', 'N')
-        h = self.get_data('close_ANY_d')
-        curve = sma(h, f)
+        curve = self.indicator('sma', 'close_ANY_d', f)
         # TODO 取N个最近的curve点进行线性回归
         slope = curve[-1] - curve[-n]
         if slope > 0:
@@ -1384,6 +1508,17 @@ class SLPSMA(RuleIterator):
         else:
             return -1
 
+    def realize_all(self):
+        f, n = self.get_pars('f', 'N')
+        if not _fits_window(self, f + n - 2):
+            return None
+        h = self.get_data('close_ANY_d')
+        if _has_interior_nan(h):
+            return None
+        curve = sma(h, f)
+        slope = curve - _shift_rows(curve, n - 1)
+        return np.where(slope > 0, 1., -1.)
+
 
 class SLPDEMA(RuleIterator):
     """ 均线斜率交易策略——DEMA均线(双重指数平滑移动平均线):
@@ -1775,14 +1910,24 @@ class SLPTRIMA(RuleIterator):
 
     def realize(self):
         f, n = self.get_pars('f', 'N')
-        h = self.get_data('close_ANY_d')
-        curve = trima(h, f)
+        curve = self.indicator('trima', 'close_ANY_d', f)
         slope = curve[-1] - curve[-n]
         if slope > 0:
             return 1
         else:
             return -1
 
+    def realize_all(self):
+        f, n = self.get_pars('f', 'N')
+        if not _fits_window(self, f + n - 2):
+            return None
+        h = self.get_data('close_ANY_d')
+        if _has_interior_nan(h):
+            return None
+        curve = trima(h, f)
+        slope = curve - _shift_rows(curve, n - 1)
+        return np.where(slope > 0, 1., -1.)
+
 
 class SLPWMA(RuleIterator):
     """ 均线斜率交易策略——WMA均线(加权移动平均线):\n
@@ -1824,14 +1969,24 @@ class SLPWMA(RuleIterator):
 
     def realize(self):
         f, n = self.get_pars('f', 'N')
-        h = self.get_data('close_ANY_d')
-        curve = wma(h, f)
+        curve = self.indicator('wma', 'close_ANY_d', f)
         slope = curve[-1] - curve[-n]
         if slope > 0:
             return 1
         else:
             return -1
 
+    def realize_all(self):
+        f, n = self.get_pars('f', 'N')
+        if not _fits_window(self, f + n - 2):
+            return None
+        h = self.get_data('close_ANY_d')
+        if _has_interior_nan(h):
+            return None
+        curve = wma(h, f)
+        slope = curve - _shift_rows(curve, n - 1)
+        return np.where(slope > 0, 1., -1.)
+
 
 # momentum-based strategies:
 # this group of strategies are based on momentum of prices
@@ -1871,24 +2026,20 @@ class SAREXT(RuleIterator):
                     DataType('high', freq='d', asset_type='ANY'),
                     DataType('low', freq='d', asset_type='ANY')
                 ],
+                vectorized=True,
         )
         if par_values:
             self.update_par_values(*par_values)
 
     def realize(self):
         a, m = self.get_pars('a', 'm')
+        # 策略以向量化方式运行，high和low为(窗口长度, 股票数量)的二维数组
         high, low = self.get_data('high_ANY_d', 'low_ANY_d')
-        sar = sarext(high, low, a, m)[-1]
+        sar = sarext_2d(high, low, float(a), float(m))[-1]
         # 策略:
         # 当指标大于0时，输出多头
         # 当指标小于0时，输出空头
-        if sar > 0:
-            cat = 1
-        elif sar < 0:
-            cat = -1
-        else:
-            cat = 0
-        return cat
+        return np.select([sar > 0, sar < 0], [1., -1.], default=0.)
 
 
 class MACD(RuleIterator):
@@ -1923,7 +2074,8 @@ class MACD(RuleIterator):
                 description='MACD strategy, determine long/short position according to differences of '
                             'exponential weighted moving average prices',
                 window_length=270,
-                data_types=DataType('close', freq='d', asset_type='ANY')
+                data_types=DataType('close', freq='d', asset_type='ANY'),
+                vectorized=True,
         )
         if par_values:
             self.update_par_values(*par_values)
@@ -1931,14 +2083,14 @@ class MACD(RuleIterator):
     def realize(self):
         s, l, m = self.get_pars('slow', 'fast', 'mid')
 
+        # 策略以向量化方式运行，h为(窗口长度, 股票数量)的二维数组
         h = self.get_data('close_ANY_d')
 
         # 计算指数的指数移动平均价格
-        diff = ema(h, s) - ema(h, l)
-        dea = ema(diff, m)
+        diff = ema_2d(h, s) - ema_2d(h, l)
+        dea = ema_2d(diff, m)
         _macd = 2 * (diff - dea)
-        cat = 1 if _macd[-1] > 0 else 0
-        return cat
+        return np.where(_macd[-1] > 0, 1., 0.)
 
 
 class TRIX(RuleIterator):
@@ -2154,6 +2306,20 @@ class AROON(RuleIterator):
             cat = 0
         return cat
 
+    def realize_all(self):
+        p = self.get_pars('p')
+        if not _fits_window(self, p):
+            return None
+        high, low = self.get_data('high_ANY_d', 'low_ANY_d')
+        if _has_interior_nan(high, low):
+            return None
+        ups, dns = aroon(high, low, p)
+        return np.select(
+                [ups > dns, (ups > 70) & (dns < 30), ups < dns, (ups < 30) & (dns > 70)],
+                [0.5, 1., -0.5, -1.],
+                default=0.,
+        )
+
 
 class AROONOSC(RuleIterator):
     """ AROON Oscillator (AROON震荡指标) 选股策略:\n
@@ -2211,6 +2377,16 @@ class AROONOSC(RuleIterator):
             cat = 0
         return cat
 
+    def realize_all(self):
+        p = self.get_pars('p')
+        if not _fits_window(self, p):
+            return None
+        high, low = self.get_data('high_ANY_d', 'low_ANY_d')
+        if _has_interior_nan(high, low):
+            return None
+        res = aroonosc(high, low, p)
+        return np.select([res > 0, res > 50, res < 0, res < -50], [0.5, 1., -0.5, -1.], default=0.)
+
 
 class CCI(RuleIterator):
     """ CCI (Commodity Channel Index商品渠道指数) 选股策略\n
@@ -2269,6 +2445,16 @@ class CCI(RuleIterator):
             cat = 0
         return cat
 
+    def realize_all(self):
+        p = self.get_pars('p')
+        if not _fits_window(self, p - 1):
+            return None
+        high, low, close = self.get_data('high_ANY_d', 'low_ANY_d', 'close_ANY_d')
+        if _has_interior_nan(high, low, close):
+            return None
+        res = cci(high, low, close, p)
+        return np.select([res > 0, res > 50, res < 0, res < -50], [0.5, 1., -0.5, -1.], default=0.)
+
 
 class CMO(RuleIterator):
     """ CMO (Chande Momentum Oscillator 钱德动量振荡器) 选股策略:\n
@@ -2429,6 +2615,16 @@ class MFI(RuleIterator):
             sig = 0
         return sig
 
+    def realize_all(self):
+        p = self.get_pars('p')
+        if not _fits_window(self, p):
+            return None
+        high, low, close, volume = self.get_data('high_ANY_d', 'low_ANY_d', 'close_ANY_d', 'volume_ANY_d')
+        if _has_interior_nan(high, low, close, volume):
+            return None
+        res = mfi(high, low, close, volume, p)
+        return np.select([res < 20, res > 80], [0.1, -0.3], default=0.)
+
 
 class DI(RuleIterator):
     """ DI (Directory Indicator 方向指标) 交易策略:\n
@@ -2586,6 +2782,23 @@ class MOM(RuleIterator):
             cat = 0
         return cat
 
+    def realize_all(self):
+        p = self.get_pars('p')
+        if not _fits_window(self, p):
+            return None
+        h = self.get_data('close_ANY_d')
+        res = mom(h, p)
+        return np.select([res > 0, res < 0], [1., -1.], default=0.)
+
+    def realize_batch(self, par_batch):
+        p = par_batch['p']
+        h = self.get_data('close_ANY_d')
+        if np.any(p >= len(h)):
+            return None
+        # 动量指标即当前价格与p日前价格之差，所有参数组的结果可以同时取得
+        res = h[-1] - h[-1 - p]
+        return np.select([res > 0, res < 0], [1., -1.], default=0.)
+
 
 class PPO(RuleIterator):
     """ PPO (Percentage Price Oscillator 百分比价格振荡器) 交易策略:
@@ -2921,6 +3134,16 @@ class ULTOSC(RuleIterator):
             sig = 0
         return sig
 
+    def realize_all(self):
+        p1, p2, p3, u, l = self.get_pars('p1', 'p2', 'p3', 'u', 'l')
+        if not _fits_window(self, max(p1, p2, p3)):
+            return None
+        high, low, close = self.get_data('high_ANY_d', 'low_ANY_d', 'close_ANY_d')
+        if _has_interior_nan(high, low, close):
+            return None
+        res = ultosc(high, low, close, p1, p2, p3)
+        return np.select([res > u, res < l], [-0.3, 0.1], default=0.)
+
 
 class WILLR(RuleIterator):
     """ WILLR (William's %R 威廉姆斯百分比) 交易策略:
@@ -2975,6 +3198,16 @@ class WILLR(RuleIterator):
             sig = 0
         return sig
 
+    def realize_all(self):
+        p, u, l = self.get_pars('p', 'u', 'l')
+        if not _fits_window(self, p - 1):
+            return None
+        high, low, close = self.get_data('high_ANY_d', 'low_ANY_d', 'close_ANY_d')
+        if _has_interior_nan(high, low, close):
+            return None
+        res = willr(high, low, close, p)
+        return np.select([res > -l, res < -u], [-0.3, 0.1], default=0.)
+
 
 # Volume & Price Indicator based strategies
 
@@ -3332,6 +3565,15 @@ class SellRate(RuleIterator):
             return -1
         return 0
 
+    def realize_all(self):
+        day, change = self.get_pars('day', 'change')
+        if not _fits_window(self, day - 1):
+            return None
+        h = self.get_data('close_ANY_d')
+        diff = h - _shift_rows(h, day - 1)
+        hit = (diff > change) if change >= 0 else (diff < change)
+        return np.where(hit, -1., 0.)
+
 
 class BuyRate(RuleIterator):
     """ 变化率买入信号策略:
@@ -3382,6 +3624,15 @@ class BuyRate(RuleIterator):
             return 1
         return 0
 
+    def realize_all(self):
+        day, change = self.get_pars('day', 'change')
+        if not _fits_window(self, day - 1):
+            return None
+        h = self.get_data('close_ANY_d')
+        diff = h - _shift_rows(h, day - 1)
+        hit = (diff > change) if change >= 0 else (diff < change)
+        return np.where(hit, 1., 0.)
+
 
 class TimingLong(GeneralStg):
     """ 简单择时策略，整个历史周期上固定保持多头全仓状态
@@ -3520,6 +3771,18 @@ class DMA(RuleIterator):
         cat = 1 if dma[-1] > ama[-1] else 0
         return cat
 
+    def realize_all(self):
+        s, l, d = self.get_pars('slow', 'long', 'diff')
+        if not _fits_window(self, max(s, l) + d - 2):
+            return None
+        h = self.get_data('close_ANY_d')
+        if _has_interior_nan(h):
+            return None
+        dma = sma(h, s) - sma(h, l)
+        ama = dma.copy()
+        ama[~np.isnan(dma)] = sma(dma[~np.isnan(dma)], d)
+        return np.where(dma > ama, 1., 0.)
+
 
 # Built-in GeneralStg strategies:
 
@@ -3697,6 +3960,21 @@ class SelectingAvgIndicator(FactorSorter):
 
         return factors
 
+    def realize_all(self):
+        dtype_id = self.data_type_ids
+        h = self.get_data(dtype_id[0])
+        window_length = self.get_window_length(dtype_id[0])
+        # 逐行累加窗口内的有效值，与在每个数据窗口上调用np.nanmean()的结果相同
+        total = np.zeros(h.shape, dtype=float)
+        count = np.zeros(h.shape, dtype=float)
+        for lag in range(window_length - 1, -1, -1):
+            lagged = _shift_rows(h, lag)
+            valid = ~np.isnan(lagged)
+            total += np.where(valid, lagged, 0.)
+            count += valid
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return total / count
+
 
 class SelectingNDayLast(FactorSorter):
     """ 以股票N天前的价格或数据指标作为选股因子选股基础选股策略，以股票的N日前历史数据作为选股因子，因子排序参数以策略属性的形式控制
@@ -3753,6 +4031,19 @@ class SelectingNDayLast(FactorSorter):
 
         return factors
 
+    def realize_all(self):
+        n = self.get_pars('n')
+        if not _fits_window(self, n):
+            return None
+        return _shift_rows(self.get_data('close_ANY_d'), n)
+
+    def realize_batch(self, par_batch):
+        n = par_batch['n']
+        h = self.get_data('close_ANY_d')
+        if np.any(n >= len(h)):
+            return None
+        return h[-n - 1]
+
 
 class SelectingNDayAvg(FactorSorter):
     """ 以股票过去N天的价格或数据指标的平均值作为选股因子选股
@@ -3811,6 +4102,17 @@ class SelectingNDayAvg(FactorSorter):
 
         return factors
 
+    def realize_all(self):
+        n = self.get_pars('n')
+        if not _fits_window(self, n):
+            return None
+        h = self.get_data('close_ANY_d')
+        # 按时间顺序逐行累加，与在每个数据窗口上调用mean(axis=0)的结果相同
+        total = _shift_rows(h, n)
+        for lag in range(n - 1, 0, -1):
+            total += _shift_rows(h, lag)
+        return total / n
+
 
 class SelectingNDayChange(FactorSorter):
     """ 以股票过去N天的价格或数据指标的变动值作为选股因子选股
@@ -3871,6 +4173,20 @@ class SelectingNDayChange(FactorSorter):
 
         return factors
 
+    def realize_all(self):
+        n = self.get_pars('n')
+        if not _fits_window(self, n):
+            return None
+        h = self.get_data('close_ANY_d')
+        return h - _shift_rows(h, n)
+
+    def realize_batch(self, par_batch):
+        n = par_batch['n']
+        h = self.get_data('close_ANY_d')
+        if np.any(n >= len(h)):
+            return None
+        return h[-1] - h[-n - 1]
+
 
 class SelectingNDayRateChange(FactorSorter):
     """ 以股票过去N天的价格或数据指标的变动比例作为选股因子选股
@@ -3930,6 +4246,22 @@ class SelectingNDayRateChange(FactorSorter):
 
         return factors
 
+    def realize_all(self):
+        n = self.get_pars('n')
+        if not _fits_window(self, n):
+            return None
+        h = self.get_data('close_ANY_d')
+        n_previous = _shift_rows(h, n)
+        return (h - n_previous) / n_previous
+
+    def realize_batch(self, par_batch):
+        n = par_batch['n']
+        h = self.get_data('close_ANY_d')
+        if np.any(n >= len(h)):
+            return None
+        n_previous = h[-n - 1]
+        return (h[-1] - n_previous) / n_previous
+
 
 class SelectingNDayVolatility(FactorSorter):
     """ 根据股票以前N天的股价波动率作为选股因子
@@ -0,0 +1,302 @@
+# coding=utf-8
+# ======================================
+# File:     csfuncs.py
+# Author:   Jackie PENG
+# Contact:  jackie.pengzhao@gmail.com
+# Created:  2026-10-19
+# Desc:
+#   Vectorized cross-sectional operators
+# (rank, zscore, demean, winsorize and
+# group neutralization) on share x date
+# matrices.
+# ======================================
+
+import warnings
+from typing import Any, Callable, Tuple
+
+import numpy as np
+import pandas as pd
+
+CS_RANK_METHODS = ('average', 'min', 'max', 'first', 'dense')
+
+
+def _as_cross_sections(x: Any, axis: int) -> Tuple[np.ndarray, Callable[[np.ndarray], np.ndarray]]:
+    """将输入整理为第 0 轴为截面 （share）维度的二维 float 数组。
+
+    Parameters
+    ----------
+    x : array_like
+        一维 （单个截面）或二维数组。
+    axis : int
+        截面所在的轴：二维输入时，``axis`` 轴上的元素属于同一个截面。
+
+    Returns
+    -------
+    tuple of (numpy.ndarray, callable)
+        形状为 ``(截面元素数, 截面数)`` 的二维数组，以及将同形结果还原为输入形状的函数。
+    """
+    arr = np.asarray(x, dtype=float)
+    if arr.ndim == 1:
+        return arr[:, np.newaxis], lambda res: res[:, 0]
+    if arr.ndim != 2:
+        raise ValueError(f'cross-sectional operators expect a 1D or 2D array, got {arr.ndim}D')
+    if axis not in (0, 1, -1, -2):
+        raise ValueError(f'axis should be 0 or 1, got {axis}')
+    if axis in (0, -2):
+        return arr, lambda res: res
+    return arr.T, lambda res: res.T
+
+
+def cs_rank(x: Any,
+            method: str = 'average',
+            ascending: bool = True,
+            pct: bool = False,
+            axis: int = 0) -> np.ndarray:
+    """对每个截面同时计算排名，NaN 不参与排名且结果保持为 NaN。
+
+    所有截面通过一次沿截面轴的稳定排序完成排名，不需要逐个截面循环，
+    计算结果与 pandas ``Series.rank(method=..., na_option='keep')`` 一致。
+
+    Parameters
+    ----------
+    x : array_like
+        一维数组 （单个截面，如 FactorSorter 中某一时刻所有股票的因子值）或二维数组。
+    method : {'average', 'min', 'max', 'first', 'dense'}, default 'average'
+        并列值的排名方式，语义与 pandas 一致。
+    ascending : bool, default True
+        True 时最小值排名为 1，False 时最大值排名为 1。
+    pct : bool, default False
+        True 时返回百分比排名 （排名除以截面有效值数量，``dense`` 时除以最大排名）。
+    axis : int, default 0
+        截面所在的轴。HistoryPanel 中的 ``(share, date)`` 矩阵使用 ``axis=0``；
+        策略中 ``(date, share)`` 形式的历史数据窗口使用 ``axis=1``。
+
+    Returns
+    -------
+    numpy.ndarray
+        与输入同形的排名数组 （float）。
+
+    Raises
+    ------
+    ValueError
+        ``method`` 不合法或输入维度不是一维或二维时抛出。
+
+    Examples
+    --------
+    >>> cs_rank(np.array([3., 1., np.nan, 3.]))
+    array([2.5, 1. , nan, 2.5])
+    >>> cs_rank(np.array([[1., 2.], [2., 2.], [0., 1.]]), method='dense')
+    array([[2., 2.],
+           [3., 2.],
+           [1., 1.]])
+    """
+    if method not in CS_RANK_METHODS:
+        raise ValueError(f'method must be one of {list(CS_RANK_METHODS)}, got {method}')
+    arr, restore = _as_cross_sections(x, axis)
+    if not ascending:
+        arr = -arr
+    n = arr.shape[0]
+    # 稳定排序保证并列值按原顺序排列 （method='first'），NaN 被排在每个截面的末尾
+    order = np.argsort(arr, axis=0, kind='stable')
+    sorted_arr = np.take_along_axis(arr, order, axis=0)
+    valid = ~np.isnan(sorted_arr)
+    positions = np.broadcast_to(np.arange(n)[:, np.newaxis], arr.shape)
+
+    group_start = np.ones(arr.shape, dtype=bool)
+    group_start[1:] = sorted_arr[1:] != sorted_arr[:-1]
+    group_end = np.ones(arr.shape, dtype=bool)
+    group_end[:-1] = group_start[1:]
+
+    if method == 'first':
+        ranks = positions + 1.
+    elif method == 'dense':
+        ranks = np.cumsum(group_start, axis=0).astype(float)
+    else:
+        first_pos = np.maximum.accumulate(np.where(group_start, positions, 0), axis=0)
+        last_pos = np.minimum.accumulate(np.where(group_end, positions, n)[::-1], axis=0)[::-1]
+        if method == 'min':
+            ranks = first_pos + 1.
+        elif method == 'max':
+            ranks = last_pos + 1.
+        else:  # average
+            ranks = (first_pos + last_pos) / 2. + 1.
+    ranks = np.where(valid, ranks, np.nan)
+
+    if pct:
+        if method == 'dense':
+            denom = np.nanmax(np.where(valid, ranks, -np.inf), axis=0)
+        else:
+            denom = valid.sum(axis=0).astype(float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ranks = ranks / denom[np.newaxis, :]
+
+    res = np.empty_like(ranks)
+    np.put_along_axis(res, order, ranks, axis=0)
+    return restore(res)
+
+
+def _cs_mean_std(arr: np.ndarray, ddof: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """计算每个截面的均值与标准差，忽略 NaN；有效值不足时结果为 NaN，不产生警告。"""
+    valid = ~np.isnan(arr)
+    cnt = valid.sum(axis=0).astype(float)
+    filled = np.where(valid, arr, 0.)
+    mu = np.full(arr.shape[1], np.nan)
+    has_mean = cnt > 0.
+    mu[has_mean] = filled.sum(axis=0)[has_mean] / cnt[has_mean]
+    dev2 = np.where(valid, (arr - mu[np.newaxis, :]) ** 2, 0.)
+    sigma = np.full(arr.shape[1], np.nan)
+    has_std = cnt - ddof > 0.
+    sigma[has_std] = np.sqrt(dev2.sum(axis=0)[has_std] / (cnt[has_std] - ddof))
+    return mu, sigma
+
+
+def cs_zscore(x: Any, ddof: int = 1, axis: int = 0) -> np.ndarray:
+    """对每个截面做标准化：``(x - 截面均值) / 截面标准差``，忽略 NaN。
+
+    Parameters
+    ----------
+    x : array_like
+        一维或二维数组，参见 :func:`cs_rank`。
+    ddof : int, default 1
+        计算标准差时的自由度修正。
+    axis : int, default 0
+        截面所在的轴。
+
+    Returns
+    -------
+    numpy.ndarray
+        与输入同形的标准化分数；标准差为 0 或有效值不足的截面结果全为 NaN。
+
+    Examples
+    --------
+    >>> cs_zscore(np.array([1., 2., 3., np.nan]))
+    array([-1.,  0.,  1., nan])
+    """
+    arr, restore = _as_cross_sections(x, axis)
+    mu, sigma = _cs_mean_std(arr, ddof=ddof)
+    invalid = (~np.isfinite(sigma)) | (sigma == 0.)
+    sigma = np.where(invalid, np.nan, sigma)
+    return restore((arr - mu[np.newaxis, :]) / sigma[np.newaxis, :])
+
+
+def cs_demean(x: Any, axis: int = 0) -> np.ndarray:
+    """对每个截面去均值：``x - 截面均值``，忽略 NaN。
+
+    Parameters
+    ----------
+    x : array_like
+        一维或二维数组，参见 :func:`cs_rank`。
+    axis : int, default 0
+        截面所在的轴。
+
+    Returns
+    -------
+    numpy.ndarray
+        与输入同形的去均值结果。
+
+    Examples
+    --------
+    >>> cs_demean(np.array([1., 2., 6.]))
+    array([-2., -1.,  3.])
+    """
+    arr, restore = _as_cross_sections(x, axis)
+    mu, _ = _cs_mean_std(arr, ddof=0)
+    return restore(arr - mu[np.newaxis, :])
+
+
+def cs_winsorize(x: Any, lower: float = 0.01, upper: float = 0.99, axis: int = 0) -> np.ndarray:
+    """按截面分位数缩尾：把每个截面中低于 ``lower`` 分位数或高于 ``upper`` 分位数的值截断到分位数上。
+
+    Parameters
+    ----------
+    x : array_like
+        一维或二维数组，参见 :func:`cs_rank`。
+    lower : float, default 0.01
+        下分位数，取值范围 [0, 1]。
+    upper : float, default 0.99
+        上分位数，取值范围 [0, 1]，且不小于 ``lower``。
+    axis : int, default 0
+        截面所在的轴。
+
+    Returns
+    -------
+    numpy.ndarray
+        与输入同形的缩尾结果，NaN 保持不变。
+
+    Raises
+    ------
+    ValueError
+        分位数不在 [0, 1] 范围内或 ``lower > upper`` 时抛出。
+
+    Examples
+    --------
+    >>> cs_winsorize(np.array([1., 2., 3., 4., 100.]), lower=0., upper=0.75)
+    array([1., 2., 3., 4., 4.])
+    """
+    if not (0. <= lower <= upper <= 1.):
+        raise ValueError(f'quantiles should satisfy 0 <= lower <= upper <= 1, got lower={lower}, upper={upper}')
+    arr, restore = _as_cross_sections(x, axis)
+    with warnings.catch_warnings():
+        # 全为 NaN 的截面分位数为 NaN，结果仍为 NaN，无需警告
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        bounds = np.nanquantile(arr, [lower, upper], axis=0)
+    return restore(np.clip(arr, bounds[0][np.newaxis, :], bounds[1][np.newaxis, :]))
+
+
+def cs_neutralize(x: Any, groups: Any, axis: int = 0) -> np.ndarray:
+    """按分组对每个截面做中性化：减去同一截面中同组元素的均值 （如行业中性化）。
+
+    所有截面、所有分组的均值通过一次 ``np.bincount`` 计算得到，不需要逐截面或逐分组循环。
+
+    Parameters
+    ----------
+    x : array_like
+        一维或二维数组，参见 :func:`cs_rank`。
+    groups : array_like
+        分组标签 （如行业代码）：长度等于截面元素数的一维序列 （各截面使用相同分组），
+        或与 ``x`` 同形的数组 （分组随时间变化）。标签为 None 或 NaN 的元素结果为 NaN。
+    axis : int, default 0
+        截面所在的轴。
+
+    Returns
+    -------
+    numpy.ndarray
+        与输入同形的组内去均值结果。
+
+    Raises
+    ------
+    ValueError
+        ``groups`` 的形状与 ``x`` 不匹配时抛出。
+
+    Examples
+    --------
+    >>> cs_neutralize(np.array([1., 3., 10., 20.]), groups=['bank', 'bank', 'tech', 'tech'])
+    array([-1.,  1., -5.,  5.])
+    """
+    arr, restore = _as_cross_sections(x, axis)
+    n, m = arr.shape
+    group_arr = np.asarray(groups, dtype=object)
+    if group_arr.ndim == 1:
+        if group_arr.shape[0] != n:
+            raise ValueError(f'groups should have {n} labels, one for each cross-sectional item, '
+                             f'got {group_arr.shape[0]}')
+        codes = pd.factorize(group_arr, use_na_sentinel=True)[0]
+        codes = np.broadcast_to(codes[:, np.newaxis], (n, m))
+    else:
+        if group_arr.shape != np.shape(x):
+            raise ValueError(f'groups shape {group_arr.shape} does not match data shape {np.shape(x)}')
+        if axis in (1, -1):
+            group_arr = group_arr.T
+        codes = pd.factorize(group_arr.ravel(), use_na_sentinel=True)[0].reshape(n, m)
+
+    n_groups = int(codes.max()) + 1 if codes.size else 0
+    valid = (~np.isnan(arr)) & (codes >= 0)
+    # 截面 j 中分组 g 的组合编号为 g * m + j，在同一次 bincount 中得到所有截面、所有分组的和与计数
+    combined = np.where(valid, codes * m + np.arange(m)[np.newaxis, :], 0).ravel()
+    size = max(n_groups * m, 1)
+    sums = np.bincount(combined, weights=np.where(valid, arr, 0.).ravel(), minlength=size)
+    counts = np.bincount(combined, weights=valid.ravel().astype(float), minlength=size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+    res = np.where(valid, arr - means[combined].reshape(n, m), np.nan)
+    return restore(res)
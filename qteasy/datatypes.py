@@ -4364,6 +4364,53 @@ def _expand_df_index(df: pd.DataFrame, starts: str, ends: str) -> pd.DataFrame:
     return df.reindex(expanded_index).sort_index(ascending=True)
 
 
+# 历史数据可选的浮点精度：默认为 float64，float32 可以使历史数据占用的内存与带宽减半
+FLOAT_DATA_DTYPES = ('float64', 'float32')
+
+
+def _regulate_float_dtype(dtype) -> Optional[np.dtype]:
+    """ 检查并规范化历史数据的浮点精度参数，None表示保持数据原有的数据类型
+
+    Parameters
+    ----------
+    dtype: {None, str, numpy.dtype}
+        'float64'/'float'/np.float64 或 'float32'/np.float32
+
+    Returns
+    -------
+    numpy.dtype or None
+
+    Raises
+    ------
+    ValueError
+        当dtype不是FLOAT_DATA_DTYPES中的浮点类型时
+    """
+    if dtype is None:
+        return None
+    try:
+        regulated = np.dtype(dtype)
+    except TypeError:
+        raise ValueError(f'dtype should be one of {list(FLOAT_DATA_DTYPES)}, got {dtype}')
+    if regulated.name not in FLOAT_DATA_DTYPES:
+        raise ValueError(f'dtype should be one of {list(FLOAT_DATA_DTYPES)}, got {dtype}')
+    return regulated
+
+
+def _cast_float_data(data: Union[pd.DataFrame, pd.Series], dtype) -> Union[pd.DataFrame, pd.Series]:
+    """ 将读取的历史数据中的数值列转换为dtype精度，非数值列 （如文本）保持不变，dtype为None时原样返回"""
+    dtype = _regulate_float_dtype(dtype)
+    if dtype is None or not isinstance(data, (pd.DataFrame, pd.Series)):
+        return data
+    if isinstance(data, pd.Series):
+        return data.astype(dtype) if data.dtype.kind in 'fiu' else data
+    numeric_cols = [col for col, col_dtype in data.dtypes.items() if col_dtype.kind in 'fiu']
+    if len(numeric_cols) == data.shape[1]:
+        return data.astype(dtype)
+    if not numeric_cols:
+        return data
+    return data.astype({col: dtype for col in numeric_cols})
+
+
 def get_history_data_from_source(
         datasource,
         htypes: List[DataType], *,
@@ -4373,6 +4420,7 @@ def get_history_data_from_source(
         freq: str = None,
         combine_asset_types: bool = False,
         row_count: int = None,
+        dtype: str = None,
 ) -> Dict[str, pd.DataFrame]:
     """ 根据给出的历史数据类型对象，获取相应的数据并组装成一个标准的DataFrame-Dict并返回
     如果给出qt_codes/start/end参数，则返回符合要求的数据范围，或者返回最近的row_count行数据
@@ -4426,6 +4474,8 @@ def get_history_data_from_source(
     row_count: int, optional, default 100
         获取的历史数据的行数，如果指定了start和end，则忽略此参数
         否则返回最近的row_count行数据
+    dtype: {None, 'float64', 'float32'}, optional
+        返回数据的浮点精度，None表示保持数据源读取的数据类型，'float32'可使数据占用的内存减半
 
     Returns
     -------
@@ -4434,6 +4484,7 @@ def get_history_data_from_source(
         HistoryPanel对象
     """
 
+    dtype = _regulate_float_dtype(dtype)
     history_data_acquired = {}
     row_count_adj_factors = {
         '1min':  241,
@@ -4542,7 +4593,7 @@ def get_history_data_from_source(
         if row_count and (end is None):
             df = df.head(row_count)
 
-        history_data_acquired[htyp] = df
+        history_data_acquired[htyp] = _cast_float_data(df, dtype)
 
     return history_data_acquired
 
@@ -4555,6 +4606,7 @@ def get_reference_data_from_source(
         freq: str = None,
         row_count: int = 100,
         group_by_dtype_name: bool = False,
+        dtype: str = None,
 ) -> Dict[str, pd.Series]:
     """ 根据给出的参考数据类型对象，获取相应的数据并组装成一个标准的Series-Dict并返回
 
@@ -4582,6 +4634,8 @@ def get_reference_data_from_source(
         是否将读取的数据按照data_type.name来分组(建立dict的key）
          - False表示使用datatype.dtype_id为key分组
          - True 表示使用datatype.name为key分组
+    dtype: {None, 'float64', 'float32'}, optional
+        返回数据的浮点精度，None表示保持数据源读取的数据类型
 
     Returns
     -------
@@ -4621,6 +4675,7 @@ def get_reference_data_from_source(
         err = ValueError(f'data types should not be empty!')
         raise err
 
+    dtype = _regulate_float_dtype(dtype)
     reference_data_acquired = {}
 
     # 逐个获取每一个历史数据类型的数据
@@ -4672,7 +4727,7 @@ def get_reference_data_from_source(
             pass
         if row_count:
             ser = ser.tail(row_count)
-        reference_data_acquired[htyp] = ser
+        reference_data_acquired[htyp] = _cast_float_data(ser, dtype)
 
     # 找到reference_data_acquired中的空DataFrame，将这些key/value删除
     keys_to_delete = [k for k, ser in reference_data_acquired.items() if isinstance(ser, pd.DataFrame) and ser.empty]
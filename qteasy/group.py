@@ -18,7 +18,7 @@ from qteasy.strategy import BaseStrategy
 
 from qteasy.blender import (
     blender_parser,
-    signal_blend,
+    compile_blender,
     human_blender,
 )
 
@@ -76,6 +76,9 @@ class Group:
         self._signal_type = signal_type
         self._blender_str = ''
         self._blender = None
+        # 编译后的混合函数及其对应的blender表达式，表达式变化（包括成员数量变化导致默认表达式变化）时重新编译
+        self._blend_func = None
+        self._blend_func_str = None
 
         self.members = []
         # 运行时由 Operator 设置，用于在策略中访问 Operator 级别的运行状态（如 process data）
@@ -249,9 +252,39 @@ class Group:
             strategy._group = None
         self.members = []
 
+    def get_blend_func(self):
+        """ 返回由当前 blender 表达式编译得到的混合函数，参见 compile_blender()。
+
+        Returns
+        -------
+        Callable or None
+            混合函数；没有成员策略且未设置 blender 时返回 None。
+        """
+        effective = self.blender_str
+        if not effective:
+            return None
+        if effective != self._blend_func_str:
+            self._blend_func = compile_blender(blender_parser(effective))
+            self._blend_func_str = effective
+        return self._blend_func
+
     def blend(self, signals: Iterable):
-        """使用当前 blender 将同组策略信号混合为一组信号。"""
-        return signal_blend(op_signals=signals, blender=self.blender)
+        """使用当前 blender 将同组策略信号混合为一组信号。
+
+        signals 中每个策略的信号可以是一个运行时间点上的一维信号，也可以是多个运行时间点上形状为
+        (步骤数, 股票数量) 的信号矩阵，后者一次得到所有运行时间点上混合后的信号。
+        """
+        blend_func = self.get_blend_func()
+        if blend_func is None:
+            raise ValueError(f'Group {self.name} has no blender, add strategies or set blender_str first')
+        return blend_func(signals)
+
+    def __getstate__(self):
+        """ 序列化时（例如并行优化时传递给子进程）不保存编译后的混合函数，需要时重新编译"""
+        state = self.__dict__.copy()
+        state['_blend_func'] = None
+        state['_blend_func_str'] = None
+        return state
 
     def __repr__(self):
         return f"Group({self.name}, {self.signal_type}, {self.blender_str})"
@@ -10,10 +10,14 @@
 # ======================================
 
 import operator
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from collections.abc import Mapping
 from numbers import Number
 
 import pandas as pd
 import numpy as np
+from numba import njit
 from typing import Union, Iterable, Any, Optional, Callable, Sequence, List, Tuple, Dict
 
 from qteasy.database import DataSource
@@ -30,16 +34,53 @@ from qteasy.utilfuncs import (
     regulate_date_format,
 )
 
+from qteasy.csfuncs import (
+    CS_RANK_METHODS,
+    cs_rank,
+    cs_zscore,
+    cs_demean,
+    cs_winsorize,
+    cs_neutralize,
+)
+from qteasy.tafuncs import sma_2d, sum_2d, ema_2d
+
 from qteasy.datatypes import (
     DataType,
     get_history_data_from_source,
     get_reference_data_from_source,
     infer_data_types,
+    _regulate_float_dtype,
+    _cast_float_data,
 )
 
 # overlay 布局默认仅对两只标的启用，预留常量便于后续调整
 HP_OVERLAY_GROUP_SHARE_COUNT: int = 2
 
+# HistoryPanel 原生保存格式 （HistoryPanel.save / HistoryPanel.load）的名称与版本
+HP_NATIVE_FORMAT_NAME: str = 'qteasy.HistoryPanel'
+HP_NATIVE_FORMAT_VERSION: int = 1
+
+# HistoryPanel.to_arrow 导出表中记录三轴标签与布局的 schema 元数据键
+HP_ARROW_METADATA_KEY: bytes = b'qteasy.historypanel'
+
+# ChunkedHistoryPanel 分块计算时默认的数据块大小：每块 share 数量与每块时间点数量
+HP_CHUNK_SHARE_BLOCK: int = 256
+HP_CHUNK_HDATE_BLOCK: int = 20000
+
+# apply_ta 逐股计算时，share 数量不少于该值才使用线程池并行 （ta-lib 计算期间释放 GIL）
+HP_TA_PARALLEL_MIN_SHARES: int = 16
+
+# 追加 htype 列时，新分配的数据缓冲沿 htype 轴预留的容量：按所需列数的倍数增长，且至少预留若干空列
+HP_HTYPE_GROWTH_FACTOR: float = 1.5
+HP_HTYPE_MIN_SPARE: int = 4
+
+# append_rows 环形缓冲：沿时间轴分配容量的若干倍，写满后才整体搬移一次，使每根新 bar 的摊销成本与窗口长度无关
+HP_ROW_BUFFER_FACTOR: int = 2
+
+# kline 派生列随 append_rows 增量更新时，基于指数平滑的指标 （EMA、MACD 等）回看的周期倍数；
+# 回看 10 倍周期时被截断的历史权重约为 exp(-20)，与完整历史计算的结果只差浮点舍入量级
+HP_KLINE_EMA_LOOKBACK_FACTOR: int = 10
+
 
 class _HistoryPanelLocIndexer:
     """只读索引器：沿 ``hdates`` 时间轴选取，``hp.loc[key]`` 等价于 ``hp[:, :, key]``。
@@ -117,6 +158,214 @@ class _HistoryPanelLocIndexer:
         return hp[:, :, key]
 
 
+def _hdate_keys(index: pd.DatetimeIndex) -> np.ndarray:
+    """将时间轴索引转换为 int64 纳秒键 （时区感知的索引按 UTC 时刻转换），用于排序合并。"""
+    return np.asarray(index.values.astype('datetime64[ns]'), dtype='datetime64[ns]').view(np.int64)
+
+
+def _hdate_index_from_keys(keys: np.ndarray, tz: Any = None) -> pd.DatetimeIndex:
+    """:func:`_hdate_keys` 的逆操作：由 int64 纳秒键重建时间轴索引。"""
+    index = pd.DatetimeIndex(np.asarray(keys, dtype=np.int64).view('datetime64[ns]'))
+    if tz is not None:
+        index = index.tz_localize('UTC').tz_convert(tz)
+    return index
+
+
+def _sorted_key_positions(keys: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """在互不相同的 int64 键 ``keys`` 中查找 ``targets`` 的位置，不存在的目标返回 -1。
+
+    通过排序后的二分查找完成，开销为 O((L + K) log L)，``keys`` 已升序时省去排序。
+    """
+    targets = np.asarray(targets, dtype=np.int64)
+    positions = np.full(targets.shape[0], -1, dtype=np.intp)
+    if keys.shape[0] == 0 or targets.shape[0] == 0:
+        return positions
+    if keys.shape[0] > 1 and np.any(keys[1:] < keys[:-1]):
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+    else:
+        order = None
+        sorted_keys = keys
+    loc = np.searchsorted(sorted_keys, targets)
+    loc_clipped = np.minimum(loc, sorted_keys.shape[0] - 1)
+    found = sorted_keys[loc_clipped] == targets
+    positions[found] = loc_clipped[found] if order is None else order[loc_clipped[found]]
+    return positions
+
+
+def _hashed_label_positions(label_pos: dict, targets: List[Any]) -> np.ndarray:
+    """通过面板自身的 ``标签 -> 序号`` 字典查找 ``targets`` 中每个标签的位置，不存在的标签返回 -1。"""
+    return np.fromiter((label_pos.get(label, -1) for label in targets), dtype=np.intp, count=len(targets))
+
+
+def _scatter_block(out: np.ndarray, values: np.ndarray, positions: Tuple[np.ndarray, ...]) -> None:
+    """把 ``values`` 中的数据一次性写入 ``out``。
+
+    ``positions`` 依次给出 ``out`` 每个轴上各位置对应的 ``values`` 中的序号 （-1 表示 ``values``
+    中没有该标签，保持 ``out`` 原值不变）。所有轴通过一次 ``np.ix_`` 花式索引完成整块取数与写入，
+    不需要逐标签循环；各轴完全对应时直接整体复制。
+    """
+    out_idx = []
+    src_idx = []
+    for pos in positions:
+        sel = np.flatnonzero(pos >= 0)
+        if sel.shape[0] == 0:
+            return
+        out_idx.append(sel)
+        src_idx.append(pos[sel])
+    if out.shape == values.shape and \
+            all(np.array_equal(idx, np.arange(n)) for idx, n in zip(src_idx, values.shape)):
+        out[...] = values
+        return
+    out[np.ix_(*out_idx)] = values[np.ix_(*src_idx)]
+
+
+class _HtypeBuffer:
+    """沿 htype 轴预留了空余容量的 float64 数据缓冲，由派生出新列的若干面板共享。
+
+    各面板的 ``_values`` 都是 ``data[:, :, :列数]`` 形式的视图；``used`` 记录已被占用的列数。
+    只有列数恰好等于 ``used`` 的面板 （即最近一次追加得到的面板）可以把新列直接写入空余容量，
+    其余面板追加列时会分配新的缓冲，因此共享同一缓冲的面板不会互相覆盖对方的列。
+    """
+
+    __slots__ = ('data', 'used')
+
+    def __init__(self, data: np.ndarray, used: int):
+        self.data = data
+        self.used = used
+
+
+def _nan_moments(values: np.ndarray, ddof: int = 1) -> Dict[str, np.ndarray]:
+    """沿第 1 轴一次性计算忽略 NaN 的各项汇总统计量。
+
+    count、均值、离差平方和、最小值与最大值在同一次遍历数据的计算中得到，
+    ``mean`` / ``std`` / ``min`` / ``max`` / ``describe`` 均由这些结果派生，不再各自重新归约。
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        形状为 ``(A, T, K)`` 的三维数组，沿第 1 轴 （T）归约。
+    ddof : int, default 1
+        计算标准差时的自由度修正。
+
+    Returns
+    -------
+    dict of numpy.ndarray
+        键为 ``'count'``、``'mean'``、``'std'``、``'min'``、``'max'``，值的形状均为 ``(A, K)``；
+        有效值个数为 0 （标准差时不超过 ``ddof``）的位置为 NaN，另含 ``'complete'`` 表示该位置没有 NaN。
+    """
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+    count = valid.sum(axis=1)
+    has_data = count > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.where(valid, values, 0.).sum(axis=1) / count
+        dev = np.where(valid, values - mean[:, np.newaxis, :], 0.)
+        std = np.sqrt((dev * dev).sum(axis=1) / (count - ddof))
+    std[count <= ddof] = np.nan
+    v_min = np.where(valid, values, np.inf).min(axis=1)
+    v_max = np.where(valid, values, -np.inf).max(axis=1)
+    return {
+        'count': count.astype(float),
+        'mean': np.where(has_data, mean, np.nan),
+        'std': std,
+        'min': np.where(has_data, v_min, np.nan),
+        'max': np.where(has_data, v_max, np.nan),
+        'complete': count == values.shape[1],
+    }
+
+
+def _nan_quantiles(values: np.ndarray, percentiles: Sequence[float]) -> np.ndarray:
+    """沿第 1 轴计算忽略 NaN 的分位数 （线性插值，与 pandas / numpy 默认方式一致）。
+
+    所有序列通过一次排序完成计算，不需要像 ``numpy.nanpercentile`` 那样逐条序列处理。
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        形状为 ``(A, T, K)`` 的三维数组。
+    percentiles : sequence of float
+        [0, 1] 之间的分位数。
+
+    Returns
+    -------
+    numpy.ndarray
+        形状为 ``(A, 分位数个数, K)`` 的分位数，没有有效值的序列为 NaN。
+    """
+    values = np.asarray(values, dtype=float)
+    sorted_values = np.sort(values, axis=1)  # NaN 排在末尾
+    count = (~np.isnan(values)).sum(axis=1)[:, np.newaxis, :]
+    q = np.asarray(percentiles, dtype=float).reshape(1, -1, 1)
+    pos = q * np.maximum(count - 1, 0)
+    lower = np.floor(pos).astype(np.intp)
+    upper = np.minimum(lower + 1, np.maximum(count - 1, 0))
+    frac = pos - lower
+    v_lower = np.take_along_axis(sorted_values, lower, axis=1)
+    v_upper = np.take_along_axis(sorted_values, upper, axis=1)
+    res = v_lower + (v_upper - v_lower) * frac
+    return np.where(count > 0, res, np.nan)
+
+
+class _HdateRingBuffer:
+    """沿时间轴预留了空余容量的数据缓冲，供 :meth:`HistoryPanel.append_rows` 实现环形窗口。
+
+    缓冲 ``data`` 的时间轴长度为窗口容量的 ``HP_ROW_BUFFER_FACTOR`` 倍，面板的 ``_values`` 是
+    ``data[:, start:stop, :]`` 形式的视图，``hdates`` 与 ``data`` 的时间轴逐行对应。新 bar 写入
+    ``stop`` 之后的空余行，最早的行通过移动 ``start`` 丢弃；空余行用完时才分配新缓冲并复制窗口内的数据，
+    不会在原缓冲上搬移数据，因此此前由面板切片得到的视图不会被改写。
+    只有数据恰好是 ``data[:, start:stop, :]`` 的面板 （即最近一次追加得到的面板）可以继续就地追加。
+    ``positions`` 记录已写入缓冲的每个时间标签所在的缓冲行，追加时只增加新标签，面板的时间标签字典
+    是其上按 ``start`` 偏移的只读视图 （见 ``_HdateRowMap``），不必在每次追加时重建。
+    """
+
+    __slots__ = ('data', 'hdates', 'positions', 'start', 'stop', 'capacity')
+
+    def __init__(self, data: np.ndarray, hdates: list, start: int, stop: int, capacity: int):
+        self.data = data
+        self.hdates = hdates
+        self.positions = {hdate: i for i, hdate in enumerate(hdates[:stop])}
+        self.start = start
+        self.stop = stop
+        self.capacity = capacity
+
+
+class _HdateRowMap(Mapping):
+    """环形缓冲中一个时间窗口的时间标签字典 （标签到窗口内行号的只读映射），作为面板的 ``_rows``。
+
+    标签的缓冲行号减去窗口起点 ``start`` 即为行号，创建视图的开销为 O(1)，与窗口长度无关。
+    缓冲中已写入的行与标签不会被改写，因此此前得到的视图始终保持创建时的窗口。
+    """
+
+    __slots__ = ('_positions', '_hdates', '_start', '_stop')
+
+    def __init__(self, buffer: _HdateRingBuffer):
+        self._positions = buffer.positions
+        self._hdates = buffer.hdates
+        self._start = buffer.start
+        self._stop = buffer.stop
+
+    def __getitem__(self, hdate: Any) -> int:
+        pos = self._positions[hdate]
+        if not self._start <= pos < self._stop:
+            raise KeyError(hdate)
+        return pos - self._start
+
+    def __contains__(self, hdate: Any) -> bool:
+        pos = self._positions.get(hdate)
+        return pos is not None and self._start <= pos < self._stop
+
+    def __iter__(self):
+        hdates = self._hdates
+        return (hdates[i] for i in range(self._start, self._stop))
+
+    def __reversed__(self):
+        hdates = self._hdates
+        return (hdates[i] for i in range(self._stop - 1, self._start - 1, -1))
+
+    def __len__(self) -> int:
+        return self._stop - self._start
+
+
 class HistoryPanel():
     """qteasy 中用于统一管理多标的、多时间点、多数据类型历史数据的三维数据容器。
 
@@ -139,7 +388,24 @@ class HistoryPanel():
     更详细的结构说明 （轴标签、切片示例、标签管理等）见文档「HistoryPanel 类」相关章节。
     """
 
-    def __init__(self, values: np.ndarray = None, levels=None, rows=None, columns=None):
+    # 切片得到的子面板与父面板共享数据缓冲时置为 True，此后首次通过 __setitem__ / assign
+    # 覆盖已有列时先复制缓冲 （写时复制），使父子面板互不影响
+    _shared_buffer: bool = False
+    # 追加列后得到的面板持有带空余 htype 容量的数据缓冲，继续追加列时可以直接写入空余容量，
+    # 不必复制整块数据 （见 _HtypeBuffer）
+    _htype_buffer: Optional[_HtypeBuffer] = None
+    # 时间轴标签缓存 （rows 字典, DatetimeIndex）：rows 字典只会被整体替换，替换后缓存自动失效
+    _hdate_index_cache: Optional[Tuple[dict, pd.DatetimeIndex]] = None
+    # mean / std / min / max / describe 的结果缓存：(数据缓冲, shares, hdates, htypes 字典, {键: 结果})。
+    # 数据缓冲或轴标签被整体替换后缓存自动失效，原地修改数据的方法 （__setitem__、fillna 等）显式清空缓存
+    _stats_cache: Optional[Tuple[Any, dict, dict, dict, dict]] = None
+    # append_rows 使用的环形时间轴缓冲 （见 _HdateRingBuffer）
+    _row_buffer: Optional[_HdateRingBuffer] = None
+    # 由 kline 访问器派生的列及其计算方式：{输出列名元组: (kline 方法名, 参数字典, 回看行数, 最少 bar 数)}，
+    # append_rows 据此只对新增的 bar 增量计算这些列
+    _kline_specs: Optional[Dict[Tuple[str, ...], Tuple[str, dict, int, int]]] = None
+
+    def __init__(self, values: np.ndarray = None, levels=None, rows=None, columns=None, dtype=None):
         """初始化 HistoryPanel 对象，并根据输入的数据与轴标签构建三维历史数据结构。
 
         可以在创建时同时给出标的 （levels）、时间 （rows）和数据类型 （columns）标签，
@@ -159,6 +425,10 @@ class HistoryPanel():
             每个标签对应一条时间记录。
         columns : str or sequence of str, optional
             历史数据类型标签，每一列代表一种数据类型 （如 open、high、close、volume 等）。
+        dtype : {None, 'float64', 'float32'}, optional
+            数据精度。None 时直接使用 ``values`` 的数据类型；给出 ``'float32'`` 时数据以单精度存储，
+            内存占用减半，此后派生列也以单精度追加，累积类计算 （如 cum_return、portfolio）仍以
+            float64 进行。
 
         Returns
         -------
@@ -171,6 +441,9 @@ class HistoryPanel():
         #  应该考虑是否在创建HistoryPanel时生成ndarray的一个copy而不是使用其自身 。
         if (not isinstance(values, np.ndarray)) and (values is not None):
             raise TypeError(f'input value type should be numpy ndarray, got {type(values)}')
+        dtype = _regulate_float_dtype(dtype)
+        if (dtype is not None) and (values is not None):
+            values = values.astype(dtype, copy=False)
 
         self._levels = None
         self._columns = None
@@ -218,7 +491,7 @@ class HistoryPanel():
             self._levels = labels_to_dict(levels, range(self._l_count))
 
             # 再建立行标签序号字典，即日期序号字典，再生成字典之前，检查输入标签数据的类型，并将数据转化为pd.Timestamp格式
-            assert isinstance(rows, (list, dict, pd.DatetimeIndex)), \
+            assert isinstance(rows, (list, Mapping, pd.DatetimeIndex)), \
                 f'TypeError, input_hdates should be a list or DatetimeIndex, got {type(rows)} instead'
             try:
                 new_rows = [pd.to_datetime(date) for date in rows]
@@ -234,6 +507,13 @@ class HistoryPanel():
         """判断HistoryPanel是否为空"""
         return self._is_empty
 
+    @property
+    def _float_dtype(self) -> np.dtype:
+        """追加或写入派生列时使用的浮点精度：``float32`` 面板保持单精度，其余情况为 ``float64``。"""
+        if self._values is not None and self._values.dtype == np.float32:
+            return np.dtype(np.float32)
+        return np.dtype(np.float64)
+
     @property
     def values(self):
         """返回当前对象内部的三维数据缓冲区 （与 ``_values`` 同一引用）。
@@ -242,7 +522,13 @@ class HistoryPanel():
         通过 ``__setitem__`` 追加新列时，内部可能 **替换** 整块数组，此前由子视图
         （``__getitem__`` / ``subpanel(copy=False)``）持有的 ``values`` 可能仍指向扩列前的旧缓冲，
         且不会自动出现新列。需要稳定快照请使用 ``subpanel(..., copy=True)`` 或 ``to_numpy(copy=True)``。
-        原地写入列时，若原数组非 ``float64``，内部会升级为 ``float64`` 再存储。
+        原地写入列时，若原数组不是浮点数组，内部会升级为 ``float64`` 再存储；``float32`` 面板保持单精度。
+        切片得到的子面板可能与父面板共享本缓冲：直接写入 ``values`` 会同时改动对方，
+        而经由 ``__setitem__`` / ``assign`` / ``ffill`` 及 ``+=`` 等就地运算写入时会先复制缓冲 （写时复制）。
+        上述方法同时清空统计缓存 （``describe``、``mean`` 等的结果）；直接写入 ``values`` 不会使缓存失效，
+        此后需要统计结果时请改用就地运算，或先 ``copy()`` 得到新面板再统计。
+        派生列方法 （``rank``、``apply_ta``、``assign`` 等）返回的面板在 htype 轴上预留了空余容量，
+        其 ``values`` 是更大缓冲的视图 （不一定 C 连续），已有列也可能与原面板共享内存。
 
         Returns
         -------
@@ -295,7 +581,7 @@ class HistoryPanel():
         Returns
         -------
         dict
-            日期字典
+            日期字典；经 ``append_rows`` 追加数据后为环形缓冲上的只读映射，用法与字典相同
         """
         return self._rows
 
@@ -315,6 +601,51 @@ class HistoryPanel():
             # return pd.Index(self._rows.keys(), dtype='datetime64')
             return list(self._rows.keys())
 
+    @property
+    def hdate_index(self) -> pd.DatetimeIndex:
+        """以 ``pandas.DatetimeIndex`` 形式返回时间轴标签，结果被缓存，仅在时间轴标签变化后重新生成。
+
+        与每次调用 ``pd.to_datetime(hp.hdates)`` 相比，不会重复构造索引；已排序的时间轴可以直接用
+        ``searchsorted`` 做二分查找 （:meth:`segment` 与按时间标签切片均基于此实现）。
+
+        Returns
+        -------
+        pandas.DatetimeIndex
+            与 ``hdates`` 顺序一致的时间索引；空面板返回空索引。
+
+        Examples
+        --------
+        >>> hp = HistoryPanel(np.ones((1, 3, 1)), rows=pd.date_range('2020-01-01', periods=3))
+        >>> hp.hdate_index
+        DatetimeIndex(['2020-01-01', '2020-01-02', '2020-01-03'], dtype='datetime64[ns]', freq=None)
+        """
+        if self.is_empty:
+            return pd.DatetimeIndex([])
+        rows = self._rows
+        cache = self._hdate_index_cache
+        if cache is None or cache[0] is not rows:
+            cache = (rows, pd.DatetimeIndex(list(rows.keys())))
+            self._hdate_index_cache = cache
+        return cache[1]
+
+    def _hdate_label_slice(self, start: Any = None, stop: Any = None, step: Optional[int] = None) -> slice:
+        """将时间标签区间 ``[start, stop]`` （两端包含）转换为时间轴上的整数切片。
+
+        基于缓存的 :attr:`hdate_index` 做二分查找，开销为 O(log L)；``start`` / ``stop`` 为 None 时
+        表示从头开始或直到末尾，标签不必恰好存在于时间轴上。
+
+        Raises
+        ------
+        ValueError
+            时间轴未按升序排列时抛出 （英文信息）。
+        """
+        index = self.hdate_index
+        if not index.is_monotonic_increasing:
+            raise ValueError('hdates are not sorted in ascending order, can not slice by date labels')
+        first = 0 if start is None else int(index.searchsorted(pd.Timestamp(start), side='left'))
+        last = len(index) if stop is None else int(index.searchsorted(pd.Timestamp(stop), side='right'))
+        return slice(first, max(first, last), step)
+
     @hdates.setter
     def hdates(self, input_hdates: list):
         if not self.is_empty:
@@ -503,7 +834,14 @@ class HistoryPanel():
             hdate_slice = slice(None, None, None)
 
         htype_slice = list_or_slice(htype_slice, self.columns)
+        # 先确保所选列就绪，惰性面板在此之前不必为解析时间轴而加载其他列
+        self._materialize_htypes(htype_slice)
         share_slice = list_or_slice(share_slice, self.levels)
+        if isinstance(hdate_slice, slice) and any(
+                bound is not None and not isinstance(bound, (int, np.integer))
+                for bound in (hdate_slice.start, hdate_slice.stop)):
+            # 以时间标签为边界的切片 （如 '2020-01-01':'2020-03-31'），按 pandas .loc 语义两端包含
+            hdate_slice = self._hdate_label_slice(hdate_slice.start, hdate_slice.stop, hdate_slice.step)
         hdate_slice = list_or_slice(hdate_slice, self.rows)
         return htype_slice, share_slice, hdate_slice
 
@@ -519,6 +857,8 @@ class HistoryPanel():
 
         ``copy=False`` 时结果可能与父对象共享底层缓冲；父对象后续 ``__setitem__`` **追加** 列会替换
         父级 ``_values``，已存在的子面板通常 **不会** 自动带上新列，详见 ``__getitem__`` / ``__setitem__``。
+        连续下标会先转换为 ``slice``，三轴均为连续区间时结果是父缓冲上的视图；共享缓冲时父、子面板
+        均被标记，之后的列覆盖采用写时复制。
 
         Parameters
         ----------
@@ -542,13 +882,200 @@ class HistoryPanel():
         Exception
             本方法假设切片器已正确解析；如调用方传入非法切片器导致 NumPy 索引失败，将原样抛出底层异常。
         """
-        out_arr = self.values[share_slice][:, hdate_slice][:, :, htype_slice]
+        buffer = self._materialize_htypes(htype_slice)
+        share_slice = self._contiguous_index(share_slice, self._l_count)
+        hdate_slice = self._contiguous_index(hdate_slice, self._r_count)
+        htype_slice = self._contiguous_index(htype_slice, self._c_count)
+        if all(isinstance(s, slice) for s in (share_slice, hdate_slice, htype_slice)):
+            # 三个轴均为连续区间时使用基本索引，得到共享父缓冲的视图，不复制数据
+            out_arr = buffer[share_slice, hdate_slice, htype_slice]
+        else:
+            out_arr = buffer[share_slice][:, hdate_slice][:, :, htype_slice]
         if copy:
             out_arr = np.array(out_arr, copy=True)
         share_labels = self._axis_labels_subset(self.shares, share_slice)
-        hdate_labels = self._axis_labels_subset(self.hdates, hdate_slice)
+        # 时间标签直接从缓存的 DatetimeIndex 中截取，子面板沿用截取结果作为自己的时间索引缓存
+        if not isinstance(hdate_slice, (slice, list, np.ndarray)):
+            raise TypeError(f'Unsupported index spec type: {type(hdate_slice)}')
+        sub_hdate_index = self.hdate_index[hdate_slice]
         htype_labels = self._axis_labels_subset(self.htypes, htype_slice)
-        return HistoryPanel(values=out_arr, levels=share_labels, rows=hdate_labels, columns=htype_labels)
+        sub = self._from_axis_labels(out_arr, share_labels, list(sub_hdate_index), htype_labels)
+        if not sub.is_empty:
+            sub._hdate_index_cache = (sub._rows, sub_hdate_index)
+        if (not copy) and (not sub.is_empty) and np.may_share_memory(out_arr, buffer):
+            self._shared_buffer = True
+            sub._shared_buffer = True
+        return sub
+
+    @staticmethod
+    def _contiguous_index(spec: Any, size: int) -> Any:
+        """将连续递增的整数下标规格转换为等价的 ``slice``，以便按基本索引取得视图。
+
+        Parameters
+        ----------
+        spec : slice, list of int, or ndarray
+            ``list_or_slice`` 的返回值。
+        size : int
+            该轴的长度，用于规整负数下标。
+
+        Returns
+        -------
+        slice or Any
+            ``spec`` 为步长为 1 的连续下标时返回对应的 ``slice``，否则原样返回 ``spec``。
+        """
+        if isinstance(spec, slice) or not isinstance(spec, (list, np.ndarray)):
+            return spec
+        idx = np.asarray(spec)
+        if idx.ndim != 1 or idx.size == 0 or idx.dtype.kind not in 'iu':
+            return spec
+        if idx.min() < -size or idx.max() >= size:
+            return spec  # 越界下标交给 numpy 抛出异常
+        idx = np.where(idx < 0, idx + size, idx)
+        if idx.size > 1 and not np.all(np.diff(idx) == 1):
+            return spec
+        start = int(idx[0])
+        return slice(start, start + idx.size)
+
+    @staticmethod
+    def _from_axis_labels(values: np.ndarray,
+                          shares: List[Any],
+                          hdates: List[Any],
+                          htypes: List[Any]) -> 'HistoryPanel':
+        """由已校验的三轴标签直接构建面板，跳过构造函数中的维度推断与日期解析。
+
+        仅供内部在已有面板上取子集时使用：标签来自父面板，``hdates`` 已是 ``Timestamp``，
+        因此构建开销只与标签数量有关，与数据量无关。若选择中含重复标签，则回退到常规构造函数，
+        由其给出与以往一致的错误。
+
+        Parameters
+        ----------
+        values : numpy.ndarray
+            三维数据数组，形状须与三轴标签数量一致。
+        shares, hdates, htypes : list
+            三个轴的标签列表。
+
+        Returns
+        -------
+        HistoryPanel
+            新面板，直接引用 ``values`` 而不复制；``values`` 为空时返回空面板。
+        """
+        if values.size == 0:
+            return HistoryPanel()
+        hp = HistoryPanel.__new__(HistoryPanel)
+        hp._values = values
+        hp._is_empty = False
+        hp._l_count, hp._r_count, hp._c_count = values.shape
+        hp._levels = dict(zip(shares, range(hp._l_count)))
+        hp._rows = dict(zip(hdates, range(hp._r_count)))
+        hp._columns = dict(zip(htypes, range(hp._c_count)))
+        if (len(hp._levels), len(hp._rows), len(hp._columns)) != values.shape:
+            return HistoryPanel(values=values, levels=shares, rows=hdates, columns=htypes)
+        return hp
+
+    def _materialize_htypes(self, htype_slice: Any) -> np.ndarray:
+        """返回内部三维缓冲，并保证 ``htype_slice`` 所选列的数据已经就绪。
+
+        普通面板的数据在创建时即已全部就绪，直接返回 ``_values``；惰性面板
+        （:class:`LazyHistoryPanel`）覆盖本方法，仅加载被选中的 htype 数据块。
+        只读取少数列的内部路径 （切片、``kline``、``rank`` 等）应经由本方法取数，
+        以免触发整块面板的加载。
+
+        Parameters
+        ----------
+        htype_slice : slice, list of int, or ndarray
+            已经由 :func:`list_or_slice` 解析过的 htype 轴下标选择器。
+
+        Returns
+        -------
+        numpy.ndarray
+            形状 ``(level_count, row_count, column_count)`` 的内部缓冲 （非拷贝）。
+        """
+        return self._values
+
+    def _writable_values(self) -> np.ndarray:
+        """返回可以原地修改的内部数据缓冲，与其他面板共享缓冲时先复制 （写时复制）。
+
+        原地修改 ``_values`` 的方法 （``ffill``、``+=`` 等就地运算）应经由本方法取得缓冲，
+        使切片得到的子面板、共享 htype 缓冲的派生面板与本对象互不影响；同时清空统计缓存，
+        避免就地修改后 ``describe`` 等方法返回修改前的结果。
+
+        Returns
+        -------
+        numpy.ndarray
+            本对象独占的数据缓冲 （即新的 ``_values``）。
+        """
+        self._stats_cache = None
+        if self._shared_buffer:
+            self._values = self._values.copy()
+            self._shared_buffer = False
+        return self._values
+
+    def _append_columns(self, names: List[str], arrays: List[np.ndarray]) -> 'HistoryPanel':
+        """在 htypes 轴末尾追加若干列，返回新面板，不修改本对象。
+
+        Parameters
+        ----------
+        names : list of str
+            新增列名，调用方负责检查与现有 ``htypes`` 不冲突。
+        arrays : list of numpy.ndarray
+            与 ``names`` 等长，每个数组形状为 ``(level_count, row_count)``。
+
+        Returns
+        -------
+        HistoryPanel
+            ``shares`` / ``hdates`` 与本对象一致、``htypes`` 末尾追加 ``names`` 的新面板，
+            数据为 float64 （``float32`` 面板保持 float32）。新面板的已有列可能与本对象共享内存 （见 ``_grow_htype_buffer``），
+            经由 ``__setitem__`` / ``assign`` 覆盖已有列时会先复制 （写时复制）。
+        """
+        to_add = np.stack([np.asarray(a, dtype=self._float_dtype) for a in arrays], axis=2)
+        new_values, buffer, shared = self._grow_htype_buffer(to_add)
+        new_htypes = list(self.htypes) + list(names)
+        hp = HistoryPanel._from_axis_labels(new_values, list(self.shares), list(self.hdates), new_htypes)
+        hp._htype_buffer = buffer
+        cache = self._hdate_index_cache
+        if cache is not None and cache[0] is self._rows:
+            hp._hdate_index_cache = (hp._rows, cache[1])
+        if shared:
+            # 新面板的前若干列与本对象共享内存，双方此后覆盖已有列时均先复制 （写时复制）
+            hp._shared_buffer = True
+            self._shared_buffer = True
+        return hp
+
+    def _htype_tail_buffer(self, n_new: int) -> Optional[_HtypeBuffer]:
+        """若本对象位于其 htype 缓冲的末端且空余容量足够容纳 ``n_new`` 列，返回该缓冲，否则返回 None。"""
+        buffer = self._htype_buffer
+        values = self._values
+        if buffer is None or values is None or buffer.used != self._c_count:
+            return None
+        data = buffer.data
+        if self._c_count + n_new > data.shape[2] or values.dtype != data.dtype:
+            return None
+        # _values 可能已被 fillna 等方法整体替换，只有仍是缓冲开头部分的视图时才可以就地追加
+        if values.shape[:2] != data.shape[:2] or values.strides != data.strides or \
+                values.__array_interface__['data'][0] != data.__array_interface__['data'][0]:
+            return None
+        return buffer
+
+    def _grow_htype_buffer(self, to_add: np.ndarray) -> Tuple[np.ndarray, _HtypeBuffer, bool]:
+        """把 ``to_add`` 沿 htype 轴追加到本对象数据之后，返回新数据视图、所在缓冲及是否与本对象共享内存。
+
+        本对象位于缓冲末端且空余容量足够时直接写入空余容量，只需 O(新增数据) 的时间；
+        否则分配容量为 ``max(所需列数 + HP_HTYPE_MIN_SPARE, 所需列数 * HP_HTYPE_GROWTH_FACTOR)``
+        的新缓冲并复制现有数据，多次追加的摊销成本仍与新增数据量成正比。本对象的数据不会被修改。
+        """
+        c_count = self._c_count
+        n_new = to_add.shape[2]
+        needed = c_count + n_new
+        buffer = self._htype_tail_buffer(n_new)
+        shared = buffer is not None
+        if buffer is None:
+            capacity = max(needed + HP_HTYPE_MIN_SPARE, int(np.ceil(needed * HP_HTYPE_GROWTH_FACTOR)))
+            data = np.empty((self._l_count, self._r_count, capacity), dtype=self._float_dtype)
+            data[:, :, :c_count] = self._values
+            buffer = _HtypeBuffer(data, c_count)
+        buffer.data[:, :, c_count:needed] = to_add
+        buffer.used = needed
+        return buffer.data[:, :, :needed], buffer, shared
 
     def to_numpy(self, copy: bool = False) -> np.ndarray:
         """返回与 ``values`` 相同形状的 ndarray；需要独立副本时使用 ``copy=True``。
@@ -556,6 +1083,7 @@ class HistoryPanel():
         空面板返回形状为 ``(0, 0, 0)`` 的 float 数组。非空时 ``copy=False`` 与 ``numpy.asarray(self.values)``
         语义一致，可与内部缓冲区共享内存。若之后在父对象上用 ``__setitem__`` **追加** 新列，父对象会替换
         整块缓冲；此前用 ``copy=False`` 拿到的数组 **不会** 自动带上新列，不宜再视为当前面板的权威快照。
+        ``copy=False`` 始终不复制数据：若本面板是切片视图，返回的数组同样与父面板共享内存。
 
         Parameters
         ----------
@@ -593,6 +1121,204 @@ class HistoryPanel():
             return np.array(self._values, copy=True)
         return np.asarray(self._values)
 
+    def append_rows(
+            self,
+            values: np.ndarray,
+            hdates: Any,
+            htypes: Optional[Union[str, Sequence[str]]] = None,
+            *,
+            capacity: Optional[int] = None,
+            update_kline: bool = True,
+    ) -> 'HistoryPanel':
+        """在时间轴末尾原地追加新 bar，面板作为固定容量的滚动窗口，超出容量时丢弃最早的数据。
+
+        适用于实盘或日内研究中把 HistoryPanel 作为策略的滚动状态：每根新 bar 只需写入新数据，
+        不必重新获取整个时间窗口。数据保存在沿时间轴预留了空余容量的环形缓冲中 （见 ``_HdateRingBuffer``），
+        空余容量用完时才整体复制一次窗口数据；时间标签同样保存在缓冲中，面板的时间标签字典是其上按窗口起点
+        偏移的视图，只增量登记新标签。因此每根新 bar 的摊销成本为 O(shares x htypes)，与窗口长度无关。
+
+        通过 ``kline`` 访问器 （如 ``hp.kline.sma(inplace=True)``）派生的列会记住其计算方式，
+        ``update_kline=True`` 时只针对新增的 bar，在最近的若干行上重新计算这些列。
+        基于窗口的指标 （SMA、布林带、KDJ）结果与在整个窗口上重新计算完全一致；基于指数平滑的指标
+        （EMA、MACD）回看 ``HP_KLINE_EMA_LOOKBACK_FACTOR`` 倍周期 （不超过窗口内的 bar 数），
+        窗口足够长时与完整历史的结果只差浮点舍入量级。
+        窗口容量小于某个派生列产生第一个有效值所需的 bar 数 （如 MACD(12, 26, 9) 需要 34 个 bar）时，
+        该列将始终为 NaN，设定或改变容量时会发出 ``UserWarning``。
+
+        Parameters
+        ----------
+        values : numpy.ndarray
+            新数据，形状为 ``(shares, 新 bar 数, 列数)``；只追加一根 bar 时也可以是 ``(shares, 列数)``。
+            shares 的顺序与 ``self.shares`` 一致。
+        hdates : str, Timestamp or sequence
+            新 bar 的时间标签，数量与新 bar 数相同，须严格递增且晚于面板中最后一个时间。
+        htypes : str or sequence of str, optional
+            ``values`` 中各列对应的 htype，须都在 ``self.htypes`` 中；为 None 时，``values`` 的列
+            依次对应全部 htypes，或对应除 kline 派生列以外的全部 htypes。未给出的列在新 bar 上为 NaN
+            （kline 派生列在 ``update_kline=True`` 时重新计算）。
+        capacity : int, optional
+            窗口容量 （保留的最大 bar 数）。为 None 时沿用此前设定的容量；第一次调用时默认为当前的 bar 数，
+            即每追加一根 bar 就丢弃最早的一根。
+        update_kline : bool, default True
+            是否增量更新 kline 派生列。
+
+        Returns
+        -------
+        HistoryPanel
+            原地修改后的本对象。
+
+        Raises
+        ------
+        TypeError
+            在惰性面板或分块面板上调用时抛出。
+        ValueError
+            面板为空、``values`` 形状与 shares / 列数 / 时间标签数量不一致、``htypes`` 不存在、
+            时间标签不是严格递增或不晚于现有时间、或 ``capacity`` 不是正整数时抛出。
+
+        Examples
+        --------
+        >>> hp = HistoryPanel(np.arange(6, dtype=float).reshape(2, 3, 1),
+        ...                   levels=['000001', '000002'],
+        ...                   rows=pd.date_range('2020-01-01 09:31', periods=3, freq='min'),
+        ...                   columns=['close'])
+        >>> hp = hp.kline.sma(window=2, inplace=True)
+        >>> hp = hp.append_rows(np.array([[3.], [6.]]), hdates='2020-01-01 09:34')
+        >>> hp.hdates
+        [Timestamp('2020-01-01 09:32:00'), Timestamp('2020-01-01 09:33:00'), Timestamp('2020-01-01 09:34:00')]
+        >>> hp.values[:, -1, :]
+        array([[3. , 2.5],
+               [6. , 5.5]])
+        """
+        if isinstance(self, (LazyHistoryPanel, ChunkedHistoryPanel)):
+            raise TypeError(f'append_rows is not supported on {type(self).__name__}, '
+                            f'create an in-memory HistoryPanel first')
+        if self.is_empty:
+            raise ValueError('Cannot append rows to an empty HistoryPanel')
+        if capacity is not None and (not isinstance(capacity, (int, np.integer)) or capacity <= 0):
+            raise ValueError(f'capacity should be a positive integer, got {capacity}')
+
+        specs = {names: spec for names, spec in (self._kline_specs or {}).items()
+                 if all(name in self._columns for name in names)}
+        if isinstance(htypes, str):
+            htypes = str_to_list(htypes)
+        values = np.asarray(values)
+        if values.ndim == 2:
+            values = values[:, np.newaxis, :]
+        if values.ndim != 3:
+            raise ValueError(f'values should be a 2D or 3D array, got {values.ndim}D')
+        if htypes is None:
+            derived = {name for names in specs for name in names}
+            base_htypes = [htype for htype in self.htypes if htype not in derived]
+            htypes = self.htypes if values.shape[2] == self._c_count else base_htypes
+        missing = [htype for htype in htypes if htype not in self._columns]
+        if missing:
+            raise ValueError(f'htypes {missing} not found in HistoryPanel htypes: {self.htypes}')
+        if values.shape[0] != self._l_count or values.shape[2] != len(htypes):
+            raise ValueError(f'values shape {values.shape} does not match '
+                             f'({self._l_count} shares, n bars, {len(htypes)} htypes)')
+
+        new_dates = [pd.Timestamp(hdates)] if np.ndim(hdates) == 0 else list(pd.to_datetime(list(hdates)))
+        n_new = len(new_dates)
+        if n_new != values.shape[1]:
+            raise ValueError(f'got {n_new} hdates for {values.shape[1]} new bars')
+        if n_new == 0:
+            return self
+        last_date = next(reversed(self._rows))
+        if new_dates[0] <= last_date or any(d1 <= d0 for d0, d1 in zip(new_dates[:-1], new_dates[1:])):
+            raise ValueError(f'hdates to append should be strictly increasing and later than '
+                             f'the last hdate {last_date}')
+
+        buffer = self._row_tail_buffer()
+        if capacity is None:
+            capacity = buffer.capacity if buffer is not None else \
+                (self._row_buffer.capacity if self._row_buffer is not None else self._r_count)
+        if update_kline and specs and (self._row_buffer is None or self._row_buffer.capacity != capacity):
+            too_short = [name for names, spec in specs.items() if spec[3] > capacity for name in names]
+            if too_short:
+                import warnings
+                warnings.warn(
+                    f'append_rows: capacity {capacity} is shorter than the bars needed by kline columns '
+                    f'{too_short}, these columns will stay NaN; use a capacity of at least '
+                    f'{max(spec[3] for spec in specs.values())}',
+                    UserWarning,
+                    stacklevel=2,
+                )
+        keep = min(self._r_count + n_new, capacity)
+        if buffer is None or buffer.capacity != capacity or buffer.stop + n_new > buffer.data.shape[1]:
+            # 分配新缓冲并复制窗口内仍需保留的数据，原缓冲不被改写
+            n_old = keep - min(n_new, keep)
+            n_rows = max(capacity * HP_ROW_BUFFER_FACTOR, keep + n_new)
+            data = np.empty((self._l_count, n_rows, self._c_count), dtype=self._values.dtype)
+            data[:, :n_old, :] = self._values[:, self._r_count - n_old:, :]
+            old_dates = list(self._rows)[self._r_count - n_old:] if n_old > 0 else []
+            buffer = _HdateRingBuffer(data, old_dates + [None] * (n_rows - n_old), 0, n_old, capacity)
+            n_new_kept = keep - n_old
+        else:
+            n_new_kept = n_new
+        rows = slice(buffer.stop, buffer.stop + n_new_kept)
+        new_block = np.full((self._l_count, n_new_kept, self._c_count), np.nan, dtype=buffer.data.dtype)
+        cols = [self._columns[htype] for htype in htypes]
+        new_block[:, :, cols] = values[:, n_new - n_new_kept:, :]
+        buffer.data[:, rows, :] = new_block
+        buffer.hdates[rows] = new_dates[n_new - n_new_kept:]
+        for pos, hdate in enumerate(buffer.hdates[rows], start=buffer.stop):
+            buffer.positions[hdate] = pos
+        buffer.stop += n_new_kept
+        buffer.start = buffer.stop - keep
+
+        self._stats_cache = None
+        self._values = buffer.data[:, buffer.start:buffer.stop, :]
+        self._r_count = keep
+        self._rows = _HdateRowMap(buffer)
+        self._row_buffer = buffer
+        self._htype_buffer = None
+
+        if update_kline and specs:
+            self._update_kline_tail(specs, n_new_kept)
+        return self
+
+    def _row_tail_buffer(self) -> Optional[_HdateRingBuffer]:
+        """若本对象的数据恰好是其环形缓冲 ``data[:, start:stop, :]`` 的视图，返回该缓冲，否则返回 None。"""
+        buffer = self._row_buffer
+        values = self._values
+        if buffer is None or values is None:
+            return None
+        # 时间标签被 hdates 属性等整体替换后，缓冲中的标签不再对应本对象
+        rows = self._rows
+        if not isinstance(rows, _HdateRowMap) or rows._positions is not buffer.positions:
+            return None
+        data = buffer.data
+        if values.dtype != data.dtype or values.shape != (data.shape[0], buffer.stop - buffer.start, data.shape[2]):
+            return None
+        # _values 可能已被 __setitem__ 追加列、fillna 等方法整体替换，只有仍是缓冲窗口的视图时才可以就地追加
+        offset = buffer.start * data.strides[1]
+        if values.strides != data.strides or \
+                values.__array_interface__['data'][0] != data.__array_interface__['data'][0] + offset:
+            return None
+        return buffer
+
+    def _update_kline_tail(self, specs: Dict[Tuple[str, ...], Tuple[str, dict, int]], n_new: int) -> None:
+        """在最近 ``回看行数 + n_new`` 个 bar 上重新计算 kline 派生列，并写回最后 ``n_new`` 个 bar。
+
+        计算只涉及最近的 ``回看行数 + n_new`` 个 bar 及其时间标签 （直接从环形缓冲中截取），开销与窗口长度无关。
+        """
+        self._stats_cache = None
+        buffer = self._row_buffer
+        for names, (method, params, lookback, _) in specs.items():
+            n_tail = min(self._r_count, lookback + n_new)
+            source_htypes = [htype for htype in self.htypes if htype not in names]
+            source_cols = [self._columns[htype] for htype in source_htypes]
+            tail = HistoryPanel._from_axis_labels(
+                    self._values[:, self._r_count - n_tail:, source_cols],
+                    list(self.shares),
+                    buffer.hdates[buffer.stop - n_tail:buffer.stop],
+                    source_htypes,
+            )
+            res = getattr(tail.kline, method)(**params)
+            for name in names:
+                self._values[:, self._r_count - n_new:, self._columns[name]] = \
+                    res._values[:, n_tail - n_new:, res._columns[name]]
+
     def where(
             self,
             condition: Union[np.ndarray, Callable[['HistoryPanel'], np.ndarray]],
@@ -748,6 +1474,7 @@ class HistoryPanel():
         ``None`` 表示该轴全选。默认 ``copy=True``，得到与父对象数据缓冲区脱钩的副本；需要零拷贝时可设
         ``copy=False`` （子面板 ``values`` 可能与父面板共享内存）。父对象上 ``__setitem__`` 追加新列时会
         替换父面板整块 ``values``，``copy=False`` 子面板通常 **不会** 自动带上新列，且可能仍引用扩列前的缓冲区。
+        ``copy=False`` 且各轴选择连续时不复制数据，覆盖列时采用写时复制，见 ``__getitem__``。
 
         Parameters
         ----------
@@ -776,6 +1503,7 @@ class HistoryPanel():
         ss = slice(None, None, None) if shares is None else shares
         ds = slice(None, None, None) if hdates is None else hdates
         htype_slice = list_or_slice(hs, self.columns)
+        self._materialize_htypes(htype_slice)
         share_slice = list_or_slice(ss, self.levels)
         hdate_slice = list_or_slice(ds, self.rows)
         return self._select_subpanel(htype_slice, share_slice, hdate_slice, copy=copy)
@@ -789,8 +1517,12 @@ class HistoryPanel():
 
         在 **父对象** 上使用 ``__setitem__`` 追加新列时，会替换父面板整块 ``values``：默认
         ``copy=False`` 的子面板 **不会** 出现新列名，且其 ``values`` 可能仍指向扩列前的旧数组；
-        ``subpanel(copy=True)`` 得到的子对象不受影响。在父面板上 **覆盖** 已有列时，与子视图共享的
-        切片数据会随父缓冲一并更新 （仍为同一底层块上的视图时）。
+        ``subpanel(copy=True)`` 得到的子对象不受影响。
+
+        **零拷贝与写时复制**：各轴选择均为连续区间 （切片、单个标签、连续标签区间）时，子面板
+        ``values`` 是父缓冲上的视图，不复制数据，按日期区间切片的开销与数据量无关；非连续选择
+        按 numpy 花式索引复制数据。共享缓冲的父、子面板中任一方通过 ``__setitem__`` / ``assign``
+        **覆盖** 已有列时，会先复制自身缓冲再写入，另一方的数据不受影响。
 
         空面板 （``is_empty``）上任意索引均返回空的 ``HistoryPanel``。
 
@@ -889,7 +1621,7 @@ class HistoryPanel():
         return self[name]
 
     def _prepare_column_array_for_inplace(self, value: Any) -> np.ndarray:
-        """将赋值右侧解析并广播为与当前面板 ``(level_count, row_count)`` 一致的 float64 二维数组。
+        """将赋值右侧解析并广播为与当前面板 ``(level_count, row_count)`` 一致的浮点二维数组。
 
         仅供非空面板在 ``__setitem__`` 等内部路径调用；空面板应在入口处拒绝赋值。
 
@@ -902,7 +1634,7 @@ class HistoryPanel():
         Returns
         -------
         numpy.ndarray
-            形状为 ``(level_count, row_count)``、``dtype=float64``、C 连续的数组副本。
+            形状为 ``(level_count, row_count)``、C 连续的数组副本，精度为 float64 （``float32`` 面板为 float32）。
 
         Raises
         ------
@@ -910,7 +1642,7 @@ class HistoryPanel():
             无法广播到当前面板的 ``(M, L)`` 时抛出；用户可见信息为英文。
         """
         m, l_count = self._l_count, self._r_count
-        arr = np.asarray(value, dtype=np.float64)
+        arr = np.asarray(value, dtype=self._float_dtype)
         if arr.ndim == 3 and arr.shape == (m, l_count, 1):
             arr = arr.reshape(m, l_count)
         try:
@@ -919,10 +1651,10 @@ class HistoryPanel():
             raise ValueError(
                 f'Cannot broadcast assignment value to shape ({m}, {l_count}) for column.'
             ) from None
-        return np.array(b, dtype=np.float64, copy=True)
+        return np.array(b, dtype=self._float_dtype, copy=True)
 
     def _set_htype_column_inplace(self, name: str, column_2d: np.ndarray) -> None:
-        """在原地覆盖已有 htype 列或沿第三轴追加新列，并在必要时把 ``_values`` 提升为 float64。
+        """在原地覆盖已有 htype 列或沿第三轴追加新列，并在必要时把非浮点的 ``_values`` 提升为 float64。
 
         供 ``__setitem__`` 与后续 ``kline(..., inplace=True)`` 等路径复用，避免重复拼接逻辑。
 
@@ -948,15 +1680,22 @@ class HistoryPanel():
                 f'Internal error: column array shape {column_2d.shape} != '
                 f'{(self._l_count, self._r_count)}'
             )
-        if self._values.dtype != np.float64:
-            self._values = np.asarray(self._values, dtype=np.float64)
+        if self._values.dtype != self._float_dtype:
+            self._values = np.asarray(self._values, dtype=self._float_dtype)
+            self._shared_buffer = False
         if name in self._columns:
+            if self._shared_buffer:
+                # 写时复制：与其他切片面板共享缓冲时，先复制再覆盖，避免修改波及对方
+                self._values = self._values.copy()
+                self._shared_buffer = False
             idx = self._columns[name]
             self._values[:, :, idx] = column_2d
             return
-        base = self._values
-        new_values = np.concatenate([base, column_2d[:, :, np.newaxis]], axis=2)
+        # 追加新列不改动已有列，可以继续与其他面板共享已有列，优先写入 htype 缓冲的空余容量
+        new_values, buffer, shared = self._grow_htype_buffer(column_2d[:, :, np.newaxis])
+        self._shared_buffer = self._shared_buffer and shared
         self._values = new_values
+        self._htype_buffer = buffer
         self._c_count = int(new_values.shape[2])
         new_htypes = list(self.htypes) + [name]
         self._columns = labels_to_dict(new_htypes, range(self._c_count))
@@ -968,7 +1707,9 @@ class HistoryPanel():
         ``value`` 将广播到 ``(share 数, 时间长度)`` 并以 ``float64`` 落盘；已存在列名 **静默覆盖**，
         语义对齐 pandas 单列赋值。父面板上 **追加** 新列会替换整块 ``values``：``subpanel(copy=False)``
         / ``__getitem__`` 子视图通常 **看不到** 新列且可能仍指向旧缓冲；``subpanel(..., copy=True)``
-        与 ``to_numpy(copy=True)`` 不受影响。父 **覆盖** 已有列时，与父共享底层块的子视图会随父更新。
+        与 ``to_numpy(copy=True)`` 不受影响。父、子面板共享缓冲时 **覆盖** 已有列采用写时复制：
+        被写入的一方先复制缓冲，另一方的数据保持不变。``copy(deep=False)`` 得到的浅拷贝不属于切片视图，
+        仍与原对象共享写入。
 
         Parameters
         ----------
@@ -1012,6 +1753,7 @@ class HistoryPanel():
             raise ValueError(
                 'Cannot assign columns to an empty HistoryPanel; construct a non-empty panel first.'
             )
+        self._stats_cache = None
         col = self._prepare_column_array_for_inplace(value)
         self._set_htype_column_inplace(key, col)
 
@@ -1053,12 +1795,12 @@ class HistoryPanel():
         if inplace:
             target = self
         else:
-            target = HistoryPanel(
-                values=np.array(self.values, copy=True),
-                levels=list(self.shares),
-                rows=list(self.hdates),
-                columns=list(self.htypes),
-            )
+            # 新面板先与本对象共享数据，追加列写入 htype 缓冲，覆盖已有列时写时复制，避免整块复制
+            target = HistoryPanel._from_axis_labels(self._values, list(self.shares), list(self.hdates),
+                                                    list(self.htypes))
+            target._htype_buffer = self._htype_buffer
+            target._shared_buffer = True
+            self._shared_buffer = True
         M, L, _ = target.shape
         for name, spec in kwargs.items():
             if not isinstance(name, str):
@@ -1091,10 +1833,15 @@ class HistoryPanel():
             *,
             axis: str = 'share',
             method: str = 'average',
+            ascending: bool = True,
+            pct: bool = False,
             new_htype: Optional[str] = None,
     ) -> 'HistoryPanel':
         """按时间逐日对横截面 （share 维）做排名并追加一列返回新面板。
 
+        所有时间点的截面排名由 :func:`qteasy.csfuncs.cs_rank` 在整个 ``(share, date)``
+        矩阵上一次完成，不再逐日循环。
+
         Parameters
         ----------
         by : str
@@ -1104,6 +1851,10 @@ class HistoryPanel():
             目前仅支持沿 share 维做截面排名。
         method : {'average', 'min', 'max', 'first', 'dense'}, default 'average'
             并列值 （tie）的排名处理方式，语义与 pandas ``Series.rank(method=...)`` 一致。
+        ascending : bool, default True
+            True 时截面最小值排名为 1，False 时最大值排名为 1。
+        pct : bool, default False
+            True 时输出百分比排名 （排名除以当日有效值数量）。
         new_htype : str, optional
             输出列名；为 None 时默认使用 ``rank_{by}``。
 
@@ -1136,28 +1887,24 @@ class HistoryPanel():
             return HistoryPanel()
         if axis != 'share':
             raise ValueError(f'axis must be "share", got {axis}')
-        valid_methods = {'average', 'min', 'max', 'first', 'dense'}
-        if method not in valid_methods:
+        if method not in CS_RANK_METHODS:
             raise ValueError(
-                f'method must be one of {sorted(valid_methods)}, got {method}'
+                f'method must be one of {sorted(CS_RANK_METHODS)}, got {method}'
             )
+        x, new_htype = self._cs_source_column(by, new_htype, f'rank_{by}')
+        out = cs_rank(x, method=method, ascending=ascending, pct=pct, axis=0)
+        return self._append_columns([new_htype], [out])
+
+    def _cs_source_column(self, by: str, new_htype: Optional[str], default_htype: str) -> Tuple[np.ndarray, str]:
+        """截面算子的公共准备步骤：解析输入列、检查输出列名冲突，返回 ``(M, L)`` 数据矩阵与输出列名。"""
         resolved = self._resolve_price_htype(by)
         if new_htype is None:
-            new_htype = f'rank_{by}'
-        if new_htype in self.htypes:
+            new_htype = default_htype
+        if new_htype in self._columns:
             raise ValueError(f'htype "{new_htype}" already exists')
-
-        ci = self.htypes.index(resolved)
-        x = self.values[:, :, ci].astype(float)  # (M, L)
-        M, L = x.shape
-        out = np.full((M, L), np.nan, dtype=float)
-        for li in range(L):
-            s = pd.Series(x[:, li], index=self.shares, dtype=float)
-            out[:, li] = s.rank(method=method, na_option='keep').values.astype(float)
-
-        new_values = np.concatenate([self.values.astype(float), out[:, :, np.newaxis]], axis=2)
-        new_htypes = list(self.htypes) + [new_htype]
-        return HistoryPanel(values=new_values, levels=list(self.shares), rows=list(self.hdates), columns=new_htypes)
+        ci = self._columns[resolved]
+        x = self._materialize_htypes([ci])[:, :, ci].astype(float)  # (M, L)
+        return x, new_htype
 
     def zscore(
             self,
@@ -1216,32 +1963,17 @@ class HistoryPanel():
         if method not in ('cs', 'ts'):
             raise ValueError(f'method must be "cs" or "ts", got {method}')
         resolved = self._resolve_price_htype(by)
-        ci = self.htypes.index(resolved)
-        x = self.values[:, :, ci].astype(float)  # (M, L)
+        ci = self._columns[resolved]
+        x = self._materialize_htypes([ci])[:, :, ci].astype(float)  # (M, L)
 
         if method == 'cs':
             if window is not None:
                 raise ValueError('window must be None when method="cs"')
             if new_htype is None:
                 new_htype = f'cs_z_{by}'
-            if new_htype in self.htypes:
+            if new_htype in self._columns:
                 raise ValueError(f'htype "{new_htype}" already exists')
-            valid = ~np.isnan(x)
-            cnt = valid.sum(axis=0).astype(float)  # (L,)
-            sum_ = np.nansum(x, axis=0)  # (L,)
-            mu = np.full_like(sum_, np.nan, dtype=float)
-            has_mean = cnt > 0.0
-            mu[has_mean] = sum_[has_mean] / cnt[has_mean]
-            dev2 = np.where(valid, (x - mu[np.newaxis, :]) ** 2, 0.0)
-            denom = cnt - 1.0
-            sigma = np.full_like(mu, np.nan, dtype=float)
-            has_std = denom > 0.0
-            sigma[has_std] = np.sqrt(dev2.sum(axis=0)[has_std] / denom[has_std])
-            z = (x - mu[np.newaxis, :]) / sigma[np.newaxis, :]
-            invalid = (~np.isfinite(sigma)) | (sigma == 0.0)
-            if np.any(invalid):
-                z[:, invalid] = np.nan
-            out = z
+            out = cs_zscore(x, ddof=1, axis=0)
         else:
             if window is None:
                 raise ValueError('window is required when method="ts"')
@@ -1249,7 +1981,7 @@ class HistoryPanel():
                 raise ValueError(f'window must be a positive integer, got {window}')
             if new_htype is None:
                 new_htype = f'ts_z_{by}_{window}'
-            if new_htype in self.htypes:
+            if new_htype in self._columns:
                 raise ValueError(f'htype "{new_htype}" already exists')
             sub = HistoryPanel(
                 values=x[:, :, np.newaxis],
@@ -1267,61 +1999,196 @@ class HistoryPanel():
                 z[invalid] = np.nan
             out = z
 
-        new_values = np.concatenate([self.values.astype(float), out[:, :, np.newaxis]], axis=2)
-        new_htypes = list(self.htypes) + [new_htype]
-        return HistoryPanel(values=new_values, levels=list(self.shares), rows=list(self.hdates), columns=new_htypes)
+        return self._append_columns([new_htype], [out])
 
-    @staticmethod
-    def _stable_intersection(a: List[Any], b: List[Any]) -> List[Any]:
-        """返回列表交集，顺序以 a 为准 （稳定）。"""
-        b_set = set(b)
-        return [x for x in a if x in b_set]
+    def demean(self, by: str, *, new_htype: Optional[str] = None) -> 'HistoryPanel':
+        """逐日对横截面 （share 维）去均值并追加一列返回新面板，NaN 不参与均值计算。
 
-    @staticmethod
-    def _stable_union(a: List[Any], b: List[Any]) -> List[Any]:
-        """返回列表并集，顺序为 a 先、再追加 b 中未出现元素 （稳定）。"""
-        out = list(a)
-        a_set = set(a)
-        out.extend([x for x in b if x not in a_set])
-        return out
+        Parameters
+        ----------
+        by : str
+            参与计算的列名 （htype），支持 ``close|b`` 等复权后缀列。
+        new_htype : str, optional
+            输出列名；为 None 时默认使用 ``cs_demean_{by}``。
 
-    def align_to(
+        Returns
+        -------
+        HistoryPanel
+            追加去均值列后的新面板；不修改原对象。空面板返回空面板。
+
+        Raises
+        ------
+        ValueError
+            当列不存在或输出列名冲突时抛出 （英文信息）。
+
+        Examples
+        --------
+        >>> hp2 = hp.demean(by='close')
+        >>> 'cs_demean_close' in hp2.htypes
+        True
+        """
+        if self.is_empty:
+            return HistoryPanel()
+        x, new_htype = self._cs_source_column(by, new_htype, f'cs_demean_{by}')
+        return self._append_columns([new_htype], [cs_demean(x, axis=0)])
+
+    def winsorize(
             self,
-            other: 'HistoryPanel',
+            by: str,
             *,
-            join: str = 'inner',
-            fill_value: float = np.nan
-    ) -> Tuple['HistoryPanel', 'HistoryPanel']:
-        """将两个 HistoryPanel 沿 shares 与 hdates 轴按标签对齐，避免 silent 错行。
+            lower: float = 0.01,
+            upper: float = 0.99,
+            new_htype: Optional[str] = None,
+    ) -> 'HistoryPanel':
+        """逐日按截面分位数缩尾并追加一列返回新面板。
 
-        本方法**不会**按 iloc/位置对齐；仅使用 axis labels 做显式对齐。对齐后返回两块
-        新的面板，它们具有完全一致的 ``shares``、``hdates`` 与 ``htypes``，缺失格点用
-        ``fill_value`` 填充。
+        每个时间点上低于 ``lower`` 分位数或高于 ``upper`` 分位数的值被截断到对应分位数，
+        常用于因子去极值。
 
         Parameters
         ----------
-        other : HistoryPanel
-            需要对齐的另一个面板。
-        join : {'inner', 'outer'}, default 'inner'
-            对齐方式：\n
-            - ``inner``：取两者 shares 与 hdates 的交集；\n
-            - ``outer``：取两者 shares 与 hdates 的并集。\n
-            输出顺序为稳定顺序：交集以 ``self`` 的顺序为准；并集为 ``self`` 在前、再追加 ``other``
-            中未出现元素。
-        fill_value : float, default np.nan
-            对齐后缺失位置的填充值。
+        by : str
+            参与计算的列名 （htype），支持 ``close|b`` 等复权后缀列。
+        lower : float, default 0.01
+            截面下分位数，取值范围 [0, 1]。
+        upper : float, default 0.99
+            截面上分位数，取值范围 [0, 1]，且不小于 ``lower``。
+        new_htype : str, optional
+            输出列名；为 None 时默认使用 ``cs_win_{by}``。
 
         Returns
         -------
-        (HistoryPanel, HistoryPanel)
-            对齐后的 ``(self_aligned, other_aligned)``。
+        HistoryPanel
+            追加缩尾列后的新面板；不修改原对象。空面板返回空面板。
 
         Raises
         ------
-        TypeError
-            ``other`` 不是 ``HistoryPanel`` 时抛出 （英文信息）。
         ValueError
-            ``join`` 非法、或两者 ``htypes`` 不完全一致时抛出 （英文信息）。
+            当分位数非法、列不存在或输出列名冲突时抛出 （英文信息）。
+
+        Examples
+        --------
+        >>> hp2 = hp.winsorize(by='pe', lower=0.05, upper=0.95)
+        >>> 'cs_win_pe' in hp2.htypes
+        True
+        """
+        if self.is_empty:
+            return HistoryPanel()
+        if not (0. <= lower <= upper <= 1.):
+            raise ValueError(f'quantiles should satisfy 0 <= lower <= upper <= 1, got lower={lower}, upper={upper}')
+        x, new_htype = self._cs_source_column(by, new_htype, f'cs_win_{by}')
+        return self._append_columns([new_htype], [cs_winsorize(x, lower=lower, upper=upper, axis=0)])
+
+    def neutralize(
+            self,
+            by: str,
+            groups: Union[str, dict, Sequence],
+            *,
+            new_htype: Optional[str] = None,
+    ) -> 'HistoryPanel':
+        """逐日按分组做截面中性化 （减去同日同组 share 的均值）并追加一列返回新面板。
+
+        Parameters
+        ----------
+        by : str
+            参与计算的列名 （htype），支持 ``close|b`` 等复权后缀列。
+        groups : str, dict or sequence
+            分组信息 （如行业分类），支持三种形式：
+
+            - dict：``{share: group}``，未出现在 dict 中的 share 结果为 NaN；
+            - sequence：与 ``self.shares`` 一一对应的分组标签；
+            - str：面板中已有的 htype 列名，该列保存随时间变化的分组编码。
+        new_htype : str, optional
+            输出列名；为 None 时默认使用 ``cs_neu_{by}``。
+
+        Returns
+        -------
+        HistoryPanel
+            追加中性化列后的新面板；不修改原对象。空面板返回空面板。
+
+        Raises
+        ------
+        ValueError
+            当分组数量与 share 数量不一致、列不存在或输出列名冲突时抛出 （英文信息）。
+        TypeError
+            当 groups 类型不受支持时抛出。
+
+        Examples
+        --------
+        >>> hp2 = hp.neutralize(by='pe', groups={'000001.SZ': 'bank', '600036.SH': 'bank', '000002.SZ': 'estate'})
+        >>> 'cs_neu_pe' in hp2.htypes
+        True
+        """
+        if self.is_empty:
+            return HistoryPanel()
+        if isinstance(groups, str):
+            if groups not in self._columns:
+                raise ValueError(f'group htype "{groups}" not found in htypes {self.htypes}')
+            gi = self._columns[groups]
+            group_labels = self._materialize_htypes([gi])[:, :, gi]  # (M, L)，分组随时间变化
+        elif isinstance(groups, dict):
+            group_labels = [groups.get(share) for share in self.shares]
+        elif isinstance(groups, (list, tuple, np.ndarray, pd.Series)):
+            group_labels = list(groups)
+            if len(group_labels) != self.share_count:
+                raise ValueError(f'groups should have {self.share_count} labels, one for each share, '
+                                 f'got {len(group_labels)}')
+        else:
+            raise TypeError(f'groups should be a htype name, a dict or a sequence, got {type(groups)}')
+        x, new_htype = self._cs_source_column(by, new_htype, f'cs_neu_{by}')
+        return self._append_columns([new_htype], [cs_neutralize(x, group_labels, axis=0)])
+
+    @staticmethod
+    def _stable_intersection(a: List[Any], b: List[Any]) -> List[Any]:
+        """返回列表交集，顺序以 a 为准 （稳定）。"""
+        b_set = set(b)
+        return [x for x in a if x in b_set]
+
+    @staticmethod
+    def _stable_union(a: List[Any], b: List[Any]) -> List[Any]:
+        """返回列表并集，顺序为 a 先、再追加 b 中未出现元素 （稳定）。"""
+        out = list(a)
+        a_set = set(a)
+        out.extend([x for x in b if x not in a_set])
+        return out
+
+    def align_to(
+            self,
+            other: 'HistoryPanel',
+            *,
+            join: str = 'inner',
+            fill_value: float = np.nan
+    ) -> Tuple['HistoryPanel', 'HistoryPanel']:
+        """将两个 HistoryPanel 沿 shares 与 hdates 轴按标签对齐，避免 silent 错行。
+
+        本方法**不会**按 iloc/位置对齐；仅使用 axis labels 做显式对齐。对齐后返回两块
+        新的面板，它们具有完全一致的 ``shares``、``hdates`` 与 ``htypes``，缺失格点用
+        ``fill_value`` 填充。
+
+        Parameters
+        ----------
+        other : HistoryPanel
+            需要对齐的另一个面板。
+        join : {'inner', 'outer'}, default 'inner'
+            对齐方式：\n
+            - ``inner``：取两者 shares 与 hdates 的交集；\n
+            - ``outer``：取两者 shares 与 hdates 的并集。\n
+            输出顺序为稳定顺序：交集以 ``self`` 的顺序为准；并集为 ``self`` 在前、再追加 ``other``
+            中未出现元素。
+        fill_value : float, default np.nan
+            对齐后缺失位置的填充值。
+
+        Returns
+        -------
+        (HistoryPanel, HistoryPanel)
+            对齐后的 ``(self_aligned, other_aligned)``。
+
+        Raises
+        ------
+        TypeError
+            ``other`` 不是 ``HistoryPanel`` 时抛出 （英文信息）。
+        ValueError
+            ``join`` 非法、或两者 ``htypes`` 不完全一致时抛出 （英文信息）。
 
         Examples
         --------
@@ -1376,52 +2243,40 @@ class HistoryPanel():
                 'align_to() requires identical htypes (same names and order) for both panels.'
             )
 
-        shares1 = list(self.shares)
-        shares2 = list(other.shares)
-        dates1 = list(self.hdates)
-        dates2 = list(other.hdates)
+        index1 = self.hdate_index
+        index2 = other.hdate_index
+        if index1.tz != index2.tz:
+            raise ValueError(
+                f'align_to() requires hdates in the same time zone, got {index1.tz} and {index2.tz}.'
+            )
         htypes = list(self.htypes)
+        keys1 = _hdate_keys(index1)
+        keys2 = _hdate_keys(index2)
 
+        # shares 通过两者各自的标签字典做哈希查找，hdates 转换为 int64 键后做排序查找
         if join == 'inner':
-            out_shares = self._stable_intersection(shares1, shares2)
-            out_hdates = self._stable_intersection(dates1, dates2)
+            out_shares = self._stable_intersection(self.shares, other.shares)
+            out_keys = keys1[np.isin(keys1, keys2)]
         else:
-            out_shares = self._stable_union(shares1, shares2)
-            out_hdates = self._stable_union(dates1, dates2)
+            out_shares = self._stable_union(self.shares, other.shares)
+            out_keys = np.concatenate([keys1, keys2[~np.isin(keys2, keys1)]])
+        out_hdates = _hdate_index_from_keys(out_keys, tz=index1.tz)
 
         M, L, N = len(out_shares), len(out_hdates), len(htypes)
-        v1 = np.full((M, L, N), float(fill_value), dtype=float)
-        v2 = np.full((M, L, N), float(fill_value), dtype=float)
-
-        out_share_pos = {s: i for i, s in enumerate(out_shares)}
-        out_date_pos = {d: i for i, d in enumerate(out_hdates)}
-        in1_share_pos = {s: i for i, s in enumerate(shares1)}
-        in1_date_pos = {d: i for i, d in enumerate(dates1)}
-        in2_share_pos = {s: i for i, s in enumerate(shares2)}
-        in2_date_pos = {d: i for i, d in enumerate(dates2)}
-
-        common_shares_1 = [s for s in out_shares if s in in1_share_pos]
-        common_dates_1 = [d for d in out_hdates if d in in1_date_pos]
-        if common_shares_1 and common_dates_1:
-            os_idx = [out_share_pos[s] for s in common_shares_1]
-            od_idx = [out_date_pos[d] for d in common_dates_1]
-            is_idx = [in1_share_pos[s] for s in common_shares_1]
-            id_idx = [in1_date_pos[d] for d in common_dates_1]
-            v1[np.ix_(os_idx, od_idx, list(range(N)))] = self.values[np.ix_(is_idx, id_idx, list(range(N)))].astype(float)
-
-        common_shares_2 = [s for s in out_shares if s in in2_share_pos]
-        common_dates_2 = [d for d in out_hdates if d in in2_date_pos]
-        if common_shares_2 and common_dates_2:
-            os_idx = [out_share_pos[s] for s in common_shares_2]
-            od_idx = [out_date_pos[d] for d in common_dates_2]
-            is_idx = [in2_share_pos[s] for s in common_shares_2]
-            id_idx = [in2_date_pos[d] for d in common_dates_2]
-            v2[np.ix_(os_idx, od_idx, list(range(N)))] = other.values[np.ix_(is_idx, id_idx, list(range(N)))].astype(float)
-
-        return (
-            HistoryPanel(values=v1, levels=out_shares, rows=out_hdates, columns=htypes),
-            HistoryPanel(values=v2, levels=out_shares, rows=out_hdates, columns=htypes),
-        )
+        htype_pos = np.arange(N)
+        aligned = []
+        for hp, keys in ((self, keys1), (other, keys2)):
+            out_values = np.full((M, L, N), float(fill_value), dtype=float)
+            _scatter_block(
+                    out_values,
+                    hp.values,
+                    (_hashed_label_positions(hp._levels, out_shares),
+                     _sorted_key_positions(keys, out_keys),
+                     htype_pos),
+            )
+            aligned.append(HistoryPanel(values=out_values, levels=out_shares, rows=out_hdates, columns=htypes))
+
+        return aligned[0], aligned[1]
 
     def resample(self, rule: str, *, agg: Optional[dict] = None) -> 'HistoryPanel':
         """沿时间轴 （hdates）按规则重采样并返回新面板。
@@ -1494,7 +2349,7 @@ class HistoryPanel():
         resampled_index = None
         out_blocks: List[np.ndarray] = []
         for mi in range(len(shares)):
-            df = pd.DataFrame(self.values[mi, :, :].astype(float), index=pd.to_datetime(self.hdates), columns=htypes)
+            df = pd.DataFrame(self.values[mi, :, :].astype(float), index=self.hdate_index, columns=htypes)
             try:
                 r = df.resample(rule).agg(agg_ordered)
             except Exception as e:
@@ -1790,49 +2645,56 @@ class HistoryPanel():
     def __iadd__(self, other: Any) -> "HistoryPanel":
         """逐元素 ``self += other``，就地修改并返回 self。"""
         if isinstance(other, (float, int, np.ndarray)):
-            self._values += other
+            values = self._writable_values()
+            values += other
             return self
         return NotImplemented
 
     def __isub__(self, other: Any) -> "HistoryPanel":
         """逐元素 ``self -= other``，就地修改并返回 self。"""
         if isinstance(other, (float, int, np.ndarray)):
-            self._values -= other
+            values = self._writable_values()
+            values -= other
             return self
         return NotImplemented
 
     def __imul__(self, other: Any) -> "HistoryPanel":
         """逐元素 ``self *= other``，就地修改并返回 self。"""
         if isinstance(other, (float, int, np.ndarray)):
-            self._values *= other
+            values = self._writable_values()
+            values *= other
             return self
         return NotImplemented
 
     def __itruediv__(self, other: Any) -> "HistoryPanel":
         """逐元素 ``self /= other``，就地修改并返回 self。"""
         if isinstance(other, (float, int, np.ndarray)):
-            self._values /= other
+            values = self._writable_values()
+            values /= other
             return self
         return NotImplemented
 
     def __ifloordiv__(self, other: Any) -> "HistoryPanel":
         """逐元素 ``self //= other``，就地修改并返回 self。"""
         if isinstance(other, (float, int, np.ndarray)):
-            self._values //= other
+            values = self._writable_values()
+            values //= other
             return self
         return NotImplemented
 
     def __imod__(self, other: Any) -> "HistoryPanel":
         """逐元素 ``self %= other``，就地修改并返回 self。"""
         if isinstance(other, (float, int, np.ndarray)):
-            self._values %= other
+            values = self._writable_values()
+            values %= other
             return self
         return NotImplemented
 
     def __ipow__(self, other: Any) -> "HistoryPanel":
         """逐元素 ``self **= other``，就地修改并返回 self。"""
         if isinstance(other, (float, int, np.ndarray)):
-            self._values **= other
+            values = self._writable_values()
+            values **= other
             return self
         return NotImplemented
 
@@ -1849,7 +2711,8 @@ class HistoryPanel():
         Returns
         -------
         out : HistoryPanel
-            一个HistoryPanel，包含start_date到end_date之间所有share和htypes的数据
+            一个HistoryPanel，包含start_date到end_date之间所有share和htypes的数据。
+            返回的面板是本对象数据的视图 （不复制数据），通过 ``__setitem__`` 覆盖列时写时复制
 
         Examples
         --------
@@ -1877,18 +2740,9 @@ class HistoryPanel():
         2015-01-09    10    20   30     40      50
         2015-01-10    10    20   30     40      50
         """
-        hdates = np.array(self.hdates)
-        if start_date is None:
-            start_date = hdates[0]
-        if end_date is None:
-            end_date = hdates[-1]
-        sd = pd.to_datetime(start_date)
-        ed = pd.to_datetime(end_date)
-        sd_index = hdates.searchsorted(sd)
-        ed_index = hdates.searchsorted(ed, side='right')
-        new_dates = list(hdates[sd_index:ed_index])
-        new_values = self[:, :, sd_index:ed_index].values
-        return HistoryPanel(new_values, levels=self.shares, rows=new_dates, columns=self.htypes)
+        if self.is_empty:
+            return HistoryPanel()
+        return self.subpanel(hdates=self._hdate_label_slice(start_date, end_date), copy=False)
 
     def isegment(self, start_index=None, end_index=None):
         """ 获取HistoryPanel的一个片段，start_index和end_index都是int数，表示日期序号，返回
@@ -1930,10 +2784,9 @@ class HistoryPanel():
         2015-01-08    10    20   30     40      50
         2015-01-09    10    20   30     40      50
         """
-        hdates = np.array(self.hdates)
-        new_dates = list(hdates[start_index:end_index])
-        new_values = self[:, :, start_index:end_index].values
-        return HistoryPanel(new_values, levels=self.shares, rows=new_dates, columns=self.htypes)
+        if self.is_empty:
+            return HistoryPanel()
+        return self.subpanel(hdates=slice(start_index, end_index), copy=False)
 
     def slice(self, shares=None, htypes=None):
         """ 获取HistoryPanel的一个股票或数据种类片段，shares和htypes可以为列表或逗号分隔字符
@@ -1998,8 +2851,7 @@ class HistoryPanel():
             htypes = str_to_list(htypes)
         if not isinstance(htypes, list):
             raise KeyError(f'wrong htypes are given!')
-        new_values = self[htypes, shares].values
-        return HistoryPanel(new_values, levels=shares, columns=htypes, rows=self.hdates)
+        return self.subpanel(htypes=htypes, shares=shares, copy=False)
 
     def info(self):
         """ 打印本HistoryPanel对象的信息
@@ -2252,6 +3104,7 @@ class HistoryPanel():
         out : HistoryPanel, 填充后的HistoryPanel对象
         """
         if not self.is_empty:
+            self._stats_cache = None
             self._values = fill_nan_data(self._values, with_val)
         return self
 
@@ -2268,6 +3121,7 @@ class HistoryPanel():
         out : HistoryPanel, 填充后的HistoryPanel对象
         """
         if not self.is_empty:
+            self._stats_cache = None
             self._values = fill_inf_data(self._values, with_val)
         return self
 
@@ -2323,7 +3177,8 @@ class HistoryPanel():
             val = self.values
             if np.all(~np.isnan(val)):
                 return self
-            self._values = ffill_3d_data(val, init_val)
+            self._stats_cache = None
+            self._values = ffill_3d_data(self._writable_values(), init_val)
         return self
 
     def join(self,
@@ -2335,7 +3190,9 @@ class HistoryPanel():
         """ 将一个HistoryPanel对象与另一个HistoryPanel对象连接起来，生成一个新的HistoryPanel：
 
         新HistoryPanel的行、列、层标签分别是两个原始HistoryPanel的行、列、层标签的并集，也就是说，新的HistoryPanel的行、列
-        层标签完全包含两个HistoryPanel对象的对应标签。
+        层标签完全包含两个HistoryPanel对象的对应标签。合并后的shares与htypes按标签排序，hdates按时间先后排序；
+        hdates以int64时间键做排序合并，shares与htypes通过标签字典做哈希查找，两个HistoryPanel的数据各自通过一次
+        整块写入填充到结果中，开销与数据量成线性关系。
 
         Parameters
         ----------
@@ -2411,86 +3268,53 @@ class HistoryPanel():
         elif other.is_empty:
             return self
         else:
-            other_shares = other.shares
-            other_htypes = other.htypes
-            other_hdates = other.hdates
-            this_shares = self.shares
-            this_htypes = self.htypes
-            this_hdates = self.hdates
+            index1 = self.hdate_index
+            index2 = other.hdate_index
             if not same_shares:
-                combined_shares = list(set(this_shares).union(set(other_shares)))
-                combined_shares.sort()
+                combined_shares = sorted(set(self._levels).union(other._levels))
             else:
-                assert this_shares == other_shares, f'Assertion Error, shares of two HistoryPanels are different!'
+                assert self.shares == other.shares, f'Assertion Error, shares of two HistoryPanels are different!'
                 combined_shares = self.shares
             if not same_htypes:
-                combined_htypes = list(set(this_htypes).union(set(other_htypes)))
-                combined_htypes.sort()
+                combined_htypes = sorted(set(self._columns).union(other._columns))
             else:
-                assert this_htypes == other_htypes, f'Assertion Error, htypes of two HistoryPanels are different!'
+                assert self.htypes == other.htypes, f'Assertion Error, htypes of two HistoryPanels are different!'
                 combined_htypes = self.htypes
             if not same_hdates:
-                combined_hdates = list(set(this_hdates).union(set(other_hdates)))
-                combined_hdates.sort()
+                if index1.tz != index2.tz:
+                    raise ValueError(f'can not join HistoryPanels with hdates in different time zones: '
+                                     f'{index1.tz} and {index2.tz}')
+                combined_keys = np.union1d(_hdate_keys(index1), _hdate_keys(index2))
+                combined_hdates = _hdate_index_from_keys(combined_keys, tz=index1.tz)
             else:
-                assert this_hdates == other_hdates, f'Assertion Error, hdates of two HistoryPanels are different!'
-                combined_hdates = self.hdates
+                assert index1.equals(index2), f'Assertion Error, hdates of two HistoryPanels are different!'
+                combined_keys = _hdate_keys(index1)
+                combined_hdates = index1
             combined_values = np.empty(shape=(len(combined_shares),
                                               len(combined_hdates),
                                               len(combined_htypes)))
             combined_values.fill(fill_value)
-            if same_shares:
-                if same_htypes:
-                    for hdate in combined_hdates:
-                        combined_hdate_id = labels_to_dict(combined_hdates, combined_hdates)
-                        this_hdate_id = labels_to_dict(this_hdates, this_hdates)
-                        other_hdate_id = labels_to_dict(other_hdates, other_hdates)
-                        if hdate in this_hdates:
-                            combined_values[:, combined_hdate_id[hdate], :] = self.values[:, this_hdate_id[hdate], :]
-                        else:
-                            combined_values[:, combined_hdate_id[hdate], :] = other.values[:, other_hdate_id[hdate], :]
-                elif same_hdates:
-                    for htype in combined_htypes:
-                        combined_htype_id = labels_to_dict(combined_htypes, combined_htypes)
-                        this_htype_id = labels_to_dict(this_htypes, this_htypes)
-                        other_htype_id = labels_to_dict(other_htypes, other_htypes)
-                        if htype in this_htypes:
-                            combined_values[:, :, combined_htype_id[htype]] = self.values[:, :, this_htype_id[htype]]
-                        else:
-                            combined_values[:, :, combined_htype_id[htype]] = other.values[:, :, other_htype_id[htype]]
-                else:
-                    for hdate in combined_hdates:
-                        for htype in combined_htypes:
-                            combined_hdate_id = labels_to_dict(combined_hdates, combined_hdates)
-                            this_hdate_id = labels_to_dict(this_hdates, this_hdates)
-                            other_hdate_id = labels_to_dict(other_hdates, other_hdates)
-                            combined_htype_id = labels_to_dict(combined_htypes, combined_htypes)
-                            this_htype_id = labels_to_dict(this_htypes, this_htypes)
-                            other_htype_id = labels_to_dict(other_htypes, other_htypes)
-                            if htype in this_htypes and hdate in this_hdates:
-                                combined_values[:, combined_hdate_id[hdate], combined_htype_id[htype]] = \
-                                    self.values[:, this_hdate_id[hdate], this_htype_id[htype]]
-                            elif htype in other_htypes and hdate in other_hdates:
-                                combined_values[:, combined_hdate_id[hdate], combined_htype_id[htype]] = \
-                                    other.values[:, other_hdate_id[hdate], other_htype_id[htype]]
-            # TODO: implement this section 实现相同htype的HistoryPanel合并
-            elif same_htypes:
-                raise NotImplementedError
-            # TODO: implement this section 实现相同数据历史时间戳的HistoryPanel合并
-            else:
-                raise NotImplementedError
+            # 先写入other的数据，再写入self的数据，两者标签重叠的位置以self的数据为准
+            for hp, index in ((other, index2), (self, index1)):
+                _scatter_block(
+                        combined_values,
+                        hp.values,
+                        (_hashed_label_positions(hp._levels, combined_shares),
+                         _sorted_key_positions(_hdate_keys(index), combined_keys),
+                         _hashed_label_positions(hp._columns, combined_htypes)),
+                )
             return HistoryPanel(values=combined_values,
                                 levels=combined_shares,
                                 rows=combined_hdates,
                                 columns=combined_htypes)
 
     def as_type(self, dtype):
-        """ 将HistoryPanel的数据类型转换为dtype类型，dtype只能为'float'或'int'
+        """ 将HistoryPanel的数据类型转换为dtype类型，dtype只能为'float'、'float64'、'float32'或'int'
 
         Parameters
         ----------
-        dtype: str, {'float', 'int'}
-            需要转换的目标数据类型
+        dtype: str, {'float', 'float64', 'float32', 'int'}
+            需要转换的目标数据类型，'float'与'float64'等价，'float32'以单精度存储数据
 
         Returns
         -------
@@ -2499,12 +3323,13 @@ class HistoryPanel():
         Raises
         ______
         AssertionError
-            当输入的数据类型不正确或输入除float/int外的其他数据类型时
+            当输入的数据类型不正确或输入除float/float64/float32/int外的其他数据类型时
         """
-        ALL_DTYPES = ['float', 'int']
+        ALL_DTYPES = ['float', 'float64', 'float32', 'int']
         if not self.is_empty:
             assert isinstance(dtype, str), f'InputError, dtype should be a string, got {type(dtype)}'
             assert dtype in ALL_DTYPES, f'data type {dtype} is not recognized or not supported!'
+            self._stats_cache = None
             self._values = self.values.astype(dtype)
         return self
 
@@ -2581,7 +3406,7 @@ class HistoryPanel():
             assert isinstance(htype, (str, int)), f'htype must be a string or an integer, got {type(htype)}'
             if isinstance(htype, int):
                 htype = self.htypes[htype]
-            if not htype in self.htypes:
+            if not htype in self._columns:
                 raise KeyError(f'htype {htype} is not found!')
             # 在生成DataFrame之前，需要把数据降低一个维度，例如shape(1, 24, 5) -> shape(24, 5)
             v = self[htype].values.T
@@ -2592,7 +3417,7 @@ class HistoryPanel():
             assert isinstance(share, (str, int)), f'share must be a string or an integer, got {type(share)}'
             if isinstance(share, int):
                 share = self.shares[share]
-            if not share in self.shares:
+            if not share in self._levels:
                 raise KeyError(f'share {share} is not found!')
             # 在生成DataFrame之前，需要把数据降低一个维度，例如shape(1, 24, 5) -> shape(24, 5)
             v = self[:, share].values
@@ -2776,7 +3601,117 @@ class HistoryPanel():
         """
         return self.flatten_to_dataframe(along=along)
 
-    def mean(self, by: str = 'share', skipna: bool = True) -> pd.DataFrame:
+    def _stats_htype_columns(self, htypes: Optional[Union[str, Sequence[str]]]) -> List[int]:
+        """把汇总统计方法的 ``htypes`` 参数解析为列下标列表。
+
+        Raises
+        ------
+        ValueError
+            ``htypes`` 中有不存在的 htype 时抛出。
+        """
+        if htypes is None:
+            return list(range(self._c_count))
+        if isinstance(htypes, str):
+            htypes = str_to_list(htypes)
+        missing = [htype for htype in htypes if htype not in self._columns]
+        if missing:
+            raise ValueError(f'htypes {missing} not found in HistoryPanel htypes: {self.htypes}')
+        return [self._columns[htype] for htype in htypes]
+
+    def _stats_block(self, cols: List[int]) -> np.ndarray:
+        """返回所选列的数据；选中全部列时直接返回内部缓冲，不复制。"""
+        buffer = self._materialize_htypes(cols)
+        if cols == list(range(buffer.shape[2])):
+            return buffer
+        return buffer[:, :, cols]
+
+    def _cached_stats(self, key: tuple, cols: List[int], compute: Callable[[], Any]) -> Any:
+        """从面板的统计缓存中取出 ``key`` 对应的结果，没有时调用 ``compute()`` 计算并缓存。
+
+        缓存记录计算时的数据缓冲与三轴标签字典，任一被整体替换后缓存自动失效。
+        """
+        buffer = self._materialize_htypes(cols)
+        cache = self._stats_cache
+        if cache is None or cache[0] is not buffer or cache[1] is not self._levels or \
+                cache[2] is not self._rows or cache[3] is not self._columns:
+            cache = (buffer, self._levels, self._rows, self._columns, {})
+            self._stats_cache = cache
+        results = cache[4]
+        if key not in results:
+            results[key] = compute()
+        return results[key]
+
+    def _stats_moments(self, cols: List[int], by: Optional[str], ddof: int = 1) -> Dict[str, np.ndarray]:
+        """按统计视角返回 （并缓存）所选列的 :func:`_nan_moments` 结果。
+
+        ``by='share'`` 时结果形状为 ``(shares, 列数)``；``by='htype'`` 时为 ``(1, 列数)``；
+        ``by=None`` 时全部数据视为一个样本池，形状为 ``(1, 1)``。
+        """
+        def compute() -> Dict[str, np.ndarray]:
+            block = self._stats_block(cols)
+            if by == 'htype':
+                block = block.reshape(1, -1, block.shape[2])
+            elif by is None:
+                block = block.reshape(1, -1, 1)
+            return _nan_moments(block, ddof=ddof)
+
+        return self._cached_stats(('moments', by, ddof, tuple(cols)), cols, compute)
+
+    def _summary_stat(self,
+                      stat: str,
+                      by: str,
+                      skipna: bool,
+                      htypes: Optional[Union[str, Sequence[str]]]) -> pd.DataFrame:
+        """``mean`` / ``std`` / ``min`` / ``max`` 的共同实现：由缓存的矩计算结果生成 （并缓存）结果表。"""
+        if self.is_empty:
+            return pd.DataFrame()
+        if by not in ('share', 'htype'):
+            raise ValueError(f'parameter "by" must be "share" or "htype", got {by}')
+        cols = self._stats_htype_columns(htypes)
+
+        def compute() -> pd.DataFrame:
+            moments = self._stats_moments(cols, 'share')
+            agg_share = moments[stat] if skipna else np.where(moments['complete'], moments[stat], np.nan)
+            all_htypes = self.htypes
+            df_share = pd.DataFrame(agg_share, index=self.shares, columns=[all_htypes[c] for c in cols])
+            return df_share if by == 'share' else df_share.T
+
+        return self._cached_stats((stat, by, skipna, tuple(cols)), cols, compute).copy()
+
+    def _describe_frame(self,
+                        cols: List[int],
+                        by: Optional[str],
+                        pcts: Tuple[float, ...],
+                        ddof: int,
+                        stat_labels: List[str]) -> pd.DataFrame:
+        """由矩计算结果与分位数生成 :meth:`describe` 的结果表。"""
+        moments = self._stats_moments(cols, by, ddof=ddof if by is None else 1)
+        block = self._stats_block(cols)
+        if by == 'htype':
+            block = block.reshape(1, -1, block.shape[2])
+        elif by is None:
+            block = block.reshape(1, -1, 1)
+        quantiles = _nan_quantiles(block, pcts)  # (A, 分位数个数, K)
+        stats = np.concatenate([
+            np.stack([moments['count'], moments['mean'], moments['std'], moments['min']], axis=1),
+            quantiles,
+            moments['max'][:, np.newaxis, :],
+        ], axis=1)  # (A, 统计量个数, K)
+        all_htypes = self.htypes
+        htype_labels = [all_htypes[c] for c in cols]
+        if by == 'share':
+            col_tuples = [(htype, stat) for htype in htype_labels for stat in stat_labels]
+            desc_df = pd.DataFrame(stats.transpose(0, 2, 1).reshape(stats.shape[0], -1), index=self.shares)
+            desc_df.columns = pd.MultiIndex.from_tuples(col_tuples, names=['htype', 'stat'])
+            return desc_df
+        if by == 'htype':
+            return pd.DataFrame(stats[0].T, index=htype_labels, columns=stat_labels)
+        return pd.DataFrame(stats[0].T, columns=stat_labels)
+
+    def mean(self,
+             by: str = 'share',
+             skipna: bool = True,
+             htypes: Optional[Union[str, Sequence[str]]] = None) -> pd.DataFrame:
         """按标的或数据类型对 HistoryPanel 进行均值统计。
 
         Parameters
@@ -2787,6 +3722,8 @@ class HistoryPanel():
             - 'htype'：对每个 htype 在所有股票上的均值，返回转置后的 DataFrame。
         skipna : bool, default True
             是否在计算均值时忽略 NaN。
+        htypes : str or sequence of str, optional
+            只统计这些 htype，为 None 时统计全部 htypes。
 
         Returns
         -------
@@ -2804,22 +3741,12 @@ class HistoryPanel():
         000001.SZ  0.456789  0.567890
         000002.SZ  0.345678  0.456789
         """
-        if self.is_empty:
-            return pd.DataFrame()
-        if by not in ('share', 'htype'):
-            raise ValueError(f'parameter "by" must be "share" or "htype", got {by}')
-
-        values = self.values.astype(float)
-        if skipna:
-            agg_share = np.nanmean(values, axis=1)
-        else:
-            agg_share = values.mean(axis=1)
-        df_share = pd.DataFrame(agg_share, index=self.shares, columns=self.htypes)
-        if by == 'share':
-            return df_share
-        return df_share.T
+        return self._summary_stat('mean', by, skipna, htypes)
 
-    def std(self, by: str = 'share', skipna: bool = True) -> pd.DataFrame:
+    def std(self,
+            by: str = 'share',
+            skipna: bool = True,
+            htypes: Optional[Union[str, Sequence[str]]] = None) -> pd.DataFrame:
         """按标的或数据类型对 HistoryPanel 进行标准差统计 （ddof=1）。
 
         Parameters
@@ -2828,6 +3755,8 @@ class HistoryPanel():
             统计维度，语义同 ``mean()``。
         skipna : bool, default True
             是否在计算标准差时忽略 NaN。
+        htypes : str or sequence of str, optional
+            只统计这些 htype，为 None 时统计全部 htypes。
 
         Returns
         -------
@@ -2845,22 +3774,12 @@ class HistoryPanel():
         000001.SZ  0.129099  0.086603
         000002.SZ  0.149361  0.110769
         """
-        if self.is_empty:
-            return pd.DataFrame()
-        if by not in ('share', 'htype'):
-            raise ValueError(f'parameter "by" must be "share" or "htype", got {by}')
-
-        values = self.values.astype(float)
-        if skipna:
-            agg_share = np.nanstd(values, axis=1, ddof=1)
-        else:
-            agg_share = values.std(axis=1, ddof=1)
-        df_share = pd.DataFrame(agg_share, index=self.shares, columns=self.htypes)
-        if by == 'share':
-            return df_share
-        return df_share.T
+        return self._summary_stat('std', by, skipna, htypes)
 
-    def min(self, by: str = 'share', skipna: bool = True) -> pd.DataFrame:
+    def min(self,
+            by: str = 'share',
+            skipna: bool = True,
+            htypes: Optional[Union[str, Sequence[str]]] = None) -> pd.DataFrame:
         """按标的或数据类型对 HistoryPanel 进行最小值统计。
 
         Parameters
@@ -2869,6 +3788,8 @@ class HistoryPanel():
             统计维度，语义同 ``mean()``。
         skipna : bool, default True
             是否在计算最小值时忽略 NaN。
+        htypes : str or sequence of str, optional
+            只统计这些 htype，为 None 时统计全部 htypes。
 
         Returns
         -------
@@ -2888,22 +3809,12 @@ class HistoryPanel():
         000001.SZ   1.0    2.0
         000002.SZ   5.0    6.0
         """
-        if self.is_empty:
-            return pd.DataFrame()
-        if by not in ('share', 'htype'):
-            raise ValueError(f'parameter "by" must be "share" or "htype", got {by}')
-
-        values = self.values.astype(float)
-        if skipna:
-            agg_share = np.nanmin(values, axis=1)
-        else:
-            agg_share = values.min(axis=1)
-        df_share = pd.DataFrame(agg_share, index=self.shares, columns=self.htypes)
-        if by == 'share':
-            return df_share
-        return df_share.T
+        return self._summary_stat('min', by, skipna, htypes)
 
-    def max(self, by: str = 'share', skipna: bool = True) -> pd.DataFrame:
+    def max(self,
+            by: str = 'share',
+            skipna: bool = True,
+            htypes: Optional[Union[str, Sequence[str]]] = None) -> pd.DataFrame:
         """按标的或数据类型对 HistoryPanel 进行最大值统计。
 
         Parameters
@@ -2912,6 +3823,8 @@ class HistoryPanel():
             统计维度，语义同 ``mean()``。
         skipna : bool, default True
             是否在计算最大值时忽略 NaN。
+        htypes : str or sequence of str, optional
+            只统计这些 htype，为 None 时统计全部 htypes。
 
         Returns
         -------
@@ -2931,20 +3844,7 @@ class HistoryPanel():
         000001.SZ   3.0    4.0
         000002.SZ   7.0    8.0
         """
-        if self.is_empty:
-            return pd.DataFrame()
-        if by not in ('share', 'htype'):
-            raise ValueError(f'parameter "by" must be "share" or "htype", got {by}')
-
-        values = self.values.astype(float)
-        if skipna:
-            agg_share = np.nanmax(values, axis=1)
-        else:
-            agg_share = values.max(axis=1)
-        df_share = pd.DataFrame(agg_share, index=self.shares, columns=self.htypes)
-        if by == 'share':
-            return df_share
-        return df_share.T
+        return self._summary_stat('max', by, skipna, htypes)
 
     def describe(
             self,
@@ -2952,12 +3852,18 @@ class HistoryPanel():
             percentiles: tuple = (0.25, 0.5, 0.75),
             include: str = 'numeric',
             ddof: int = 1,
+            htypes: Optional[Union[str, Sequence[str]]] = None,
     ) -> pd.DataFrame:
         """对 HistoryPanel 进行基础统计描述，类似 pandas.DataFrame.describe。
 
         可以按标的 （share）、历史数据类型 （htype）或全局视角对数值数据做 count、
         mean、std、min、max 及给定分位数等统计描述。
 
+        所有统计量由一次 NaN 感知的矩计算与一次排序得到，并与 ``mean`` / ``std`` / ``min`` / ``max``
+        共用同一份按面板缓存的中间结果：同一面板上重复调用这些方法 （例如仪表盘或报告反复刷新）时直接返回缓存结果，
+        经由 ``__setitem__``、``fillna``、``append_rows`` 等方法修改面板后缓存自动失效。
+        直接修改 ``values`` 返回的数组不会被检测到，此时请重新创建面板。
+
         Parameters
         ----------
         by : {'share', 'htype', None}, default 'share'
@@ -2971,6 +3877,8 @@ class HistoryPanel():
             当前仅支持数值型统计，非数值列会被自动忽略。
         ddof : int, default 1
             计算标准差时的自由度参数，仅在 ``by is None`` 时生效。
+        htypes : str or sequence of str, optional
+            只统计这些 htype，为 None 时统计全部 htypes。
 
         Returns
         -------
@@ -3016,57 +3924,19 @@ class HistoryPanel():
         # 目前仅支持数值型统计，兼容老版本 pandas，这里不直接将 include 透传给 pandas.describe
         if include not in ('numeric', None):
             raise ValueError('only numeric include is supported for HistoryPanel.describe')
-
-        # by='share'：对每只股票的 DataFrame 做 describe，拼接为 MultiIndex 列
-        if by == 'share':
-            rows = {}
-            col_tuples = []
-            first = True
-            for share in self.shares:
-                df = self.slice_to_dataframe(share=share)
-                # DataFrame 仅包含数值列，不再传递 include 参数，以兼容当前 pandas 版本
-                desc = df.describe(percentiles=percentiles)
-                if first:
-                    stats_order = list(desc.index)
-                    for htype in df.columns:
-                        for stat in stats_order:
-                            col_tuples.append((htype, stat))
-                    first = False
-                values = []
-                for htype in df.columns:
-                    for stat in stats_order:
-                        values.append(desc.loc[stat, htype])
-                rows[share] = values
-            desc_df = pd.DataFrame.from_dict(rows, orient='index')
-            desc_df.columns = pd.MultiIndex.from_tuples(col_tuples, names=['htype', 'stat'])
-            return desc_df
-
-        # by='htype'：每个 htype 在所有股票与时间上的分布
-        if by == 'htype':
-            rows = {}
-            stats_index = None
-            for i, htype in enumerate(self.htypes):
-                arr = self.values[:, :, i].astype(float).ravel()
-                arr = arr[~np.isnan(arr)]
-                series = pd.Series(arr)
-                desc = series.describe(percentiles=percentiles)
-                if stats_index is None:
-                    stats_index = desc.index
-                rows[htype] = desc.values
-            desc_df = pd.DataFrame.from_dict(rows, orient='index', columns=stats_index)
-            return desc_df
-
-        # 全局 describe：所有数值视作一个整体样本池
-        if by is None:
-            arr = self.values.astype(float).ravel()
-            arr = arr[~np.isnan(arr)]
-            series = pd.Series(arr)
-            desc = series.describe(percentiles=percentiles)
-            if 'std' in desc.index:
-                desc['std'] = series.std(ddof=ddof)
-            return desc.to_frame().T
-
-        raise ValueError(f'parameter \"by\" must be \"share\", \"htype\" or None, got {by}')
+        if by not in ('share', 'htype', None):
+            raise ValueError(f'parameter \"by\" must be \"share\", \"htype\" or None, got {by}')
+        # 统计量的标签与排序后的分位数与 pandas.describe 保持一致 （自动补充 50% 分位数）
+        stat_labels = list(pd.Series([0.]).describe(percentiles=percentiles).index)
+        pcts = list(percentiles)
+        if 0.5 not in pcts:
+            pcts.append(0.5)
+        pcts = tuple(np.unique(np.asarray(pcts, dtype=float)).tolist())
+        cols = self._stats_htype_columns(htypes)
+        key = ('describe', by, pcts, ddof if by is None else 1, tuple(cols))
+        return self._cached_stats(
+                key, cols, lambda: self._describe_frame(cols, by, pcts, ddof, stat_labels)
+        ).copy()
 
     def rolling(
             self,
@@ -3163,23 +4033,11 @@ class HistoryPanel():
         if method not in ('simple', 'log'):
             raise ValueError(f'method must be "simple" or "log", got {method}')
 
-        ci = self.htypes.index(resolved_price_htype)
-        prices = self.values[:, :, ci].astype(float)  # (shares, times)
+        ci = self._columns[resolved_price_htype]
+        prices = self._materialize_htypes([ci])[:, :, ci].astype(float)  # (shares, times)
 
         n_share, n_time = prices.shape
-        ret = np.full((n_share, n_time), np.nan, dtype=float)
-
-        for i in range(n_share):
-            p = prices[i, :]
-            for t in range(periods, n_time):
-                p_prev = p[t - periods]
-                p_curr = p[t]
-                if np.isnan(p_prev) or np.isnan(p_curr) or p_prev <= 0:
-                    ret[i, t] = np.nan
-                elif method == 'simple':
-                    ret[i, t] = p_curr / p_prev - 1.0
-                else:  # log
-                    ret[i, t] = np.log(p_curr) - np.log(p_prev)
+        ret = self._period_returns_along_time(prices, periods, method)
 
         if dropna:
             # 删除整行全 NaN 的起始行
@@ -3253,84 +4111,104 @@ class HistoryPanel():
         return np.array(broad, dtype=bool, copy=True)
 
     @staticmethod
-    def _cum_return_1d_along_time(p_eff: np.ndarray, method: str) -> np.ndarray:
-        """沿单 share 单列时间序列计算累计收益 （已套用 mask 的 ``p_eff``）。
+    def _period_returns_along_time(prices: np.ndarray, periods: int, method: str) -> np.ndarray:
+        """沿第 1 轴 （时间轴）一次性计算所有序列的区间收益率。
+
+        Parameters
+        ----------
+        prices : numpy.ndarray
+            价格数组，第 1 轴为时间，如 ``(shares, times)``；一维输入视为单条时间序列。
+        periods : int
+            收益率间隔的 bar 数。
+        method : {'simple', 'log'}
+            ``simple``：``p_t/p_{t-periods}-1``；``log``：``log(p_t)-log(p_{t-periods})``。
+
+        Returns
+        -------
+        numpy.ndarray
+            与 ``prices`` 同形的收益率；前 ``periods`` 个时点、任一端为 NaN 或前值非正时为 NaN。
+        """
+        prices = np.asarray(prices, dtype=float)
+        axis = 1 if prices.ndim > 1 else 0
+        n_time = prices.shape[axis]
+        ret = np.full(prices.shape, np.nan, dtype=float)
+        if periods >= n_time:
+            return ret
+        p_prev = np.take(prices, np.arange(0, n_time - periods), axis=axis)
+        p_curr = np.take(prices, np.arange(periods, n_time), axis=axis)
+        valid = (~np.isnan(p_prev)) & (~np.isnan(p_curr)) & (p_prev > 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if method == 'simple':
+                r = p_curr / p_prev - 1.0
+            else:
+                r = np.log(p_curr) - np.log(p_prev)
+        tail = [slice(None)] * prices.ndim
+        tail[axis] = slice(periods, None)
+        ret[tuple(tail)] = np.where(valid, r, np.nan)
+        return ret
+
+    @staticmethod
+    def _cum_return_along_time(p_eff: np.ndarray, method: str) -> np.ndarray:
+        """沿时间轴 （第 1 轴）对所有 share 与列同时计算累计收益 （已套用 mask 的 ``p_eff``）。
 
         Parameters
         ----------
         p_eff : numpy.ndarray
-            一维价格序列 （已将 mask=False 位置置为 NaN）。
+            形如 ``(shares, times, columns)`` 的价格块 （已将 mask=False 位置置为 NaN）。
         method : {'simple', 'log'}
             ``simple``：``p_t/p_{t0}-1``；``log``：``log(p_t)-log(p_{t0})``。
 
         Returns
         -------
         numpy.ndarray
-            一维累计收益序列。首个有效正价 ``t0`` 处为 0；路径断开后为 NaN。
-        """
-        p_eff = np.asarray(p_eff, dtype=float).ravel()
-        l_cnt = p_eff.size
-        out = np.full(l_cnt, np.nan, dtype=float)
-        t0: Optional[int] = None
-        for t in range(l_cnt):
-            v = p_eff[t]
-            if np.isfinite(v) and v > 0:
-                t0 = t
-                break
-        if t0 is None:
-            return out
-        out[t0] = 0.0
-        p0 = p_eff[t0]
-        broken = False
-        for t in range(t0 + 1, l_cnt):
-            v = p_eff[t]
-            if broken or not np.isfinite(v) or v <= 0:
-                broken = True
-                out[t] = np.nan
-                continue
+            与 ``p_eff`` 同形的累计收益。每条序列在首个有效正价 ``t0`` 处为 0；
+            路径上出现 NaN 或非正价格后 （路径断开）均为 NaN。
+        """
+        p_eff = np.asarray(p_eff, dtype=float)
+        with np.errstate(invalid='ignore'):
+            valid = np.isfinite(p_eff) & (p_eff > 0)
+        l_cnt = p_eff.shape[1]
+        has_any = valid.any(axis=1, keepdims=True)
+        t0 = np.argmax(valid, axis=1)[:, np.newaxis, :]
+        # t0 之后仍在路径上的时点：此前累计的无效点数恰等于 t0 （即 t0 之后没有再出现无效点）
+        n_invalid = np.cumsum(~valid, axis=1)
+        t_idx = np.arange(l_cnt).reshape(1, l_cnt, 1)
+        on_path = has_any & (t_idx >= t0) & (n_invalid == t0)
+        p0 = np.take_along_axis(p_eff, t0, axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
             if method == 'simple':
-                out[t] = v / p0 - 1.0
+                out = p_eff / p0 - 1.0
             else:
-                out[t] = np.log(v) - np.log(p0)
-        return out
+                out = np.log(p_eff) - np.log(p0)
+        return np.where(on_path, out, np.nan)
 
     @staticmethod
-    def _normalize_1d_along_time(
-            p_eff: np.ndarray,
-            base_index: int,
-            mask_1d: np.ndarray,
-    ) -> np.ndarray:
-        """单 share 单列归一化；``mask_1d`` 与 ``p_eff`` 等长。
+    def _normalize_along_time(p_eff: np.ndarray, base_index: int) -> np.ndarray:
+        """沿时间轴 （第 1 轴）对所有 share 与列同时按 ``base_index`` 处的值归一化。
 
         Parameters
         ----------
         p_eff : numpy.ndarray
-            一维原始序列 （已将 mask=False 位置置为 NaN）。
+            形如 ``(shares, times, columns)`` 的数据块 （已将 mask=False 位置置为 NaN）。
         base_index : int
             基准下标 （从 0 起）。
-        mask_1d : numpy.ndarray
-            一维布尔掩码；与 ``p_eff`` 等长。
 
         Returns
         -------
         numpy.ndarray
-            一维归一化序列。若基准点被 mask 排除、为 NaN 或为 0，则返回全 NaN。
+            与 ``p_eff`` 同形的归一化结果。基准点被 mask 排除、为 NaN 或为 0 的序列全为 NaN。
 
         Raises
         ------
         ValueError
             ``base_index`` 越界时抛出 （英文）。
         """
-        p_eff = np.asarray(p_eff, dtype=float).ravel()
-        mask_1d = np.asarray(mask_1d, dtype=bool).ravel()
-        l_cnt = p_eff.size
+        p_eff = np.asarray(p_eff, dtype=float)
+        l_cnt = p_eff.shape[1]
         if base_index < 0 or base_index >= l_cnt:
             raise ValueError(f'base_index out of range for time axis: {base_index}')
-        if (not mask_1d[base_index]
-                or not np.isfinite(p_eff[base_index])
-                or p_eff[base_index] == 0.0):
-            return np.full(l_cnt, np.nan, dtype=float)
-        base = p_eff[base_index]
+        base = p_eff[:, base_index:base_index + 1, :]
+        base = np.where(np.isfinite(base) & (base != 0.0), base, np.nan)
         return p_eff / base
 
     def _resolve_cum_norm_column_pairs(
@@ -3367,7 +4245,7 @@ class HistoryPanel():
         pairs: List[Tuple[str, int]] = []
         for lab in labels:
             resolved = self._resolve_price_htype(lab)
-            j = self.htypes.index(resolved)
+            j = self._columns[resolved]
             pairs.append((lab, j))
         return pairs
 
@@ -3430,21 +4308,14 @@ class HistoryPanel():
         pairs = self._resolve_cum_norm_column_pairs(htypes)
         out_names = [f'cumret_{lab}' for lab, _ in pairs]
         for name in out_names:
-            if name in self.htypes:
+            if name in self._columns:
                 raise ValueError(
                     f'output htype "{name}" already exists in panel; '
                     'choose different columns or rename existing htypes.'
                 )
-        m, l_cnt, _ = self.shape
-        n_out = len(pairs)
-        out_arr = np.full((m, l_cnt, n_out), np.nan, dtype=float)
-        values_f = self.values.astype(float)
-        for k, (lab, j) in enumerate(pairs):
-            for i in range(m):
-                p = values_f[i, :, j]
-                m_ij = mask_full[i, :, j]
-                p_eff = np.where(m_ij, p, np.nan)
-                out_arr[i, :, k] = self._cum_return_1d_along_time(p_eff, method)
+        cols = [j for _, j in pairs]
+        p_eff = np.where(mask_full[:, :, cols], self._materialize_htypes(cols)[:, :, cols].astype(float), np.nan)
+        out_arr = self._cum_return_along_time(p_eff, method)
         return HistoryPanel(
             values=out_arr,
             levels=list(self.shares),
@@ -3508,23 +4379,14 @@ class HistoryPanel():
         pairs = self._resolve_cum_norm_column_pairs(htypes)
         out_names = [f'norm_{lab}' for lab, _ in pairs]
         for name in out_names:
-            if name in self.htypes:
+            if name in self._columns:
                 raise ValueError(
                     f'output htype "{name}" already exists in panel; '
                     'choose different columns or rename existing htypes.'
                 )
-        m, l_cnt, _ = self.shape
-        n_out = len(pairs)
-        out_arr = np.full((m, l_cnt, n_out), np.nan, dtype=float)
-        values_f = self.values.astype(float)
-        for k, (lab, j) in enumerate(pairs):
-            for i in range(m):
-                p = values_f[i, :, j]
-                m_ij = mask_full[i, :, j]
-                p_eff = np.where(m_ij, p, np.nan)
-                out_arr[i, :, k] = self._normalize_1d_along_time(
-                    p_eff, base_index, m_ij,
-                )
+        cols = [j for _, j in pairs]
+        p_eff = np.where(mask_full[:, :, cols], self._materialize_htypes(cols)[:, :, cols].astype(float), np.nan)
+        out_arr = self._normalize_along_time(p_eff, base_index)
         return HistoryPanel(
             values=out_arr,
             levels=list(self.shares),
@@ -3544,55 +4406,62 @@ class HistoryPanel():
         pairs: List[Tuple[str, int]] = []
         for lab in labels:
             resolved = self._resolve_price_htype(lab)
-            j = self.htypes.index(resolved)
+            j = self._columns[resolved]
             pairs.append((lab, j))
         return pairs
 
     @staticmethod
-    def _portfolio_aggregate_cell(
-            values_f: np.ndarray,
-            mask_full: np.ndarray,
-            share_indices: Sequence[int],
-            t: int,
-            j: int,
+    def _portfolio_aggregate_group(
+            block: np.ndarray,
+            valid: np.ndarray,
             *,
             mode: str,
             weights: Optional[np.ndarray],
             normalize_weights: bool,
-    ) -> float:
-        """单组、单时刻、单列上的组合值 （等权或加权）。"""
-        xs: List[float] = []
-        wi_list: List[float] = []
-        for i in share_indices:
-            if not mask_full[i, t, j]:
-                continue
-            v = values_f[i, t, j]
-            if not np.isfinite(v):
-                continue
-            xs.append(float(v))
-            if mode == 'weighted':
-                if weights is None:
-                    raise ValueError('internal: weighted mode without weights')
-                if weights.ndim == 1:
-                    wi = float(weights[i])
-                elif weights.ndim == 2:
-                    wi = float(weights[i, t])
-                else:
-                    raise ValueError('weights must be 1D or 2D')
-                wi_list.append(wi)
-        if not xs:
-            return float('nan')
+    ) -> np.ndarray:
+        """一次性计算单个组在所有时刻、所有列上的组合值 （等权或加权）。
+
+        Parameters
+        ----------
+        block : numpy.ndarray
+            组内成员的数据块，形状 ``(members, times, columns)``。
+        valid : numpy.ndarray
+            与 ``block`` 同形的布尔数组，表示参与聚合的格点 （mask 为 True 且数值有限）。
+        mode : {'equal', 'weighted'}
+            等权平均或加权平均。
+        weights : numpy.ndarray, optional
+            组内成员的权重，形状 ``(members,)`` 或 ``(members, times)``；仅 ``mode='weighted'`` 时使用。
+        normalize_weights : bool
+            加权时是否先在有效成员上把权重归一化再求和。
+
+        Returns
+        -------
+        numpy.ndarray
+            形状 ``(times, columns)`` 的组合值；没有有效成员或有效权重之和为 0 / 非有限时为 NaN。
+        """
+        x = np.where(valid, block, 0.0)
+        count = valid.sum(axis=0)
         if mode == 'equal':
-            return float(np.mean(xs))
-        w_arr = np.asarray(wi_list, dtype=float)
-        x_arr = np.asarray(xs, dtype=float)
-        sw = float(np.sum(w_arr))
-        if sw == 0.0 or not np.isfinite(sw):
-            return float('nan')
-        if normalize_weights:
-            w_arr = w_arr / sw
-            return float(np.sum(w_arr * x_arr))
-        return float(np.sum(w_arr * x_arr) / sw)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                res = x.sum(axis=0) / count
+            return np.where(count > 0, res, np.nan)
+        if weights is None:
+            raise ValueError('internal: weighted mode without weights')
+        if weights.ndim == 1:
+            w = weights[:, np.newaxis, np.newaxis]
+        elif weights.ndim == 2:
+            w = weights[:, :, np.newaxis]
+        else:
+            raise ValueError('weights must be 1D or 2D')
+        w = np.where(valid, w, 0.0)
+        sw = w.sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if normalize_weights:
+                res = (w / sw[np.newaxis, :, :] * x).sum(axis=0)
+            else:
+                res = (w * x).sum(axis=0) / sw
+        ok = (count > 0) & np.isfinite(sw) & (sw != 0.0)
+        return np.where(ok, res, np.nan)
 
     def portfolio(
             self,
@@ -3667,7 +4536,7 @@ class HistoryPanel():
                 f'benchmark_output must be "none", "tag_along", or "excess_only", '
                 f'got {benchmark_output!r}'
             )
-        if benchmark is not None and benchmark not in self.shares:
+        if benchmark is not None and benchmark not in self._levels:
             raise ValueError(f'benchmark "{benchmark}" not found in shares: {self.shares}')
         if mode not in ('equal', 'weighted'):
             raise ValueError(f'mode must be "equal" or "weighted", got {mode!r}')
@@ -3744,19 +4613,17 @@ class HistoryPanel():
 
         n_grp = len(group_specs)
         port = np.full((n_grp, l_cnt, n_col), np.nan, dtype=float)
+        cols = [j for _, j in htype_pairs]
+        col_vals = values_f[:, :, cols]
+        col_valid = mask_full[:, :, cols] & np.isfinite(col_vals)
         for gi, (_, sidxs) in enumerate(group_specs):
-            for t in range(l_cnt):
-                for jc, (_, j) in enumerate(htype_pairs):
-                    port[gi, t, jc] = self._portfolio_aggregate_cell(
-                        values_f,
-                        mask_full,
-                        sidxs,
-                        t,
-                        j,
-                        mode=mode,
-                        weights=weights_use,
-                        normalize_weights=normalize_weights,
-                    )
+            port[gi] = self._portfolio_aggregate_group(
+                col_vals[sidxs],
+                col_valid[sidxs],
+                mode=mode,
+                weights=None if weights_use is None else weights_use[sidxs],
+                normalize_weights=normalize_weights,
+            )
 
         out_shares: List[str] = [name for name, _ in group_specs]
         out_htypes: List[str]
@@ -3839,7 +4706,7 @@ class HistoryPanel():
                 if len(self.hdates) < 2:
                     raise ValueError('cannot infer periods_per_year from fewer than 2 dates; set periods_per_year explicitly')
                 try:
-                    idx = pd.DatetimeIndex(self.hdates)
+                    idx = self.hdate_index
                     delta = idx[-1] - idx[0]
                     n_bars = max(1, len(idx) - 1)
                     avg_delta = delta / n_bars
@@ -3888,7 +4755,7 @@ class HistoryPanel():
         """
         if self.is_empty:
             raise ValueError('HistoryPanel is empty')
-        if price_htype in self.htypes:
+        if price_htype in self._columns:
             return price_htype
 
         # 仅当用户传入的是无后缀的根价格名时，尝试从复权列中自动映射。
@@ -3897,7 +4764,7 @@ class HistoryPanel():
             # 优先顺序：back-adjusted -> forward-adjusted -> 其它同根后缀 （稳定选择）
             preferred = [f'{root}|b', f'{root}|f']
             for cand in preferred:
-                if cand in self.htypes:
+                if cand in self._columns:
                     return cand
 
             matching = [h for h in self.htypes if h.startswith(f'{root}|')]
@@ -3956,17 +4823,11 @@ class HistoryPanel():
         stock_ret = self.returns(price_htype=price_htype, method=method, periods=1, as_panel=False, dropna=False)
 
         # 基准收益率
-        bench_ret = bench_price.copy()
-        bench_ret.iloc[:] = np.nan
-        for i in range(1, len(bench_price)):
-            p_prev = bench_price.iloc[i - 1]
-            p_curr = bench_price.iloc[i]
-            if np.isnan(p_prev) or np.isnan(p_curr) or p_prev <= 0:
-                bench_ret.iloc[i] = np.nan
-            elif method == 'simple':
-                bench_ret.iloc[i] = p_curr / p_prev - 1.0
-            else:
-                bench_ret.iloc[i] = np.log(p_curr) - np.log(p_prev)
+        bench_ret = pd.Series(
+            self._period_returns_along_time(bench_price.to_numpy(), 1, method),
+            index=bench_price.index,
+            name=bench_price.name,
+        )
 
         # 按共同日期对齐
         common_index = stock_ret.index.intersection(bench_ret.index)
@@ -3990,39 +4851,30 @@ class HistoryPanel():
         else:
             per_year = 1.0
 
-        res = {'alpha': [], 'beta': [], 'r2': [], 'n_obs': []}
-        for share in self.shares:
-            if share not in stock_ret.columns:
-                res['alpha'].append(np.nan)
-                res['beta'].append(np.nan)
-                res['r2'].append(np.nan)
-                res['n_obs'].append(0)
-                continue
-            y = stock_ret[share]
-            x = bench_ret
-            mask = (~y.isna()) & (~x.isna())
-            xv = x[mask].to_numpy()
-            yv = y[mask].to_numpy()
-            n = len(xv)
-            if n < 2:
-                res['alpha'].append(np.nan)
-                res['beta'].append(np.nan)
-                res['r2'].append(np.nan)
-                res['n_obs'].append(n)
-                continue
-
-            # 线性回归 y = alpha + beta * x
-            beta, alpha = np.polyfit(xv, yv, 1)
-            # 拟合优度 R^2
-            y_hat = alpha + beta * xv
-            ss_res = np.sum((yv - y_hat) ** 2)
-            ss_tot = np.sum((yv - np.mean(yv)) ** 2)
-            r2 = 1.0 - ss_res / ss_tot if ss_tot > 0 else np.nan
-
-            res['alpha'].append(alpha * per_year)
-            res['beta'].append(beta)
-            res['r2'].append(r2)
-            res['n_obs'].append(n)
+        # 所有股票同时做带缺失值掩码的一元线性回归 y = alpha + beta * x
+        y = stock_ret.reindex(columns=self.shares).to_numpy(dtype=float).T  # (shares, times)
+        x = np.broadcast_to(bench_ret.to_numpy(dtype=float), y.shape)
+        valid = (~np.isnan(y)) & (~np.isnan(x))
+        n_obs = valid.sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_mean = np.where(valid, x, 0.0).sum(axis=1) / n_obs
+            y_mean = np.where(valid, y, 0.0).sum(axis=1) / n_obs
+            dx = np.where(valid, x - x_mean[:, np.newaxis], 0.0)
+            dy = np.where(valid, y - y_mean[:, np.newaxis], 0.0)
+            sxx = (dx * dx).sum(axis=1)
+            sxy = (dx * dy).sum(axis=1)
+            syy = (dy * dy).sum(axis=1)
+            beta = sxy / sxx
+            alpha = y_mean - beta * x_mean
+            ss_res = np.maximum(syy - beta * sxy, 0.0)
+            r2 = np.where(syy > 0, 1.0 - ss_res / syy, np.nan)
+        fitted = (n_obs >= 2) & (sxx > 0)
+        res = {
+            'alpha': np.where(fitted, alpha * per_year, np.nan),
+            'beta': np.where(fitted, beta, np.nan),
+            'r2': np.where(fitted, r2, np.nan),
+            'n_obs': n_obs,
+        }
 
         result = pd.DataFrame(res, index=self.shares)
         return result
@@ -4033,10 +4885,17 @@ class HistoryPanel():
             htype: str = 'close',
             shares: Optional[Iterable[str]] = None,
             as_panel: bool = True,
+            max_workers: Optional[int] = None,
             **kwargs,
     ):
         """调用 qteasy.tafuncs 中的技术指标函数，并在多股票上广播计算。
 
+        所有选中股票的输入数据被一次取出为 ``(share, 时间)`` 数据块，计算结果直接写入预先分配的输出块：
+
+        - 对支持二维输入的指标 （``sma``、``ema``、``sum`` 及逐元素数学变换等，且 ta-lib 可用时），
+          整个 ``(时间, share)`` 数据块一次完成计算，结果与逐股调用 ta-lib 一致 （至多相差浮点舍入误差）；
+        - 其余指标逐股调用，share 数量较多时分派到线程池并行计算 （ta-lib 计算期间释放 GIL）。
+
         Parameters
         ----------
         func_name : str
@@ -4048,6 +4907,11 @@ class HistoryPanel():
         as_panel : bool, default True
             True 时返回新的 HistoryPanel，在 htypes 末尾追加输出列；
             False 时返回 MultiIndex 列的 DataFrame （时间×[share, output_name]）。
+        max_workers : int, optional
+            逐股计算时线程池的最大线程数；None 时使用 CPU 核数，为 1 时不使用线程池，
+            在当前线程中依次计算。
+        **kwargs :
+            透传给指标函数的其他关键字参数。
         """
         if self.is_empty:
             return HistoryPanel() if as_panel else pd.DataFrame()
@@ -4056,7 +4920,7 @@ class HistoryPanel():
             raise ValueError(f'technical indicator function \"{func_name}\" not found in qteasy.tafuncs')
         func = getattr(tafuncs, func_name)
 
-        if htype not in self.htypes:
+        if htype not in self._columns:
             raise ValueError(f'htype \"{htype}\" not found in HistoryPanel.htypes: {self.htypes}')
 
         if shares is None:
@@ -4067,51 +4931,31 @@ class HistoryPanel():
             else:
                 share_list = list(shares)
 
-        ci = self.htypes.index(htype)
-        idx = pd.to_datetime(self.hdates)
-
-        # 收集各 share 的结果
-        result_arrays = {}
-        out_names = None
+        share_list = list(dict.fromkeys(share_list))
         for share in share_list:
-            if share not in self.shares:
+            if share not in self._levels:
                 raise ValueError(f'share \"{share}\" not found in HistoryPanel.shares')
-            li = self.shares.index(share)
-            series = pd.Series(self.values[li, :, ci].astype(float), index=idx)
-            out = func(series, **kwargs)
-            if isinstance(out, (list, tuple)):
-                cols = [f'{func_name}_{i}' for i in range(len(out))]
-                arrs = [np.asarray(o, dtype=float).ravel() for o in out]
-            else:
-                cols = [func_name]
-                arrs = [np.asarray(out, dtype=float).ravel()]
-            if out_names is None:
-                out_names = cols
-            result_arrays[share] = arrs
+        # 通过标签字典一次得到所有 share 的位置，避免逐个 self.shares.index(share) 的线性查找
+        share_pos = np.array([self._levels[share] for share in share_list], dtype=int)
+
+        ci = self._columns[htype]
+        column = self._materialize_htypes([ci])[:, :, ci]
+        block = np.ascontiguousarray(column[share_pos, :], dtype=float)  # (S, L)
+        out_names, out_block = _apply_ta_to_block(func_name, func, block, max_workers, kwargs)
 
         if as_panel:
-            # 在原 Panel 后追加新 htypes
-            base = self.values.astype(float)
-            n_share, n_time, _ = base.shape
-            new_cols = list(self.htypes) + list(out_names)
-            add_values = np.zeros((n_share, n_time, len(out_names)), dtype=float)
-            add_values[:] = np.nan
-            for share, arrs in result_arrays.items():
-                li = self.shares.index(share)
-                for j, arr in enumerate(arrs):
-                    L = min(n_time, len(arr))
-                    add_values[li, -L:, j] = arr[-L:]
-            new_values = np.concatenate([base, add_values], axis=2)
-            return HistoryPanel(values=new_values, levels=self.shares, rows=self.hdates, columns=new_cols)
+            # 在原 Panel 后追加新 htypes，未参与计算的 share 填充 NaN
+            if len(share_list) == self.level_count and np.array_equal(share_pos, np.arange(self.level_count)):
+                add_values = out_block
+            else:
+                add_values = np.full((self.level_count, self.row_count, len(out_names)), np.nan)
+                add_values[share_pos] = out_block
+            return self._append_columns(list(out_names), [add_values[:, :, j] for j in range(len(out_names))])
 
         # 返回 DataFrame：MultiIndex 列 (share, output_name)
-        data = {}
-        for share, arrs in result_arrays.items():
-            for name, arr in zip(out_names, arrs):
-                data[(share, name)] = arr
-        df = pd.DataFrame(data, index=idx)
-        df.columns = pd.MultiIndex.from_tuples(df.columns, names=['share', 'output'])
-        return df
+        data = out_block.transpose(1, 0, 2).reshape(self.row_count, len(share_list) * len(out_names))
+        columns = pd.MultiIndex.from_product([share_list, out_names], names=['share', 'output'])
+        return pd.DataFrame(data, index=self.hdate_index, columns=columns)
 
     def candle_pattern(
             self,
@@ -4140,21 +4984,22 @@ class HistoryPanel():
 
         o_name, h_name, l_name, c_name = price_htypes
         for nm in (o_name, h_name, l_name, c_name):
-            if nm not in self.htypes:
+            if nm not in self._columns:
                 raise ValueError(f'price htype \"{nm}\" not found in HistoryPanel.htypes: {self.htypes}')
 
-        oi = self.htypes.index(o_name)
-        hi = self.htypes.index(h_name)
-        li = self.htypes.index(l_name)
-        ci = self.htypes.index(c_name)
-        idx = pd.to_datetime(self.hdates)
+        oi = self._columns[o_name]
+        hi = self._columns[h_name]
+        li = self._columns[l_name]
+        ci = self._columns[c_name]
+        values = self._materialize_htypes([oi, hi, li, ci])
+        idx = self.hdate_index
 
         signals = np.zeros((self.level_count, self.row_count), dtype=float)
         for s_idx, share in enumerate(self.shares):
-            o = pd.Series(self.values[s_idx, :, oi].astype(float), index=idx)
-            h = pd.Series(self.values[s_idx, :, hi].astype(float), index=idx)
-            l = pd.Series(self.values[s_idx, :, li].astype(float), index=idx)
-            c = pd.Series(self.values[s_idx, :, ci].astype(float), index=idx)
+            o = pd.Series(values[s_idx, :, oi].astype(float), index=idx)
+            h = pd.Series(values[s_idx, :, hi].astype(float), index=idx)
+            l = pd.Series(values[s_idx, :, li].astype(float), index=idx)
+            c = pd.Series(values[s_idx, :, ci].astype(float), index=idx)
             sig = func(o, h, l, c, **kwargs)
             sig_arr = np.asarray(sig, dtype=float).ravel()
             L = min(self.row_count, len(sig_arr))
@@ -4266,32 +5111,344 @@ class HistoryPanel():
                 df_dict[htype] = self.slice_to_dataframe(htype=htype)
             return df_dict
 
-    def unstack(self, by: str = 'share') -> dict:
-        """ 等同于方法self.to_df_dict(), 是方法self.to_df_dict()的别称
+    def save(self, path: str, compress: bool = False) -> str:
+        """将 HistoryPanel 保存为 qteasy 原生格式，以便之后用 :meth:`load` 快速恢复。
+
+        原生格式为一个目录，包含：
+
+        - ``values.npy`` （或 ``compress=True`` 时的 ``values.npz``）：三维数据数组，按原 dtype 保存；
+        - ``meta.json``：shares / hdates / htypes 三轴标签及格式版本、形状、dtype 等元数据。
+
+        与由 DataFrame 重建面板相比，保存与读取只需顺序读写一块数组，适合在研究流程中对已准备好的
+        面板做检查点，避免重复执行完整的数据源查询。
 
         Parameters
         ----------
-        by: str, {'share', 'htype'}, default 'share'
-            指定按照share或者htype来unstack, 默认为share
+        path : str or os.PathLike
+            保存目录，不存在时自动创建；目录中已有的同名文件会被覆盖。
+        compress : bool, default False
+            为 True 时以 zip 压缩格式保存数据数组，文件更小，但读取时不能使用内存映射。
 
         Returns
         -------
-        dict
-            unstack后的结果，是一个字典，key为share或htype，value为对应的DataFrame
+        str
+            保存目录的路径。
+
+        Raises
+        ------
+        ValueError
+            面板为空时抛出。
+        TypeError
+            shares 或 htypes 标签无法写入 JSON 元数据 （既不是字符串也不是数值）时抛出。
 
         Examples
         --------
-        >>> hp = HistoryPanel(np.random.randn(2, 3, 4),
-        ...                   rows=['2020-01-01', '2020-01-02', '2020-01-03'],
-        ...                   levels=['000001', '000002', '000003'],
-        ...                   columns=['close', 'open', 'high', 'low'])
-        >>> hp
-        share 0, label: 000001
-                    close,  open,   high,   low
-        2020-01-01  0.1,    0.2,    0.3,    0.4
-        2020-01-02  0.5,    0.6,    0.7,    0.8
-        2020-01-03  0.9,    1.0,    1.1,    1.2
-        share 1, label: 000002
+        >>> hp = HistoryPanel(np.arange(12, dtype=float).reshape(2, 3, 2),
+        ...                   levels=['000001', '000002'],
+        ...                   rows=pd.date_range('2020-01-01', periods=3),
+        ...                   columns=['open', 'close'])
+        >>> hp.save('checkpoints/hp_daily')
+        'checkpoints/hp_daily'
+        >>> hp2 = HistoryPanel.load('checkpoints/hp_daily')
+        >>> np.allclose(hp2.values, hp.values)
+        True
+        """
+        import os
+        import json
+
+        if self.is_empty:
+            raise ValueError('Cannot save an empty HistoryPanel.')
+
+        path = os.fspath(path)
+        os.makedirs(path, exist_ok=True)
+        values = np.ascontiguousarray(self.values)
+        meta = _hp_native_meta(self.shares, self.hdates, self.htypes, values, compressed=compress)
+
+        npy_file = os.path.join(path, 'values.npy')
+        npz_file = os.path.join(path, 'values.npz')
+        if compress:
+            np.savez_compressed(npz_file, values=values)
+            stale_file = npy_file
+        else:
+            np.save(npy_file, values, allow_pickle=False)
+            stale_file = npz_file
+        # 删除以另一种方式保存的旧数据文件，避免读取时产生歧义
+        if os.path.exists(stale_file):
+            os.remove(stale_file)
+        _write_hp_native_meta(path, meta)
+        return path
+
+    @staticmethod
+    def load(path: str, mmap: bool = True) -> 'HistoryPanel':
+        """读取由 :meth:`save` 保存的 HistoryPanel。
+
+        Parameters
+        ----------
+        path : str or os.PathLike
+            :meth:`save` 使用的保存目录。
+        mmap : bool, default True
+            为 True 且数据未压缩时，以内存映射方式打开数据数组：读取几乎不耗时，数据在被访问时
+            才从磁盘载入。映射采用写时复制模式 （``mmap_mode='c'``），修改面板数据不会写回文件。
+            压缩保存的数据总是完整读入内存。
+
+        Returns
+        -------
+        HistoryPanel
+            与保存时 shares / hdates / htypes 及数据完全一致的面板。
+
+        Raises
+        ------
+        FileNotFoundError
+            目录中没有元数据文件或数据文件时抛出。
+        ValueError
+            元数据不是 qteasy HistoryPanel 格式、版本不受支持或与数据形状不一致时抛出。
+
+        Examples
+        --------
+        >>> hp = HistoryPanel.load('checkpoints/hp_daily', mmap=True)
+        >>> hp.htypes
+        ['open', 'close']
+        """
+        import os
+
+        path = os.fspath(path)
+        meta = _read_hp_native_meta(path)
+        if meta.get('compressed'):
+            with np.load(os.path.join(path, 'values.npz'), allow_pickle=False) as npz:
+                values = npz['values']
+        else:
+            values = np.load(os.path.join(path, 'values.npy'),
+                             mmap_mode='c' if mmap else None,
+                             allow_pickle=False)
+        shares, hdates, htypes = _hp_native_labels(meta, values)
+        return HistoryPanel._from_axis_labels(values, shares, hdates, htypes)
+
+    def to_arrow(self, layout: str = 'long', as_batch: bool = False):
+        """将 HistoryPanel 导出为 Arrow 列式表 （``pyarrow.Table`` 或 ``pyarrow.RecordBatch``），不经过 pandas。
+
+        三维数据数组只做一次按列连续的转置拷贝，随后每一列直接引用这块内存构建 Arrow 数组，
+        不创建任何 DataFrame 或 MultiIndex。导出的表可以直接交给其他支持 Arrow 的分析工具，
+        或以 Parquet / Feather 等格式写入磁盘，并可由 :meth:`from_arrow` 还原为 HistoryPanel。
+
+        支持两种布局：
+
+        - ``'long'``：每行对应一个 (share, hdate)，列为 ``share`` （字典编码）、``hdate`` 及全部 htypes，
+          行顺序与 ``flatten_to_dataframe(along='row')`` 一致；
+        - ``'wide'``：每行对应一个 hdate，列为 ``hdate`` 以及每个 (share, htype) 组合，
+          列名为 ``'<share>.<htype>'``，列顺序与 ``flatten_to_dataframe(along='col')`` 一致。
+
+        三轴标签 （保留原始类型）与布局记录在表的 schema 元数据中，供 :meth:`from_arrow` 使用。
+
+        Parameters
+        ----------
+        layout : {'long', 'wide'}, default 'long'
+            导出表的布局。
+        as_batch : bool, default False
+            为 True 时返回 ``pyarrow.RecordBatch``，否则返回 ``pyarrow.Table``。
+
+        Returns
+        -------
+        pyarrow.Table or pyarrow.RecordBatch
+
+        Raises
+        ------
+        ImportError
+            未安装可选依赖 pyarrow 时抛出。
+        ValueError
+            面板为空或 ``layout`` 不合法时抛出。
+        TypeError
+            shares 或 htypes 标签既不是字符串也不是数值时抛出。
+
+        Examples
+        --------
+        >>> hp = HistoryPanel(np.arange(12, dtype=float).reshape(2, 3, 2),
+        ...                   levels=['000001', '000002'],
+        ...                   rows=pd.date_range('2020-01-01', periods=3),
+        ...                   columns=['open', 'close'])
+        >>> table = hp.to_arrow(layout='long')
+        >>> table.column_names
+        ['share', 'hdate', 'open', 'close']
+        >>> table.num_rows
+        6
+        >>> hp.to_arrow(layout='wide').column_names
+        ['hdate', '000001.open', '000001.close', '000002.open', '000002.close']
+        """
+        import json
+
+        pa = _import_pyarrow()
+        if layout not in ('long', 'wide'):
+            raise ValueError(f'layout must be "long" or "wide", got {layout!r}')
+        if self.is_empty:
+            raise ValueError('Cannot export an empty HistoryPanel to arrow.')
+
+        shares, htypes = self.shares, self.htypes
+        m, l_cnt, n = self.shape
+        index = self.hdate_index
+        tz = None if index.tz is None else str(index.tz)
+        hdate_keys = _hdate_keys(index)
+        values = self._materialize_htypes(slice(None))
+        meta = {
+            'format': HP_NATIVE_FORMAT_NAME,
+            'version': HP_NATIVE_FORMAT_VERSION,
+            'layout': layout,
+            'shares': [_hp_json_label(share) for share in shares],
+            'htypes': [_hp_json_label(htype) for htype in htypes],
+        }
+        schema_meta = {HP_ARROW_METADATA_KEY: json.dumps(meta, ensure_ascii=False).encode('utf-8')}
+
+        if layout == 'long':
+            # (htypes, shares, hdates) 连续排列后，每个 htype 列就是一段连续内存
+            columnar = np.ascontiguousarray(values.transpose(2, 0, 1)).reshape(n, m * l_cnt)
+            share_col = pa.DictionaryArray.from_arrays(
+                pa.array(np.repeat(np.arange(m, dtype=np.int32), l_cnt)),
+                pa.array([str(share) for share in shares]),
+            )
+            hdate_col = pa.array(np.tile(hdate_keys, m), type=pa.timestamp('ns', tz=tz))
+            arrays = [share_col, hdate_col] + [pa.array(columnar[j]) for j in range(n)]
+            names = ['share', 'hdate'] + [str(htype) for htype in htypes]
+        else:
+            # (shares, htypes, hdates) 连续排列后，每个 (share, htype) 列是一段连续内存
+            columnar = np.ascontiguousarray(values.transpose(0, 2, 1)).reshape(m * n, l_cnt)
+            hdate_col = pa.array(hdate_keys, type=pa.timestamp('ns', tz=tz))
+            arrays = [hdate_col] + [pa.array(columnar[k]) for k in range(m * n)]
+            names = ['hdate'] + [f'{share}.{htype}' for share in shares for htype in htypes]
+
+        if as_batch:
+            return pa.RecordBatch.from_arrays(arrays, names=names).replace_schema_metadata(schema_meta)
+        return pa.Table.from_arrays(arrays, names=names, metadata=schema_meta)
+
+    @staticmethod
+    def from_arrow(table) -> 'HistoryPanel':
+        """由 Arrow 列式表 （``pyarrow.Table`` 或 ``pyarrow.RecordBatch``）创建 HistoryPanel，不经过 pandas。
+
+        :meth:`to_arrow` 导出的表 （两种布局）可以完整还原为原面板，包括标签类型、顺序与时区。
+        其他来源的长表也可以导入：表中须含 ``share`` 与 ``hdate`` 两列，其余数值列均作为 htypes；
+        此时 shares 按首次出现的顺序排列，hdates 按时间排序，缺失的 (share, hdate) 组合填充为 NaN。
+
+        Parameters
+        ----------
+        table : pyarrow.Table or pyarrow.RecordBatch
+            需要导入的 Arrow 表。
+
+        Returns
+        -------
+        HistoryPanel
+            数据类型为 float32 （所有数据列均为 float32 时）或 float64 的新面板。
+
+        Raises
+        ------
+        ImportError
+            未安装可选依赖 pyarrow 时抛出。
+        TypeError
+            ``table`` 不是 Arrow 表时抛出。
+        ValueError
+            表中缺少 ``share`` / ``hdate`` 列、宽表不是由 :meth:`to_arrow` 导出、
+            或长表中同一 (share, hdate) 出现多次时抛出。
+
+        Examples
+        --------
+        >>> table = hp.to_arrow(layout='wide')
+        >>> hp2 = HistoryPanel.from_arrow(table)
+        >>> np.allclose(hp2.values, hp.values)
+        True
+        """
+        import json
+
+        pa = _import_pyarrow()
+        if isinstance(table, pa.RecordBatch):
+            table = pa.Table.from_batches([table])
+        if not isinstance(table, pa.Table):
+            raise TypeError(f'table should be a pyarrow Table or RecordBatch, got {type(table)}')
+        schema_meta = table.schema.metadata or {}
+        meta = None
+        if HP_ARROW_METADATA_KEY in schema_meta:
+            meta = json.loads(schema_meta[HP_ARROW_METADATA_KEY].decode('utf-8'))
+            if meta.get('format') != HP_NATIVE_FORMAT_NAME:
+                meta = None
+        layout = 'long' if meta is None else meta['layout']
+        if 'hdate' not in table.column_names:
+            raise ValueError('arrow table should contain a "hdate" column')
+        if table.num_rows == 0:
+            return HistoryPanel()
+
+        hdate_type = table.schema.field('hdate').type
+        tz = getattr(hdate_type, 'tz', None)
+        hdate_col = table.column('hdate').to_numpy()
+        hdate_keys = np.asarray(hdate_col, dtype='datetime64[ns]').view(np.int64)
+
+        if layout == 'wide':
+            shares, htypes = meta['shares'], meta['htypes']
+            data_names = [name for name in table.column_names if name != 'hdate']
+            m, n = len(shares), len(htypes)
+            if len(data_names) != m * n:
+                raise ValueError(f'wide arrow table has {len(data_names)} data columns, '
+                                 f'expected {m} shares x {n} htypes')
+            columns = [table.column(name).to_numpy(zero_copy_only=False) for name in data_names]
+            dtype = _arrow_float_dtype(columns)
+            order = np.argsort(hdate_keys, kind='stable')
+            stacked = np.stack([np.asarray(col, dtype=dtype) for col in columns]).reshape(m, n, -1)
+            values = np.ascontiguousarray(stacked[:, :, order].transpose(0, 2, 1))
+            hdates = list(_hdate_index_from_keys(hdate_keys[order], tz))
+            return HistoryPanel._from_axis_labels(values, list(shares), hdates, list(htypes))
+
+        if 'share' not in table.column_names:
+            raise ValueError('long arrow table should contain a "share" column')
+        data_names = [name for name in table.column_names if name not in ('share', 'hdate')]
+        share_col = table.column('share').combine_chunks()
+        if pa.types.is_dictionary(share_col.type):
+            codes = share_col.indices.to_numpy(zero_copy_only=False).astype(np.intp)
+            uniques = share_col.dictionary.to_pylist()
+        else:
+            codes, uniques = pd.factorize(share_col.to_numpy(zero_copy_only=False))
+            uniques = list(uniques)
+        if meta is not None:
+            shares, htypes = list(meta['shares']), list(meta['htypes'])
+            share_pos = {str(share): pos for pos, share in enumerate(shares)}
+            share_idx = np.array([share_pos[str(u)] for u in uniques], dtype=np.intp)[codes]
+        else:
+            shares, htypes = uniques, data_names
+            share_idx = codes
+        unique_keys, date_idx = np.unique(hdate_keys, return_inverse=True)
+        m, l_cnt, n = len(shares), len(unique_keys), len(htypes)
+        flat = share_idx * l_cnt + date_idx.ravel()
+        if np.unique(flat).size != flat.size:
+            raise ValueError('arrow table contains duplicated (share, hdate) rows')
+
+        columns = [table.column(name).to_numpy(zero_copy_only=False) for name in data_names]
+        dtype = _arrow_float_dtype(columns)
+        values = np.full((m * l_cnt, n), np.nan, dtype=dtype)
+        for j, col in enumerate(columns):
+            values[flat, j] = col
+        values = values.reshape(m, l_cnt, n)
+        hdates = list(_hdate_index_from_keys(unique_keys, tz))
+        return HistoryPanel._from_axis_labels(values, shares, hdates, htypes)
+
+    def unstack(self, by: str = 'share') -> dict:
+        """ 等同于方法self.to_df_dict(), 是方法self.to_df_dict()的别称
+
+        Parameters
+        ----------
+        by: str, {'share', 'htype'}, default 'share'
+            指定按照share或者htype来unstack, 默认为share
+
+        Returns
+        -------
+        dict
+            unstack后的结果，是一个字典，key为share或htype，value为对应的DataFrame
+
+        Examples
+        --------
+        >>> hp = HistoryPanel(np.random.randn(2, 3, 4),
+        ...                   rows=['2020-01-01', '2020-01-02', '2020-01-03'],
+        ...                   levels=['000001', '000002', '000003'],
+        ...                   columns=['close', 'open', 'high', 'low'])
+        >>> hp
+        share 0, label: 000001
+                    close,  open,   high,   low
+        2020-01-01  0.1,    0.2,    0.3,    0.4
+        2020-01-02  0.5,    0.6,    0.7,    0.8
+        2020-01-03  0.9,    1.0,    1.1,    1.2
+        share 1, label: 000002
                     close,  open,   high,   low
         2020-01-01  1.1,    1.2,    1.3,    1.4
         2020-01-02  1.5,    1.6,    1.7,    1.8
@@ -4779,7 +5936,7 @@ class HistoryPanel():
         def _infer_freq_info_from_hdates() -> str:
             """从 hdates 推断频率说明 （中文），用于图表标题。"""
             try:
-                idx = pd.DatetimeIndex(self.hdates)
+                idx = self.hdate_index
                 if len(idx) >= 3:
                     f = pd.infer_freq(idx)
                 else:
@@ -5055,8 +6212,8 @@ class _HistoryPanelKlineAccessor:
             当 ``HistoryPanel`` 为空或 ``price_htype`` 不存在于 ``htypes`` 中时抛出。
         """
         resolved_htype = self._hp._resolve_price_htype(price_htype)
-        ci = self._hp.htypes.index(resolved_htype)
-        return self._hp.values[:, :, ci].astype(float)
+        ci = self._hp._columns[resolved_htype]
+        return self._hp._materialize_htypes([ci])[:, :, ci].astype(float)
 
     def _append_htypes(self, new_columns: list, new_arrays: list) -> HistoryPanel:
         """将派生出的指标列追加到原 ``HistoryPanel`` 的 htypes 轴上并返回新面板。
@@ -5081,11 +6238,7 @@ class _HistoryPanelKlineAccessor:
         hp = self._hp
         if hp.is_empty:
             return HistoryPanel()
-        base = hp.values.astype(float)
-        to_add = np.stack(new_arrays, axis=2)  # (L, R, C_new)
-        new_values = np.concatenate([base, to_add], axis=2)
-        new_htypes = list(hp.htypes) + list(new_columns)
-        return HistoryPanel(values=new_values, levels=hp.shares, rows=hp.hdates, columns=new_htypes)
+        return hp._append_columns(list(new_columns), list(new_arrays))
 
     def _inplace_append_htypes(self, new_columns: list, new_arrays: list) -> HistoryPanel:
         """将派生列原地追加到绑定的 ``HistoryPanel`` 并返回该面板。
@@ -5118,12 +6271,47 @@ class _HistoryPanelKlineAccessor:
         if hp.is_empty:
             raise ValueError('Cannot apply kline indicator on an empty HistoryPanel')
         for name in new_columns:
-            if name in hp.htypes:
+            if name in hp._columns:
                 raise ValueError(f'htype "{name}" already exists')
         for name, arr in zip(new_columns, new_arrays):
             hp[name] = arr
         return hp
 
+    def _register_incremental(self,
+                              hp_out: HistoryPanel,
+                              new_columns: list,
+                              method: str,
+                              params: dict,
+                              lookback: int,
+                              min_bars: int) -> HistoryPanel:
+        """记录派生列的计算方式，使 :meth:`HistoryPanel.append_rows` 可以只对新 bar 增量计算这些列。
+
+        Parameters
+        ----------
+        hp_out : HistoryPanel
+            追加了派生列的面板 （``inplace=True`` 时即原面板）。
+        new_columns : list of str
+            派生列名。
+        method : str
+            本访问器中计算这些列的方法名。
+        params : dict
+            调用 ``method`` 的参数，须能重新生成同名的派生列。
+        lookback : int
+            计算一个新 bar 上的指标值所需回看的 bar 数。
+        min_bars : int
+            产生第一个有效指标值所需的最少 bar 数，``append_rows`` 的窗口容量小于此值时发出警告。
+
+        Returns
+        -------
+        HistoryPanel
+            ``hp_out`` 本身。
+        """
+        specs = dict(self._hp._kline_specs or {})
+        specs.update(hp_out._kline_specs or {})
+        specs[tuple(new_columns)] = (method, params, int(lookback), int(min_bars))
+        hp_out._kline_specs = specs
+        return hp_out
+
     def sma(
             self,
             window: int = 20,
@@ -5177,7 +6365,7 @@ class _HistoryPanelKlineAccessor:
             new_htype = default_name
         if self._hp.is_empty:
             raise ValueError('Cannot apply SMA on an empty HistoryPanel')
-        if new_htype in self._hp.htypes:
+        if new_htype in self._hp._columns:
             raise ValueError(f'new_htype "{new_htype}" already exists in htypes')
         prices = self._get_price(price_htype)
         n_share, n_time = prices.shape
@@ -5185,8 +6373,12 @@ class _HistoryPanelKlineAccessor:
         for i in range(n_share):
             out[i, :] = tafuncs.sma(prices[i, :], timeperiod=window)
         if inplace:
-            return self._inplace_append_htypes([new_htype], [out])
-        return self._append_htypes([new_htype], [out])
+            hp_out = self._inplace_append_htypes([new_htype], [out])
+        else:
+            hp_out = self._append_htypes([new_htype], [out])
+        return self._register_incremental(hp_out, [new_htype], 'sma',
+                                          dict(window=window, price_htype=price_htype, new_htype=new_htype),
+                                          lookback=window, min_bars=window)
 
     def ema(
             self,
@@ -5226,7 +6418,7 @@ class _HistoryPanelKlineAccessor:
             new_htype = default_name
         if self._hp.is_empty:
             raise ValueError('Cannot apply EMA on an empty HistoryPanel')
-        if new_htype in self._hp.htypes:
+        if new_htype in self._hp._columns:
             raise ValueError(f'new_htype "{new_htype}" already exists in htypes')
         prices = self._get_price(price_htype)
         n_share, n_time = prices.shape
@@ -5236,8 +6428,12 @@ class _HistoryPanelKlineAccessor:
             arr = np.atleast_1d(np.asarray(res, dtype=float)).ravel()
             out[i, :min(n_time, len(arr))] = arr[:n_time]
         if inplace:
-            return self._inplace_append_htypes([new_htype], [out])
-        return self._append_htypes([new_htype], [out])
+            hp_out = self._inplace_append_htypes([new_htype], [out])
+        else:
+            hp_out = self._append_htypes([new_htype], [out])
+        return self._register_incremental(hp_out, [new_htype], 'ema',
+                                          dict(span=span, price_htype=price_htype, new_htype=new_htype),
+                                          lookback=span * HP_KLINE_EMA_LOOKBACK_FACTOR, min_bars=span)
 
     def bbands(
             self,
@@ -5287,7 +6483,7 @@ class _HistoryPanelKlineAccessor:
         middle_name = f'bbands_middle_{tag}'
         lower_name = f'bbands_lower_{tag}'
         for n in (upper_name, middle_name, lower_name):
-            if n in self._hp.htypes:
+            if n in self._hp._columns:
                 raise ValueError(f'htype "{n}" already exists')
         prices = self._get_price(price_htype)
         n_share, n_time = prices.shape
@@ -5308,8 +6504,16 @@ class _HistoryPanelKlineAccessor:
             m[i, -L:] = mm[-L:]
             l[i, -L:] = ll[-L:]
         if inplace:
-            return self._inplace_append_htypes([upper_name, middle_name, lower_name], [u, m, l])
-        return self._append_htypes([upper_name, middle_name, lower_name], [u, m, l])
+            hp_out = self._inplace_append_htypes([upper_name, middle_name, lower_name], [u, m, l])
+        else:
+            hp_out = self._append_htypes([upper_name, middle_name, lower_name], [u, m, l])
+        return self._register_incremental(
+                hp_out, [upper_name, middle_name, lower_name], 'bbands',
+                dict(window=window, price_htype=price_htype, nbdev_up=nbdev_up, nbdev_dn=nbdev_dn,
+                     ma_type=ma_type, suffix=tag),
+                lookback=window if ma_type == 'sma' else window * HP_KLINE_EMA_LOOKBACK_FACTOR,
+                min_bars=window,
+        )
 
     def macd(
             self,
@@ -5354,7 +6558,7 @@ class _HistoryPanelKlineAccessor:
         tag = suffix if suffix is not None else f'{fastperiod}_{slowperiod}_{signalperiod}'
         n1, n2, n3 = f'macd_{tag}', f'macd_signal_{tag}', f'macd_hist_{tag}'
         for n in (n1, n2, n3):
-            if n in self._hp.htypes:
+            if n in self._hp._columns:
                 raise ValueError(f'htype "{n}" already exists')
         prices = self._get_price(price_htype)
         n_share, n_time = prices.shape
@@ -5369,8 +6573,16 @@ class _HistoryPanelKlineAccessor:
             sig_arr[i, -L:] = sig[-L:]
             hist_arr[i, -L:] = hist[-L:]
         if inplace:
-            return self._inplace_append_htypes([n1, n2, n3], [macd_arr, sig_arr, hist_arr])
-        return self._append_htypes([n1, n2, n3], [macd_arr, sig_arr, hist_arr])
+            hp_out = self._inplace_append_htypes([n1, n2, n3], [macd_arr, sig_arr, hist_arr])
+        else:
+            hp_out = self._append_htypes([n1, n2, n3], [macd_arr, sig_arr, hist_arr])
+        return self._register_incremental(
+                hp_out, [n1, n2, n3], 'macd',
+                dict(price_htype=price_htype, fastperiod=fastperiod, slowperiod=slowperiod,
+                     signalperiod=signalperiod, suffix=tag),
+                lookback=(slowperiod + signalperiod) * HP_KLINE_EMA_LOOKBACK_FACTOR,
+                min_bars=slowperiod + signalperiod - 1,
+        )
 
     def kdj(
             self,
@@ -5420,7 +6632,7 @@ class _HistoryPanelKlineAccessor:
         d_name = f'kdj_d_{tag}'
         j_name = f'kdj_j_{tag}'
         for n in (k_name, d_name, j_name):
-            if n in self._hp.htypes:
+            if n in self._hp._columns:
                 raise ValueError(f'htype "{n}" already exists')
         high = self._get_price('high')
         low = self._get_price('low')
@@ -5439,8 +6651,16 @@ class _HistoryPanelKlineAccessor:
             d_arr[i, :] = dd
             j_arr[i, :] = jj
         if inplace:
-            return self._inplace_append_htypes([k_name, d_name, j_name], [k_arr, d_arr, j_arr])
-        return self._append_htypes([k_name, d_name, j_name], [k_arr, d_arr, j_arr])
+            hp_out = self._inplace_append_htypes([k_name, d_name, j_name], [k_arr, d_arr, j_arr])
+        else:
+            hp_out = self._append_htypes([k_name, d_name, j_name], [k_arr, d_arr, j_arr])
+        return self._register_incremental(
+                hp_out, [k_name, d_name, j_name], 'kdj',
+                dict(price_htype=price_htype, fastk_period=fastk_period, slowk_period=slowk_period,
+                     slowd_period=slowd_period, suffix=tag),
+                lookback=fastk_period + slowk_period + slowd_period,
+                min_bars=fastk_period + slowk_period + slowd_period - 2,
+        )
 
 
     def apply_ta(
@@ -5449,6 +6669,7 @@ class _HistoryPanelKlineAccessor:
             htype: str = 'close',
             shares: Optional[Iterable[str]] = None,
             as_panel: bool = True,
+            max_workers: Optional[int] = None,
             **kwargs,
     ):
         """在当前面板上应用 ``tafuncs`` 中的技术指标函数 （委托给 ``HistoryPanel.apply_ta``）。
@@ -5467,6 +6688,8 @@ class _HistoryPanelKlineAccessor:
             限定计算的标的集合；为 None 时对所有 shares 计算。
         as_panel : bool, default True
             返回值类型控制；含义与 :meth:`HistoryPanel.apply_ta` 一致。
+        max_workers : int, optional
+            逐股计算时线程池的最大线程数；含义与 :meth:`HistoryPanel.apply_ta` 一致。
         **kwargs :
             透传给指标函数的其他关键字参数。
 
@@ -5475,7 +6698,272 @@ class _HistoryPanelKlineAccessor:
         Any
             返回值与 :meth:`HistoryPanel.apply_ta` 保持一致。
         """
-        return self._hp.apply_ta(func_name=func_name, htype=htype, shares=shares, as_panel=as_panel, **kwargs)
+        return self._hp.apply_ta(func_name=func_name, htype=htype, shares=shares, as_panel=as_panel,
+                                 max_workers=max_workers, **kwargs)
+
+
+def _ta_batch_sma(block: np.ndarray, timeperiod: int = 30) -> Optional[np.ndarray]:
+    """在 ``(时间, share)`` 二维数据块上逐列计算 SMA，返回同形状的结果。
+
+    每列跳过开头的 NaN，之后的前 timeperiod - 1 行为 NaN，中间出现的 NaN 向后传播，与逐股调用 ta-lib 相同。
+    timeperiod 为 1 时与 tafuncs.sma 一样报错，不是大于 1 的整数时返回 None，由调用方退回逐股计算。
+    """
+    if timeperiod == 1:
+        raise ValueError('For SMA, timeperiod must be greater than 1')
+    if not isinstance(timeperiod, (int, np.integer)) or timeperiod < 2:
+        return None
+    return sma_2d(block, timeperiod)
+
+
+def _ta_batch_sum(block: np.ndarray, timeperiod: int = 30) -> Optional[np.ndarray]:
+    """在 ``(时间, share)`` 二维数据块上逐列计算 SUM，返回同形状的结果。
+
+    NaN 与前置数据的处理同 _ta_batch_sma；timeperiod 不是大于 1 的整数时返回 None，由调用方退回逐股计算。
+    """
+    if not isinstance(timeperiod, (int, np.integer)) or timeperiod < 2:
+        return None
+    return sum_2d(block, timeperiod)
+
+
+def _ta_batch_ema(block: np.ndarray, span: int = 30) -> Optional[np.ndarray]:
+    """在 ``(时间, share)`` 二维数据块上逐列计算 EMA，返回同形状的结果。
+
+    每列以跳过开头 NaN 后第一个完整窗口的简单平均为初值，此前的 span - 1 行为 NaN，中间出现的 NaN 向后传播；
+    span 不是大于 1 的整数时返回 None，由调用方退回逐股计算。
+    """
+    if not isinstance(span, (int, np.integer)) or span < 2:
+        return None
+    return ema_2d(block, span)
+
+
+def _ta_batch_ufunc(ufunc: np.ufunc) -> Callable[[np.ndarray], np.ndarray]:
+    """将逐元素的 numpy ufunc 包装为数学变换类指标的批量实现。
+
+    返回的函数接受任意形状的数据块 （通常为 ``(时间, share)``），返回同形状的结果；没有前置数据，
+    NaN 及定义域之外的输入原样得到 NaN/inf，与 ta-lib 相同，且不发出 numpy 的 RuntimeWarning。
+    """
+    def _batch(block: np.ndarray) -> np.ndarray:
+        with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+            return ufunc(block)
+    return _batch
+
+
+# 支持二维 (时间, share) 输入的技术指标：函数名 -> 批量实现。批量实现返回 None 时表示参数不适用，
+# 退回逐股调用 tafuncs 中的原函数 （由原函数给出相同的报错）
+_TA_BATCH_FUNCS: Dict[str, Callable[..., Optional[np.ndarray]]] = {
+    'sma': _ta_batch_sma,
+    'sum': _ta_batch_sum,
+    'ema': _ta_batch_ema,
+    'acos': _ta_batch_ufunc(np.arccos),
+    'asin': _ta_batch_ufunc(np.arcsin),
+    'atan': _ta_batch_ufunc(np.arctan),
+    'ceil': _ta_batch_ufunc(np.ceil),
+    'cos': _ta_batch_ufunc(np.cos),
+    'cosh': _ta_batch_ufunc(np.cosh),
+    'exp': _ta_batch_ufunc(np.exp),
+    'floor': _ta_batch_ufunc(np.floor),
+    'ln': _ta_batch_ufunc(np.log),
+    'log10': _ta_batch_ufunc(np.log10),
+    'sin': _ta_batch_ufunc(np.sin),
+    'sinh': _ta_batch_ufunc(np.sinh),
+    'sqrt': _ta_batch_ufunc(np.sqrt),
+    'tan': _ta_batch_ufunc(np.tan),
+    'tanh': _ta_batch_ufunc(np.tanh),
+}
+
+
+def _write_ta_output(out_block: np.ndarray, row: int, outputs: Sequence[np.ndarray]) -> None:
+    """将一只股票的指标输出按时间末端对齐写入预分配输出块的第 ``row`` 行。"""
+    n_time = out_block.shape[1]
+    for j, arr in enumerate(outputs):
+        arr = np.asarray(arr, dtype=float).ravel()
+        L = min(n_time, len(arr))
+        if L > 0:
+            out_block[row, -L:, j] = arr[-L:]
+
+
+def _apply_ta_to_block(func_name: str,
+                       func: Callable,
+                       block: np.ndarray,
+                       max_workers: Optional[int],
+                       kwargs: Dict[str, Any]) -> Tuple[List[str], np.ndarray]:
+    """在 ``(share, 时间)`` 数据块上计算技术指标，返回输出列名和形状为 ``(share, 时间, 输出数)`` 的结果块。
+
+    支持二维输入的指标整块计算；其余指标逐股计算，share 较多时分派到线程池，
+    各线程直接写入预分配结果块中互不重叠的行。
+    """
+    import qteasy.tafuncs as tafuncs
+    n_share, n_time = block.shape
+
+    batch_func = _TA_BATCH_FUNCS.get(func_name) if tafuncs.TA_LIB_AVAILABLE else None
+    if batch_func is not None:
+        res = batch_func(block.T, **kwargs)
+        if res is not None:
+            return [func_name], np.ascontiguousarray(res.T)[:, :, np.newaxis]
+
+    # 首只股票的结果用于确定输出数量，然后一次分配整个结果块
+    first = func(block[0], **kwargs)
+    outputs = list(first) if isinstance(first, (list, tuple)) else [first]
+    if isinstance(first, (list, tuple)):
+        out_names = [f'{func_name}_{i}' for i in range(len(outputs))]
+    else:
+        out_names = [func_name]
+    out_block = np.full((n_share, n_time, len(out_names)), np.nan)
+    _write_ta_output(out_block, 0, outputs)
+
+    def _run(row: int) -> None:
+        out = func(block[row], **kwargs)
+        _write_ta_output(out_block, row, out if isinstance(out, (list, tuple)) else [out])
+
+    import os
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    rows = range(1, n_share)
+    if max_workers > 1 and n_share >= HP_TA_PARALLEL_MIN_SHARES:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # 通过 list() 取回结果，使工作线程中的异常在此处抛出
+            list(executor.map(_run, rows))
+    else:
+        for row in rows:
+            _run(row)
+    return out_names, out_block
+
+
+# 滚动窗口计算内核：直接作用于二维数组 （每行为一条时间序列），单次遍历完成滚动统计，
+# 避免为每个 share/htype 创建 pandas Series。居中窗口通过将输出位置向前平移
+# offset=(window-1)//2 实现，窗口越过序列末尾的部分视为 NaN，与 pandas 截断窗口的行为一致。
+@njit(nogil=True, cache=True)
+def _rolling_sum_kernel(data: np.ndarray,
+                        window: int,
+                        min_periods: int,
+                        offset: int,
+                        mean: bool) -> np.ndarray:
+    """滚动求和/均值内核，使用带 Kahan 补偿的累计和，在窗口移入/移出时增量更新。"""
+    n_series, n_time = data.shape
+    res = np.full((n_series, n_time), np.nan)
+    for i in range(n_series):
+        nobs = 0
+        sum_x = 0.
+        comp = 0.
+        for t in range(n_time + offset):
+            if t < n_time:
+                val = data[i, t]
+                if val == val:
+                    nobs += 1
+                    y = val - comp
+                    tmp = sum_x + y
+                    comp = (tmp - sum_x) - y
+                    sum_x = tmp
+            out = t - window
+            if 0 <= out < n_time:
+                val = data[i, out]
+                if val == val:
+                    nobs -= 1
+                    y = -val - comp
+                    tmp = sum_x + y
+                    comp = (tmp - sum_x) - y
+                    sum_x = tmp
+            if nobs == 0:
+                sum_x = 0.
+                comp = 0.
+            pos = t - offset
+            if pos < 0:
+                continue
+            if nobs >= min_periods:
+                res[i, pos] = sum_x / nobs if mean else sum_x
+    return res
+
+
+@njit(nogil=True, cache=True)
+def _rolling_std_kernel(data: np.ndarray,
+                        window: int,
+                        min_periods: int,
+                        offset: int) -> np.ndarray:
+    """滚动样本标准差 （ddof=1）内核，使用 Welford 算法在窗口移入/移出时增量更新均值与离差平方和。"""
+    n_series, n_time = data.shape
+    res = np.full((n_series, n_time), np.nan)
+    for i in range(n_series):
+        nobs = 0
+        mean_x = 0.
+        ssqdm_x = 0.
+        prev_value = np.nan
+        same_count = 0
+        for t in range(n_time + offset):
+            if t < n_time:
+                val = data[i, t]
+                if val == val:
+                    nobs += 1
+                    delta = val - mean_x
+                    mean_x += delta / nobs
+                    ssqdm_x += delta * (val - mean_x)
+                    if val == prev_value:
+                        same_count += 1
+                    else:
+                        same_count = 1
+                    prev_value = val
+            out = t - window
+            if 0 <= out < n_time:
+                val = data[i, out]
+                if val == val:
+                    nobs -= 1
+                    if nobs > 0:
+                        delta = val - mean_x
+                        mean_x -= delta / nobs
+                        ssqdm_x -= delta * (val - mean_x)
+                    else:
+                        mean_x = 0.
+                        ssqdm_x = 0.
+            pos = t - offset
+            if pos < 0:
+                continue
+            if nobs >= min_periods and nobs > 1:
+                # 窗口内全部为相同值时结果严格为 0，避免增量更新带来的舍入误差
+                if same_count >= nobs or ssqdm_x <= 0.:
+                    res[i, pos] = 0.
+                else:
+                    res[i, pos] = np.sqrt(ssqdm_x / (nobs - 1))
+    return res
+
+
+@njit(nogil=True, cache=True)
+def _rolling_min_max_kernel(data: np.ndarray,
+                            window: int,
+                            min_periods: int,
+                            offset: int,
+                            is_max: bool) -> np.ndarray:
+    """滚动最小/最大值内核，使用单调双端队列，每个元素最多入队、出队各一次。"""
+    n_series, n_time = data.shape
+    res = np.full((n_series, n_time), np.nan)
+    deque = np.empty(n_time, dtype=np.int64)
+    for i in range(n_series):
+        head = 0
+        tail = 0
+        nobs = 0
+        for t in range(n_time + offset):
+            if t < n_time:
+                val = data[i, t]
+                if val == val:
+                    nobs += 1
+                    while tail > head:
+                        last = data[i, deque[tail - 1]]
+                        if (is_max and last <= val) or ((not is_max) and last >= val):
+                            tail -= 1
+                        else:
+                            break
+                    deque[tail] = t
+                    tail += 1
+            out = t - window
+            if 0 <= out < n_time:
+                if data[i, out] == data[i, out]:
+                    nobs -= 1
+                while tail > head and deque[head] <= out:
+                    head += 1
+            pos = t - offset
+            if pos < 0:
+                continue
+            if nobs >= min_periods and tail > head:
+                res[i, pos] = data[i, deque[head]]
+    return res
 
 
 class HistoryPanelRolling:
@@ -5521,14 +7009,38 @@ class HistoryPanelRolling:
         self._center = center
         self._by = by
 
+    def _series_matrix(self) -> np.ndarray:
+        """将面板数据整理为 ``(shares*htypes, hdates)`` 的连续二维数组 （内部方法）。
+
+        每一行对应一个 share、一个 htype 的时间序列，供滚动计算内核按行处理。
+
+        Returns
+        -------
+        np.ndarray
+            float64 类型的 C 连续二维数组。
+        """
+        values = self._hp.values.astype(float)
+        l_cnt, r_cnt, c_cnt = values.shape
+        return np.ascontiguousarray(values.transpose(0, 2, 1)).reshape(l_cnt * c_cnt, r_cnt)
+
+    def _matrix_to_panel(self, res: np.ndarray) -> HistoryPanel:
+        """将 :meth:`_series_matrix` 形状的计算结果还原为新的 HistoryPanel （内部方法）。"""
+        hp = self._hp
+        l_cnt, r_cnt, c_cnt = hp.shape
+        res = res.reshape(l_cnt, c_cnt, r_cnt).transpose(0, 2, 1)
+        return HistoryPanel(values=np.ascontiguousarray(res), levels=hp.shares, rows=hp.hdates, columns=hp.htypes)
+
     def _apply_rolling(self, func_name: str) -> HistoryPanel:
         """对面板数据应用指定的滚动聚合函数并返回新面板 （内部方法）。
 
+        直接在 ``(shares*htypes, hdates)`` 的二维数组上调用编译后的滚动内核，
+        每条序列只遍历一次 （O(n)），计算结果与 pandas ``Series.rolling`` 一致。
+        ``by='share'`` 与 ``by='htype'`` 的计算结果相同。
+
         Parameters
         ----------
         func_name : str
-            pandas ``Rolling`` 对象的方法名，例如 ``'mean'``、``'std'``、``'sum'``、
-            ``'min'``、``'max'``。
+            滚动聚合函数名，可选 ``'mean'``、``'std'``、``'sum'``、``'min'``、``'max'``。
 
         Returns
         -------
@@ -5539,32 +7051,22 @@ class HistoryPanelRolling:
         hp = self._hp
         if hp.is_empty:
             return HistoryPanel()
-        values = hp.values.astype(float)
-        res = np.full_like(values, np.nan, dtype=float)
-
-        l_cnt, r_cnt, c_cnt = values.shape
+        data = self._series_matrix()
+        window = int(self._window)
+        min_periods = max(int(self._min_periods), 1)
+        offset = (window - 1) // 2 if self._center else 0
+
+        if func_name in ('sum', 'mean'):
+            res = _rolling_sum_kernel(data, window, min_periods, offset, func_name == 'mean')
+        elif func_name == 'std':
+            res = _rolling_std_kernel(data, window, min_periods, offset)
+        elif func_name in ('min', 'max'):
+            res = _rolling_min_max_kernel(data, window, min_periods, offset, func_name == 'max')
+        else:
+            raise ValueError(f'Invalid rolling function: {func_name}, '
+                             f'should be one of "mean", "std", "sum", "min", "max"')
 
-        if self._by == 'share':
-            # 每只股票、每个 htype 独立做时间滚动
-            for li in range(l_cnt):
-                for ci in range(c_cnt):
-                    series = pd.Series(values[li, :, ci], index=hp.hdates)
-                    roller = series.rolling(window=self._window,
-                                            min_periods=self._min_periods,
-                                            center=self._center)
-                    rolled = getattr(roller, func_name)()
-                    res[li, :, ci] = rolled.values
-        else:  # by == 'htype'
-            for ci in range(c_cnt):
-                for li in range(l_cnt):
-                    series = pd.Series(values[li, :, ci], index=hp.hdates)
-                    roller = series.rolling(window=self._window,
-                                            min_periods=self._min_periods,
-                                            center=self._center)
-                    rolled = getattr(roller, func_name)()
-                    res[li, :, ci] = rolled.values
-
-        return HistoryPanel(values=res, levels=hp.shares, rows=hp.hdates, columns=hp.htypes)
+        return self._matrix_to_panel(res)
 
     def mean(self) -> HistoryPanel:
         """计算滚动窗口均值并返回新面板。
@@ -5641,6 +7143,7 @@ class HistoryPanelRolling:
         - 与 pandas 一致：当窗口内有效样本数小于 ``min_periods`` 时，结果为 NaN。
         - ``func`` 应返回标量数值；返回数组或非数值类型可能导致 pandas 报错或产生
           不符合预期的结果。
+        - ``raw=True`` 时传入的窗口是原数据的只读视图 （不复制数据），``func`` 不应修改窗口内容。
 
         Examples
         --------
@@ -5676,35 +7179,947 @@ class HistoryPanelRolling:
         hp = self._hp
         if hp.is_empty:
             return HistoryPanel()
-        values = hp.values.astype(float)
-        res = np.full_like(values, np.nan, dtype=float)
-        l_cnt, r_cnt, c_cnt = values.shape
+        data = self._series_matrix()
+        n_series, r_cnt = data.shape
+        window = int(self._window)
+        min_periods = max(int(self._min_periods), 1)
+        offset = (window - 1) // 2 if self._center else 0
+        hdates = pd.DatetimeIndex(hp.hdates)
+        res = np.full_like(data, np.nan)
+
+        # 每个时间点的窗口范围 [starts, ends)，越过序列两端的部分被截断，与 pandas 一致
+        ends = np.arange(1, r_cnt + 1) + offset
+        starts = np.clip(ends - window, 0, r_cnt)
+        ends = np.clip(ends, 0, r_cnt)
+        # 完整窗口直接取自滑动窗口视图，避免复制数据
+        windows = np.lib.stride_tricks.sliding_window_view(data, window, axis=1) if window <= r_cnt else None
+        valid_counts = np.concatenate(
+                [np.zeros((n_series, 1), dtype=int), np.cumsum(~np.isnan(data), axis=1)],
+                axis=1,
+        )
 
-        def _apply_series(s: pd.Series) -> float:
-            if raw:
-                return func(s.values, **kwargs)
-            return func(s, **kwargs)
-
-        if self._by == 'share':
-            for li in range(l_cnt):
-                for ci in range(c_cnt):
-                    series = pd.Series(values[li, :, ci], index=hp.hdates)
-                    roller = series.rolling(window=self._window,
-                                            min_periods=self._min_periods,
-                                            center=self._center)
-                    rolled = roller.apply(_apply_series, raw=False)
-                    res[li, :, ci] = rolled.values
+        for i in range(n_series):
+            nobs = valid_counts[i, ends] - valid_counts[i, starts]
+            for pos in np.flatnonzero(nobs >= min_periods):
+                start, end = starts[pos], ends[pos]
+                if windows is not None and end - start == window:
+                    win = windows[i, start]
+                else:
+                    win = data[i, start:end]
+                if not raw:
+                    win = pd.Series(win, index=hdates[start:end])
+                res[i, pos] = func(win, **kwargs)
+
+        return self._matrix_to_panel(res)
+
+
+class LazyHistoryPanel(HistoryPanel):
+    """按需加载 htype 数据块的 HistoryPanel （惰性面板）。
+
+    创建时只记录取数计划 （shares、htypes 与每个 htype 的加载函数），不读取任何数据；
+    某个 htype 的数据块在第一次被访问时 （如 ``hp['close']``、``hp.kline.macd()``、
+    ``hp.slice(htypes='close')``）才通过 ``loader`` 读取并缓存，之后的访问直接使用缓存。
+    需要整块数据的操作 （如 ``values``、``mean()``、打印）会一次性加载全部未加载的 htype。
+
+    通常由 :func:`get_history_panel` 在 ``lazy=True`` 时创建。
+
+    Notes
+    -----
+    - ``hdates`` 为已加载数据块日期的并集 （按时间排序）；后加载的数据块若带来新的日期，
+      时间轴会相应扩展，已加载列在新日期上为 ``NaN``。全部 htype 加载完成后，
+      时间轴与非惰性方式得到的面板一致。
+    - 派生列 （``rank``、``kline`` 等，``inplace=False``）返回的新面板仍为惰性面板，
+      与本对象共享已读取的数据块缓存，同一 htype 不会重复读取。
+    """
+
+    def __init__(self,
+                 loader: Callable[[str], pd.DataFrame],
+                 shares: Union[str, Sequence[str]],
+                 htypes: Union[str, Sequence[str]],
+                 row_count: Optional[int] = None,
+                 dtype=None):
+        """创建惰性面板，记录取数计划但不加载数据。
+
+        Parameters
+        ----------
+        loader : callable
+            ``loader(htype) -> pandas.DataFrame``：读取单个 htype 的数据，返回 index 为日期、
+            columns 为 share 的 DataFrame；缺少的 share 列以 NaN 填充。
+        shares : str or sequence of str
+            面板的标的标签，可为逗号分隔字符串。
+        htypes : str or sequence of str
+            面板的数据类型标签，可为逗号分隔字符串。
+        row_count : int, optional
+            时间轴最多保留的行数 （保留最近的 ``row_count`` 行），为 None 时不限制。
+        dtype : {None, 'float64', 'float32'}, optional
+            内部缓冲的数据精度，None 时为 ``float64``。
+
+        Raises
+        ------
+        ValueError
+            ``shares`` 或 ``htypes`` 为空、或 ``row_count`` 不是正整数时抛出。
+        """
+        self._is_empty = False
+        self._values_buffer = None
+        self._lazy_rows = None
+        self._lazy_r_count = 0
+        if isinstance(shares, str):
+            shares = str_to_list(shares)
+        if isinstance(htypes, str):
+            htypes = str_to_list(htypes)
+        shares = list(shares)
+        htypes = list(htypes)
+        if not shares or not htypes:
+            raise ValueError('LazyHistoryPanel requires non-empty shares and htypes.')
+        if row_count is not None and (not isinstance(row_count, int) or row_count <= 0):
+            raise ValueError(f'row_count must be a positive integer, got {row_count}')
+        if not callable(loader):
+            raise TypeError(f'loader should be callable, got {type(loader)} instead')
+        self._loader = loader
+        self._row_limit = row_count
+        buffer_dtype = _regulate_float_dtype(dtype)
+        self._buffer_dtype = np.dtype(np.float64) if buffer_dtype is None else buffer_dtype
+        self._frame_cache: Dict[str, pd.DataFrame] = {}
+        self._pending = list(htypes)
+        self._l_count = len(shares)
+        self._c_count = len(htypes)
+        self._levels = labels_to_dict(shares, range(self._l_count))
+        self._columns = labels_to_dict(htypes, range(self._c_count))
+
+    # 以下三个属性覆盖 HistoryPanel 中同名的实例属性，读取时按需触发加载
+    @property
+    def _values(self) -> np.ndarray:
+        self._load_htypes(list(self._pending))
+        return self._values_buffer
+
+    @_values.setter
+    def _values(self, values: np.ndarray) -> None:
+        self._values_buffer = values
+        self._pending = []
+
+    @property
+    def _rows(self) -> dict:
+        self._ensure_date_axis()
+        return self._lazy_rows
+
+    @_rows.setter
+    def _rows(self, rows: dict) -> None:
+        self._lazy_rows = rows
+
+    @property
+    def _r_count(self) -> int:
+        self._ensure_date_axis()
+        return self._lazy_r_count
+
+    @_r_count.setter
+    def _r_count(self, count: int) -> None:
+        self._lazy_r_count = count
+
+    @property
+    def _float_dtype(self) -> np.dtype:
+        # 直接使用创建时确定的精度，避免读取 _values 触发加载
+        return self._buffer_dtype
+
+    @property
+    def pending_htypes(self) -> List[str]:
+        """尚未加载数据的 htype 列表。"""
+        return list(self._pending)
+
+    @property
+    def loaded_htypes(self) -> List[str]:
+        """已加载 （或已原地赋值）的 htype 列表，顺序与 ``htypes`` 一致。"""
+        return [h for h in self._columns if h not in self._pending]
+
+    def materialize(self) -> 'LazyHistoryPanel':
+        """立即加载全部尚未加载的 htype，并返回本对象。"""
+        self._load_htypes(list(self._pending))
+        return self
+
+    def _ensure_date_axis(self) -> None:
+        """时间轴尚未确定时，加载第一个待加载的 htype 以确定时间轴。"""
+        if self._lazy_rows is None and self._pending:
+            self._load_htypes(self._pending[:1])
+
+    def _materialize_htypes(self, htype_slice: Any) -> np.ndarray:
+        """仅加载 ``htype_slice`` 选中的 htype，返回内部缓冲 （未加载列为 NaN）。"""
+        if isinstance(htype_slice, (slice, list, np.ndarray)):
+            self._load_htypes(self._axis_labels_subset(list(self._columns), htype_slice))
         else:
-            for ci in range(c_cnt):
-                for li in range(l_cnt):
-                    series = pd.Series(values[li, :, ci], index=hp.hdates)
-                    roller = series.rolling(window=self._window,
-                                            min_periods=self._min_periods,
-                                            center=self._center)
-                    rolled = roller.apply(_apply_series, raw=False)
-                    res[li, :, ci] = rolled.values
+            self._load_htypes(list(self._pending))
+        self._ensure_date_axis()
+        return self._values_buffer
+
+    def _read_frame(self, htype: str) -> pd.DataFrame:
+        """通过 ``loader`` 读取单个 htype 的数据，结果在派生面板之间共享缓存。"""
+        if htype not in self._frame_cache:
+            df = self._loader(htype)
+            if isinstance(df, pd.Series):
+                df = df.to_frame()
+            if not isinstance(df, pd.DataFrame):
+                raise TypeError(f'loader should return a pandas DataFrame, got {type(df)} for htype "{htype}"')
+            self._frame_cache[htype] = df.rename(index=pd.to_datetime)
+        return self._frame_cache[htype]
+
+    def _load_htypes(self, htypes: Iterable[str]) -> None:
+        """加载给定 htype 中尚未加载者，并把它们写入内部缓冲。"""
+        for htype in htypes:
+            if htype not in self._pending:
+                continue
+            df = self._read_frame(htype)
+            self._extend_date_axis(list(df.index))
+            rows = list(self._lazy_rows.keys())
+            extended = df.reindex(index=rows, columns=list(self._levels.keys()))
+            self._values_buffer[:, :, self._columns[htype]] = extended.values.T.astype(self._buffer_dtype)
+            self._pending.remove(htype)
+
+    def _extend_date_axis(self, new_dates: List[Any]) -> None:
+        """将 ``new_dates`` 并入时间轴，必要时扩展内部缓冲 （新增格点为 NaN）。"""
+        if self._lazy_rows is None:
+            old_dates = []
+        else:
+            old_dates = list(self._lazy_rows.keys())
+        old_set = set(old_dates)
+        if self._lazy_rows is not None and all(d in old_set for d in new_dates):
+            return
+        combined = sorted(old_set.union(new_dates))
+        if self._row_limit is not None:
+            combined = combined[-self._row_limit:]
+        new_buffer = np.full((self._l_count, len(combined), self._c_count), np.nan, dtype=self._buffer_dtype)
+        if old_dates:
+            new_pos = {d: i for i, d in enumerate(combined)}
+            kept = [(i, new_pos[d]) for i, d in enumerate(old_dates) if d in new_pos]
+            if kept:
+                src, dst = zip(*kept)
+                new_buffer[:, list(dst), :] = self._values_buffer[:, list(src), :]
+        self._values_buffer = new_buffer
+        self._lazy_rows = labels_to_dict(combined, range(len(combined)))
+        self._lazy_r_count = len(combined)
+
+    def _set_htype_column_inplace(self, name: str, column_2d: np.ndarray) -> None:
+        """原地覆盖或追加一列，不触发其他待加载 htype 的加载。"""
+        self._ensure_date_axis()
+        if column_2d.shape != (self._l_count, self._lazy_r_count):
+            raise ValueError(
+                f'Internal error: column array shape {column_2d.shape} != '
+                f'{(self._l_count, self._lazy_r_count)}'
+            )
+        if name in self._pending:
+            self._pending.remove(name)
+        if self._shared_buffer and name in self._columns:
+            self._values_buffer = self._values_buffer.copy()
+        self._shared_buffer = False
+        if name in self._columns:
+            self._values_buffer[:, :, self._columns[name]] = column_2d
+            return
+        self._values_buffer = np.concatenate([self._values_buffer, column_2d[:, :, np.newaxis]], axis=2)
+        self._c_count = int(self._values_buffer.shape[2])
+        self._columns = labels_to_dict(list(self._columns) + [name], range(self._c_count))
+
+    def _append_columns(self, names: List[str], arrays: List[np.ndarray]) -> 'LazyHistoryPanel':
+        """返回追加了新列的惰性面板，待加载的 htype 在新面板中仍保持待加载。"""
+        self._ensure_date_axis()
+        derived = LazyHistoryPanel(
+                loader=self._loader,
+                shares=list(self._levels),
+                htypes=list(self._columns),
+                row_count=self._row_limit,
+                dtype=self._buffer_dtype,
+        )
+        derived._frame_cache = self._frame_cache
+        derived._pending = list(self._pending)
+        derived._values_buffer = self._values_buffer.copy()
+        derived._lazy_rows = dict(self._lazy_rows)
+        derived._lazy_r_count = self._lazy_r_count
+        for name, arr in zip(names, arrays):
+            derived._set_htype_column_inplace(name, np.asarray(arr, dtype=self._buffer_dtype))
+        return derived
+
+
+class ChunkedHistoryPanel(HistoryPanel):
+    """以磁盘文件为后备、按数据块计算的 HistoryPanel （分块面板）。
+
+    数据以 :meth:`HistoryPanel.save` 的原生格式保存在磁盘上，并以内存映射方式打开，
+    全市场分钟级数据等无法整块放入内存的面板也可以使用。索引、切片、``kline`` 等访问接口
+    与普通面板一致，只有被访问的数据才会从磁盘读入。
 
-        return HistoryPanel(values=res, levels=hp.shares, rows=hp.hdates, columns=hp.htypes)
+    以下计算按数据块逐块进行，结果逐块写入磁盘上的新分块面板，内存占用只与数据块大小有关：
+
+    - 沿时间轴的计算按 share 块进行：``rolling``、``returns``、``apply_ta``、``zscore(method='ts')``；
+    - 截面计算按时间块进行：``rank``、``zscore(method='cs')``。
+
+    由于每个数据块都包含完整的时间序列 （或完整的截面），分块计算的结果与普通面板完全一致。
+
+    Notes
+    -----
+    - 计算结果写入 ``spill_dir`` 目录 （默认为系统临时目录下的新目录），不会修改原数据文件。
+      结果文件在生成它的面板被回收或调用 :meth:`close` 时删除，自动创建的临时目录清空后一并删除。
+    - 以 ``mode='r'`` 打开时，``__setitem__``、``ffill``、``fillna`` 及 ``+=`` 等就地运算会先把数据
+      复制到 ``spill_dir`` 中的新文件再写入 （文件级的写时复制）；以 ``mode='r+'`` 打开时这些写操作
+      直接写回原文件。
+    - ``values``、``mean()``、``copy()`` 等未分块的方法会作用于整块数据，对于超大面板应避免调用。
+
+    Examples
+    --------
+    >>> hp.save('data/minute_panel')
+    >>> chp = ChunkedHistoryPanel('data/minute_panel', share_block=200)
+    >>> ret = chp.returns(as_panel=True)  # 结果同样是分块面板
+    >>> for block in ret.iter_blocks(by='share'):
+    ...     process(block)
+    """
+
+    def __init__(self,
+                 path: str,
+                 *,
+                 share_block: int = HP_CHUNK_SHARE_BLOCK,
+                 hdate_block: int = HP_CHUNK_HDATE_BLOCK,
+                 mode: str = 'r',
+                 spill_dir: Optional[str] = None):
+        """打开以原生格式保存的面板数据，创建分块面板。
+
+        Parameters
+        ----------
+        path : str or os.PathLike
+            :meth:`HistoryPanel.save` 保存 （且未压缩）的目录。
+        share_block : int, default HP_CHUNK_SHARE_BLOCK
+            按 share 分块计算时，每个数据块包含的 share 数量。
+        hdate_block : int, default HP_CHUNK_HDATE_BLOCK
+            按时间分块计算时，每个数据块包含的时间点数量。
+        mode : {'r', 'r+'}, default 'r'
+            数据文件的打开方式：``'r'`` 只读，``'r+'`` 允许将修改写回文件。
+        spill_dir : str, optional
+            分块计算结果的存放目录，为 None 时在首次需要时创建临时目录。
+
+        Raises
+        ------
+        ValueError
+            数据块大小不是正整数、``mode`` 非法，或数据以压缩格式保存时抛出。
+        """
+        import os
+
+        for name, block in (('share_block', share_block), ('hdate_block', hdate_block)):
+            if not isinstance(block, int) or block <= 0:
+                raise ValueError(f'{name} must be a positive integer, got {block}')
+        if mode not in ('r', 'r+'):
+            raise ValueError(f'mode must be "r" or "r+", got {mode}')
+        path = os.fspath(path)
+        meta = _read_hp_native_meta(path)
+        if meta.get('compressed'):
+            raise ValueError(f'HistoryPanel saved in {path} is compressed and can not be memory mapped, '
+                             f'save it with compress=False')
+        values = np.load(os.path.join(path, 'values.npy'), mmap_mode=mode, allow_pickle=False)
+        shares, hdates, htypes = _hp_native_labels(meta, values)
+
+        self._path = path
+        self._mode = mode
+        self._share_block = share_block
+        self._hdate_block = hdate_block
+        self._spill_dir = spill_dir
+        self._spill_dir_owned = False
+        self._spill_finalizers: List[weakref.finalize] = []
+        self._set_storage(values, shares, hdates, htypes)
+
+    @classmethod
+    def create(cls,
+               path: str,
+               shares: Sequence[Any],
+               hdates: Sequence[Any],
+               htypes: Sequence[Any],
+               dtype: Optional[Union[str, np.dtype]] = None,
+               **kwargs) -> 'ChunkedHistoryPanel':
+        """在磁盘上创建一个数据全部为 NaN 的可写分块面板，用于逐块写入数据。
+
+        Parameters
+        ----------
+        path : str or os.PathLike
+            数据保存目录，不存在时自动创建。
+        shares, hdates, htypes : sequence
+            面板的三轴标签。
+        dtype : {None, 'float64', 'float32'}, optional
+            数据的浮点精度，与配置项 ``data_dtype`` 取值相同；为 None 时使用 ``float64``。
+        **kwargs :
+            传递给 :class:`ChunkedHistoryPanel` 的其他参数 （``share_block``、``hdate_block``、
+            ``spill_dir``），``mode`` 固定为 ``'r+'``。
+
+        Returns
+        -------
+        ChunkedHistoryPanel
+            以 ``mode='r+'`` 打开的新面板，可以通过 ``values[...]`` 逐块写入数据。
+
+        Raises
+        ------
+        ValueError
+            三轴标签为空或 ``dtype`` 不是受支持的浮点精度时抛出。
+
+        Examples
+        --------
+        >>> chp = ChunkedHistoryPanel.create('data/minute_panel', shares, minutes, ['open', 'close'])
+        >>> for i, share in enumerate(shares):
+        ...     chp.values[i] = load_share_minutes(share)
+        """
+        import os
+
+        path = os.fspath(path)
+        shares, hdates, htypes = list(shares), list(hdates), list(htypes)
+        if not shares or not hdates or not htypes:
+            raise ValueError('ChunkedHistoryPanel requires non-empty shares, hdates and htypes.')
+        dtype = _regulate_float_dtype(dtype)
+        os.makedirs(path, exist_ok=True)
+        shape = (len(shares), len(hdates), len(htypes))
+        values = np.lib.format.open_memmap(os.path.join(path, 'values.npy'), mode='w+',
+                                           dtype=np.float64 if dtype is None else dtype, shape=shape)
+        block = kwargs.get('share_block', HP_CHUNK_SHARE_BLOCK)
+        for start in range(0, shape[0], block):
+            values[start:start + block] = np.nan
+        values.flush()
+        _write_hp_native_meta(path, _hp_native_meta(shares, hdates, htypes, values))
+        del values
+        kwargs['mode'] = 'r+'
+        return cls(path, **kwargs)
+
+    @classmethod
+    def from_panel(cls, hp: HistoryPanel, path: str, **kwargs) -> 'ChunkedHistoryPanel':
+        """将普通 HistoryPanel 保存到 ``path`` 并以分块面板打开。
+
+        Parameters
+        ----------
+        hp : HistoryPanel
+            非空的历史数据面板。
+        path : str or os.PathLike
+            数据保存目录。
+        **kwargs :
+            传递给 :class:`ChunkedHistoryPanel` 的其他参数。
+
+        Returns
+        -------
+        ChunkedHistoryPanel
+        """
+        hp.save(path)
+        return cls(path, **kwargs)
+
+    @property
+    def path(self) -> str:
+        """数据文件所在目录。"""
+        return self._path
+
+    @property
+    def share_block(self) -> int:
+        """按 share 分块计算时每个数据块包含的 share 数量。"""
+        return self._share_block
+
+    @property
+    def hdate_block(self) -> int:
+        """按时间分块计算时每个数据块包含的时间点数量。"""
+        return self._hdate_block
+
+    def _set_storage(self, values: np.ndarray, shares: List[Any], hdates: List[Any], htypes: List[Any]) -> None:
+        """将本对象指向新的数据数组及其三轴标签。"""
+        self._values = values
+        self._is_empty = False
+        self._l_count, self._r_count, self._c_count = values.shape
+        self._levels = dict(zip(shares, range(self._l_count)))
+        self._rows = dict(zip(hdates, range(self._r_count)))
+        self._columns = dict(zip(htypes, range(self._c_count)))
+
+    def _adopt_storage(self, out: 'ChunkedHistoryPanel') -> None:
+        """将本对象切换到 ``out`` 的数据文件，并接管 ``out`` 在 spill 目录中的结果文件的清理。"""
+        self._path = out._path
+        self._mode = out._mode
+        self._stats_cache = None
+        self._set_storage(out._values, out.shares, out.hdates, out.htypes)
+        for finalizer in out._spill_finalizers:
+            detached = finalizer.detach()
+            if detached is not None:
+                _, func, args, _ = detached
+                self._spill_finalizers.append(weakref.finalize(self, func, *args))
+        out._spill_finalizers = []
+
+    def _writable_values(self) -> np.ndarray:
+        """返回可以原地写入的数据数组。
+
+        以 ``mode='r'`` 打开或数据不是浮点数组时，先将数据逐块复制到 ``spill_dir`` 中的新文件再返回
+        （文件级的写时复制），原数据文件不被改写；以 ``mode='r+'`` 打开的浮点数据直接写回原文件。
+        """
+        self._stats_cache = None
+        self._shared_buffer = False
+        if self._mode != 'r+' or self._values.dtype.kind != 'f':
+            self._adopt_storage(self._append_columns([], []))
+        return self._values
+
+    def close(self) -> None:
+        """关闭分块面板：将修改写回磁盘，释放内存映射，并删除本对象在 ``spill_dir`` 中生成的结果文件。
+
+        关闭后本对象成为空面板；原数据文件以及其他面板的结果文件不受影响。
+        """
+        if isinstance(self._values, np.memmap) and self._mode == 'r+':
+            self._values.flush()
+        self._values = None
+        self._is_empty = True
+        self._stats_cache = None
+        self._l_count, self._r_count, self._c_count = (0, 0, 0)
+        self._levels, self._rows, self._columns = {}, {}, {}
+        finalizers, self._spill_finalizers = self._spill_finalizers, []
+        for finalizer in finalizers:
+            finalizer()
+
+    def _block_slices(self, by: str) -> List[slice]:
+        """返回沿 share 轴 （``by='share'``）或时间轴 （``by='hdate'``）划分的数据块下标。"""
+        if by == 'share':
+            size, block = self._l_count, self._share_block
+        elif by == 'hdate':
+            size, block = self._r_count, self._hdate_block
+        else:
+            raise ValueError(f'parameter "by" must be "share" or "hdate", got {by}')
+        return [slice(start, min(start + block, size)) for start in range(0, size, block)]
+
+    def _block_view(self, by: str, block: slice, shares: List[Any], hdates: List[Any]) -> HistoryPanel:
+        """返回单个数据块的普通 HistoryPanel 视图，不复制数据；未分块的轴直接复用本对象的标签字典。"""
+        hp = HistoryPanel.__new__(HistoryPanel)
+        if by == 'share':
+            values = self._values[block]
+            hp._levels = dict(zip(shares[block], range(block.stop - block.start)))
+            hp._rows = self._rows
+        else:
+            values = self._values[:, block]
+            hp._levels = self._levels
+            hp._rows = dict(zip(hdates[block], range(block.stop - block.start)))
+        hp._columns = self._columns
+        hp._values = values
+        hp._is_empty = False
+        hp._l_count, hp._r_count, hp._c_count = values.shape
+        return hp
+
+    def iter_blocks(self, by: str = 'share') -> Iterable[HistoryPanel]:
+        """逐个返回数据块，每个数据块是一个普通 HistoryPanel （原数据的视图）。
+
+        Parameters
+        ----------
+        by : {'share', 'hdate'}, default 'share'
+            按 share 分块 （每块包含完整时间序列）或按时间分块 （每块包含完整截面）。
+
+        Yields
+        ------
+        HistoryPanel
+            数据块面板，只有被访问的数据才会从磁盘读入。
+        """
+        shares, hdates = self.shares, self.hdates
+        for block in self._block_slices(by):
+            yield self._block_view(by, block, shares, hdates)
+
+    def _spill_path(self) -> str:
+        """在 ``spill_dir`` 中为新的计算结果创建一个目录并返回其路径。"""
+        import os
+        import tempfile
+
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix='qteasy_chunked_hp_')
+            self._spill_dir_owned = True
+        os.makedirs(self._spill_dir, exist_ok=True)
+        return tempfile.mkdtemp(dir=self._spill_dir, prefix='block_result_')
+
+    def _derive(self, htypes: List[Any], hdates: Optional[List[Any]] = None) -> 'ChunkedHistoryPanel':
+        """在 ``spill_dir`` 中创建与本对象 shares 相同的空白分块面板，用于写入计算结果。
+
+        新面板的数据精度与本对象一致 （``float32`` 面板保持单精度），其数据文件在新面板被回收
+        或调用 :meth:`close` 时删除。
+        """
+        out = ChunkedHistoryPanel.create(
+                self._spill_path(),
+                shares=self.shares,
+                hdates=self.hdates if hdates is None else hdates,
+                htypes=htypes,
+                dtype=self._float_dtype,
+                share_block=self._share_block,
+                hdate_block=self._hdate_block,
+                spill_dir=self._spill_dir,
+        )
+        out._spill_dir_owned = self._spill_dir_owned
+        root = self._spill_dir if self._spill_dir_owned else None
+        out._spill_finalizers.append(weakref.finalize(out, _remove_chunked_spill, out._path, root))
+        return out
+
+    def _map_blocks(self, func: Callable[[HistoryPanel], Optional[HistoryPanel]], by: str) -> HistoryPanel:
+        """对每个数据块调用 ``func``，并将各块结果逐块写入新的分块面板 （内部方法）。
+
+        Parameters
+        ----------
+        func : callable
+            ``func(block) -> HistoryPanel or None``，返回与数据块 shares/hdates 一致的结果面板；
+            返回 None 表示该块没有新的计算结果：若结果面板在原 htypes 之后追加了新列，
+            该块的原有列照常复制、新列保持为 NaN。
+        by : {'share', 'hdate'}
+            分块方式。
+
+        Returns
+        -------
+        HistoryPanel
+            各块结果拼接而成的分块面板；所有块均无结果时返回空面板。
+        """
+        shares, hdates = self.shares, self.hdates
+        out = None
+        skipped = []
+        for block in self._block_slices(by):
+            res = func(self._block_view(by, block, shares, hdates))
+            if res is None or res.is_empty:
+                skipped.append(block)
+                continue
+            if out is None:
+                out = self._derive(htypes=res.htypes)
+            if by == 'share':
+                out._values[block] = res.values
+            else:
+                out._values[:, block] = res.values
+        if out is None:
+            return HistoryPanel()
+        if skipped and out.htypes[:self._c_count] == self.htypes:
+            for block in skipped:
+                if by == 'share':
+                    out._values[block, :, :self._c_count] = self._values[block]
+                else:
+                    out._values[:, block, :self._c_count] = self._values[:, block]
+        out._values.flush()
+        return out
+
+    def _append_columns(self, names: List[str], arrays: List[np.ndarray]) -> 'ChunkedHistoryPanel':
+        """在新的分块面板中复制原有数据并追加新列，逐个 share 块写入磁盘。"""
+        out = self._derive(htypes=list(self.htypes) + list(names))
+        c_cnt = self._c_count
+        for block in self._block_slices('share'):
+            out._values[block, :, :c_cnt] = self._values[block]
+            for j, arr in enumerate(arrays):
+                out._values[block, :, c_cnt + j] = np.asarray(arr, dtype=out._values.dtype)[block]
+        out._values.flush()
+        return out
+
+    def _set_htype_column_inplace(self, name: str, column_2d: np.ndarray) -> None:
+        """覆盖或追加一列；只读打开或追加新列时先将数据复制到 ``spill_dir`` 中的新文件。"""
+        if column_2d.shape != (self._l_count, self._r_count):
+            raise ValueError(
+                f'Internal error: column array shape {column_2d.shape} != '
+                f'{(self._l_count, self._r_count)}'
+            )
+        if name in self._columns:
+            values = self._writable_values()
+            values[:, :, self._columns[name]] = column_2d
+            values.flush()
+            return
+        self._adopt_storage(self._append_columns([name], [column_2d]))
+
+    def fillna(self, with_val: Union[int, float]):
+        """按 share 块逐块填充 nan 值，参数见 :meth:`HistoryPanel.fillna`；只读打开时先写时复制。"""
+        if not self.is_empty:
+            values = self._writable_values()
+            for block in self._block_slices('share'):
+                values[block] = fill_nan_data(np.asarray(values[block]), with_val)
+            values.flush()
+        return self
+
+    def fillinf(self, with_val: Union[int, float]):
+        """按 share 块逐块填充 inf 值，参数见 :meth:`HistoryPanel.fillinf`；只读打开时先写时复制。"""
+        if not self.is_empty:
+            values = self._writable_values()
+            for block in self._block_slices('share'):
+                values[block] = fill_inf_data(np.asarray(values[block]), with_val)
+            values.flush()
+        return self
+
+    def ffill(self, init_val=np.nan):
+        """按 share 块逐块前向填充缺失值，参数见 :meth:`HistoryPanel.ffill`；只读打开时先写时复制。"""
+        if not self.is_empty:
+            values = self._writable_values()
+            for block in self._block_slices('share'):
+                ffill_3d_data(np.asarray(values[block]), init_val)
+            values.flush()
+        return self
+
+    def rolling(self,
+                window: int,
+                min_periods: Optional[int] = None,
+                center: bool = False,
+                by: str = 'share') -> 'HistoryPanelRolling':
+        """基于分块面板构造滚动窗口统计对象，滚动计算按 share 块逐块进行，参数见 :meth:`HistoryPanel.rolling`。"""
+        roller = super().rolling(window, min_periods=min_periods, center=center, by=by)
+        return _ChunkedHistoryPanelRolling(self, roller._window, roller._min_periods, roller._center, roller._by)
+
+    def returns(self,
+                price_htype: str = 'close',
+                method: str = 'simple',
+                periods: int = 1,
+                as_panel: bool = False,
+                dropna: bool = False):
+        """按 share 块逐块计算收益率，参数见 :meth:`HistoryPanel.returns`。
+
+        ``as_panel=True`` 时返回分块面板 （``dropna=True`` 时为分块面板上的视图）；
+        ``as_panel=False`` 时返回的 DataFrame 位于内存中。
+        """
+
+        def _block_returns(block: HistoryPanel):
+            return HistoryPanel.returns(block, price_htype=price_htype, method=method,
+                                        periods=periods, as_panel=as_panel, dropna=False)
+
+        if not as_panel:
+            blocks = [_block_returns(block) for block in self.iter_blocks(by='share')]
+            ret = pd.concat(blocks, axis=1)
+            if dropna:
+                ret = ret.loc[ret.notna().any(axis=1)]
+            return ret
+
+        ret = self._map_blocks(_block_returns, by='share')
+        if not dropna:
+            return ret
+        has_value = np.zeros(ret.row_count, dtype=bool)
+        for block in ret.iter_blocks(by='share'):
+            has_value |= np.any(~np.isnan(block.values[:, :, 0]), axis=0)
+        return ret.subpanel(hdates=has_value.tolist(), copy=False)
+
+    def apply_ta(self,
+                 func_name: str,
+                 htype: str = 'close',
+                 shares: Optional[Iterable[str]] = None,
+                 as_panel: bool = True,
+                 max_workers: Optional[int] = None,
+                 **kwargs):
+        """按 share 块逐块计算技术指标，参数见 :meth:`HistoryPanel.apply_ta`。
+
+        ``as_panel=True`` 时返回分块面板；``as_panel=False`` 时返回的 DataFrame 位于内存中。
+        """
+        if shares is None:
+            share_list = list(self.shares)
+        elif isinstance(shares, str):
+            share_list = str_to_list(shares)
+        else:
+            share_list = list(shares)
+        for share in share_list:
+            if share not in self._levels:
+                raise ValueError(f'share "{share}" not found in HistoryPanel.shares')
+        wanted = set(share_list)
+
+        def _block_ta(block: HistoryPanel):
+            block_shares = [share for share in block.shares if share in wanted]
+            if not block_shares:
+                return None
+            return HistoryPanel.apply_ta(block, func_name, htype=htype, shares=block_shares,
+                                         as_panel=as_panel, max_workers=max_workers, **kwargs)
+
+        if as_panel:
+            return self._map_blocks(_block_ta, by='share')
+        blocks = [df for df in (_block_ta(block) for block in self.iter_blocks(by='share')) if df is not None]
+        df = pd.concat(blocks, axis=1)
+        return df.loc[:, share_list]
+
+    def rank(self,
+             by: str,
+             *,
+             axis: str = 'share',
+             method: str = 'average',
+             ascending: bool = True,
+             pct: bool = False,
+             new_htype: Optional[str] = None) -> HistoryPanel:
+        """按时间块逐块计算截面排名，参数见 :meth:`HistoryPanel.rank`。"""
+        return self._map_blocks(
+                lambda block: HistoryPanel.rank(block, by, axis=axis, method=method, ascending=ascending,
+                                                pct=pct, new_htype=new_htype),
+                by='hdate',
+        )
+
+    def zscore(self,
+               by: str,
+               *,
+               method: str = 'cs',
+               window: Optional[int] = None,
+               new_htype: Optional[str] = None) -> HistoryPanel:
+        """逐块计算标准化分数：截面标准化按时间块、时序标准化按 share 块，参数见 :meth:`HistoryPanel.zscore`。"""
+        if method not in ('cs', 'ts'):
+            raise ValueError(f'method must be "cs" or "ts", got {method}')
+        return self._map_blocks(
+                lambda block: HistoryPanel.zscore(block, by, method=method, window=window, new_htype=new_htype),
+                by='hdate' if method == 'cs' else 'share',
+        )
+
+    def demean(self, by: str, *, new_htype: Optional[str] = None) -> HistoryPanel:
+        """按时间块逐块计算截面去均值，参数见 :meth:`HistoryPanel.demean`。"""
+        return self._map_blocks(lambda block: HistoryPanel.demean(block, by, new_htype=new_htype), by='hdate')
+
+    def winsorize(self,
+                  by: str,
+                  *,
+                  lower: float = 0.01,
+                  upper: float = 0.99,
+                  new_htype: Optional[str] = None) -> HistoryPanel:
+        """按时间块逐块计算截面缩尾，参数见 :meth:`HistoryPanel.winsorize`。"""
+        return self._map_blocks(
+                lambda block: HistoryPanel.winsorize(block, by, lower=lower, upper=upper, new_htype=new_htype),
+                by='hdate',
+        )
+
+    def neutralize(self,
+                   by: str,
+                   groups: Union[str, dict, Sequence],
+                   *,
+                   new_htype: Optional[str] = None) -> HistoryPanel:
+        """按时间块逐块计算分组中性化，参数见 :meth:`HistoryPanel.neutralize`。"""
+        return self._map_blocks(
+                lambda block: HistoryPanel.neutralize(block, by, groups, new_htype=new_htype),
+                by='hdate',
+        )
+
+
+class _ChunkedHistoryPanelRolling(HistoryPanelRolling):
+    """分块面板的滚动窗口统计对象，各项滚动计算按 share 块逐块进行并写入新的分块面板。"""
+
+    def _block_roller(self, block: HistoryPanel) -> HistoryPanelRolling:
+        """返回单个数据块上参数相同的普通滚动窗口统计对象。"""
+        return HistoryPanelRolling(block, self._window, self._min_periods, self._center, self._by)
+
+    def _apply_rolling(self, func_name: str) -> HistoryPanel:
+        """按 share 块逐块计算滚动聚合并写入新的分块面板，参数见 :meth:`HistoryPanelRolling._apply_rolling`。
+
+        每个 share 块包含完整的时间序列，结果与在整个面板上计算完全一致。
+        """
+        return self._hp._map_blocks(lambda block: self._block_roller(block)._apply_rolling(func_name), by='share')
+
+    def apply(self,
+              func: Callable[[np.ndarray], float],
+              raw: bool = False,
+              **kwargs) -> HistoryPanel:
+        """按 share 块逐块在滚动窗口上应用自定义函数，参数见 :meth:`HistoryPanelRolling.apply`。
+
+        Returns
+        -------
+        HistoryPanel
+            各块结果写入的新分块面板，shares/hdates/htypes 标签保持不变。
+        """
+        return self._hp._map_blocks(lambda block: self._block_roller(block).apply(func, raw=raw, **kwargs),
+                                    by='share')
+
+
+def _remove_chunked_spill(path: str, root: Optional[str]) -> None:
+    """删除分块面板在 spill 目录中的一个结果目录；``root`` 为自动创建的临时目录时，清空后一并删除。"""
+    import os
+    import shutil
+
+    shutil.rmtree(path, ignore_errors=True)
+    if root is not None:
+        try:
+            os.rmdir(root)
+        except OSError:
+            pass
+
+
+def _hp_json_label(label: Any) -> Any:
+    """将 share 或 htype 标签转换为可写入 JSON 的原生类型。
+
+    Raises
+    ------
+    TypeError
+        标签既不是字符串也不是数值时抛出。
+    """
+    if isinstance(label, np.generic):
+        label = label.item()
+    if not isinstance(label, (str, int, float)):
+        raise TypeError(f'HistoryPanel label {label!r} of type {type(label)} can not be saved, '
+                        f'labels should be str or numbers.')
+    return label
+
+
+def _hp_native_meta(shares: List[Any],
+                    hdates: List[Any],
+                    htypes: List[Any],
+                    values: np.ndarray,
+                    compressed: bool = False) -> dict:
+    """生成 HistoryPanel 原生保存格式的元数据字典 （``meta.json`` 的内容）。
+
+    Raises
+    ------
+    TypeError
+        shares 或 htypes 标签既不是字符串也不是数值，无法写入 JSON 时抛出。
+    """
+    return {
+        'format': HP_NATIVE_FORMAT_NAME,
+        'version': HP_NATIVE_FORMAT_VERSION,
+        'shape': list(values.shape),
+        'dtype': values.dtype.str,
+        'compressed': bool(compressed),
+        'shares': [_hp_json_label(share) for share in shares],
+        'hdates': [pd.Timestamp(hdate).isoformat() for hdate in hdates],
+        'htypes': [_hp_json_label(htype) for htype in htypes],
+    }
+
+
+def _write_hp_native_meta(path: str, meta: dict) -> None:
+    """将原生格式元数据写入 ``path/meta.json``。"""
+    import os
+    import json
+
+    with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+
+def _read_hp_native_meta(path: str) -> dict:
+    """读取并校验 ``path/meta.json`` 中的原生格式元数据。
+
+    Raises
+    ------
+    FileNotFoundError
+        目录中没有元数据文件时抛出。
+    ValueError
+        元数据不是 qteasy HistoryPanel 格式或版本不受支持时抛出。
+    """
+    import os
+    import json
+
+    meta_file = os.path.join(path, 'meta.json')
+    if not os.path.exists(meta_file):
+        raise FileNotFoundError(f'No HistoryPanel metadata file found in {path}')
+    with open(meta_file, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('format') != HP_NATIVE_FORMAT_NAME:
+        raise ValueError(f'{path} does not contain a saved HistoryPanel')
+    if meta.get('version', 0) > HP_NATIVE_FORMAT_VERSION:
+        raise ValueError(f'Unsupported HistoryPanel format version {meta.get("version")}, '
+                         f'expected {HP_NATIVE_FORMAT_VERSION} or lower')
+    return meta
+
+
+def _hp_native_labels(meta: dict, values: np.ndarray) -> Tuple[List[Any], List[Any], List[Any]]:
+    """从元数据中解析三轴标签，并检查其与数据数组形状一致。
+
+    Raises
+    ------
+    ValueError
+        数据形状与标签数量或元数据中记录的形状不一致时抛出。
+    """
+    shares = meta['shares']
+    hdates = list(pd.to_datetime(meta['hdates']))
+    htypes = meta['htypes']
+    if values.shape != (len(shares), len(hdates), len(htypes)) or list(values.shape) != meta['shape']:
+        raise ValueError(f'Saved HistoryPanel data shape {values.shape} does not match its labels '
+                         f'({len(shares)}, {len(hdates)}, {len(htypes)})')
+    return shares, hdates, htypes
+
+
+def _import_pyarrow():
+    """导入可选依赖 pyarrow，缺失时给出安装提示。
+
+    Raises
+    ------
+    ImportError
+        未安装 pyarrow 时抛出。
+    """
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError(
+            f"Missing optional dependency 'pyarrow' for arrow export/import of HistoryPanel. "
+            f"Please install pyarrow: $ conda install pyarrow ({e})"
+        ) from e
+    return pyarrow
+
+
+def _arrow_float_dtype(columns: List[np.ndarray]) -> type:
+    """导入 Arrow 数据列时使用的浮点类型：所有列均为 float32 时使用 float32，否则使用 float64。"""
+    if columns and all(np.asarray(col).dtype == np.float32 for col in columns):
+        return np.float32
+    return np.float64
 
 
 def hp_join(*historypanels):
@@ -5725,7 +8140,7 @@ def hp_join(*historypanels):
     res_hp = HistoryPanel()
     for hp in historypanels:
         if isinstance(hp, HistoryPanel):
-            res_hp.join(other=hp)
+            res_hp = res_hp.join(other=hp)
     return res_hp
 
 
@@ -5919,7 +8334,8 @@ def stack_dataframes(dfs: Union[list, dict],
                      dataframe_as: str = 'shares',
                      shares: Iterable = None,
                      htypes: Iterable = None,
-                     fill_value: Any = None):
+                     fill_value: Any = None,
+                     dtype: str = None):
     """将多个 ``DataFrame`` 组合为一个 ``HistoryPanel``。
 
     Parameters
@@ -5936,6 +8352,8 @@ def stack_dataframes(dfs: Union[list, dict],
         输出面板在 ``dataframe_as='htypes'`` 时的列标签；可为逗号分隔字符串或列表。
     fill_value : int or float, optional
         对齐缺失位置时使用的填充值；默认 ``NaN``。
+    dtype : {None, 'float64', 'float32'}, optional
+        输出面板的数据精度，None 时为 ``float64``。
 
     Returns
     -------
@@ -6031,7 +8449,9 @@ def stack_dataframes(dfs: Union[list, dict],
     combined_shares_dict = dict(zip(combined_shares, range(share_count)))
     combined_index.sort()
     # 生成并复制数据
-    res_values = np.zeros(shape=(share_count, index_count, htype_count))
+    float_dtype = _regulate_float_dtype(dtype)
+    res_values = np.empty(shape=(share_count, index_count, htype_count),
+                          dtype=np.float64 if float_dtype is None else float_dtype)
     res_values.fill(fill_value)
     for df_id in range(len(dfs)):
         extended_df = dfs[df_id].reindex(combined_index)
@@ -6268,6 +8688,7 @@ def get_history_data_packages(
         start=None,
         end=None,
         rows=None,
+        dtype=None,
 ) -> dict[str, pd.DataFrame]:
     """ 历史数据获取函数，从本地DataSource （数据库/csv/hdf/fth）获取所需的数据并返回一个
     data_package （包含不同数据类型的区间数据），返回的数据类型为dict，包含每一个data_type
@@ -6299,6 +8720,8 @@ def get_history_data_packages(
     rows: int, optional
         获取的历史数据的行数
         如果rows为正整数，则获取最近的rows行历史数据，如果给出了start或end参数，则忽略rows参数
+    dtype: {None, 'float64', 'float32'}, optional
+        数据包中数据的浮点精度，None表示保持数据源读取的数据类型，'float32'可使数据包占用的内存减半
 
     Returns
     -------
@@ -6339,6 +8762,7 @@ def get_history_data_packages(
                 start=start,
                 end=end,
                 row_count=rows,
+                dtype=dtype,
         ))
     # 获取无share的参考数据
     if len(unsymbolized_dtypes) > 0:
@@ -6349,6 +8773,7 @@ def get_history_data_packages(
                 start=start,
                 end=end,
                 row_count=rows,
+                dtype=dtype,
         ))
 
     # 根据数据类型设置数据日期时间的Offset值
@@ -6380,6 +8805,8 @@ def get_history_panel(
         b_days_only=True,
         trade_time_only=True,
         return_history_panel=True,
+        lazy=False,
+        dtype=None,
         **kwargs
 ) -> Union[HistoryPanel, dict[str, pd.DataFrame]]:
     """ 历史数据获取函数，从本地DataSource （数据库/csv/hdf/fth）获取所需的数据并组装为一个
@@ -6478,6 +8905,13 @@ def get_history_panel(
         处理数据频率更新时的方法
     return_history_panel: bool, default True
         是否返回HistoryPanel对象，如果为False，则返回一个dict，dict的key为data
+    lazy: bool, default False
+        是否返回惰性面板 LazyHistoryPanel：为True时只记录取数计划，每个htype的数据在第一次
+        被访问时才从数据源读取并缓存。适合一次请求很多htype、但只使用其中少数几个的场景。
+        要求给出shares，且return_history_panel为True
+    dtype: {None, 'float64', 'float32'}, default None
+        返回数据的浮点精度，None时保持默认的float64，'float32'时读取的数据与生成的HistoryPanel
+        均以单精度存储，内存占用减半
     **kwargs:
         用于生成trade_time_index的参数，包括：
         include_start:   日期时间序列是否包含开始日期/时间
@@ -6500,6 +8934,7 @@ def get_history_panel(
 
     if data_source is None:
         raise TypeError(f'A data source should be given to acquire data from!')
+    dtype = _regulate_float_dtype(dtype)
 
     if freq is not None:
         different_freq_dtypes = [dtype for dtype in data_types if dtype.freq != freq]
@@ -6509,6 +8944,64 @@ def get_history_panel(
             #          f'They will be re-sampled to match requested frequency!')
             pass
 
+    def _regulate_htype_frame(htyp, df):
+        """ 根据设定处理单个htype的df：调整频率、截取行数并根据设定去掉全NaN的行"""
+        if isinstance(df, pd.Series):
+            df = pd.DataFrame(df)
+            df.columns = ['none']
+        # find freq of the htyp:
+        htype_freq = [d_type for d_type in data_types if d_type.name == htyp][0]
+        if (not b_days_only) or (not trade_time_only) or (freq != htype_freq.freq):
+            new_df = _adjust_freq(
+                    df,
+                    target_freq=freq,
+                    method=resample_method,
+                    forced_start=start,
+                    forced_end=end,
+                    b_days_only=b_days_only,
+                    trade_time_only=trade_time_only,
+                    **kwargs
+            )
+            # 调整频率时的插值与聚合可能改变数据精度，需要重新转换
+            df = _cast_float_data(new_df, dtype)
+        if rows is not None:
+            assert isinstance(rows, int)
+            assert rows > 0
+            df = df.tail(rows)
+        if drop_nan:
+            df = df.dropna(how='all')
+        return df
+
+    if lazy:
+        if not shares:
+            raise ValueError('shares should be given to create a lazy HistoryPanel')
+        if not return_history_panel:
+            raise ValueError('lazy loading is only available when return_history_panel is True')
+        share_list = str_to_list(shares) if isinstance(shares, str) else list(shares)
+
+        def _load_htype(htyp):
+            """ 从数据源读取名称为htyp的所有数据类型，处理后作为一个数据块返回"""
+            try:
+                dfs = get_history_data_from_source(
+                        datasource=data_source,
+                        htypes=[dtype for dtype in data_types if dtype.name == htyp],
+                        qt_codes=list_to_str_format(share_list),
+                        start=start,
+                        end=end,
+                        freq=freq,
+                        row_count=rows,
+                        combine_asset_types=True,
+                        dtype=dtype,
+                )
+            except RuntimeError:
+                # 单个数据块读取为空时不报错，该htype在面板中全部为NaN
+                return pd.DataFrame(columns=share_list, dtype=float if dtype is None else dtype)
+            return _regulate_htype_frame(htyp, dfs[htyp])
+
+        htype_names = list(dict.fromkeys(dtype.name for dtype in data_types))
+        return LazyHistoryPanel(loader=_load_htype, shares=share_list, htypes=htype_names, row_count=rows,
+                                dtype=dtype)
+
     if shares:
         # 在这里获取有share的数据，但是注意，因为这里选择将相同name但是不同资产类型的数据合并到一起
         # 但如果相同name的数据类型中有多个不同频率，则会在下面的函数中报错，此时应该检查输入的数据类型
@@ -6522,6 +9015,7 @@ def get_history_panel(
                 freq=freq,
                 row_count=rows,
                 combine_asset_types=True,
+                dtype=dtype,
         )
         all_dfs = normal_dfs
     else:
@@ -6534,6 +9028,7 @@ def get_history_panel(
                 freq=freq,
                 row_count=rows,
                 group_by_dtype_name=True,
+                dtype=dtype,
         )
         all_dfs = reference_dfs
 
@@ -6541,32 +9036,10 @@ def get_history_panel(
     #  2，检查整行NaN值的情况，根据设定去掉或保留这些行
     #  3，如果df是一个Series，则将其转化为DataFrame
     for htyp, df in all_dfs.items():
-        if isinstance(df, pd.Series):
-            df = pd.DataFrame(df)
-            df.columns = ['none']
-        # find freq of the htyp:
-        htype_freq = [d_type for d_type in data_types if d_type.name == htyp][0]
-        if (not b_days_only) or (not trade_time_only) or (freq != htype_freq.freq):
-            new_df = _adjust_freq(
-                    df,
-                    target_freq=freq,
-                    method=resample_method,
-                    forced_start=start,
-                    forced_end=end,
-                    b_days_only=b_days_only,
-                    trade_time_only=trade_time_only,
-                    **kwargs
-            )
-            df = new_df
-        if rows is not None:
-            assert isinstance(rows, int)
-            assert rows > 0
-            df = df.tail(rows)
-        if drop_nan:
-            df = df.dropna(how='all')
-        all_dfs[htyp] = df
+        all_dfs[htyp] = _regulate_htype_frame(htyp, df)
     if return_history_panel:
-        result_hp = stack_dataframes(all_dfs, dataframe_as='htypes', htypes=all_dfs.keys(), shares=shares)
+        result_hp = stack_dataframes(all_dfs, dataframe_as='htypes', htypes=all_dfs.keys(), shares=shares,
+                                     dtype=dtype)
         if rows is not None:
             assert isinstance(rows, int)
             assert rows > 0
@@ -6657,7 +9130,8 @@ def check_and_prepare_live_trade_data(op,
                                       trade_date: Union[str, pd.Timestamp],
                                       datasource: DataSource,
                                       shares: Union[str, list[str]],
-                                      live_prices: Optional[pd.DataFrame] = None) -> dict[str, pd.DataFrame]:
+                                      live_prices: Optional[pd.DataFrame] = None,
+                                      dtype: Optional[str] = None) -> dict[str, pd.DataFrame]:
     """ 在run_mode == 0的情况下准备相应的历史数据
 
     Parameters
@@ -6672,6 +9146,8 @@ def check_and_prepare_live_trade_data(op,
         股票代码清单，逗号分隔字符串或字符串列表
     live_prices: pd.DataFrame, optional
         用于实盘交易的最新价格数据，如果不提供，则从datasource中下载获取
+    dtype: {None, 'float64', 'float32'}, optional
+        数据包中数据的浮点精度，None表示保持数据源读取的数据类型
 
     Returns
     -------
@@ -6687,9 +9163,11 @@ def check_and_prepare_live_trade_data(op,
             backtest_end=trade_date,
             shares=shares,
             datasource=datasource,
+            dtype=dtype,
     )
     if live_prices is not None and isinstance(live_prices, pd.DataFrame) and (not live_prices.empty):
         hist_data_package = _merge_live_prices_into_package(hist_data_package, live_prices, trade_date)
+        hist_data_package = {key: _cast_float_data(data, dtype) for key, data in hist_data_package.items()}
     return hist_data_package
 
 
@@ -6697,7 +9175,8 @@ def check_and_prepare_backtest_data(op,
                                     backtest_start: str,
                                     backtest_end: str,
                                     shares: Union[str, list[str]],
-                                    datasource: DataSource) -> dict[str, pd.DataFrame]:
+                                    datasource: DataSource,
+                                    dtype: Optional[str] = None) -> dict[str, pd.DataFrame]:
     """ 生成operator对象在回测模式下运行所需要的相关数据包，包括回测所有交易策略所需的历史数据，
     遍历Operator对象中的所有交易策略，获取所有交易策略所需要的所有历史数据。
 
@@ -6718,6 +9197,8 @@ def check_and_prepare_backtest_data(op,
         回测资产池中的股票列表
     datasource: qteasy.DataSource
         数据源对象
+    dtype: {None, 'float64', 'float32'}, optional
+        数据包中数据的浮点精度，None表示保持数据源读取的数据类型，'float32'可使数据包占用的内存减半
 
     Returns
     -------
@@ -6758,6 +9239,7 @@ def check_and_prepare_backtest_data(op,
             start=regulate_date_format(pd.to_datetime(invest_start) - time_window_delta),
             end=invest_end,
             data_source=datasource,
+            dtype=dtype,
     )
 
     return hist_data_package
@@ -258,7 +258,7 @@ def _hp_slice_htype(hp: HistoryPanel, htype: str, shares: Optional[Sequence[str]
     """从 HP 中切片出单列 htype 数据，形状 (n_share, n_time)。"""
     if hp.is_empty or htype not in hp.htypes:
         raise ValueError(f'htype "{htype}" not in panel htypes: {hp.htypes}')
-    ci = hp.htypes.index(htype)
+    ci = hp.columns[htype]
     arr = np.asarray(hp.values[:, :, ci], dtype=float)
     if shares is not None:
         share_set = set(shares)
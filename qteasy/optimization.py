@@ -222,17 +222,8 @@ def _flash_evaluate_parameter(
 
     _shared_op.set_opt_par_values(par_values=par_values)
     # 1，调用operator.run()生成完整的交易信号清单，并计算保存运行时间
-    signal_length = _shared_op.get_signal_count()
-    stypes = np.zeros(signal_length, dtype=int)
-    s_indices = np.zeros(signal_length, dtype=int)
-    signals = np.zeros((signal_length, share_count), dtype=float)
-    signal_index = 0
-
-    for stype, s_index, signal in _shared_op.run_strategies(steps=range(len(_shared_op.group_timing_table))):
-        stypes[signal_index] = SIGNAL_TYPE_ID[stype]
-        s_indices[signal_index] = s_index
-        signals[signal_index, :] = signal
-        signal_index += 1
+    signal_types, s_indices, signals = _shared_op.run_all_steps(share_count=share_count)
+    stypes = np.array([SIGNAL_TYPE_ID[stype] for stype in signal_types], dtype=int)
 
     # 3，调用backtest_batch_steps()进行回测，填充回测结果清单
     closing_cash, closing_amounts = backtest_flash_steps(
@@ -418,6 +409,7 @@ class Optimizer:
         self.opti_time = 0.0  # 优化时间记录
         self.eval_time = 0.0  # 优化结果评价时间记录
         self.test_time = 0.0  # 测试时间记录
+        self.strategy_profile = None  # 优化过程中策略运行耗时统计，参见Operator.enable_profiling()
 
     def generate_running_backtester(self,
                                     stage: str,
@@ -553,13 +545,15 @@ class Optimizer:
 
         return self
 
-    def _evaluate_parameter(self, par_values: tuple) -> float:
+    def _evaluate_parameter(self, par_values: tuple, op_result: Optional[tuple] = None) -> float:
         """ 使用一组策略参数进行回测，并返回回测结果的简易评价结果即一个数字评分
 
         Parameters
         ----------
         par_values: tuple
             策略参数值元组，元组中的每一个值对应策略空间中的一个参数
+        op_result: tuple, optional
+            这组参数对应的预先生成的Operator运行结果，参见Backtester.run()
 
         Returns
         -------
@@ -568,7 +562,7 @@ class Optimizer:
         """
         self.op.set_opt_par_values(par_values=par_values)
         # 在优化区间进行回测
-        self.running_backtester.run()
+        self.running_backtester.run(op_result=op_result)
         # DEBUG
         # print(f'evaluating parameter in {id(self)} with backtester: {id(self.running_backtester)}')
         if self.opti_target == 'fv':
@@ -582,18 +576,20 @@ class Optimizer:
 
         return result
 
-    def _deep_evaluate_parameter(self, par_values: tuple) -> tuple[float, dict]:
+    def _deep_evaluate_parameter(self, par_values: tuple, op_result: Optional[tuple] = None) -> tuple[float, dict]:
         """ 使用一组策略参数进行回测，并返回回测结果的数字评价结果及评价指标字典
 
         Parameters
         ----------
         par_values: tuple
             策略参数值元组，元组中的每一个值对应策略空间中的一个参数
+        op_result: tuple, optional
+            这组参数对应的预先生成的Operator运行结果，参见Backtester.run()
 
         Returns
         -------
         """
-        perf = self._evaluate_parameter(par_values)
+        perf = self._evaluate_parameter(par_values, op_result=op_result)
         metrics = self.running_backtester.evaluate_result(indicators=self.evaluate_indicators)
 
         # 特殊处理回测评价结果，使其符合优化结果表的生成需要
@@ -736,11 +732,11 @@ class Optimizer:
 
         with tqdm(total=total, leave=leave_progress_bar, position=pbar_position) as pbar:
 
-            for par in par_value_list:
+            for par, op_result in self._generate_op_results(par_value_list):
                 self.running_backtester.clear_backtest_buffers()
-                target_value = eval_func(par)
+                target_value = eval_func(par, op_result=op_result)
                 if deep_eval:
-                    perf, metrics = self._deep_evaluate_parameter(par)
+                    perf, metrics = target_value
                 else:
                     perf, metrics = target_value, None
                 result_pool.push(item=par, perf=perf, extra=metrics)
@@ -750,6 +746,24 @@ class Optimizer:
                 pbar.set_description(desc=f'Epoch:{epoch_str}->{best_so_far:.3f}', )
                 pbar.update(1)
 
+    def _generate_op_results(self, par_value_list: Union[list, tuple, Generator]) -> Generator:
+        """ 每SIGNAL_BATCH_SIZE组参数调用一次Operator.run_all_steps_batch()，逐组返回(参数, Operator运行结果)
+
+        Operator依赖交易过程数据或回测启用了追踪时，运行结果为None，由Backtester逐组运行Operator
+        """
+        if self.running_backtester.enable_tracing or self.op.check_dynamic_data():
+            for par in par_value_list:
+                yield par, None
+            return
+        batch = []
+        for par in par_value_list:
+            batch.append(par)
+            if len(batch) == self.SIGNAL_BATCH_SIZE:
+                yield from zip(batch, self.op.run_all_steps_batch(batch, share_count=self.share_count))
+                batch = []
+        if batch:
+            yield from zip(batch, self.op.run_all_steps_batch(batch, share_count=self.share_count))
+
     def _search_grid(self,
                      space: Space) -> None:
         """网格搜索：在参数空间上按固定步长取样并批量评估。
@@ -1357,6 +1371,7 @@ class Optimizer:
                 benchmark=self.benchmark,
                 opti_time=self.opti_time,
                 eval_time=self.eval_time,
+                profile=self.strategy_profile if stage == 'optimization' else None,
         )
 
         return report_string
@@ -1376,6 +1391,9 @@ class Optimizer:
                 test_duration=self.test_time,
         )
 
+    # 顺序评价参数时，每次由Operator批量生成交易信号的参数组数
+    SIGNAL_BATCH_SIZE = 16
+
     AVAILABLE_OPTIMIZERS = {
         'grid':        _search_grid,
         'montecarlo':  _search_montecarlo,
@@ -9,19 +9,22 @@
 # ======================================
 
 
+import hashlib
 import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 
 import numpy as np
 import pandas as pd
 
-from typing import Generator, Optional, Union, Any, Iterable, Mapping
+from typing import Generator, Optional, Union, Any, Iterable, Mapping, Callable
 
 import qteasy
-from qteasy.strategy import BaseStrategy, RuleIterator
+from qteasy.strategy import BaseStrategy, RuleIterator, IndicatorCache
 from qteasy.group import Group
 from qteasy.parameter import Parameter
-from qteasy.datatypes import DataType
+from qteasy.datatypes import DataType, _regulate_float_dtype, _cast_float_data
 
 from qteasy.history import (
     check_and_prepare_trade_prices,
@@ -36,6 +39,7 @@ from qteasy.utilfuncs import (
     rolling_window,
     SlideView,
     sanitize_filename,
+    update_hash,
 )
 
 from qteasy.built_in import (
@@ -161,11 +165,14 @@ class Operator:
         self._groups = []  # 交易策略组，所有同时同频运行的策略会被归为同一组
         self._group_merge_type = None  # 交易策略组的合并方式，默认为None
         self.group_timing_table = None  # 交易策略组的运行时间表，一个DataFrame，每列代表一个策略组，1表示运行，0不运行
+        self._run_plan = None  # 由运行时间表编译得到的运行计划，(运行时间表, 每步组序号起点, 组序号)，详见compile_run_plan()
+        self._indicator_cache = None  # 所有策略共用的技术指标缓存，在create_data_windows()中随数据窗口一同创建
         self.group_merge_type = group_merge_type  # 交易策略组的合并方式，默认为None
         self.group_schedules = {}  # 交易策略组的运行时间表，包含每个组的运行时间和频率
 
         # Operator对象存储的历史数据缓存和窗口缓存：
         self.data_buffers = {}  # Dict——Operator对象的历史数据缓存，缓存所有策略所需的历史数据
+        self._strategy_buffers = {}  # Dict——交给策略使用的float64数据缓存数组，在create_data_windows()中创建
         self.dynamic_data_buffers = {}  # Dict——Operator对象的动态历史数据缓存，缓存所有策略所需的动态历史数据
         self.data_window_views = {}  # Dict——Operator对象的历史数据滑窗视图，保存所有策略所需的历史数据滑窗
         self.data_window_indices = {}  # Dict——Operator对象的历史数据滑窗索引，保存所有策略所需的历史数据滑窗索引
@@ -187,6 +194,11 @@ class Operator:
 
         # 其他相关属性
         self._trace_enabled = False
+        # 并发运行策略的线程数量和线程池，由enable_concurrency()设置，线程数量为0时逐个运行策略
+        self._strategy_workers = 0
+        self._strategy_executor = None
+        self._proc_data_check = None  # 缓存的(策略对象id, 是否使用交易过程数据)，避免每个运行时间点重复检查
+        self._profiler = None  # 运行剖析器，由enable_profiling()设置，为None时不记录运行耗时
 
         if signal_type:
             # change signal_types of all groups to the new signal_type
@@ -560,6 +572,7 @@ class Operator:
         self.debug = False
         self._next_stg_index = 0
         self.data_buffers = {}
+        self._strategy_buffers = {}
         self.data_window_views = {}
         self.data_window_indices = {}
         self._op_signals = None
@@ -1081,24 +1094,32 @@ class Operator:
         -----
         内部调用 ``Strategy.update_par_values``，不在此处做参数合法性校验。
         """
+        for stg, stg_par_values in zip(self.strategies, self._split_opt_par_values(par_values)):
+            if stg_par_values is not None:
+                stg.update_par_values(*stg_par_values)  # 使用update_pars更新参数，不检查参数的正确性
+
+    def _split_opt_par_values(self, par_values) -> list:
+        """ 将一条优化参数向量按各个策略的 ``opt_tag`` 切分为每个策略的参数tuple，不参与优化的策略为None"""
         s = 0
         k = 0
+        stg_par_values = []
         # 依次遍历operator对象中的所有策略：
         for stg in self.strategies:
-            # 优化标记为0：该策略的所有参数在优化中不发生变化
-            if stg.opt_tag == 0:
-                pass
             # 优化标记为1：该策略参与优化，用于优化的参数组的类型为上下界
-            elif stg.opt_tag == 1:
+            if stg.opt_tag == 1:
                 k += stg.par_count
-                stg.update_par_values(*par_values[s:k])  # 使用update_pars更新参数，不检查参数的正确性
+                stg_par_values.append(tuple(par_values[s:k]))
                 s = k
             # 优化标记为2：该策略参与优化，用于优化的参数组的类型为枚举
             elif stg.opt_tag == 2:
                 # 在这种情况下，只需要取出参数向量中的一个分量，赋值给策略作为参数即可。因为这一个分量就包含了完整的策略参数tuple
                 k += 1
-                stg.update_par_values(*par_values[s])  # 使用update_pars更新参数，不检查参数的正确性
+                stg_par_values.append(tuple(par_values[s]))
                 s = k
+            # 优化标记为0：该策略的所有参数在优化中不发生变化
+            else:
+                stg_par_values.append(None)
+        return stg_par_values
 
     def set_blender(self,
                     blender: Union[str, list[str], dict[str, str]],
@@ -1662,6 +1683,215 @@ class Operator:
         for stg in self.strategies:
             stg.disable_tracing()
 
+    def enable_concurrency(self, max_workers: int = None):
+        """ 启用策略的并发运行，在线程池中同时运行同一个运行时间点上的多个策略
+
+        许多策略的主要计算在NumPy或talib中完成，这些计算会释放GIL，因此多个策略可以在多个线程中同时计算，
+        缩短实盘交易中从数据到达到生成交易信号的延迟。启用后：
+
+        - 同一个策略组中的成员策略在线程池中同时运行；
+        - Operator中的策略不依赖交易过程数据（proc.*）且没有启用追踪时，同一个运行时间点上运行的多个策略组
+          也同时运行，run_all_steps()一次生成整段时间轴的信号时，所有策略同时运行；
+        - 数据窗口在主线程中设置，信号的混合与输出顺序与逐个运行时完全相同，因此生成的交易信号也相同。
+
+        每个策略对象只在一个线程中运行，策略自身不需要是线程安全的；但自定义策略如果修改全局变量等共享
+        状态，需要自行处理线程安全问题。
+
+        Parameters
+        ----------
+        max_workers: int, optional
+            线程池的最大线程数量，为None时与ThreadPoolExecutor的默认值相同，由CPU核心数量决定
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        TypeError
+            max_workers不是整数时
+        ValueError
+            max_workers小于1时
+
+        Examples
+        --------
+        >>> op = qt.Operator('dma, macd, trix')
+        >>> op.enable_concurrency(max_workers=4)
+        >>> op.concurrency_enabled
+        True
+        """
+        if max_workers is None:
+            max_workers = min(32, (os.cpu_count() or 1) + 4)
+        if not isinstance(max_workers, (int, np.integer)) or isinstance(max_workers, bool):
+            raise TypeError(f'max_workers should be an integer, got {type(max_workers)} instead')
+        if max_workers < 1:
+            raise ValueError(f'max_workers should be larger than 0, got {max_workers} instead')
+        self.disable_concurrency()
+        self._strategy_workers = int(max_workers)
+
+    def disable_concurrency(self):
+        """ 禁用策略的并发运行，关闭线程池，此后逐个运行所有策略
+
+        Returns
+        -------
+        None
+        """
+        if self._strategy_executor is not None:
+            self._strategy_executor.shutdown(wait=True)
+        self._strategy_executor = None
+        self._strategy_workers = 0
+
+    @property
+    def concurrency_enabled(self) -> bool:
+        """ 是否启用了策略的并发运行，参见enable_concurrency()"""
+        return self._strategy_workers > 0
+
+    def _get_strategy_executor(self) -> Optional[ThreadPoolExecutor]:
+        """ 返回并发运行策略的线程池，第一次使用时创建；没有启用并发运行时返回None"""
+        if self._strategy_workers <= 0:
+            return None
+        if self._strategy_executor is None:
+            self._strategy_executor = ThreadPoolExecutor(
+                    max_workers=self._strategy_workers,
+                    thread_name_prefix='qteasy_strategy',
+            )
+        return self._strategy_executor
+
+    def enable_profiling(self):
+        """ 启用运行剖析，记录每个策略和策略组在运行过程中的调用次数与耗时
+
+        启用后Operator记录以下各项操作的每一次耗时（重新启用时清除此前的记录）：
+
+        - data_window: 设置策略数据窗口的耗时
+        - generate: 策略在一个运行时间点上调用generate()生成信号的耗时
+        - realize: 策略调用realize()的耗时，RuleIterator对每个股票分别调用realize()
+        - generate_all: 策略调用realize_all()一次生成整段时间轴信号的耗时
+        - generate_batch: 参数优化时策略调用realize_batch()一次生成多组参数信号的耗时
+        - blend: 策略组混合成员策略信号的耗时
+
+        通过get_profile()获取每个策略/策略组的调用次数、总耗时、平均耗时、中位数、95分位耗时和最大耗时，
+        从而找出运行最慢的策略。回测时也可以通过配置profile_strategies启用，结果保存在回测结果中并
+        打印在回测报告里。并行参数优化时各子进程中的记录无法返回，只有顺序优化时能够得到记录。
+
+        Returns
+        -------
+        None
+
+        Examples
+        --------
+        >>> op = qt.Operator('dma, macd')
+        >>> op.enable_profiling()
+        >>> res = qt.run(op, mode=1)
+        >>> op.get_profile()
+        """
+        from qteasy.utilfuncs import RunProfiler
+        self._profiler = RunProfiler()
+        for stg in self.strategies:
+            stg.set_profiler(self._profiler)
+
+    def disable_profiling(self):
+        """ 禁用运行剖析，清除已有的记录
+
+        Returns
+        -------
+        None
+        """
+        self._profiler = None
+        for stg in self.strategies:
+            stg.set_profiler(None)
+
+    @property
+    def profiling_enabled(self) -> bool:
+        """ 是否启用了运行剖析，参见enable_profiling()"""
+        return self._profiler is not None
+
+    def get_profile(self) -> Optional[pd.DataFrame]:
+        """ 获取运行剖析的汇总结果，参见enable_profiling()
+
+        Returns
+        -------
+        pd.DataFrame or None
+            以(category, name)为索引，包含count、total、mean、p50、p95、max列，时间单位为秒；
+            没有启用运行剖析时返回None
+        """
+        if self._profiler is None:
+            return None
+        return self._profiler.summary()
+
+    def get_signal_fingerprint(self, share_count: int) -> Optional[str]:
+        """ 生成标识当前运行结果的指纹，用于在磁盘上缓存和复用生成的交易信号
+
+        指纹由Operator的结构（策略组、信号类型、混合表达式、组合并方式）、每个策略的类型与代码、
+        参数和其他公开属性、数据缓存中的全部数据以及运行时间表共同决定，其中任何一项发生变化，
+        指纹都会改变。交易费用、资金计划等只影响回测过程、不影响交易信号的设置不包含在指纹中。
+        策略属性中的其他对象以pickle序列化的结果写入指纹，无法序列化时不能确定运行结果，返回None。
+
+        Parameters
+        ----------
+        share_count: int
+            交易信号中的股票数量
+
+        Returns
+        -------
+        str or None
+            十六进制字符串形式的sha256指纹，策略中有无法写入指纹的对象时返回None
+        """
+        self.is_ready(raise_error=True)
+        hasher = hashlib.sha256()
+        try:
+            update_hash(hasher, (qteasy.__version__, share_count, self.group_merge_type))
+            for group in self._groups:
+                update_hash(hasher, (group.name, group.signal_type, group.run_freq, group.run_timing,
+                                     group.blender_str, [stg.strategy_id for stg in group.members]))
+                for stg in group.members:
+                    self._update_strategy_fingerprint(hasher, stg)
+            update_hash(hasher, self.group_timing_table)
+            update_hash(hasher, self.data_buffers)
+        except TypeError:
+            return None
+        return hasher.hexdigest()
+
+    @staticmethod
+    def _update_strategy_fingerprint(hasher, strategy: BaseStrategy) -> None:
+        """ 将策略的类型、代码、参数、数据设置以及公开属性写入指纹
+
+        策略的代码使用各个方法的代码对象而不是源代码，因此在交互环境中定义的策略同样适用，
+        且不需要读取和解析源文件。运行过程中被改写的属性不写入指纹，因此同一个Operator运行前后的指纹相同：
+        包括数据窗口（与数据类型ID同名的属性）、与参数同名的属性（已由参数值给出），以及为各个股票使用
+        不同参数（multi_pars）时逐个股票更新的参数值，此时以multi_pars代替参数值
+        """
+        for cls in type(strategy).__mro__[:-1]:
+            update_hash(hasher, f'{cls.__module__}.{cls.__qualname__}')
+            for name, attr in sorted(vars(cls).items()):
+                func = attr.__func__ if isinstance(attr, (staticmethod, classmethod)) else attr
+                code = getattr(func, '__code__', None)
+                if code is not None:
+                    update_hash(hasher, (name, code))
+        runtime_attrs = {'logger', 'debug', 'trace_mode'}.union(strategy.data_types, strategy.par_names)
+        public_attrs = {key: value for key, value in vars(strategy).items()
+                        if (not key.startswith('_')) and (key not in runtime_attrs)}
+        par_values = strategy.par_values
+        if getattr(strategy, 'allow_multi_par', False) and getattr(strategy, 'multi_pars', None):
+            par_values = None
+        update_hash(hasher, (strategy.strategy_id, par_values, strategy.data_type_ids,
+                             strategy.data_names, strategy.window_lengths, strategy.data_ulc, public_attrs))
+
+    def _can_run_groups_concurrently(self) -> bool:
+        """ 同一运行时间点上的多个策略组能否同时运行：各组共用交易过程数据的信号行号和追踪步骤，
+        因此Operator依赖交易过程数据或启用了追踪时，策略组必须逐个运行"""
+        if self._trace_enabled:
+            return False
+        key = tuple(id(stg) for stg in self.strategies)
+        if (self._proc_data_check is None) or (self._proc_data_check[0] != key):
+            self._proc_data_check = (key, self.check_dynamic_data())
+        return not self._proc_data_check[1]
+
+    def __getstate__(self):
+        """ 序列化时（例如并行优化时传递给子进程）不保存线程池，需要时在子进程中重新创建"""
+        state = self.__dict__.copy()
+        state['_strategy_executor'] = None
+        return state
+
     def prepare_running_schedule(self,
                                  start_date=None,
                                  end_date=None,
@@ -1741,9 +1971,65 @@ class Operator:
         timing_table = pd.concat(self.group_schedules.values(), axis=1)
         timing_table.columns = self.group_schedules.keys()
         self.group_timing_table = timing_table.fillna(0).astype('int')
+        self.compile_run_plan()
 
         return
 
+    def compile_run_plan(self) -> tuple:
+        """ 将运行时间表编译为扁平的NumPy数组，使run_strategy()每一步只需要O(1)的数组读取
+
+        运行计划以CSR格式保存每一步运行的策略组：第step步运行的策略组序号为
+        ``group_ids[group_ptr[step]:group_ptr[step + 1]]``。由于group_merge_type为'None'时
+        每个运行的策略组产生一条交易信号，``group_ptr[step]``同时也是第step步第一条交易信号的
+        全局行号，不需要再对运行时间表的前step行求和。
+
+        运行计划与生成它的运行时间表对象绑定，运行时间表被重新赋值后，下一次运行时会自动重新编译；
+        如果直接原地修改了运行时间表中的数据，需要手动调用本方法重新编译。
+
+        Returns
+        -------
+        run_plan: tuple of (pd.DataFrame, np.ndarray, np.ndarray)
+            (运行时间表, 每一步策略组序号的起点group_ptr, 所有步骤依次运行的策略组序号group_ids)
+
+        Raises
+        ------
+        ValueError
+            运行时间表尚未创建时
+        """
+        timing_table = self.group_timing_table
+        if timing_table is None:
+            raise ValueError("Group timing table is not set. Please set it before compiling run plan.")
+        running = np.asarray(timing_table.values) != 0
+        _, group_ids = np.nonzero(running)
+        group_ptr = np.zeros(running.shape[0] + 1, dtype=np.intp)
+        np.cumsum(running.sum(axis=1), out=group_ptr[1:])
+        self._run_plan = (timing_table, group_ptr, group_ids.astype(np.intp))
+        return self._run_plan
+
+    def _get_run_plan(self) -> tuple:
+        """ 返回与当前运行时间表对应的运行计划，运行时间表被重新赋值过时重新编译"""
+        run_plan = self._run_plan
+        if (run_plan is None) or (run_plan[0] is not self.group_timing_table):
+            run_plan = self.compile_run_plan()
+        return run_plan
+
+    def get_running_groups(self, step_index: int) -> list:
+        """ 返回运行时间表第step_index步需要运行的所有策略组，按策略组序号排列
+
+        Parameters
+        ----------
+        step_index: int
+            当前步骤的索引，表示在运行时间表中的位置
+
+        Returns
+        -------
+        groups: list of StrategyGroup
+        """
+        _, group_ptr, group_ids = self._get_run_plan()
+        all_groups = self._groups
+        group_count = len(all_groups)
+        return [all_groups[i] for i in group_ids[group_ptr[step_index]:group_ptr[step_index + 1]] if i < group_count]
+
     def get_signal_count(self, steps=None) -> int:
         """ 获取当前运行时间表中所有策略组生成的交易信号数量
 
@@ -1771,7 +2057,8 @@ class Operator:
     def prepare_data_buffer(self, *,
                             start_date: Union[str, pd.Timestamp],
                             end_date: Union[str, pd.Timestamp],
-                            data_package: dict) -> None:
+                            data_package: dict,
+                            dtype: Optional[str] = None) -> None:
         """ 准备数据缓冲区，加载所有策略需要的数据
 
         数据缓冲区是一个字典，键为数据类型，值为对应的数据DataFrame，输入参数包括数据包的开始和结束日期，
@@ -1789,7 +2076,11 @@ class Operator:
             一个字典，包含所有需要的数据，键为数据类型，值为对应的数据DataFrame
             例如：{'price': price_df, 'volume': volume_df, ...}
             其中每个DataFrame的索引为时间戳，列为不同的标的代码
+        dtype: {None, 'float64', 'float32'}, optional
+            数据缓冲区的浮点精度，None表示保持数据包中的数据类型；ta-lib只接受float64数据，因此单精度的
+            数据缓冲区在create_data_windows()中一次性转换为float64后交给策略，策略获得的数据窗口总是float64
         """
+        dtype = _regulate_float_dtype(dtype)
         # 清除原有的 data_buffers
         self.data_buffers = {}
         # 针对所有 data_type，检查数据包的 key 是否都是 str 且 value 都是 DataFrame 或
@@ -1831,7 +2122,10 @@ class Operator:
                 # to solve problem of insufficient data when freq = 'Q'
                 raise ValueError(msg)
             # 检查数据索引是否包含所需的时间范围且含有足够的前置数据
-            self.data_buffers[data_type.dtype_id] = data_package[data_type.dtype_id]
+            buffered_data = data_package[data_type.dtype_id]
+            if (dtype is not None) and np.any(np.atleast_1d(buffered_data.dtypes) != dtype):
+                buffered_data = _cast_float_data(buffered_data, dtype)
+            self.data_buffers[data_type.dtype_id] = buffered_data
 
     def prepare_dynamic_data_buffer(self, *,
                                     trade_records: np.ndarray,
@@ -1852,6 +2146,13 @@ class Operator:
         if self.group_timing_table is None:
             raise ValueError("Group timing table is not set. Please set it before creating data windows.")
 
+        # 数据窗口、技术指标缓存和realize_all()都使用同一份float64数据：单精度的数据缓冲区在这里一次性转换，
+        # 策略调用ta-lib时不必逐次转换数据类型
+        self._strategy_buffers = {}
+        for dtype_id, buffered_data in self.data_buffers.items():
+            values = buffered_data.values
+            self._strategy_buffers[dtype_id] = values.astype(np.float64) if values.dtype == np.float32 else values
+
         for group in self._groups:
             schedule = self.group_timing_table
             for strategy in group.members:
@@ -1866,7 +2167,7 @@ class Operator:
                     ulc = strategy.data_ulc[data_type]
                     buffered_data = self.data_buffers.get(data_type, None)
 
-                    window = rolling_window(buffered_data.values, window=window_length, axis=0)
+                    window = rolling_window(self._strategy_buffers[data_type], window=window_length, axis=0)
                     self.data_window_views[strategy.strategy_id][data_type] = window
 
                     total_window_indices = np.arange(len(buffered_data) - window_length + 1) + window_length - 1
@@ -1881,6 +2182,16 @@ class Operator:
 
                     self.data_window_indices[strategy.strategy_id][data_type] = schedule_indices
 
+        # 数据缓存更新后重新建立技术指标缓存，策略通过indicator()在各个运行时间点上复用同一份技术指标
+        self._indicator_cache = IndicatorCache({
+            dtype_id: self._strategy_buffers[dtype_id]
+            for dtype_id, buffered_data in self.data_buffers.items()
+            if isinstance(buffered_data, pd.DataFrame)
+        })
+        for strategy in self.strategies:
+            strategy.set_indicator_cache(self._indicator_cache)
+            strategy.set_profiler(self._profiler)
+
     def run_strategy(self,
                      step_index) -> Generator[
         Union[tuple[Any, int, Any], tuple[Optional[Any], int, Union[int, Any]]], Any, None]:
@@ -1903,19 +2214,17 @@ class Operator:
         """
         if self.group_timing_table is None:
             raise ValueError("Group timing table is not set. Please set it before running steps.")
+        _, group_ptr, _ = self._get_run_plan()
         # 计算当前步骤对应的“全局 signal 行号”起点（与 op_signal_index 对齐），
         # 无论是否启用 tracing，process data 都依赖这一索引。
         if self.group_merge_type == 'None':
-            base_signal_index = int(self.group_timing_table.iloc[:step_index].values.sum())
+            base_signal_index = int(group_ptr[step_index])
         else:
             base_signal_index = step_index
         # 对 tracing 来说，保持原有语义：使用全局 signal 行号，与 op_signal_index 一致
         if self._trace_enabled:
             self._trace_signal_index = base_signal_index
-        # print(f'taking step index: {step_index} from group_timing_table with shape {self.group_timing_table.shape}')
-        group_timing = self.group_timing_table.iloc[step_index].values
-        group_count = len(self.groups)
-        groups = [self.groups_by_index[i] for i in range(group_count) if group_timing[i]]
+        groups = self.get_running_groups(step_index)
 
         signal_type = groups[0].signal_type if groups else None
 
@@ -1923,36 +2232,46 @@ class Operator:
         # DEBUG:
         # print(f'In current op run step, following groups are running: {groups}')
         current_index = base_signal_index
-        for group in groups:
-            # ----set up data window for each strategy
-            for strategy in group.members:
-                strategy.update_running_data_window(
-                        data_windows=self.data_window_views[strategy.strategy_id],
-                        window_indices=self.data_window_indices[strategy.strategy_id],
-                        window_index=step_index,
-                )
-
-            # ---- take care of tracing if enabled（使用全局 signal 行号，与 op_signal_index 一致）
-            if self._trace_enabled:
-                for stg in group.members:
-                    stg.update_trace_step(step=self._trace_signal_index)
+        executor = self._get_strategy_executor()
+        group_futures = None
+        if (executor is not None) and (len(groups) > 1) and self._can_run_groups_concurrently():
+            # 并发运行时，预先设置所有策略组的数据窗口并同时启动全部成员策略，随后仍按组的顺序混合和输出信号
+            for group in groups:
+                self._update_group_data_windows(group, step_index)
+            group_futures = [[executor.submit(self._generate_signal, stg) for stg in group.members] for group in groups]
+
+        for group_no, group in enumerate(groups):
+            if group_futures is None:
+                # ----set up data window for each strategy
+                self._update_group_data_windows(group, step_index)
+
+                # ---- take care of tracing if enabled（使用全局 signal 行号，与 op_signal_index 一致）
+                if self._trace_enabled:
+                    for stg in group.members:
+                        stg.update_trace_step(step=self._trace_signal_index)
 
             # ---- end setting up data windows
             signal_type = group.signal_type
             # 在生成信号前，更新当前全局 signal 行号，供 process data 访问使用
             self._current_signal_index = current_index
-            signals = [stg.generate() for stg in group.members]
+            if group_futures is not None:
+                signals = [future.result() for future in group_futures[group_no]]
+            elif (executor is not None) and (len(group.members) > 1):
+                # executor.map()按成员策略的顺序返回结果
+                signals = list(executor.map(self._generate_signal, group.members))
+            else:
+                signals = [self._generate_signal(stg) for stg in group.members]
 
             if self.group_merge_type == 'None':
-                signal = group.blend(signals)
+                signal = self._blend_signals(group, signals)
                 yield signal_type, step_index, signal
                 current_index += 1
                 if self._trace_enabled:
                     self._trace_signal_index += 1
             elif self.group_merge_type == 'Or':
-                signal += group.blend(signals)
+                signal += self._blend_signals(group, signals)
             elif self.group_merge_type == 'And':
-                signal *= group.blend(signals)
+                signal *= self._blend_signals(group, signals)
             else:
                 raise ValueError(f'Invalid group merge type: {self.group_merge_type}')
 
@@ -1963,6 +2282,43 @@ class Operator:
             if self._trace_enabled:
                 self._trace_signal_index += 1
 
+    def _update_group_data_windows(self, group: Group, step_index: int) -> None:
+        """ 设置策略组中所有成员策略在step_index步骤的数据窗口"""
+        for strategy in group.members:
+            self._update_data_window(strategy, step_index)
+
+    def _update_data_window(self, strategy: BaseStrategy, step_index: int) -> None:
+        """ 设置策略在step_index步骤的数据窗口，启用运行剖析时记录耗时"""
+        profiler = self._profiler
+        start = time.perf_counter() if profiler is not None else 0.
+        strategy.update_running_data_window(
+                data_windows=self.data_window_views[strategy.strategy_id],
+                window_indices=self.data_window_indices[strategy.strategy_id],
+                window_index=step_index,
+        )
+        if profiler is not None:
+            profiler.record('data_window', strategy.strategy_id, time.perf_counter() - start)
+
+    def _generate_signal(self, strategy: BaseStrategy):
+        """ 调用策略的generate()生成当前数据窗口上的信号，启用运行剖析时记录耗时"""
+        profiler = self._profiler
+        if profiler is None:
+            return strategy.generate()
+        start = time.perf_counter()
+        res = strategy.generate()
+        profiler.record('generate', strategy.strategy_id, time.perf_counter() - start)
+        return res
+
+    def _blend_signals(self, group: Group, signals: list):
+        """ 混合策略组成员策略的信号，启用运行剖析时记录耗时"""
+        profiler = self._profiler
+        if profiler is None:
+            return group.blend(signals)
+        start = time.perf_counter()
+        res = group.blend(signals)
+        profiler.record('blend', group.name, time.perf_counter() - start)
+        return res
+
     def run_strategies(self, steps: Iterable) -> Iterable:
         """运行 Operator，返回运行结果；语义接近 ``qt.run(self, ...)`` 传入的关键字参数形式。
 
@@ -1986,6 +2342,292 @@ class Operator:
             for result in self.run_strategy(step):
                 yield result
 
+    def run_all_steps(self, share_count: int) -> tuple:
+        """ 运行运行时间表中的所有步骤，一次性返回全部交易信号
+
+        如果Operator中的策略不依赖交易过程数据、没有启用追踪，且至少有一个策略实现了realize_all()方法，
+        则逐个策略一次性生成整段时间轴上的信号：实现了realize_all()的策略在完整的数据缓存上只计算一次，
+        其余策略仍逐个运行时间点调用generate()，最后逐个时间点混合各策略组的信号。否则逐步调用
+        run_strategy()生成交易信号，两种方式生成的交易信号相同。
+
+        Parameters
+        ----------
+        share_count: int
+            交易信号中的股票数量
+
+        Returns
+        -------
+        tuple of (list, np.ndarray, np.ndarray)
+            (每条交易信号的信号类型, 每条交易信号对应的步骤索引, 形状为(信号数量, share_count)的交易信号)
+        """
+        self.is_ready(raise_error=True)
+
+        result = self._run_all_steps_by_strategy(share_count)
+        if result is not None:
+            return result
+
+        signal_count = self.get_signal_count()
+        signal_types = []
+        step_indices = np.zeros(signal_count, dtype=int)
+        signals = np.zeros((signal_count, share_count), dtype=float)
+        for signal_index, (stype, s_index, signal) in enumerate(
+                self.run_strategies(steps=range(len(self.group_timing_table)))):
+            signal_types.append(stype)
+            step_indices[signal_index] = s_index
+            signals[signal_index, :] = signal
+        return signal_types, step_indices, signals
+
+    def _get_strategy_buffer_rows(self, strategy: BaseStrategy, steps: np.ndarray) -> Optional[np.ndarray]:
+        """ 返回策略在steps各个步骤的数据窗口最后一行在数据缓存中的行号
+
+        策略的所有数据类型必须使用同样索引的数据缓存（因而各步骤的行号相同），否则返回None
+        """
+        rows = None
+        buffer_index = None
+        for dtype_id in strategy.data_types:
+            buffered_data = self.data_buffers.get(dtype_id, None)
+            if (dtype_id in self.all_dynamic_dtypes) or (not isinstance(buffered_data, pd.DataFrame)):
+                return None
+            window_indices = self.data_window_indices[strategy.strategy_id][dtype_id][steps]
+            if np.any(window_indices < 0):
+                return None
+            dtype_rows = window_indices + strategy.data_window_lengths[dtype_id] - 1
+            if rows is None:
+                rows = dtype_rows
+                buffer_index = buffered_data.index
+            elif not (np.array_equal(rows, dtype_rows) and buffer_index.equals(buffered_data.index)):
+                return None
+        return rows
+
+    def _run_strategy_all_steps(self, strategy: BaseStrategy, steps: np.ndarray, share_count: int) -> np.ndarray:
+        """ 生成策略在steps各个步骤的输出，优先调用realize_all()一次性生成，否则逐个步骤调用generate()"""
+        if strategy.has_realize_all:
+            rows = self._get_strategy_buffer_rows(strategy, steps)
+            if rows is not None:
+                data_buffers = {dtype_id: self._strategy_buffers[dtype_id] for dtype_id in strategy.data_types}
+                stg_signals = self._generate_all_signals(strategy, data_buffers, rows)
+                if stg_signals is not None:
+                    return stg_signals
+
+        stg_signals = np.zeros((len(steps), share_count), dtype=float)
+        for i, step_index in enumerate(steps):
+            self._update_data_window(strategy, step_index)
+            stg_signals[i] = self._generate_signal(strategy)
+        return stg_signals
+
+    def _generate_all_signals(self, strategy: BaseStrategy, data_buffers: dict, rows: np.ndarray):
+        """ 调用策略的generate_all()一次生成所有步骤的信号，启用运行剖析时记录耗时"""
+        profiler = self._profiler
+        if profiler is None:
+            return strategy.generate_all(data_buffers=data_buffers, rows=rows)
+        start = time.perf_counter()
+        res = strategy.generate_all(data_buffers=data_buffers, rows=rows)
+        profiler.record('generate_all', strategy.strategy_id, time.perf_counter() - start)
+        return res
+
+    def _run_all_steps_by_strategy(self, share_count: int) -> Optional[tuple]:
+        """ 逐个策略一次性生成所有步骤的交易信号，Operator不满足一次性生成信号的条件时返回None"""
+        if self._trace_enabled or self.check_dynamic_data():
+            return None
+        executor = self._get_strategy_executor()
+        if (executor is None) and (not any(stg.has_realize_all for stg in self.strategies)):
+            return None
+        group_steps = self._get_group_steps()
+        if group_steps is None:
+            return None
+        if executor is None:
+            member_signals = lambda stg, steps: self._run_strategy_all_steps(stg, steps, share_count)
+        else:
+            # 各个策略使用各自的数据窗口，互不依赖，所有策略在线程池中同时生成整段时间轴上的信号
+            futures = {
+                stg.strategy_id: executor.submit(self._run_strategy_all_steps, stg, steps, share_count)
+                for group, (_, steps) in zip(self._groups, group_steps)
+                for stg in group.members
+            }
+            member_signals = lambda stg, steps: futures[stg.strategy_id].result()
+        return self._merge_group_signals(
+                share_count=share_count,
+                group_steps=group_steps,
+                member_signals=member_signals,
+        )
+
+    def _get_group_steps(self) -> Optional[list]:
+        """ 根据运行计划返回每个策略组的[(交易信号行号, 步骤索引), ...]，运行计划中包含不存在的策略组时返回None"""
+        _, group_ptr, group_ids = self._get_run_plan()
+        if np.any(group_ids >= len(self._groups)):
+            return None
+        step_ids = np.repeat(np.arange(len(group_ptr) - 1), np.diff(group_ptr))
+        group_steps = []
+        for group_index in range(len(self._groups)):
+            signal_rows = np.flatnonzero(group_ids == group_index)
+            group_steps.append((signal_rows, step_ids[signal_rows]))
+        return group_steps
+
+    def _merge_group_signals(self, share_count: int, group_steps: list, member_signals: Callable) -> tuple:
+        """ 一次混合各策略组在所有时间点上的信号，并按照group_merge_type合并为交易信号
+
+        Parameters
+        ----------
+        share_count: int
+            交易信号中的股票数量
+        group_steps: list of tuple
+            _get_group_steps()的结果
+        member_signals: Callable
+            member_signals(strategy, steps)返回策略在steps各个步骤的输出，形状为(步骤数, share_count)
+
+        Returns
+        -------
+        tuple of (list, np.ndarray, np.ndarray)
+            与run_all_steps()的返回值相同
+        """
+        _, group_ptr, group_ids = self._get_run_plan()
+        groups = self._groups
+        step_count = len(group_ptr) - 1
+
+        merge_type = self.group_merge_type
+        if merge_type == 'None':
+            signals = np.zeros((len(group_ids), share_count), dtype=float)
+        elif merge_type == 'Or':
+            signals = np.zeros((step_count, share_count), dtype=float)
+        elif merge_type == 'And':
+            signals = np.ones((step_count, share_count), dtype=float)
+        else:
+            raise ValueError(f'Invalid group merge type: {merge_type}')
+
+        for group, (signal_rows, steps) in zip(groups, group_steps):
+            # 混合函数逐个元素（unify逐行）计算，因此一次混合所有步骤的信号矩阵与逐个步骤混合的结果相同
+            all_member_signals = [member_signals(stg, steps) for stg in group.members]
+            group_signals = np.zeros((len(steps), share_count), dtype=float)
+            group_signals[:] = self._blend_signals(group, all_member_signals)
+            if merge_type == 'None':
+                signals[signal_rows] = group_signals
+            elif merge_type == 'Or':
+                signals[steps] += group_signals
+            else:  # 'And'
+                signals[steps] *= group_signals
+
+        if merge_type == 'None':
+            signal_types = [groups[group_index].signal_type for group_index in group_ids]
+            return signal_types, np.repeat(np.arange(step_count), np.diff(group_ptr)), signals
+        # 对于 AND / OR 合并模式，每个步骤的信号类型与该步骤最后一个运行的策略组相同
+        signal_types = [groups[group_ids[group_ptr[step + 1] - 1]].signal_type if group_ptr[step + 1] > group_ptr[step]
+                        else None for step in range(step_count)]
+        return signal_types, np.arange(step_count), signals
+
+    def run_all_steps_batch(self, par_values_list: Iterable, share_count: int) -> list:
+        """ 使用多组优化参数运行运行时间表中的所有步骤，一次返回每组参数对应的全部交易信号
+
+        参数优化时，运行时间表、数据窗口和信号混合器对所有参数组都相同。本方法逐个策略、在时间轴上只遍历
+        一次：策略参数相同的参数组（例如不参与优化的策略）只计算一次；实现了realize_all()的策略对每组参数
+        在完整的数据缓存上计算一次；其余策略在每个运行时间点上只设置一次数据窗口，实现了realize_batch()的
+        策略一次得到所有参数组的输出，否则逐组设置参数并调用generate()。最后对每组参数分别混合各策略组的信号。
+        Operator依赖交易过程数据或启用了追踪时，逐组设置参数并调用run_all_steps()。
+        每组参数的结果与调用set_opt_par_values()后再调用run_all_steps()相同，运行结束后策略参数恢复原值。
+
+        Parameters
+        ----------
+        par_values_list: iterable of tuple
+            多组优化参数，每组参数的格式与set_opt_par_values()的参数相同
+        share_count: int
+            交易信号中的股票数量
+
+        Returns
+        -------
+        list of tuple
+            每组参数对应的run_all_steps()运行结果(信号类型, 步骤索引, 交易信号)
+        """
+        self.is_ready(raise_error=True)
+        par_values_list = list(par_values_list)
+        original_par_values = [stg.par_values for stg in self.strategies]
+        try:
+            group_steps = None
+            if not (self._trace_enabled or self.check_dynamic_data()):
+                group_steps = self._get_group_steps()
+            if group_steps is None:
+                results = []
+                for par_values in par_values_list:
+                    self.set_opt_par_values(par_values)
+                    results.append(self.run_all_steps(share_count=share_count))
+                return results
+
+            stg_par_values = [self._split_opt_par_values(par_values) for par_values in par_values_list]
+            executor = self._get_strategy_executor()
+            outputs = {}
+            for group, (_, steps) in zip(self._groups, group_steps):
+                for stg in group.members:
+                    position = self.strategies.index(stg)
+                    current = stg.par_values or ()
+                    par_list = [pars[position] if pars[position] is not None else current for pars in stg_par_values]
+                    if executor is None:
+                        outputs[stg.strategy_id] = self._run_strategy_all_steps_batch(stg, steps, share_count, par_list)
+                    else:
+                        outputs[stg.strategy_id] = executor.submit(
+                                self._run_strategy_all_steps_batch, stg, steps, share_count, par_list,
+                        )
+            if executor is not None:
+                # 等待所有策略结束后再读取结果，避免某个策略出错时其他策略仍在运行、参数却已被恢复
+                wait(outputs.values())
+                outputs = {stg_id: future.result() for stg_id, future in outputs.items()}
+
+            return [
+                self._merge_group_signals(
+                        share_count=share_count,
+                        group_steps=group_steps,
+                        member_signals=lambda stg, steps, k=k: outputs[stg.strategy_id][k],
+                )
+                for k in range(len(par_values_list))
+            ]
+        finally:
+            for stg, par_values in zip(self.strategies, original_par_values):
+                # 从未设置过参数的策略无法恢复为None，保留最后一组参数，与逐组调用set_opt_par_values()相同
+                if par_values and all(value is not None for value in par_values):
+                    stg.update_par_values(*par_values)
+
+    def _run_strategy_all_steps_batch(self,
+                                      strategy: BaseStrategy,
+                                      steps: np.ndarray,
+                                      share_count: int,
+                                      par_list: list) -> list:
+        """ 生成策略使用par_list中每组参数时在steps各个步骤的输出，相同的参数只计算一次"""
+        unique_pars = list(dict.fromkeys(par_list))
+        outputs = {}
+        if strategy.has_realize_all:
+            rows = self._get_strategy_buffer_rows(strategy, steps)
+            if rows is not None:
+                data_buffers = {dtype_id: self._strategy_buffers[dtype_id] for dtype_id in strategy.data_types}
+                for par in unique_pars:
+                    if par:
+                        strategy.update_par_values(*par)
+                    stg_signals = self._generate_all_signals(strategy, data_buffers, rows)
+                    if stg_signals is not None:
+                        outputs[par] = stg_signals
+
+        remaining = [par for par in unique_pars if par not in outputs]
+        if remaining:
+            stepwise = {par: np.zeros((len(steps), share_count), dtype=float) for par in remaining}
+            par_batch = None
+            if strategy.has_realize_batch and len(remaining) > 1:
+                par_batch = strategy.get_par_batch(remaining)
+            profiler = self._profiler
+            for i, step_index in enumerate(steps):
+                self._update_data_window(strategy, step_index)
+                batch_signals = None
+                if par_batch is not None:
+                    start = time.perf_counter() if profiler is not None else 0.
+                    batch_signals = strategy.generate_batch(par_batch)
+                    if profiler is not None:
+                        profiler.record('generate_batch', strategy.strategy_id, time.perf_counter() - start)
+                if batch_signals is not None:
+                    for par, signal in zip(remaining, batch_signals):
+                        stepwise[par][i] = signal
+                    continue
+                for par in remaining:
+                    if par:
+                        strategy.update_par_values(*par)
+                    stepwise[par][i] = self._generate_signal(strategy)
+            outputs.update(stepwise)
+        return [outputs[par] for par in par_list]
+
     # ================= High level running functions ===================
 
     def run(self, config, datasource=None, logger=None):
@@ -2129,6 +2771,10 @@ class Operator:
                 f'asset_pool should be str or list[str], got {type(raw_asset_pool)} instead'
             )
         self.set_shares(live_asset_pool)
+        # 实盘交易中从数据到达到生成交易信号的延迟更重要，按照配置在线程池中并发运行策略
+        strategy_workers = config.get('live_trade_strategy_workers', 0)
+        if strategy_workers and strategy_workers > 1:
+            self.enable_concurrency(max_workers=strategy_workers)
 
         trader = Trader(
                 operator=self,
@@ -2165,6 +2811,7 @@ class Operator:
                 daily_refill_tables=config['live_trade_daily_refill_tables'],
                 weekly_refill_tables=config['live_trade_weekly_refill_tables'],
                 monthly_refill_tables=config['live_trade_monthly_refill_tables'],
+                data_dtype=config['data_dtype'],
                 debug=False,
                 live_config=live_cfg,
         )
@@ -2244,6 +2891,7 @@ class Operator:
                 backtest_end=end_date,
                 shares=config['asset_pool'],
                 datasource=datasource,
+                dtype=config['data_dtype'],
         )
 
         trade_prices = check_and_prepare_trade_prices(
@@ -2290,6 +2938,12 @@ class Operator:
 
         # 生成交易清单，对交易清单进行回测，对回测的结果进行基本评价
         from qteasy.backtest import Backtester
+        signal_cache_path = None
+        if config['signal_cache']:
+            from qteasy import QT_ROOT_PATH, _resolve_path
+            signal_cache_path = _resolve_path(
+                    QT_ROOT_PATH, config['signal_cache_file_path'], 'signal_cache_file_path'
+            )
         backtested = Backtester(
                 op=self,
                 shares=config['asset_pool'],
@@ -2305,6 +2959,8 @@ class Operator:
                 trading_delivery_params=trading_delivery_params,
                 trade_price_data=trade_prices.values,
                 enable_tracing=config['trace_log'],
+                enable_profiling=config['profile_strategies'],
+                signal_cache_path=signal_cache_path,
                 logger=logger,
         ).run()
 
@@ -2395,6 +3051,7 @@ class Operator:
                 backtest_end=opti_end,
                 shares=config['asset_pool'],
                 datasource=datasource,
+                dtype=config['data_dtype'],
         )
 
         test_data_package = check_and_prepare_backtest_data(
@@ -2403,6 +3060,7 @@ class Operator:
                 backtest_end=test_end,
                 shares=config['asset_pool'],
                 datasource=datasource,
+                dtype=config['data_dtype'],
         )
 
         from qteasy.optimization import Optimizer
@@ -2467,10 +3125,15 @@ class Operator:
         )
 
         # print(f'Starting optimization...')
+        if config['profile_strategies']:
+            # 并行优化时策略在子进程中运行，只能统计到主进程中的运行耗时
+            self.enable_profiling()
         optimizer.optimize(
                 benchmark_data=opti_benchmark,
                 trade_price_data=opti_trade_prices.values,
         )
+        optimizer.strategy_profile = self.get_profile()
+        self.disable_profiling()
         print(f'Optimization finished, best parameters:\n')
 
         if config['report']:
@@ -11,8 +11,11 @@
 
 import numpy as np
 import pandas as pd
+from numba import njit
 from abc import abstractmethod, ABCMeta
 from typing import Union, List, Tuple, Dict, Any, Callable, Literal, Iterable
+import threading
+import time
 import warnings
 
 from qteasy.utilfuncs import (
@@ -25,6 +28,7 @@ from qteasy.datatypes import (
 )
 
 from qteasy.parameter import Parameter
+from qteasy import tafuncs
 
 
 def _dict_par_format_is_valid(par_name: str, pars, value_type, key_type):
@@ -64,6 +68,169 @@ def _dict_par_format_is_valid(par_name: str, pars, value_type, key_type):
     return True
 
 
+def _apply_by_columns(func: Callable, arrays: list, args: tuple, kwargs: dict):
+    """ 在一维或二维(行数, 股票数量)的历史数据上计算技术指标，二维数据逐列计算，结果与输入数据同形
+
+    func为qteasy.tafuncs中的技术指标函数或形式相同的函数，有多个输出时返回tuple
+    """
+    if arrays[0].ndim == 1:
+        return func(*arrays, *args, **kwargs)
+    columns = [func(*[np.asarray(arr[:, i], dtype=float) for arr in arrays], *args, **kwargs)
+               for i in range(arrays[0].shape[1])]
+    if isinstance(columns[0], tuple):
+        return tuple(np.column_stack(output) for output in zip(*columns))
+    return np.column_stack(columns)
+
+
+class IndicatorCache:
+    """ 技术指标缓存：在完整的数据缓存上计算技术指标并保存，供策略在所有运行时间点上复用
+
+    函数、参数和数据类型均相同的技术指标在整个数据缓存上只计算一次，策略在每个运行时间点上通过
+    BaseStrategy.indicator()取得与当前数据窗口对齐的部分，不必在每个数据窗口上重新计算整个指标。
+    Operator在创建数据窗口时建立缓存，并分配给所有的策略共用，数据缓存更新后缓存随之重建。
+    缓存的技术指标数量超过max_size时，最久未被使用的技术指标被移出缓存（例如在参数优化过程中）。
+    数据中间有nan值时（某列第一个有效值之后的nan），滚动计算的结果从该行起与在数据窗口上计算的结果不同，
+    此后的数据窗口不使用缓存，见interior_nan_rows()。
+    Operator启用并发运行时多个策略在不同线程中同时读取缓存，缓存的读写由一个锁保护。
+    """
+
+    def __init__(self, data_buffers: dict, max_size: int = 64):
+        """
+
+        Parameters
+        ----------
+        data_buffers: dict of {str: np.ndarray}
+            完整的数据缓存，键为数据类型ID，值为形状为(数据缓存行数, 股票数量)的数组
+        max_size: int, default 64
+            缓存中最多保存的技术指标数量
+        """
+        if (not isinstance(max_size, (int, np.integer))) or (max_size < 1):
+            raise ValueError(f'max_size should be a positive integer, got {max_size} instead')
+        self._data_buffers = data_buffers
+        self.max_size = int(max_size)
+        self._values = {}  # 缓存的技术指标，键为(函数, 数据类型ID, 参数)，值为各个输出的二维数组组成的tuple
+        self._lookbacks = {}  # 各个技术指标在不同长度的数据窗口上的前置数据量
+        self._nan_rows = {}  # 各组数据类型每列第一个非前导nan值的行号
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._values)
+
+    def __getstate__(self):
+        """ 序列化时（例如并行优化时传递给子进程）不保存已经计算的技术指标，需要时重新计算"""
+        state = self.__dict__.copy()
+        state['_values'] = {}
+        state['_lookbacks'] = {}
+        state['_nan_rows'] = {}
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def has_data(self, dtype_ids: tuple) -> bool:
+        """ 数据缓存中是否包含所有的数据类型，且各个数据类型的数据形状相同"""
+        if not all(dtype_id in self._data_buffers for dtype_id in dtype_ids):
+            return False
+        return len({self._data_buffers[dtype_id].shape for dtype_id in dtype_ids}) == 1
+
+    def interior_nan_rows(self, dtype_ids: tuple) -> np.ndarray:
+        """ 数据缓存各列中第一个非前导nan值（该列第一个有效值之后的nan）所在的行号，多个数据类型时取最小值
+
+        ta-lib等滚动计算遇到nan后，此后的结果全部成为nan，而在数据窗口上计算时只要窗口内没有nan就能得到
+        有效结果，因此数据窗口的最后一行不早于这个行号时，缓存中的技术指标可能与在数据窗口上计算的结果不同。
+        前导的nan会被跳过，不影响结果。
+
+        Returns
+        -------
+        np.ndarray
+            长度为股票数量的整数数组，某列没有非前导nan值时为数据缓存的行数
+        """
+        nan_rows = self._nan_rows.get(dtype_ids)
+        if nan_rows is None:
+            for dtype_id in dtype_ids:
+                data = self._data_buffers[dtype_id]
+                valid = ~np.isnan(data)
+                interior = np.maximum.accumulate(valid, axis=0) & ~valid
+                rows = np.where(interior.any(axis=0), interior.argmax(axis=0), data.shape[0])
+                nan_rows = rows if nan_rows is None else np.minimum(nan_rows, rows)
+            self._nan_rows[dtype_ids] = nan_rows
+        return nan_rows
+
+    def get(self, func: Callable, dtype_ids: tuple, args: tuple, kwargs: dict) -> tuple:
+        """ 获取技术指标在整个数据缓存上的计算结果，缓存中没有时计算并保存
+
+        Parameters
+        ----------
+        func: Callable
+            技术指标函数
+        dtype_ids: tuple of str
+            技术指标使用的历史数据类型ID，按照函数参数的顺序排列
+        args: tuple
+            技术指标的位置参数
+        kwargs: dict
+            技术指标的关键字参数
+
+        Returns
+        -------
+        tuple of (key, values)
+            key为技术指标在缓存中的键，values为技术指标各个输出的只读二维数组组成的tuple
+        """
+        key = (func, dtype_ids, args, tuple(sorted(kwargs.items())))
+        with self._lock:
+            values = self._values.pop(key, None)
+            if values is not None:
+                self._values[key] = values  # 重新插入，使字典中的顺序为最近使用的顺序
+                return key, values
+
+        # 在锁外计算，其他线程计算或读取不同的技术指标时不必等待；两个线程同时计算同一个指标时，
+        # 先写入缓存的结果被保留，后计算的线程也使用这个结果
+        arrays = [self._data_buffers[dtype_id] for dtype_id in dtype_ids]
+        result = _apply_by_columns(func, arrays, args, kwargs)
+        if not isinstance(result, tuple):
+            result = (result,)
+        values = tuple(np.asarray(output, dtype=float) for output in result)
+        for output in values:
+            output.flags.writeable = False
+
+        with self._lock:
+            stored = self._values.pop(key, None)
+            if stored is not None:
+                values = stored
+            elif len(self._values) >= self.max_size:
+                oldest = next(iter(self._values))
+                del self._values[oldest]
+                self._lookbacks = {k: v for k, v in self._lookbacks.items() if k[0] != oldest}
+            self._values[key] = values
+        return key, values
+
+    def lookback(self, key: tuple, window_length: int, values: tuple = None) -> int:
+        """ 在长度为window_length的数据窗口上计算技术指标时，窗口最前面的结果为NaN的行数
+
+        数据缓存的前window_length行就是第一个数据窗口，因此从缓存的技术指标中即可得到，不需要重新计算。
+        前置数据量不小于窗口长度时返回窗口长度，此时在数据窗口上得不到任何有效结果。
+        values为get()返回的技术指标，给出时不再从缓存中读取（并发运行时技术指标可能已被其他线程移出缓存）。
+        """
+        lookback = self._lookbacks.get((key, window_length))
+        if lookback is None:
+            lookback = 0
+            if values is None:
+                with self._lock:
+                    values = self._values[key]
+            for output in values:
+                valid = ~np.isnan(output[:window_length])
+                if valid.ndim == 1:
+                    valid = valid[:, np.newaxis]
+                has_valid = valid.any(axis=0)
+                if not has_valid.any():
+                    lookback = window_length
+                    break
+                lookback = max(lookback, int(valid.argmax(axis=0)[has_valid].min()))
+            self._lookbacks[(key, window_length)] = lookback
+        return lookback
+
+
 class BaseStrategy:
     """量化投资策略的抽象基类，所有具体策略都应从本类继承并实现交易信号生成逻辑。
 
@@ -178,6 +345,12 @@ class BaseStrategy:
         self.logger = None  # 策略的日志记录器
         # 运行时由 Operator 设置，用于在策略内部访问 Operator（例如 process data）
         self._operator = None
+        # 运行时由 Operator 设置的技术指标缓存，以及当前数据窗口最后一行在数据缓存中的行号
+        self._indicator_cache = None
+        self._indicator_rows = None
+        self._indicator_share = slice(None)  # 当前计算的股票在数据缓存中的列号
+        self._indicator_specs = {}  # indicator()参数对应的技术指标函数和数据类型ID
+        self._profiler = None  # 运行时由 Operator 设置的运行剖析器，为 None 时不记录 realize() 的耗时
 
     @property
     def name(self):
@@ -1089,6 +1262,281 @@ class BaseStrategy:
         for dtype_name in self.data_types:
             data_window = data_windows[dtype_name][window_indices[dtype_name][window_index]]
             setattr(self, dtype_name, data_window)
+        self._update_indicator_rows(window_indices, window_index)
+
+    def set_indicator_cache(self, cache: Union[IndicatorCache, None]) -> None:
+        """ 设置策略使用的技术指标缓存，由Operator在创建数据窗口时调用"""
+        self._indicator_cache = cache
+        self._indicator_rows = None
+
+    def set_profiler(self, profiler) -> None:
+        """ 设置记录realize()调用次数和耗时的运行剖析器（RunProfiler），由Operator在启用运行剖析时调用，
+        为None时不记录"""
+        self._profiler = profiler
+
+    def _run_realize(self):
+        """ 调用realize()，设置了运行剖析器时记录本次调用的耗时"""
+        profiler = self._profiler
+        if profiler is None:
+            return self.realize()
+        start = time.perf_counter()
+        res = self.realize()
+        profiler.record('realize', self.strategy_id, time.perf_counter() - start)
+        return res
+
+    def _update_indicator_rows(self, window_indices: dict, window_index: int) -> None:
+        """ 记录当前数据窗口最后一行在数据缓存中的行号，供indicator()从技术指标缓存中取值"""
+        if self._indicator_cache is None:
+            return
+        rows = {}
+        for dtype_name in self.data_types:
+            start = window_indices[dtype_name][window_index]
+            if start >= 0:
+                rows[dtype_name] = start + self._data_WL[dtype_name] - 1
+        self._indicator_rows = rows
+
+    def indicator(self, func: Union[str, Callable], data: Union[str, List[str], Tuple[str, ...]], *args, **kwargs):
+        """ 在策略的realize()中获取技术指标，结果与get_data()得到的数据窗口对齐
+
+        由Operator运行策略时，技术指标在完整的数据缓存上只计算一次并缓存，各个运行时间点上直接从缓存中
+        取出与当前数据窗口对齐的部分，而不是在每个数据窗口上重新计算；同一个Operator中的策略共用缓存。
+        取出的结果中，在数据窗口上计算时因前置数据不足而为NaN的行同样为NaN，因此对于SMA、WMA、BBANDS等
+        只依赖固定长度前置数据的指标，结果与在数据窗口上直接计算相同；对于EMA、KAMA、MACD等递归计算的指标，
+        缓存中的结果使用了数据窗口之前的全部历史数据，与在数据窗口上直接计算的结果略有不同。
+        没有技术指标缓存时（例如直接调用generate()或在realize_all()中），在当前数据上直接计算；数据缓存中
+        当前数据窗口的最后一行及以前有非前导的nan值时（例如停牌造成的缺失数据），同样在数据窗口上直接计算。
+
+        Parameters
+        ----------
+        func: str or Callable
+            技术指标函数，可以是qteasy.tafuncs中的函数名，如'sma'、'bbands'，也可以是形式相同的函数，
+            即以一个或多个一维数组和指标参数为输入，输出一个或多个（tuple）与输入等长的一维数组
+        data: str or list of str
+            技术指标使用的历史数据类型ID，如'close_E_d'，多个数据类型按照函数参数的顺序排列，也可以是逗号
+            分隔的字符串，如'high_E_d, low_E_d'；策略中只有一个同名数据类型时可以只给出数据名称，如'close'
+        *args, **kwargs:
+            技术指标的参数，参数必须可以hash
+
+        Returns
+        -------
+        np.ndarray or tuple of np.ndarray
+            与数据窗口形状相同的只读技术指标数组，技术指标有多个输出时返回tuple
+
+        Raises
+        ------
+        ValueError
+            func不是qteasy.tafuncs中的函数，或data不是策略的数据类型时
+        TypeError
+            func不是str或Callable时
+
+        Examples
+        --------
+        >>> class MyTiming(RuleIterator):
+        ...     def realize(self):
+        ...         close = self.get_data('close_E_d')
+        ...         return 1 if self.indicator('sma', 'close', 20)[-1] < close[-1] else 0
+        """
+        func_obj, dtype_ids = self._resolve_indicator(func, data)
+
+        cache = self._indicator_cache
+        rows = self._indicator_rows
+        end_row = None
+        if (cache is not None) and (rows is not None):
+            end_row = rows.get(dtype_ids[0])
+            window_length = self._data_WL[dtype_ids[0]]
+            for dtype_id in dtype_ids[1:]:
+                if (rows.get(dtype_id) != end_row) or (self._data_WL[dtype_id] != window_length):
+                    end_row = None
+            if (end_row is not None) and (not cache.has_data(dtype_ids)):
+                end_row = None
+            if (end_row is not None) and \
+                    (np.min(cache.interior_nan_rows(dtype_ids)[self._indicator_share]) <= end_row):
+                end_row = None
+        if end_row is None:
+            return _apply_by_columns(func_obj, [self.get_data(dtype_id) for dtype_id in dtype_ids], args, kwargs)
+
+        key, values = cache.get(func_obj, dtype_ids, args, kwargs)
+        lookback = cache.lookback(key, window_length, values)
+        outputs = []
+        for output in values:
+            output = output[end_row - window_length + 1:end_row + 1, self._indicator_share]
+            if lookback > 0:
+                output = output.copy()
+                output[:lookback] = np.nan
+                output.flags.writeable = False
+            outputs.append(output)
+        return tuple(outputs) if len(outputs) > 1 else outputs[0]
+
+    def _resolve_indicator(self, func: Union[str, Callable], data: Union[str, List[str], Tuple[str, ...]]) -> tuple:
+        """ 将indicator()的func和data参数转换为技术指标函数和数据类型ID，结果按照参数缓存"""
+        spec_key = (func, data if isinstance(data, str) else tuple(data))
+        spec = self._indicator_specs.get(spec_key)
+        if spec is not None:
+            return spec
+        if isinstance(func, str):
+            func_obj = getattr(tafuncs, func, None)
+            if (not callable(func_obj)) or func.startswith('_'):
+                raise ValueError(f'{func} is not a technical indicator function in qteasy.tafuncs')
+        elif callable(func):
+            func_obj = func
+        else:
+            raise TypeError(f'func should be a function name or a callable, got {type(func)} instead')
+        names = str_to_list(data) if isinstance(data, str) else list(data)
+        if not names:
+            raise ValueError('at least one data type id must be provided')
+        dtype_ids = tuple(self._resolve_data_type_id(name) for name in names)
+        self._indicator_specs[spec_key] = (func_obj, dtype_ids)
+        return func_obj, dtype_ids
+
+    def _resolve_data_type_id(self, name: str) -> str:
+        """ 将数据名称转换为策略的数据类型ID，name本身是数据类型ID时直接返回"""
+        if name in self.data_type_ids:
+            return name
+        matched = [dtype_id for dtype_id, dtype in self.data_types.items() if dtype.name == name]
+        if len(matched) != 1:
+            raise ValueError(f'{name} does not match exactly one data type of strategy {self.name}, '
+                             f'available data types: {self.data_type_ids}')
+        return matched[0]
+
+    @property
+    def has_realize_all(self) -> bool:
+        """策略是否实现了realize_all()方法，可以一次性生成整段时间轴上的交易信号"""
+        return type(self).realize_all is not BaseStrategy.realize_all
+
+    def realize_all(self):
+        """ 可选的策略方法：一次性计算整段时间轴上所有运行时间点的策略输出
+
+        与逐步调用的realize()不同，调用realize_all()时策略的历史数据不是某一个时间点的数据窗口，而是
+        完整的数据缓存：get_data()得到的数组的第r行为数据缓存的第r行，realize_all()返回的数组的第r行必须
+        等于以数据缓存第r行为最后一行的数据窗口上调用realize()的结果（允许浮点数计算误差）。Operator会从
+        中选出每个运行时间点对应的行作为策略输出。对于使用移动平均等滑动指标的策略，整段时间轴的指标只需要
+        计算一次，不必在每个运行时间点上重新计算整个窗口。
+
+        realize_all()的返回值形式与策略类型有关：
+        - RuleIterator: 对单个股票调用，返回长度等于数据缓存行数的一维数组
+        - FactorSorter: 返回形状为(数据缓存行数, 股票数量)的因子矩阵，选股逻辑由策略基类完成
+        - GeneralStg: 返回形状为(数据缓存行数, 股票数量)的交易信号矩阵
+
+        默认不实现（返回None），此时策略逐个运行时间点调用realize()生成信号；在当前参数下无法一次性生成
+        信号时（例如某些参数取值下指标依赖于窗口起点），realize_all()也可以返回None，使策略回到逐步运行。
+
+        Returns
+        -------
+        np.ndarray or None
+        """
+        return None
+
+    def _set_full_data(self, data_buffers: dict, share_index: Union[int, slice, np.ndarray, None] = None) -> None:
+        """ 将策略的历史数据设置为完整的数据缓存，share_index不为None时仅设置这些股票的数据"""
+        for dtype_name in self.data_types:
+            data = data_buffers[dtype_name]
+            setattr(self, dtype_name, data if share_index is None else data[:, share_index])
+        self._indicator_rows = None
+
+    def generate_all(self, data_buffers: dict, rows: np.ndarray) -> Union[np.ndarray, None]:
+        """ 调用realize_all()一次性生成rows指定的所有运行时间点的策略输出
+
+        Parameters
+        ----------
+        data_buffers: dict of {str: np.ndarray}
+            策略所需的完整数据缓存，键为数据类型ID，值为形状为(数据缓存行数, 股票数量)的数组
+        rows: np.ndarray
+            每个运行时间点的数据窗口最后一行在数据缓存中的行号
+
+        Returns
+        -------
+        np.ndarray or None
+            形状为(运行时间点数量, 股票数量)的策略输出，策略不支持一次性生成信号时返回None
+        """
+        self._set_full_data(data_buffers)
+        signals = self.realize_all()
+        if signals is None:
+            return None
+        signals = np.asarray(signals, dtype=float)
+        if signals.ndim != 2 or signals.shape[1] != self.share_count:
+            raise ValueError(f'realize_all() of strategy {self.name} should return an array with shape '
+                             f'(rows, {self.share_count}), got {signals.shape} instead')
+        return signals[rows]
+
+    @property
+    def has_realize_batch(self) -> bool:
+        """策略是否实现了realize_batch()方法，可以在同一个数据窗口上一次计算多组参数的输出"""
+        return type(self).realize_batch is not BaseStrategy.realize_batch
+
+    def realize_batch(self, par_batch: dict):
+        """ 可选的策略方法：在当前数据窗口上一次计算多组策略参数的策略输出
+
+        参数优化时，Operator.run_all_steps_batch()在每个运行时间点上只设置一次数据窗口，然后调用本方法
+        一次得到所有参数组的输出，而不是逐组设置参数并调用realize()。par_batch中每个参数的值是一个数组，
+        数组的第k个元素为第k组参数中该参数的值。返回数组的第k行必须等于使用第k组参数调用realize()的结果。
+
+        realize_batch()的返回值形式与策略类型有关：
+        - RuleIterator: 对单个股票调用，返回长度为参数组数的一维数组；vectorized=True时返回
+          形状为(参数组数, 股票数量)的数组
+        - FactorSorter: 返回形状为(参数组数, 股票数量)的因子矩阵，选股逻辑由策略基类完成
+        - GeneralStg: 返回形状为(参数组数, 股票数量)的交易信号矩阵
+
+        默认不实现（返回None），此时Operator逐组设置参数并调用realize()。
+
+        Parameters
+        ----------
+        par_batch: dict of {str: np.ndarray}
+            键为参数名，值为各组参数中该参数的值组成的一维数组
+
+        Returns
+        -------
+        np.ndarray or None
+        """
+        return None
+
+    def get_par_batch(self, par_values_list: list) -> dict:
+        """ 将多组策略参数整理为realize_batch()使用的{参数名: 参数值数组}形式
+
+        Parameters
+        ----------
+        par_values_list: list of tuple
+            多组策略参数，每组参数是一个按照参数顺序排列的tuple
+
+        Returns
+        -------
+        dict of {str: np.ndarray}
+        """
+        par_batch = {}
+        for i, par_name in enumerate(self.par_names):
+            values = [par_values[i] for par_values in par_values_list]
+            if all(isinstance(value, (int, float, np.integer, np.floating)) for value in values):
+                par_batch[par_name] = np.array(values)
+            else:
+                # 枚举型参数的值可能是tuple等对象，保存为一维的object数组
+                par_batch[par_name] = np.empty(len(values), dtype=object)
+                par_batch[par_name][:] = values
+        return par_batch
+
+    def _check_batch_output(self, output, batch_size: int) -> np.ndarray:
+        """ 检查realize_batch()输出的形状是否为(参数组数, 股票数量)"""
+        output = np.asarray(output, dtype=float)
+        if output.shape != (batch_size, self.share_count):
+            raise ValueError(f'realize_batch() of strategy {self.name} should return an array with shape '
+                             f'({batch_size}, {self.share_count}), got {output.shape} instead')
+        return output
+
+    def generate_batch(self, par_batch: dict) -> Union[np.ndarray, None]:
+        """ 调用realize_batch()在当前数据窗口上一次生成多组参数的策略输出
+
+        Parameters
+        ----------
+        par_batch: dict of {str: np.ndarray}
+            多组策略参数，参见realize_batch()
+
+        Returns
+        -------
+        np.ndarray or None
+            形状为(参数组数, 股票数量)的策略输出，策略不支持一次计算多组参数时返回None
+        """
+        signals = self.realize_batch(par_batch)
+        if signals is None:
+            return None
+        return self._check_batch_output(signals, len(next(iter(par_batch.values()))))
 
     def set_custom_pars(self, **kwargs):
         """如果还有其他策略参数或用户自定义参数，在这里设置"""
@@ -1207,7 +1655,7 @@ class GeneralStg(BaseStrategy):
     def generate(self):
         """ 通用交易策略的所有策略代码全部都在realize中实现
         """
-        return self.realize()
+        return self._run_realize()
 
     @abstractmethod
     def realize(self):
@@ -1218,6 +1666,143 @@ class GeneralStg(BaseStrategy):
         pass
 
 
+# FactorSorter的选股条件与权重分配方式，在编译的选股函数中以序号表示
+FACTOR_SORTER_CONDITIONS = ('any', 'greater', 'less', 'between', 'not_between')
+FACTOR_SORTER_WEIGHTINGS = ('even', 'linear', 'distance', 'proportion', 'ones')
+
+
+@njit(nogil=True, cache=True, error_model='numpy')
+def _select_factor_rows(factors: np.ndarray,
+                        sel_count: int,
+                        condition: int,
+                        lbound: float,
+                        ubound: float,
+                        sort_ascending: bool,
+                        weighting: int) -> np.ndarray:
+    """ 对因子矩阵的每一行分别筛选、排序并分配选股权重，参见FactorSorter._select_by_factor_matrix()
+
+    Parameters
+    ----------
+    factors: np.ndarray
+        形状为(行数, 股票数量)的选股因子，不会被修改
+    sel_count: int
+        每一行最多选中的股票数量
+    condition: int
+        选股条件在FACTOR_SORTER_CONDITIONS中的序号
+    lbound: float
+        选股条件的下界
+    ubound: float
+        选股条件的上界
+    sort_ascending: bool
+        True时选择因子最小的股票，False时选择因子最大的股票
+    weighting: int
+        权重分配方式在FACTOR_SORTER_WEIGHTINGS中的序号
+
+    Returns
+    -------
+    np.ndarray
+        形状与factors相同的选股权重
+    """
+    row_count, share_count = factors.shape
+    chosen = np.zeros((row_count, share_count))
+    row = np.empty(share_count)
+    for i in range(row_count):
+        # 不符合选股条件的因子设置为nan
+        valid_count = 0
+        for j in range(share_count):
+            value = factors[i, j]
+            if condition == 1:
+                if value < ubound:
+                    value = np.nan
+            elif condition == 2:
+                if value > lbound:
+                    value = np.nan
+            elif condition == 3:
+                if (value < lbound) or (value > ubound):
+                    value = np.nan
+            elif condition == 4:
+                if (value > lbound) and (value < ubound):
+                    value = np.nan
+            row[j] = value
+            if not np.isnan(value):
+                valid_count += 1
+        if valid_count == 0:
+            continue
+        # 用部分排序找到第sel_count小（或大）的有效因子作为门限，选出最小或最大的sel_count个有效因子，
+        #  只对选中的因子排序，被选中的股票按因子从小到大排列
+        arg_count = min(sel_count, valid_count)
+        valid_values = np.empty(valid_count)
+        k = 0
+        for j in range(share_count):
+            if not np.isnan(row[j]):
+                valid_values[k] = row[j]
+                k += 1
+        kth = arg_count - 1 if sort_ascending else valid_count - arg_count
+        threshold = np.partition(valid_values, kth)[kth]
+        candidates = np.empty(arg_count, dtype=np.int64)
+        k = 0
+        for j in range(share_count):
+            if (sort_ascending and row[j] < threshold) or ((not sort_ascending) and row[j] > threshold):
+                candidates[k] = j
+                k += 1
+        for j in range(share_count):
+            if k == arg_count:
+                break
+            if row[j] == threshold:
+                candidates[k] = j
+                k += 1
+        if (weighting == 0) or (weighting == 4):
+            # 平均分配或全1分配时，权重与选中股票的次序无关
+            args = candidates
+        else:
+            args = candidates[np.argsort(row[candidates], kind='mergesort')]
+
+        if weighting == 4:  # ones
+            for t in range(arg_count):
+                chosen[i, args[t]] = 1.
+        elif weighting == 1:  # linear
+            step = 2. / arg_count
+            total = 0.
+            for t in range(arg_count):
+                total += 1. + t * step
+            for t in range(arg_count):
+                chosen[i, args[t]] = (1. + t * step) / total
+        elif weighting == 2:  # distance
+            d_min = row[args[0]]
+            d_max = row[args[arg_count - 1]]
+            d = d_max - d_min
+            total = 0.
+            all_zero = True
+            for t in range(arg_count):
+                if not sort_ascending:
+                    dist = row[args[t]] - d_min + d / 10.
+                else:
+                    dist = d_max - row[args[t]] + d / 10.
+                row[args[t]] = dist
+                total += dist
+                if dist != 0.:
+                    all_zero = False
+            for t in range(arg_count):
+                if all_zero:
+                    chosen[i, args[t]] = 1. / arg_count
+                elif total == 0.:
+                    chosen[i, args[t]] = row[args[t]] / arg_count
+                else:
+                    chosen[i, args[t]] = row[args[t]] / total
+        elif weighting == 3:  # proportion
+            total = 0.
+            for t in range(arg_count):
+                if row[args[t]] < 0.:
+                    row[args[t]] = 0.
+                total += row[args[t]]
+            for t in range(arg_count):
+                chosen[i, args[t]] = row[args[t]] / total
+        else:  # even
+            for t in range(arg_count):
+                chosen[i, args[t]] = 1. / arg_count
+    return chosen
+
+
 class FactorSorter(BaseStrategy):
     """ 因子排序选股策略，根据用户定义的选股因子筛选排序后确定每个股票的选股权重(请注意，FactorSorter策略
         生成的交易信号在0到1之间，推荐设置signal_type为"PT")
@@ -1227,6 +1812,13 @@ class FactorSorter(BaseStrategy):
     策略会根据预设的条件，从中筛选出符合标准的因子，并将剩下的因子排序，从中选择特定数量的股票，最后根据它
     们的因子值分配权重或信号值。关于Strategy类的更详细说明，请参见qteasy的文档。
 
+    在realize()中对因子做截面预处理（排名、标准化、去极值、行业中性化等）时，可以直接使用
+    qteasy.csfuncs中的向量化截面算子。策略历史数据窗口的形状为(日期, 股票)，截面位于axis=1；
+    对最终的一维因子（每只股票一个值）则无需指定axis，例如：
+
+        from qteasy.csfuncs import cs_winsorize, cs_zscore
+        factor = cs_zscore(cs_winsorize(pe[-1], lower=0.05, upper=0.95))
+
     """
     __metaclass__ = ABCMeta
 
@@ -1299,113 +1891,123 @@ class FactorSorter(BaseStrategy):
         chosen: numpy.ndarray
             一个一维向量，代表一个周期内股票的投资组合权重，所有权重的和为1
         """
-        pct = self.max_sel_count
-        condition = self.condition
-        lbound = self.lbound
-        ubound = self.ubound
-        sort_ascending = self.sort_ascending  # True: 选择最小的，Fals: 选择最大的
-        weighting = self.weighting
-
         # 获取realize()方法计算得到的选股因子
-        factors = self.realize()
-
-        share_count = factors.shape[0]
-        if pct < 1:
-            # pct 参数小于1时，代表目标投资组合在所有投资产品中所占的比例，如0.5代表需要选中50%的投资产品
-            pct = int(share_count * pct)
-        else:  # pct 参数大于1时，取整后代表目标投资组合中投资产品的数量，如5代表需要选中5只投资产品
-            pct = int(pct)
-        if pct < 1:
-            pct = 1
-
-        # factors必须是一维向量，如果因子是二维向量，允许shape为(N, 1)型，此时将其转换为一维向量，否则报错
+        factors = self._run_realize()
+        return self._select_by_factors(factors)
+
+    def generate_all(self, data_buffers: dict, rows: np.ndarray) -> Union[np.ndarray, None]:
+        """ 调用realize_all()一次性计算所有运行时间点的选股因子，再逐个时间点完成选股
+
+        Parameters
+        ----------
+        data_buffers: dict of {str: np.ndarray}
+            策略所需的完整数据缓存，键为数据类型ID，值为形状为(数据缓存行数, 股票数量)的数组
+        rows: np.ndarray
+            每个运行时间点的数据窗口最后一行在数据缓存中的行号
+
+        Returns
+        -------
+        np.ndarray or None
+            形状为(运行时间点数量, 股票数量)的选股权重，策略不支持一次性生成因子时返回None
+        """
+        self._set_full_data(data_buffers)
+        factors = self.realize_all()
+        if factors is None:
+            return None
+        factors = np.asarray(factors, dtype=float)
+        if factors.ndim != 2 or factors.shape[1] != self.share_count:
+            raise ValueError(f'realize_all() of strategy {self.name} should return an array with shape '
+                             f'(rows, {self.share_count}), got {factors.shape} instead')
+        return self._select_by_factor_matrix(factors[rows])
+
+    def generate_batch(self, par_batch: dict) -> Union[np.ndarray, None]:
+        """ 调用realize_batch()在当前数据窗口上一次计算多组参数的选股因子，再逐组完成选股
+
+        Parameters
+        ----------
+        par_batch: dict of {str: np.ndarray}
+            多组策略参数，参见realize_batch()
+
+        Returns
+        -------
+        np.ndarray or None
+            形状为(参数组数, 股票数量)的选股权重，策略不支持一次计算多组参数时返回None
+        """
+        factors = self.realize_batch(par_batch)
+        if factors is None:
+            return None
+        factors = self._check_batch_output(factors, len(next(iter(par_batch.values()))))
+        return self._select_by_factor_matrix(factors)
+
+    def _select_by_factors(self, factors: np.ndarray) -> np.ndarray:
+        """ 按照选股条件筛选并排序选股因子，确定每个股票的选股权重
+
+        Parameters
+        ----------
+        factors: np.ndarray
+            一维向量，每个股票的选股因子，也可以是形状为(N, 1)的二维数组
+
+        Returns
+        -------
+        chosen: numpy.ndarray
+            一个一维向量，代表一个周期内股票的投资组合权重
+        """
+        factors = np.asarray(factors, dtype=float)
+        # factors必须是一维向量，如果因子是二维向量，允许shape为(N, 1)型，此时将其转换为一维向量
         if factors.ndim == 2:
             factors = factors.flatten()
+        return self._select_by_factor_matrix(factors[np.newaxis, :])[0]
 
-        chosen = np.zeros_like(factors)
-        # 筛选出不符合要求的指标，将他们设置为nan值
-        if condition == 'any':
-            pass
-        elif condition == 'greater':
-            factors[np.where(factors < ubound)] = np.nan
-        elif condition == 'less':
-            factors[np.where(factors > lbound)] = np.nan
-        elif condition == 'between':
-            factors[np.where((factors < lbound) | (factors > ubound))] = np.nan
-        elif condition == 'not_between':
-            factors[np.where((factors > lbound) & (factors < ubound))] = np.nan
-        else:
-            raise ValueError(f'invalid selection condition \'{condition}\''
-                             f'should be one of ["any", "greater", "less", "between", "not_between"]')
-        nan_count = np.isnan(factors).astype('int').sum()  # 清点数据，获取nan值的数量
-        if nan_count == share_count:  # 当indices全部为nan，导致没有有意义的参数可选，此时直接返回全0值
-            return chosen
-        if not sort_ascending:
-            # 选择分数最高的部分个股，由于np排序时会把NaN值与最大值排到一起，总数需要加上NaN值的数量
-            pos = max(share_count - pct - nan_count, 0)
-        else:  # 选择分数最低的部分个股
-            pos = pct
-        # 对数据进行排序，并把排位靠前者的序号存储在arg_found中
-        if weighting == 'even':
-            # 仅当投资比例为均匀分配时，才可以使用速度更快的argpartition方法进行粗略排序
-            if not sort_ascending:
-                share_found = factors.argpartition(pos)[pos:]
-            else:
-                share_found = factors.argpartition(pos)[:pos]
-        else:  # 如果采用其他投资比例分配方式时，必须使用较慢的全排序
-            if not sort_ascending:
-                share_found = factors.argsort()[pos:]
-            else:
-                share_found = factors.argsort()[:pos]
-        # nan值数据的序号存储在arg_nan中
-        share_nan = np.where(np.isnan(factors))[0]
-        # 使用集合操作从arg_found中剔除arg_nan，使用assume_unique参数可以提高效率
-        args = np.setdiff1d(share_found, share_nan, assume_unique=True)
-        # 构造输出向量，初始值为全0
-        arg_count = len(args)
-        # 如果符合条件的选项数量为0，则直接返回全0
-        if arg_count == 0:
-            return chosen
-        # 根据投资组合比例分配方式，确定被选中产品的权重
-
-        # ones：全1分配，所有中选股票在组合中权重相同且全部为1
-        if weighting == 'ones':
-            chosen[args] = 1.
-        # linear 线性比例分配，将所有分值排序后，股票的比例呈线性分布
-        elif weighting == 'linear':
-            dist = np.arange(1, 3, 2. / arg_count)  # 生成一个线性序列，最大值为最小值的约三倍
-            chosen[args] = dist / dist.sum()  # 将比率填入输出向量中
-        # distance：距离分配，权重与其分值距离成正比，分值最低者获得一个基础比例，其余股票的比例
-        #  与其分值的距离成正比，分值的距离为它与最低分之间的差值，因此不管分值是否大于0，股票都能
-        #  获取比例分配
-        elif weighting == 'distance':
-            dist = factors[args]
-            d_max = dist[-1]
-            d_min = dist[0]
-            d = d_max - d_min
-            if not sort_ascending:
-                dist = dist - d_min + d / 10.
-            else:
-                dist = d_max - dist + d / 10.
-            d_sum = dist.sum()
-            if ~np.any(dist):  # if all distances are zero
-                chosen[args] = 1 / len(dist)
-            elif d_sum == 0:  # if not all distances are zero but sum is zero
-                chosen[args] = dist / len(dist)
-            else:
-                chosen[args] = dist / d_sum
-        # proportion：比例分配，权重与其分值成正比，分值为0或小于0者比例为0
-        elif weighting == 'proportion':
-            f = factors[args]
-            f = np.where(f < 0, 0, f)  # np.where 比 np.clip(0) 速度快得多
-            chosen[args] = f / f.sum()
-        # even：均匀分配，所有中选股票在组合中权重相同
-        elif weighting == 'even':
-            chosen[args] = 1. / arg_count
-        else:
-            raise KeyError(f'invalid weighting type: "{weighting}". '
-                           f'should be one of ["ones", "linear", "distance", "proportion", "even"]')
-        return chosen
+    def _select_by_factor_matrix(self, factors: np.ndarray) -> np.ndarray:
+        """ 对多个运行时间点（或多组参数）的选股因子一次性完成筛选、排序和权重分配
+
+        矩阵的每一行相当于一个时间点上的选股因子：不符合condition的因子被视为nan，在剩余的因子中按照
+        sort_ascending选出max_sel_count个股票，再按照weighting分配权重。所有行在编译的函数中一次完成，
+        每一行的结果与单独对该行选股相同。
+
+        Parameters
+        ----------
+        factors: np.ndarray
+            形状为(行数, 股票数量)的选股因子
+
+        Returns
+        -------
+        chosen: numpy.ndarray
+            形状与factors相同的选股权重
+
+        Raises
+        ------
+        ValueError
+            选股条件condition不合法时
+        KeyError
+            权重分配方式weighting不合法时
+        """
+        if self.condition not in FACTOR_SORTER_CONDITIONS:
+            raise ValueError(f'invalid selection condition \'{self.condition}\''
+                             f'should be one of {list(FACTOR_SORTER_CONDITIONS)}')
+        if self.weighting not in FACTOR_SORTER_WEIGHTINGS:
+            raise KeyError(f'invalid weighting type: "{self.weighting}". '
+                           f'should be one of {list(FACTOR_SORTER_WEIGHTINGS)}')
+        factors = np.ascontiguousarray(factors, dtype=float)
+        share_count = factors.shape[1]
+        sel_count = self.max_sel_count
+        if sel_count < 1:
+            # max_sel_count 参数小于1时，代表目标投资组合在所有投资产品中所占的比例，如0.5代表需要选中50%的投资产品
+            sel_count = int(share_count * sel_count)
+        else:  # max_sel_count 参数大于1时，取整后代表目标投资组合中投资产品的数量，如5代表需要选中5只投资产品
+            sel_count = int(sel_count)
+        if sel_count < 1:
+            sel_count = 1
+
+        return _select_factor_rows(
+                factors,
+                sel_count,
+                FACTOR_SORTER_CONDITIONS.index(self.condition),
+                float(self.lbound),
+                float(self.ubound),
+                bool(self.sort_ascending),
+                FACTOR_SORTER_WEIGHTINGS.index(self.weighting),
+        )
 
     @abstractmethod
     def realize(self):
@@ -1420,6 +2022,10 @@ class RuleIterator(BaseStrategy):
     例如，用户可以设计一个均线交叉策略，并将其应用到投资组合中的所有股票上，同时可以为每只股票
     设定不同的均线周期参数。关于Strategy类的更详细说明，请参见qteasy的文档。
 
+    默认情况下realize()对每只股票分别调用一次，得到的历史数据是一维数组。设置vectorized=True后，
+    使用同一组参数的所有股票在同一次realize()调用中计算：历史数据是形状为(窗口长度, 股票数量)的二维
+    数组，realize()需要返回每只股票一个值的一维数组。
+
     """
     __metaclass__ = ABCMeta
 
@@ -1427,6 +2033,7 @@ class RuleIterator(BaseStrategy):
                  name: str = 'Rule-Iterator',
                  description: str = 'description of rule iterator strategy',
                  allow_multi_par: bool = True,
+                 vectorized: bool = False,
                  **kwargs):
         super().__init__(name=name,
                          description=description,
@@ -1435,6 +2042,8 @@ class RuleIterator(BaseStrategy):
         self._data_windows = {}
         self.allow_multi_par = allow_multi_par  # 设置为True，表示策略可以对不同的股票使用不同的参数
         self.multi_pars = None
+        self.vectorized = vectorized  # 设置为True，表示realize()同时处理使用同一组参数的所有股票
+        self._share_groups = None  # 按参数分组的股票序号缓存，(multi_pars, share_count, 分组列表)
 
     def info(self, verbose: bool = False, stg_id=None, **kwargs):
         """ display more FactorSorter-specific properties
@@ -1584,6 +2193,122 @@ class RuleIterator(BaseStrategy):
         for dtype_name in self.data_types:
             data_window = data_windows[dtype_name][window_indices[dtype_name][window_index]]
             self._data_windows[dtype_name] = data_window
+        self._update_indicator_rows(window_indices, window_index)
+
+    def generate_all(self, data_buffers: dict, rows: np.ndarray) -> Union[np.ndarray, None]:
+        """ 逐个股票调用realize_all()，一次性生成rows指定的所有运行时间点的交易信号
+
+        Parameters
+        ----------
+        data_buffers: dict of {str: np.ndarray}
+            策略所需的完整数据缓存，键为数据类型ID，值为形状为(数据缓存行数, 股票数量)的数组
+        rows: np.ndarray
+            每个运行时间点的数据窗口最后一行在数据缓存中的行号
+
+        Returns
+        -------
+        np.ndarray or None
+            形状为(运行时间点数量, 股票数量)的交易信号，策略不支持一次性生成信号时返回None
+        """
+        signals = np.empty((len(rows), self.share_count), dtype=float)
+        if self.vectorized:
+            for par, share_indices in self.get_share_groups():
+                if par is not None:
+                    self.update_par_values(*par)
+                self._set_full_data(data_buffers, share_index=share_indices)
+                group_signal = self.realize_all()
+                if group_signal is None:
+                    return None
+                group_signal = np.asarray(group_signal, dtype=float)
+                if group_signal.ndim != 2:
+                    raise ValueError(f'realize_all() of vectorized strategy {self.name} should return '
+                                     f'a 2D array, got {group_signal.ndim}D array instead')
+                signals[:, share_indices] = group_signal[rows]
+            return signals
+
+        for i in range(self.share_count):
+            if self.allow_multi_par and self.multi_pars:
+                # 如果允许多参数，则为每个股票使用不同的参数
+                par = self.multi_pars[i]
+                self.update_par_values(*par)
+            self._set_full_data(data_buffers, share_index=i)
+            share_signal = self.realize_all()
+            if share_signal is None:
+                return None
+            share_signal = np.asarray(share_signal, dtype=float)
+            if share_signal.ndim != 1:
+                raise ValueError(f'realize_all() of strategy {self.name} should return a 1D array, '
+                                 f'got {share_signal.ndim}D array instead')
+            signals[:, i] = share_signal[rows]
+        return signals
+
+    def generate_batch(self, par_batch: dict) -> Union[np.ndarray, None]:
+        """ 逐个股票调用realize_batch()，在当前数据窗口上一次生成多组参数的交易信号
+
+        为每个股票设置了不同参数（multi_pars）时，策略参数不随参数组变化，返回None
+
+        Parameters
+        ----------
+        par_batch: dict of {str: np.ndarray}
+            多组策略参数，参见realize_batch()
+
+        Returns
+        -------
+        np.ndarray or None
+            形状为(参数组数, 股票数量)的交易信号，策略不支持一次计算多组参数时返回None
+        """
+        if self.allow_multi_par and self.multi_pars:
+            return None
+        batch_size = len(next(iter(par_batch.values())))
+        if self.vectorized:
+            for dtype_name in self.data_types:
+                setattr(self, dtype_name, self._data_windows[dtype_name])
+            signals = self.realize_batch(par_batch)
+            if signals is None:
+                return None
+            return self._check_batch_output(signals, batch_size)
+
+        signals = np.empty((batch_size, self.share_count), dtype=float)
+        for i in range(self.share_count):
+            for dtype_name in self.data_types:
+                setattr(self, dtype_name, self._data_windows[dtype_name][:, i])
+            self._indicator_share = i
+            share_signal = self.realize_batch(par_batch)
+            if share_signal is None:
+                self._indicator_share = slice(None)
+                return None
+            share_signal = np.asarray(share_signal, dtype=float)
+            if share_signal.shape != (batch_size,):
+                raise ValueError(f'realize_batch() of strategy {self.name} should return an array with shape '
+                                 f'({batch_size},), got {share_signal.shape} instead')
+            signals[:, i] = share_signal
+        self._indicator_share = slice(None)
+        return signals
+
+    def get_share_groups(self) -> list:
+        """ 将股票按照使用的参数分组，返回[(参数, 股票序号), ...]
+
+        没有设置multi_pars时所有股票使用策略当前的参数，此时只有一个分组，参数为None，股票序号为
+        slice(None)，取数据时得到的是原数组的视图。分组结果被缓存，直到multi_pars或股票数量发生变化。
+
+        Returns
+        -------
+        list of tuple (tuple or None, slice or np.ndarray)
+        """
+        cache = self._share_groups
+        if (cache is not None) and (cache[0] is self.multi_pars) and (cache[1] == self.share_count):
+            return cache[2]
+        if not (self.allow_multi_par and self.multi_pars):
+            groups = [(None, slice(None))]
+        elif len(set(self.multi_pars)) == 1:
+            groups = [(self.multi_pars[0], slice(None))]
+        else:
+            share_indices = {}
+            for i, par in enumerate(self.multi_pars):
+                share_indices.setdefault(par, []).append(i)
+            groups = [(par, np.array(indices)) for par, indices in share_indices.items()]
+        self._share_groups = (self.multi_pars, self.share_count, groups)
+        return groups
 
     def generate(self):
         """ 中间构造函数，将历史数据模块传递过来的单只股票历史数据去除nan值，并进行滚动展开
@@ -1601,6 +2326,18 @@ class RuleIterator(BaseStrategy):
         # 生成iterators, 将参数送入realize_no_nan中逐个迭代后返回结果
         signal = np.empty(self.share_count, dtype=float)
 
+        if self.vectorized:
+            # 使用同一组参数的股票在同一次realize()调用中计算，历史数据为(窗口长度, 股票数量)的二维数组
+            for par, share_indices in self.get_share_groups():
+                if par is not None:
+                    self.update_par_values(*par)
+                for dtype_name in self.data_types:
+                    setattr(self, dtype_name, self._data_windows[dtype_name][:, share_indices])
+                self._indicator_share = share_indices
+                signal[share_indices] = self._run_realize()
+            self._indicator_share = slice(None)
+            return signal
+
         for i in range(self.share_count):
             if self.allow_multi_par and self.multi_pars:
                 # 如果允许多参数，则为每个股票使用不同的参数
@@ -1609,7 +2346,9 @@ class RuleIterator(BaseStrategy):
             # 更新股票使用的数据
             for dtype_name in self.data_types:
                 setattr(self, dtype_name, self._data_windows[dtype_name][:, i])
-            signal[i] = self.realize()
+            self._indicator_share = i
+            signal[i] = self._run_realize()
+        self._indicator_share = slice(None)
 
         return signal
 
@@ -12,6 +12,7 @@
 # 尝试导入ta-lib，如果导入失败，打印warning信息，设置flag: TA_LIB_AVAILABLE = False
 import numpy as np
 import warnings
+from numba import njit
 
 try:
     # noinspection PyUnresolvedReferences
@@ -442,6 +443,266 @@ def sma_no_ta(close, timeperiod=30):
     return (a - ar) / timeperiod
 
 
+# 二维批量计算内核：输入为 (时间, share) 数据块，逐列复现 ta-lib 的计算顺序，
+# 因此结果与逐股调用 ta-lib 一致 （至多相差浮点舍入误差）：每列跳过开头的 NaN 后开始计算，中间出现的 NaN 向后传播。
+@njit(nogil=True, cache=True)
+def _ta_sma_sum_kernel(data: np.ndarray, timeperiod: int, mean: bool) -> np.ndarray:
+    """按 ta-lib SMA / SUM 的累计方式逐列计算移动平均或移动求和。"""
+    n_time, n_series = data.shape
+    res = np.full((n_time, n_series), np.nan)
+    for j in range(n_series):
+        begin = 0
+        while begin < n_time and data[begin, j] != data[begin, j]:
+            begin += 1
+        if n_time - begin < timeperiod:
+            continue
+        total = 0.
+        for i in range(begin, begin + timeperiod - 1):
+            total += data[i, j]
+        trailing = begin
+        for i in range(begin + timeperiod - 1, n_time):
+            total += data[i, j]
+            res[i, j] = total / timeperiod if mean else total
+            total -= data[trailing, j]
+            trailing += 1
+    return res
+
+
+@njit(nogil=True, cache=True)
+def _ta_ema_kernel(data: np.ndarray, timeperiod: int) -> np.ndarray:
+    """按 ta-lib EMA 的方式逐列计算指数移动平均：以首个窗口的简单平均为初值，之后递推。"""
+    n_time, n_series = data.shape
+    res = np.full((n_time, n_series), np.nan)
+    k = 2. / (timeperiod + 1)
+    for j in range(n_series):
+        begin = 0
+        while begin < n_time and data[begin, j] != data[begin, j]:
+            begin += 1
+        if n_time - begin < timeperiod:
+            continue
+        total = 0.
+        for i in range(begin, begin + timeperiod):
+            total += data[i, j]
+        prev = total / timeperiod
+        res[begin + timeperiod - 1, j] = prev
+        for i in range(begin + timeperiod, n_time):
+            prev = ((data[i, j] - prev) * k) + prev
+            res[i, j] = prev
+    return res
+
+
+@njit(nogil=True, cache=True)
+def _ta_sarext_kernel(high: np.ndarray,
+                      low: np.ndarray,
+                      start_value: float,
+                      offset_on_reverse: float,
+                      af_init_long: float = 0.02,
+                      af_step_long: float = 0.02,
+                      af_max_long: float = 0.2,
+                      af_init_short: float = 0.02,
+                      af_step_short: float = 0.02,
+                      af_max_short: float = 0.2) -> np.ndarray:
+    """按 ta-lib SAREXT 的方式逐列计算扩展抛物线SAR：多头时输出正值，空头时输出负值。
+
+    start_value 为 0 时根据前两个周期的 -DM 判断初始方向，大于 0 时初始为多头并以其为初始 SAR，
+    小于 0 时初始为空头并以其绝对值为初始 SAR；offset_on_reverse 为反转时 SAR 的偏移比例。
+    """
+    n_time, n_series = high.shape
+    res = np.full((n_time, n_series), np.nan)
+    if af_init_long > af_max_long:
+        af_init_long = af_max_long
+    if af_step_long > af_max_long:
+        af_step_long = af_max_long
+    if af_init_short > af_max_short:
+        af_init_short = af_max_short
+    if af_step_short > af_max_short:
+        af_step_short = af_max_short
+    for j in range(n_series):
+        begin = 0
+        while begin < n_time and (high[begin, j] != high[begin, j] or low[begin, j] != low[begin, j]):
+            begin += 1
+        today = begin + 1
+        if today >= n_time:
+            continue
+        af_long = af_init_long
+        af_short = af_init_short
+        if start_value == 0:
+            diff_p = high[today, j] - high[today - 1, j]
+            diff_m = low[today - 1, j] - low[today, j]
+            is_long = not (diff_m > 0 and diff_p < diff_m)
+        else:
+            is_long = start_value > 0
+        new_high = high[today - 1, j]
+        new_low = low[today - 1, j]
+        if start_value == 0:
+            if is_long:
+                ep = high[today, j]
+                sar = new_low
+            else:
+                ep = low[today, j]
+                sar = new_high
+        elif start_value > 0:
+            ep = high[today, j]
+            sar = start_value
+        else:
+            ep = low[today, j]
+            sar = abs(start_value)
+        new_low = low[today, j]
+        new_high = high[today, j]
+        while today < n_time:
+            prev_low = new_low
+            prev_high = new_high
+            new_low = low[today, j]
+            new_high = high[today, j]
+            if is_long:
+                if new_low <= sar:
+                    is_long = False
+                    sar = ep
+                    if sar < prev_high:
+                        sar = prev_high
+                    if sar < new_high:
+                        sar = new_high
+                    if offset_on_reverse != 0:
+                        sar += sar * offset_on_reverse
+                    res[today, j] = -sar
+                    af_short = af_init_short
+                    ep = new_low
+                    sar = sar + af_short * (ep - sar)
+                    if sar < prev_high:
+                        sar = prev_high
+                    if sar < new_high:
+                        sar = new_high
+                else:
+                    res[today, j] = sar
+                    if new_high > ep:
+                        ep = new_high
+                        af_long += af_step_long
+                        if af_long > af_max_long:
+                            af_long = af_max_long
+                    sar = sar + af_long * (ep - sar)
+                    if sar > prev_low:
+                        sar = prev_low
+                    if sar > new_low:
+                        sar = new_low
+            else:
+                if new_high >= sar:
+                    is_long = True
+                    sar = ep
+                    if sar > prev_low:
+                        sar = prev_low
+                    if sar > new_low:
+                        sar = new_low
+                    if offset_on_reverse != 0:
+                        sar -= sar * offset_on_reverse
+                    res[today, j] = sar
+                    af_long = af_init_long
+                    ep = new_high
+                    sar = sar + af_long * (ep - sar)
+                    if sar > prev_low:
+                        sar = prev_low
+                    if sar > new_low:
+                        sar = new_low
+                else:
+                    res[today, j] = -sar
+                    if new_low < ep:
+                        ep = new_low
+                        af_short += af_step_short
+                        if af_short > af_max_short:
+                            af_short = af_max_short
+                    sar = sar + af_short * (ep - sar)
+                    if sar < prev_high:
+                        sar = prev_high
+                    if sar < new_high:
+                        sar = new_high
+            today += 1
+    return res
+
+
+def _check_2d_period(name, timeperiod):
+    """ 检查二维批量版本的周期参数：与ta-lib相同，周期必须是大于1的整数"""
+    if not isinstance(timeperiod, (int, np.integer)) or timeperiod < 2:
+        raise ValueError(f'For {name}, timeperiod must be an integer greater than 1, got {timeperiod} instead')
+    return int(timeperiod)
+
+
+def sma_2d(close, timeperiod=30):
+    """Simple Moving Average 简单移动平均的二维批量版本，在 (时间, 股票) 二维数组上逐列计算
+
+    每列的结果与在该列上调用sma()相同：跳过开头的nan值后开始计算，中间出现的nan值向后传播。
+    不依赖ta-lib。
+
+    Parameters
+    ----------
+    close: 2-D ndarray, 形状为 (时间, 股票数量) 的收盘价
+    timeperiod: int, 1 < timeperiod, 移动平均的周期
+
+    Return
+    ------
+    2-D ndarray; 与输入形状相同的简单移动平均值，前timeperiod - 1行为nan
+    """
+    return _ta_sma_sum_kernel(np.asarray(close), _check_2d_period('SMA', timeperiod), True)
+
+
+def sum_2d(close, timeperiod=30):
+    """Summation 移动求和的二维批量版本，在 (时间, 股票) 二维数组上逐列计算
+
+    每列的结果与在该列上调用sum()相同，nan值的处理方式与sma_2d()相同。不依赖ta-lib。
+
+    Parameters
+    ----------
+    close: 2-D ndarray, 形状为 (时间, 股票数量) 的收盘价
+    timeperiod: int, 1 < timeperiod, 求和的周期
+
+    Return
+    ------
+    2-D ndarray; 与输入形状相同的移动求和值，前timeperiod - 1行为nan
+    """
+    return _ta_sma_sum_kernel(np.asarray(close), _check_2d_period('SUM', timeperiod), False)
+
+
+def ema_2d(close, span: int = 30):
+    """Exponential Moving Average 指数移动平均的二维批量版本，在 (时间, 股票) 二维数组上逐列计算
+
+    每列的结果与在该列上调用ema()相同 （至多相差浮点舍入误差）：以第一个完整窗口的简单平均为初值，之后递推，
+    nan值的处理方式与sma_2d()相同。不依赖ta-lib。
+
+    Parameters
+    ----------
+    close: 2-D ndarray, 形状为 (时间, 股票数量) 的收盘价
+    span: int, optional, 1 < span, 跨度
+
+    Return
+    ------
+    2-D ndarray; 与输入形状相同的指数移动平均值，前span - 1行为nan
+    """
+    return _ta_ema_kernel(np.asarray(close), _check_2d_period('EMA', span))
+
+
+def sarext_2d(high, low, acceleration=0, maximum=0):
+    """Parabolic SAR Extended 扩展抛物线SAR的二维批量版本，在 (时间, 股票) 二维数组上逐列计算
+
+    每列的结果与在该列上调用sarext(high, low, acceleration, maximum)相同：多头时为正值，空头时为负值。
+    每列跳过开头的nan值后开始计算。不依赖ta-lib。
+
+    Parameters
+    ----------
+    high: 2-D ndarray, 形状为 (时间, 股票数量) 的最高价
+    low: 2-D ndarray, 与high形状相同的最低价
+    acceleration: float, 对应ta-lib SAREXT的startvalue，为0时根据前两个周期的价格变动判断初始方向，
+        大于0时初始为多头并以其为初始SAR，小于0时初始为空头并以其绝对值为初始SAR
+    maximum: float, 对应ta-lib SAREXT的offsetonreverse，反转时SAR的偏移比例
+
+    Return
+    ------
+    2-D ndarray; 与输入形状相同的扩展抛物线SAR，第一个有效行为nan
+    """
+    high = np.asarray(high)
+    low = np.asarray(low)
+    if high.shape != low.shape:
+        raise ValueError(f'high and low should have the same shape, got {high.shape} and {low.shape}')
+    return _ta_sarext_kernel(high, low, float(acceleration), float(maximum))
+
+
 def t3(close, timeperiod=5, vfactor=0):
     """Triple Exponential Moving Average 三重指数移动平均线
 
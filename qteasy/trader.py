@@ -277,6 +277,7 @@ class Trader(object):
                  daily_refill_tables: str = '',
                  weekly_refill_tables: str = '',
                  monthly_refill_tables: str = '',
+                 data_dtype: str = 'float64',
                  debug=False,
                  risk_manager: Optional[RiskManager] = None,
                  live_config: Optional[LiveTradeConfig] = None):
@@ -294,6 +295,8 @@ class Trader(object):
             数据源对象，从数据源获取数据
         submit_sell_before_buy: bool, default True
             为 True 时，在同一批解析出的订单中先提交卖出委托再提交买入委托。
+        data_dtype: {'float64', 'float32'}, default 'float64'
+            读取的历史数据及数据缓冲区的浮点精度，策略数据窗口总是float64
         debug: bool, default False
             是否打印debug信息
         risk_manager : RiskManager or None, optional
@@ -361,6 +364,7 @@ class Trader(object):
         self.daily_refill_tables = daily_refill_tables
         self.weekly_refill_tables = weekly_refill_tables
         self.monthly_refill_tables = monthly_refill_tables
+        self.data_dtype = data_dtype
 
         # ---------------- live price related -----------------
         self.live_price = None  # 用于存储本交易日最新的实时价格，用于跟踪最新价格、计算市值盈亏等
@@ -588,6 +592,7 @@ class Trader(object):
             'live_trade_daily_refill_tables':       self.daily_refill_tables,
             'live_trade_weekly_refill_tables':      self.weekly_refill_tables,
             'live_trade_monthly_refill_tables':     self.monthly_refill_tables,
+            'data_dtype':                           self.data_dtype,
             'live_trade_data_refill_batch_size':    self.live_data_batch_size,
             'live_trade_data_refill_batch_interval':self.live_data_batch_interval,
             'live_trade_data_refill_channel':       self.live_data_channel,
@@ -2203,9 +2208,7 @@ class Trader(object):
 
         # 下载最小所需实时历史数据
         max_run_freq = 'T'
-        group_timing = operator.group_timing_table.iloc[step_index].values
-        group_count = len(operator.groups)
-        groups_to_run = [operator.groups_by_index[i] for i in range(group_count) if group_timing[i]]
+        groups_to_run = operator.get_running_groups(step_index)
 
         for group in groups_to_run:
             for strategy in group.members:
@@ -2232,6 +2235,7 @@ class Trader(object):
                 datasource=self._datasource,
                 shares=self.asset_pool,
                 live_prices=self.live_price,
+                dtype=self.data_dtype,
         )
 
         self.send_message(f'read real time data and set operator data allocation', debug=True)
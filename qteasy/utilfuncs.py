@@ -9,11 +9,14 @@
 # ======================================
 
 import argparse
+import pickle
 import re
 import shutil
 import sys, os
 import time
 import warnings
+from array import array
+from types import CodeType, FunctionType
 import numpy as np
 import pandas as pd
 
@@ -1932,6 +1935,132 @@ class FunctionTimer:
             print(f"{func_name} 总耗时: {total_time:.4f} 秒")
 
 
+class RunProfiler:
+    """ 运行剖析器：记录Operator运行过程中各项操作的调用次数与耗时，用于找出运行最慢的策略
+
+    每条记录属于一个类别（例如'generate'、'realize'、'blend'、'data_window'）和一个名称（策略ID或策略组
+    名称），同一类别同一名称的所有耗时都被保存，汇总时计算调用次数、总耗时、平均耗时、分位数耗时和
+    最大耗时。耗时使用紧凑的array('d')保存，以控制长时间回测时的内存占用。
+    """
+
+    PERCENTILES = (50, 95)
+
+    def __init__(self):
+        self._samples = {}
+
+    def __len__(self):
+        return len(self._samples)
+
+    def record(self, category: str, name: str, elapsed: float) -> None:
+        """ 记录一次耗时为elapsed秒的操作"""
+        samples = self._samples.get((category, name))
+        if samples is None:
+            samples = self._samples.setdefault((category, name), array('d'))
+        samples.append(elapsed)
+
+    def reset(self) -> None:
+        """ 清除所有记录"""
+        self._samples = {}
+
+    def summary(self) -> pd.DataFrame:
+        """ 汇总所有记录
+
+        Returns
+        -------
+        pd.DataFrame
+            以(category, name)为索引，包含count、total、mean、p50、p95、max列，时间单位为秒；
+            同一类别中按总耗时从大到小排列
+        """
+        columns = ['count', 'total', 'mean'] + [f'p{p}' for p in self.PERCENTILES] + ['max']
+        rows = []
+        index = []
+        for (category, name), samples in self._samples.items():
+            arr = np.frombuffer(samples, dtype=float)
+            rows.append([len(samples), arr.sum(), arr.mean(), *np.percentile(arr, self.PERCENTILES), arr.max()])
+            index.append((category, name))
+        if not rows:
+            return pd.DataFrame(columns=columns,
+                                index=pd.MultiIndex.from_tuples([], names=['category', 'name']))
+        res = pd.DataFrame(rows, columns=columns, index=pd.MultiIndex.from_tuples(index, names=['category', 'name']))
+        res['count'] = res['count'].astype(int)
+        return res.sort_values(by=['category', 'total'], ascending=[True, False])
+
+
+def update_hash(hasher, value) -> None:
+    """ 将value的内容写入hashlib的哈希对象，用于生成运行结果的指纹
+
+    支持None、数字、字符串、时间戳、np.ndarray、pd.DataFrame/pd.Series、函数及其代码对象以及由它们
+    组成的list、tuple和dict，同样内容的输入总是写入同样的字节；其他对象（例如策略中保存的模型）写入其
+    pickle序列化的结果，对象的内容改变时指纹随之改变
+
+    Parameters
+    ----------
+    hasher: hashlib的哈希对象，例如hashlib.sha256()
+    value: Any
+        需要写入的值
+
+    Returns
+    -------
+    None
+
+    Raises
+    ------
+    TypeError
+        value中包含无法序列化的对象，无法生成可靠的指纹时
+
+    Examples
+    --------
+    >>> import hashlib
+    >>> h1, h2 = hashlib.sha256(), hashlib.sha256()
+    >>> update_hash(h1, {'a': [1, 2.5], 'b': np.arange(3)})
+    >>> update_hash(h2, {'b': np.arange(3), 'a': [1, 2.5]})
+    >>> h1.hexdigest() == h2.hexdigest()
+    True
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        hasher.update(f'<{type(value).__name__}>'.encode())
+        update_hash(hasher, list(value.columns) if isinstance(value, pd.DataFrame) else value.name)
+        hasher.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        hasher.update(f'<ndarray {value.dtype.str} {value.shape}>'.encode())
+        if value.dtype.hasobject:
+            update_hash(hasher, value.tolist())
+        else:
+            hasher.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        hasher.update(b'{')
+        for key in sorted(value, key=repr):
+            update_hash(hasher, key)
+            update_hash(hasher, value[key])
+        hasher.update(b'}')
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        items = sorted(value, key=repr) if isinstance(value, (set, frozenset)) else value
+        hasher.update(b'[')
+        for item in items:
+            update_hash(hasher, item)
+        hasher.update(b']')
+    elif isinstance(value, CodeType):
+        # 代码对象的内容不包含文件名和行号，只要函数的逻辑不变，指纹就不变
+        hasher.update(b'<code>')
+        hasher.update(value.co_code)
+        update_hash(hasher, (value.co_names, value.co_varnames, value.co_consts))
+    elif isinstance(value, FunctionType):
+        # pickle只保存函数的名称，因此使用函数的代码、默认参数和闭包变量
+        hasher.update(f'<function {value.__qualname__}>'.encode())
+        closure = [cell.cell_contents for cell in value.__closure__] if value.__closure__ else None
+        update_hash(hasher, (value.__code__, value.__defaults__, closure))
+    elif value is None or isinstance(value, (bool, int, float, str, bytes, np.generic, pd.Timestamp)):
+        hasher.update(f'<{type(value).__name__}>{value!r};'.encode())
+    else:
+        try:
+            content = pickle.dumps(value, protocol=4)
+        except Exception as e:
+            raise TypeError(f'can not generate fingerprint for object of type '
+                            f'{type(value).__module__}.{type(value).__qualname__}: {e}') from e
+        hasher.update(f'<{type(value).__module__}.{type(value).__qualname__}>'.encode())
+        hasher.update(content)
+
+
 def reindent(s, num_spaces: int = 4) -> str:
     """ 给定一个（通常多行）的string，在每一行前面添加空格形成缩进效果
 
@@ -856,7 +856,7 @@ def _mpf_plot(
         # 静态图：在全历史上计算好指标后，根据用户 start/end 对 HP 时间做切片，仅显示子区间
         # 动态图：始终显示全历史（用户可通过交互缩放/平移）
         if not interactive and (plot_start is not None or plot_end is not None):
-            hdates = pd.to_datetime(hp_with_ind.hdates)
+            hdates = hp_with_ind.hdate_index
             left = plot_start if plot_start is not None else hdates[0]
             right = plot_end if plot_end is not None else hdates[-1]
             mask = (hdates >= left) & (hdates <= right)
@@ -1806,13 +1806,42 @@ def _loop_report_str(loop_results=None,
     path_value_curve = loop_results.get('complete_values_file')
     if path_value_curve:
         report_string += f'value curve (complete values) is stored in: {path_value_curve}\n'
+    report_string += _profile_report_str(loop_results.get('strategy_profile'))
 
     report_string += report_ending()
 
     return report_string
 
 
-def opti_result_str(result, *, name='optimization report', benchmark=None, opti_time=0., eval_time=0., formatter=None) -> str:
+def _profile_report_str(profile: Optional[pd.DataFrame]) -> str:
+    """ 生成策略运行剖析结果的格式化输出，参见Operator.enable_profiling()
+
+    Parameters
+    ----------
+    profile: pd.DataFrame or None
+        Operator.get_profile()的结果，为None或空表时返回空字符串
+
+    Returns
+    -------
+    str
+    """
+    if (profile is None) or profile.empty:
+        return ''
+    report_string = f'\n-------------strategy profile:--------------\n' \
+                    f'time in milliseconds, grouped by category and sorted by total time\n'
+    ms_columns = ['total', 'mean', 'p50', 'p95', 'max']
+    profile_ms = profile.copy()
+    profile_ms[ms_columns] = profile_ms[ms_columns] * 1000.
+    report_string += profile_ms.to_string(
+            formatters={col: '{:,.3f}'.format for col in ms_columns},
+            justify='center',
+    )
+    report_string += '\n'
+    return report_string
+
+
+def opti_result_str(result, *, name='optimization report', benchmark=None, opti_time=0., eval_time=0., formatter=None,
+                    profile=None) -> str:
     """ 以表格形式格式化输出批量数据结果，输出结果的格式和内容由columns，headers，formatter等参数控制，
         输入的数据包括多组同样结构的数据，输出时可以选择以统计结果的形式输出或者以表格形式输出，也可以同时
         以统计结果和表格的形式输出
@@ -1831,6 +1860,8 @@ def opti_result_str(result, *, name='optimization report', benchmark=None, opti_
         评价运行时长，单位为秒
     formatter: list, optional, to be implemented
         输出的格式化函数
+    profile: pd.DataFrame, optional
+        策略运行剖析结果，给出时附加在报告末尾，参见Operator.enable_profiling()
 
     Returns
     -------
@@ -1885,6 +1916,7 @@ def opti_result_str(result, *, name='optimization report', benchmark=None, opti_
                                                    'sell_count':  '{:.1f}'.format,
                                                    'buy_count':   '{:.1f}'.format},
                                        justify='center'))
+    report_string += _profile_report_str(profile)
     report_string += report_ending()
 
     return report_string
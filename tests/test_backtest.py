@@ -25,6 +25,8 @@ from qteasy.backtest import (
     calculate_trade_results,
     initialize_backtest_delivery_queue,
     process_backtest_delivery,
+    read_signal_cache,
+    write_signal_cache,
 )
 
 from qteasy.history import (
@@ -4749,5 +4751,171 @@ class TestBacktester(unittest.TestCase):
         self.assertIn('Alphabet Inc.', trade_summary_df['name'].values)
 
 
+class TestSignalCache(unittest.TestCase):
+    """测试交易信号的磁盘缓存：指纹相同时直接读取缓存，策略参数或数据变化时重新生成"""
+
+    def setUp(self):
+        np.random.seed(11)
+        index = pd.date_range('2020-01-01', periods=400, freq='D') + pd.Timedelta(hours=15)
+        self.shares = ['000001.SZ', '000002.SZ']
+        close = 10 * np.exp(np.cumsum(np.random.normal(0, 0.02, (400, 2)), axis=0))
+        self.data_package = {'close_ANY_d': pd.DataFrame(close, index=index, columns=self.shares)}
+        self.run_index = index[300:] + pd.Timedelta(hours=1)
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.cache_dir.name, 'signal_cache')
+
+    def tearDown(self):
+        self.cache_dir.cleanup()
+
+    def prepare_op(self, data_package=None):
+        """ 不依赖交易日历，手动设置运行时间表并准备数据缓存和数据窗口"""
+        op = Operator(['mom', 'ssma'], group_merge_type='And')
+        op.set_shares(self.shares)
+        timing_table = pd.DataFrame(1, index=self.run_index, columns=op.group_names)
+        op.group_timing_table = timing_table
+        op.group_schedules = {name: timing_table[[name]] for name in op.group_names}
+        op.prepare_data_buffer(start_date=self.run_index[0],
+                               end_date=self.run_index[-1],
+                               data_package=self.data_package if data_package is None else data_package)
+        op.create_data_windows()
+        return op
+
+    def run_backtest(self, op, cost_rate=0.001, enable_tracing=False):
+        n_signals = op.get_signal_count()
+        cash_investment_array = np.zeros(n_signals)
+        cash_investment_array[0] = 100000.
+        return Backtester(
+                op=op,
+                shares=self.shares,
+                cash_plan=CashPlan(dates=[self.run_index[0]], amounts=[100000.], interest_rate=0.),
+                cash_investment_array=cash_investment_array,
+                cash_inflation_array=np.ones(n_signals),
+                delivery_day_indicators=np.ones(n_signals),
+                cost_params=np.array([cost_rate, cost_rate, 0., 0., 0.]),
+                signal_parsing_params={'pt_buy_threshold':  0.1,
+                                       'pt_sell_threshold': 0.1,
+                                       'long_pos_limit':    1.0,
+                                       'short_pos_limit':   -1.0,
+                                       'allow_sell_short':  False},
+                trading_moq_params={'moq_buy': 0., 'moq_sell': 0.},
+                trading_delivery_params={'cash_delivery_period': 0, 'stock_delivery_period': 0},
+                trade_price_data=self.data_package['close_ANY_d'].loc[self.run_index - pd.Timedelta(hours=1)].values,
+                enable_tracing=enable_tracing,
+                signal_cache_path=self.cache_path,
+        ).run()
+
+    def test_read_write_signal_cache(self):
+        """写入的缓存可以原样读回，缓存不存在或损坏时返回None"""
+        print('\n[TestSignalCache] read and write signal cache')
+        op_result = (['pt', 'ps'], np.array([0, 3]), np.array([[0.5, 0.], [1., -1.]]))
+        self.assertIsNone(read_signal_cache(self.cache_path, 'abc'))
+        file_name = write_signal_cache(self.cache_path, 'abc', op_result)
+        self.assertTrue(os.path.exists(file_name))
+        signal_types, step_indices, signals = read_signal_cache(self.cache_path, 'abc')
+        self.assertEqual(signal_types, ['pt', 'ps'])
+        self.assertTrue(np.array_equal(step_indices, op_result[1]))
+        self.assertTrue(np.array_equal(signals, op_result[2]))
+        with open(file_name, 'wb') as f:
+            f.write(b'broken')
+        self.assertIsNone(read_signal_cache(self.cache_path, 'abc'))
+
+    def test_fingerprint(self):
+        """指纹只随策略参数、数据或运行时间表变化"""
+        print('\n[TestSignalCache] signal fingerprint')
+        op = self.prepare_op()
+        fingerprint = op.get_signal_fingerprint(share_count=2)
+        self.assertEqual(fingerprint, self.prepare_op().get_signal_fingerprint(share_count=2))
+
+        op.set_parameter('ssma', par_values=(12,))
+        self.assertNotEqual(op.get_signal_fingerprint(share_count=2), fingerprint)
+
+        changed_data = {'close_ANY_d': self.data_package['close_ANY_d'] * 1.01}
+        self.assertNotEqual(self.prepare_op(changed_data).get_signal_fingerprint(share_count=2), fingerprint)
+
+        op = self.prepare_op()
+        op.set_blender(blender='s0 + s1', group_id=op.group_names[0])
+        self.assertNotEqual(op.get_signal_fingerprint(share_count=2), fingerprint)
+
+    def test_fingerprint_after_running(self):
+        """运行过程中改写的数据窗口和参数属性不影响指纹，同一个Operator运行前后的指纹相同"""
+        print('\n[TestSignalCache] signal fingerprint of a reused operator')
+        op = self.prepare_op()
+        fingerprint = op.get_signal_fingerprint(share_count=2)
+        op.run_all_steps(share_count=2)
+        self.assertEqual(op.get_signal_fingerprint(share_count=2), fingerprint)
+        list(op.run_strategies(steps=range(5)))
+        self.assertEqual(op.get_signal_fingerprint(share_count=2), fingerprint)
+        self.assertEqual(op.get_signal_fingerprint(share_count=2), self.prepare_op().get_signal_fingerprint(2))
+        op.set_parameter('ssma', par_values=(12,))
+        self.assertNotEqual(op.get_signal_fingerprint(share_count=2), fingerprint)
+
+        # 为各个股票使用不同的参数时，运行中逐个股票更新的参数值不影响指纹
+        op = self.prepare_op()
+        op.strategies[1].update_par_values({'000001.SZ': (12,), '000002.SZ': (20,)})
+        fingerprint = op.get_signal_fingerprint(share_count=2)
+        list(op.run_strategies(steps=range(5)))
+        self.assertEqual(op.get_signal_fingerprint(share_count=2), fingerprint)
+        op.strategies[1].update_par_values({'000001.SZ': (12,), '000002.SZ': (21,)})
+        self.assertNotEqual(op.get_signal_fingerprint(share_count=2), fingerprint)
+
+    def test_fingerprint_of_object_attributes(self):
+        """策略属性中的其他对象改变时指纹随之改变，无法写入指纹时不使用缓存"""
+        print('\n[TestSignalCache] signal fingerprint of object attributes')
+        from types import SimpleNamespace
+        import threading
+        op = self.prepare_op()
+        op.strategies[1].model = SimpleNamespace(weights=np.array([0.2, 0.8]), name='model')
+        fingerprint = op.get_signal_fingerprint(share_count=2)
+        self.assertIsNotNone(fingerprint)
+        first = self.run_backtest(op)
+        self.assertFalse(first.signal_cache_hit)
+        self.assertTrue(self.run_backtest(op).signal_cache_hit)
+
+        op.strategies[1].model.weights[1] = 0.7
+        self.assertNotEqual(op.get_signal_fingerprint(share_count=2), fingerprint)
+        self.assertFalse(self.run_backtest(op).signal_cache_hit)
+
+        # 函数属性按代码和闭包变量写入指纹
+        op.strategies[1].model = lambda x: x * 2
+        fingerprint = op.get_signal_fingerprint(share_count=2)
+        op.strategies[1].model = lambda x: x * 3
+        self.assertNotEqual(op.get_signal_fingerprint(share_count=2), fingerprint)
+
+        # 无法序列化的对象：不生成指纹，回测时不读取也不写入缓存
+        op.strategies[1].model = threading.Lock()
+        self.assertIsNone(op.get_signal_fingerprint(share_count=2))
+        cache_files = len(os.listdir(self.cache_path))
+        result = self.run_backtest(op)
+        self.assertFalse(result.signal_cache_hit)
+        self.assertEqual(len(os.listdir(self.cache_path)), cache_files)
+        self.assertTrue(np.allclose(result.op_signals, first.op_signals))
+
+    def test_backtest_with_signal_cache(self):
+        """只修改交易费用时读取缓存的交易信号，回测结果与重新生成交易信号相同"""
+        print('\n[TestSignalCache] backtest with signal cache')
+        first = self.run_backtest(self.prepare_op())
+        self.assertFalse(first.signal_cache_hit)
+        self.assertEqual(len(os.listdir(self.cache_path)), 1)
+
+        second = self.run_backtest(self.prepare_op(), cost_rate=0.003)
+        self.assertTrue(second.signal_cache_hit)
+        self.assertTrue(np.allclose(second.op_signals, first.op_signals))
+
+        op = self.prepare_op()
+        expected = op.run_all_steps(share_count=2)
+        self.assertTrue(np.allclose(second.op_signals, expected[2]))
+
+        # 策略参数变化时重新生成交易信号并写入新的缓存
+        op = self.prepare_op()
+        op.set_parameter('ssma', par_values=(12,))
+        third = self.run_backtest(op)
+        self.assertFalse(third.signal_cache_hit)
+        self.assertEqual(len(os.listdir(self.cache_path)), 2)
+
+        # 启用追踪时不使用缓存
+        traced = self.run_backtest(self.prepare_op(), enable_tracing=True)
+        self.assertFalse(traced.signal_cache_hit)
+
+
 if __name__ == '__main__':
     unittest.main()
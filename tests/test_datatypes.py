@@ -1977,6 +1977,19 @@ class TestDataTypes(unittest.TestCase):
 
         print(f'got history panel:\n{dfs}')
 
+        # testing getting data with float32 precision
+        dfs_32 = get_history_data_from_source(
+                self.ds,
+                qt_codes=shares,
+                htypes=htypes,
+                start=start,
+                end=end,
+                freq=freq,
+                dtype='float32',
+        )
+        self.assertEqual(list(dfs_32.keys()), htype_dtype_ids)
+        self.assertTrue(all(dt == 'float32' for df in dfs_32.values() for dt in df.dtypes if dt.kind in 'fiu'))
+
         # testing getting simple daily data with basic types with combination
 
         print(f'getting data with combination for htypes: \n{[at.__str__() for at in htypes]}')
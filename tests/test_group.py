@@ -384,5 +384,37 @@ class TestGroup(unittest.TestCase):
         self.assertEqual(gp.blender_str, 's0*s1')
 
 
+    def test_blend_func_and_signal_matrix(self):
+        """编译后的混合函数被缓存，blender 变化时重新编译；可以一次混合多个时间点的信号矩阵。"""
+        import pickle
+        gp = Group('g', run_freq='d', run_timing='close')
+        self.assertIsNone(gp.get_blend_func())
+        with self.assertRaises(ValueError):
+            gp.blend([np.ones(3)])
+        gp.add_strategy(self.gen_stg_d_close)
+        gp.add_strategy(self.factor_sorter_d_close)
+        blend_func = gp.get_blend_func()
+        self.assertIs(gp.get_blend_func(), blend_func)
+        # 成员数量变化时默认 blender 变化，重新编译
+        gp.add_strategy(self.iterator_stg_d_close)
+        self.assertIsNot(gp.get_blend_func(), blend_func)
+
+        np.random.seed(1)
+        signals = [np.random.uniform(size=(5, 3)) for _ in range(3)]
+        for blender_str in ['s0*s1*s2', 'avg(s0, s1, s2)', 'unify(s0) + s1 - s2']:
+            gp.blender_str = blender_str
+            blended = gp.blend(signals)
+            self.assertEqual(blended.shape, (5, 3))
+            for i in range(5):
+                self.assertTrue(np.allclose(blended[i], gp.blend([sig[i] for sig in signals])))
+
+        # 序列化时不保存编译后的混合函数
+        gp_plain = Group('p', blender='s0 + s1 * s2', run_freq='d', run_timing='close')
+        expected = gp_plain.blend(signals)
+        gp_copy = pickle.loads(pickle.dumps(gp_plain))
+        self.assertIsNone(gp_copy._blend_func)
+        self.assertTrue(np.allclose(gp_copy.blend(signals), expected))
+
+
 if __name__ == '__main__':
     unittest.main()
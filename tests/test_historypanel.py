@@ -27,9 +27,15 @@ from qteasy.history import (
     HistoryPanel,
     stack_dataframes,
     ffill_3d_data,
-    get_history_data_packages
+    get_history_data_packages,
+    hp_join
 )
 
+try:
+    import pyarrow as _pyarrow
+except ImportError:
+    _pyarrow = None
+
 
 class TestHistoryPanel(unittest.TestCase):
     def setUp(self):
@@ -2268,6 +2274,58 @@ class TestHistoryPanelTAApplyAndPatterns(unittest.TestCase):
         with self.assertRaises(ValueError):
             hp.apply_ta('non_exist_func', htype='close', as_panel=True)
 
+    def test_apply_ta_batched_matches_per_share(self):
+        """ 批量 （二维）计算路径与逐股调用 tafuncs 的结果一致，包括开头与中间存在 NaN 的情况。"""
+        print('\n[TestHistoryPanelTAApplyAndPatterns] apply_ta batched path vs per-share calls')
+        import qteasy.tafuncs as tafuncs
+        rng = np.random.default_rng(32)
+        values = np.cumsum(rng.normal(size=(6, 80, 1)), axis=1) + 50.
+        values[0, :12] = np.nan
+        values[1, 40] = np.nan
+        values[2, :] = np.nan
+        values[3, :75] = np.nan
+        shares = [f's{i}' for i in range(6)]
+        hp = HistoryPanel(values=values, levels=shares, rows=pd.date_range('2023-01-01', periods=80),
+                          columns=['close'])
+        for func_name, kwargs in [('sma', {'timeperiod': 7}), ('ema', {'span': 9}), ('sum', {'timeperiod': 4}),
+                                  ('ln', {}), ('sqrt', {})]:
+            got = hp.apply_ta(func_name, htype='close', **kwargs).values[:, :, -1]
+            for i in range(len(shares)):
+                expected = getattr(tafuncs, func_name)(values[i, :, 0].copy(), **kwargs)
+                self.assertTrue(np.allclose(got[i], expected, equal_nan=True), msg=(func_name, i))
+        # 参数不适用于批量计算时退回逐股调用，并给出与原函数相同的报错
+        with self.assertRaises(ValueError):
+            hp.apply_ta('sma', htype='close', timeperiod=1)
+
+    def test_apply_ta_thread_pool_and_share_subset(self):
+        """ 逐股计算路径：线程池与单线程结果一致，share 子集与 DataFrame 输出正确对齐。"""
+        print('\n[TestHistoryPanelTAApplyAndPatterns] apply_ta thread pool and share subset')
+        import qteasy.tafuncs as tafuncs
+        from qteasy.history import HP_TA_PARALLEL_MIN_SHARES
+        rng = np.random.default_rng(320)
+        n_share = HP_TA_PARALLEL_MIN_SHARES + 4
+        values = np.cumsum(rng.normal(size=(n_share, 120, 1)), axis=1) + 50.
+        shares = [f's{i:02d}' for i in range(n_share)]
+        hp = HistoryPanel(values=values, levels=shares, rows=pd.date_range('2023-01-01', periods=120),
+                          columns=['close'])
+        serial = hp.apply_ta('macd', htype='close', max_workers=1)
+        pooled = hp.apply_ta('macd', htype='close', max_workers=4)
+        self.assertEqual(pooled.htypes, ['close', 'macd_0', 'macd_1', 'macd_2'])
+        self.assertTrue(np.allclose(serial.values, pooled.values, equal_nan=True))
+        expected = tafuncs.macd(values[7, :, 0].copy())
+        for j in range(3):
+            self.assertTrue(np.allclose(pooled.values[7, :, j + 1], expected[j], equal_nan=True))
+
+        subset = ['s05', 's01']
+        hp_sub = hp.kline.apply_ta('macd', htype='close', shares=subset, max_workers=4)
+        self.assertTrue(np.all(np.isnan(hp_sub.values[0, :, 1:])))
+        self.assertTrue(np.allclose(hp_sub.values[5], serial.values[5], equal_nan=True))
+        df = hp.apply_ta('macd', htype='close', shares=subset, as_panel=False)
+        self.assertEqual(df.columns.get_level_values('share').unique().tolist(), subset)
+        self.assertTrue(np.allclose(df[('s01', 'macd_1')].values, serial.values[1, :, 2], equal_nan=True))
+        with self.assertRaises(ValueError):
+            hp.apply_ta('macd', htype='close', shares=['s01', 'not_a_share'])
+
     def test_candle_pattern_basic(self):
         """ candle_pattern 返回整型信号矩阵，与 tafuncs 中形态函数结果一致。"""
         print('\n[TestHistoryPanelTAApplyAndPatterns] candle_pattern basic')
@@ -4264,5 +4322,1311 @@ class TestHistoryPanelPhase5Portfolio(unittest.TestCase):
         self.assertAlmostEqual(out.values[0, 1, 0], 14.0)
 
 
+
+class TestLazyHistoryPanel(unittest.TestCase):
+    """惰性 HistoryPanel：按需加载 htype 数据块。"""
+
+    def setUp(self):
+        self.shares = ['000001.SZ', '000002.SZ']
+        self.dates = pd.date_range('2023-01-02', periods=6, freq='D')
+        self.frames = {
+            'close': pd.DataFrame(
+                np.arange(12, dtype=float).reshape(6, 2), index=self.dates, columns=self.shares,
+            ),
+            'open': pd.DataFrame(
+                np.arange(12, dtype=float).reshape(6, 2) + 100, index=self.dates, columns=self.shares,
+            ),
+            # pe 缺少第二只股票，且多出一个日期
+            'pe': pd.DataFrame(
+                {'000001.SZ': np.arange(7, dtype=float)},
+                index=pd.date_range('2023-01-01', periods=7, freq='D'),
+            ),
+        }
+        self.calls = []
+
+    def _loader(self, htype):
+        self.calls.append(htype)
+        return self.frames[htype]
+
+    def test_nothing_loaded_at_creation(self):
+        from qteasy.history import LazyHistoryPanel
+        hp = LazyHistoryPanel(self._loader, shares=self.shares, htypes=['close', 'open', 'pe'])
+        self.assertEqual(self.calls, [])
+        self.assertEqual(hp.htypes, ['close', 'open', 'pe'])
+        self.assertEqual(hp.shares, self.shares)
+        self.assertEqual(hp.pending_htypes, ['close', 'open', 'pe'])
+
+    def test_getitem_loads_only_selected_htype_once(self):
+        from qteasy.history import LazyHistoryPanel
+        hp = LazyHistoryPanel(self._loader, shares=self.shares, htypes=['close', 'open', 'pe'])
+        sub = hp['open']
+        self.assertEqual(self.calls, ['open'])
+        np.testing.assert_allclose(sub.values[:, :, 0], self.frames['open'].values.T)
+        hp['open']
+        hp.slice(htypes='open')
+        self.assertEqual(self.calls, ['open'])
+        self.assertEqual(hp.loaded_htypes, ['open'])
+
+    def test_kline_and_rank_load_only_price_column(self):
+        from qteasy.history import LazyHistoryPanel
+        hp = LazyHistoryPanel(self._loader, shares=self.shares, htypes=['close', 'open', 'pe'])
+        hp2 = hp.kline.sma(window=2)
+        hp3 = hp2.rank(by='close')
+        self.assertEqual(self.calls, ['close'])
+        self.assertIsInstance(hp3, LazyHistoryPanel)
+        self.assertEqual(hp3.htypes, ['close', 'open', 'pe', 'sma_2', 'rank_close'])
+        np.testing.assert_allclose(hp3['rank_close'].values[:, :, 0], np.array([[1.0] * 6, [2.0] * 6]))
+        # 派生面板与原面板共享缓存，加载 open 只读取一次
+        hp3['open']
+        hp['open']
+        self.assertEqual(self.calls, ['close', 'open'])
+
+    def test_full_materialization_matches_eager_stack(self):
+        from qteasy.history import LazyHistoryPanel
+        hp = LazyHistoryPanel(self._loader, shares=self.shares, htypes=['close', 'open', 'pe'])
+        eager = stack_dataframes(dict(self.frames), dataframe_as='htypes',
+                                 htypes=['close', 'open', 'pe'], shares=self.shares)
+        hp['close']
+        self.assertEqual(hp.row_count, 6)
+        values = hp.values
+        self.assertEqual(sorted(self.calls), ['close', 'open', 'pe'])
+        self.assertEqual(hp.hdates, eager.hdates)
+        np.testing.assert_allclose(values, eager.values)
+
+    def test_row_count_keeps_latest_rows(self):
+        from qteasy.history import LazyHistoryPanel
+        hp = LazyHistoryPanel(self._loader, shares=self.shares, htypes=['close', 'pe'], row_count=3)
+        self.assertEqual(hp['pe'].hdates, list(pd.date_range('2023-01-05', periods=3, freq='D')))
+        hp.materialize()
+        self.assertEqual(hp.shape, (2, 3, 2))
+        np.testing.assert_allclose(hp.values[:, :, 0], self.frames['close'].values[-3:].T)
+
+    def test_setitem_does_not_load_other_htypes(self):
+        from qteasy.history import LazyHistoryPanel
+        hp = LazyHistoryPanel(self._loader, shares=self.shares, htypes=['close', 'open'])
+        hp['twice'] = hp['close'].values * 2
+        self.assertEqual(self.calls, ['close'])
+        self.assertEqual(hp.htypes, ['close', 'open', 'twice'])
+        np.testing.assert_allclose(hp['twice'].values[:, :, 0], self.frames['close'].values.T * 2)
+
+    def test_invalid_plan_raises(self):
+        from qteasy.history import LazyHistoryPanel
+        with self.assertRaises(ValueError):
+            LazyHistoryPanel(self._loader, shares=[], htypes=['close'])
+        with self.assertRaises(ValueError):
+            LazyHistoryPanel(self._loader, shares=self.shares, htypes=['close'], row_count=0)
+        with self.assertRaises(TypeError):
+            LazyHistoryPanel('not callable', shares=self.shares, htypes=['close'])
+
+
+class TestHistoryPanelRollingKernels(unittest.TestCase):
+    """ 测试 HistoryPanelRolling 的滚动计算内核与 pandas rolling 结果一致。"""
+
+    def setUp(self):
+        rng = np.random.default_rng(27)
+        values = rng.normal(size=(3, 40, 2)) * 10
+        values[rng.random(values.shape) < 0.15] = np.nan
+        values[1, 10:20, 0] = 3.0  # 连续相同值，标准差应严格为 0
+        self.values = values
+        self.hp = HistoryPanel(values,
+                               levels=['000001', '000002', '000003'],
+                               rows=pd.date_range('2020-01-01', periods=40),
+                               columns=['open', 'close'])
+
+    def _pandas_rolling(self, window, min_periods, center, func):
+        expected = np.empty_like(self.values)
+        for li in range(self.values.shape[0]):
+            for ci in range(self.values.shape[2]):
+                roller = pd.Series(self.values[li, :, ci]).rolling(window=window,
+                                                                   min_periods=min_periods,
+                                                                   center=center)
+                expected[li, :, ci] = func(roller).values
+        return expected
+
+    def test_aggregations_match_pandas(self):
+        print('\n[TestHistoryPanelRollingKernels] mean/std/sum/min/max vs pandas')
+        for window in (1, 2, 3, 4, 7, 40, 50):
+            for min_periods in sorted({1, max(1, window // 2), window}):
+                for center in (False, True):
+                    roller = self.hp.rolling(window=window, min_periods=min_periods, center=center)
+                    for func_name in ('mean', 'std', 'sum', 'min', 'max'):
+                        res = getattr(roller, func_name)()
+                        expected = self._pandas_rolling(window, min_periods, center,
+                                                        lambda r: getattr(r, func_name)())
+                        self.assertEqual(res.shape, self.hp.shape)
+                        self.assertTrue(np.allclose(res.values, expected, equal_nan=True, atol=1e-9),
+                                        msg=f'{func_name} window={window} min_periods={min_periods} '
+                                            f'center={center}')
+        res = self.hp.rolling(window=5, min_periods=2).std()
+        self.assertTrue(np.all(res.values[1, 14:20, 0] == 0.))
+
+    def test_apply_matches_pandas(self):
+        print('\n[TestHistoryPanelRollingKernels] apply vs pandas')
+
+        def spread(x):
+            return float(np.nanmax(x) - np.nanmin(x)) + len(x)
+
+        for window, min_periods, center in [(3, 1, False), (4, 2, True), (5, 5, True), (50, 1, False)]:
+            roller = self.hp.rolling(window=window, min_periods=min_periods, center=center)
+            res = roller.apply(spread, raw=True)
+            expected = self._pandas_rolling(window, min_periods, center,
+                                            lambda r: r.apply(spread, raw=True))
+            self.assertTrue(np.allclose(res.values, expected, equal_nan=True))
+
+        # raw=False 时传入带日期索引的 Series
+        res = self.hp.rolling(window=3, min_periods=1).apply(lambda s: s.index[-1].day, raw=False)
+        expected = pd.Series(self.values[0, :, 0], index=pd.date_range('2020-01-01', periods=40))
+        expected = expected.rolling(window=3, min_periods=1).apply(lambda s: s.index[-1].day, raw=False)
+        self.assertTrue(np.allclose(res.values[0, :, 0], expected.values, equal_nan=True))
+
+
+class TestHistoryPanelViewsCopyOnWrite(unittest.TestCase):
+    """ 测试连续切片返回零拷贝视图，以及 __setitem__ / assign 的写时复制语义。"""
+
+    def setUp(self):
+        self.values = np.arange(5 * 20 * 4, dtype=float).reshape(5, 20, 4)
+        self.hp = HistoryPanel(self.values.copy(),
+                               levels=['000001', '000002', '000003', '000004', '000005'],
+                               rows=pd.date_range('2020-01-01', periods=20),
+                               columns=['open', 'high', 'low', 'close'])
+
+    def test_contiguous_selections_are_views(self):
+        print('\n[TestHistoryPanelViewsCopyOnWrite] contiguous selections share buffer')
+        views = [
+            self.hp['close'],
+            self.hp['high:close', '000002:000004'],
+            self.hp[:, :, 3:15],
+            self.hp.segment('2020-01-05', '2020-01-10'),
+            self.hp.isegment(2, 8),
+            self.hp.slice(shares='000002,000003', htypes='low,close'),
+            self.hp.subpanel(hdates=slice(0, 5), copy=False),
+        ]
+        for sub in views:
+            self.assertTrue(np.shares_memory(sub.values, self.hp.values))
+        seg = self.hp.segment('2020-01-05', '2020-01-10')
+        self.assertEqual(seg.hdates, list(pd.date_range('2020-01-05', '2020-01-10')))
+        self.assertTrue(np.allclose(seg.values, self.values[:, 4:10, :]))
+        sl = self.hp.slice(shares='000002,000003', htypes='low,close')
+        self.assertEqual(sl.shares, ['000002', '000003'])
+        self.assertEqual(sl.htypes, ['low', 'close'])
+        self.assertTrue(np.allclose(sl.values, self.values[1:3, :, 2:4]))
+        # 非连续选择与 copy=True 仍复制数据
+        self.assertFalse(np.shares_memory(self.hp['open,close'].values, self.hp.values))
+        self.assertFalse(np.shares_memory(self.hp.subpanel(htypes='close').values, self.hp.values))
+
+    def test_setitem_copies_on_write(self):
+        print('\n[TestHistoryPanelViewsCopyOnWrite] setitem copy on write')
+        sub = self.hp.segment('2020-01-01', '2020-01-10')
+        sub['close'] = -1.0
+        self.assertTrue(np.all(sub.values[:, :, 3] == -1.0))
+        self.assertTrue(np.allclose(self.hp.values, self.values))
+        self.assertFalse(np.shares_memory(sub.values, self.hp.values))
+
+        sub = self.hp[:, :, 0:10]
+        self.hp['close'] = 0.0
+        self.assertTrue(np.allclose(sub.values, self.values[:, 0:10, :]))
+        self.assertTrue(np.all(self.hp.values[:, :, 3] == 0.0))
+
+        sub = self.hp['close']
+        sub.assign(inplace=True, close=lambda p: p.values[:, :, 0] + 1)
+        self.assertTrue(np.all(self.hp.values[:, :, 3] == 0.0))
+        self.assertTrue(np.all(sub.values[:, :, 0] == 1.0))
+
+    def test_inplace_operations_copy_on_write(self):
+        print('\n[TestHistoryPanelViewsCopyOnWrite] in-place arithmetic and ffill copy on write')
+        sub = self.hp['open']
+        sub += 1000
+        self.assertTrue(np.allclose(sub.values[:, :, 0], self.values[:, :, 0] + 1000))
+        self.assertTrue(np.allclose(self.hp.values, self.values))
+        sub *= 2
+        self.assertTrue(np.allclose(sub.values[:, :, 0], (self.values[:, :, 0] + 1000) * 2))
+        self.assertTrue(np.allclose(self.hp.values, self.values))
+
+        values = self.values.copy()
+        values[:, 5:8, 0] = np.nan
+        hp = HistoryPanel(values.copy(), levels=self.hp.shares, rows=self.hp.hdates, columns=self.hp.htypes)
+        filled = hp['open'].ffill()
+        self.assertFalse(np.any(np.isnan(filled.values)))
+        self.assertTrue(np.all(np.isnan(hp.values[:, 5:8, 0])))
+        self.assertTrue(np.allclose(hp.values, values, equal_nan=True))
+
+    def test_to_numpy_copy_false_is_honest(self):
+        print('\n[TestHistoryPanelViewsCopyOnWrite] to_numpy(copy=False) returns the shared buffer')
+        sub = self.hp[:, :, 0:5]
+        arr = sub.to_numpy(copy=False)
+        self.assertTrue(np.shares_memory(arr, self.hp.values))
+        arr[0, 0, 0] = 999.0
+        self.assertEqual(self.hp.values[0, 0, 0], 999.0)
+        self.assertFalse(np.shares_memory(sub.to_numpy(copy=True), self.hp.values))
+
+    def test_duplicated_labels_still_rejected(self):
+        print('\n[TestHistoryPanelViewsCopyOnWrite] duplicated labels')
+        with self.assertRaises(AssertionError):
+            self.hp.slice(htypes='open, close, open')
+
+
+class TestHistoryPanelSaveLoad(unittest.TestCase):
+    """ 测试 HistoryPanel.save / HistoryPanel.load 原生格式的保存与读取。"""
+
+    def setUp(self):
+        import tempfile
+        self.tmp_dir = tempfile.mkdtemp(prefix='temp_test_hp_save_load_')
+        values = np.random.default_rng(29).normal(size=(3, 15, 4))
+        values[0, 3, 1] = np.nan
+        self.hp = HistoryPanel(values,
+                               levels=['000001.SZ', '000002.SZ', '600000.SH'],
+                               rows=pd.date_range('2020-01-01 09:30', periods=15, freq='min'),
+                               columns=['open', 'high', 'low', 'close'])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _assert_same_panel(self, hp):
+        self.assertEqual(hp.shares, self.hp.shares)
+        self.assertEqual(hp.hdates, self.hp.hdates)
+        self.assertEqual(hp.htypes, self.hp.htypes)
+        self.assertTrue(np.allclose(hp.values, self.hp.values, equal_nan=True))
+
+    def test_round_trip(self):
+        print('\n[TestHistoryPanelSaveLoad] round trip raw / mmap / compressed')
+        path = os.path.join(self.tmp_dir, 'hp')
+        self.assertEqual(self.hp.save(path), path)
+        hp_mmap = HistoryPanel.load(path)
+        self._assert_same_panel(hp_mmap)
+        self.assertIsInstance(hp_mmap.values, np.memmap)
+        hp_mem = HistoryPanel.load(path, mmap=False)
+        self._assert_same_panel(hp_mem)
+        self.assertNotIsInstance(hp_mem.values, np.memmap)
+
+        self.hp.save(path, compress=True)
+        self.assertFalse(os.path.exists(os.path.join(path, 'values.npy')))
+        self._assert_same_panel(HistoryPanel.load(path))
+
+        # 切片视图与默认整数标签也可保存
+        sub = self.hp[:, :, 2:6]
+        sub.save(path)
+        self.assertEqual(HistoryPanel.load(path).hdates, sub.hdates)
+        int_hp = HistoryPanel(np.ones((2, 3, 1)))
+        int_hp.save(path)
+        self.assertEqual(HistoryPanel.load(path).shares, [0, 1])
+
+    def test_mmap_changes_are_not_written_back(self):
+        print('\n[TestHistoryPanelSaveLoad] writes to mmap panel stay in memory')
+        path = os.path.join(self.tmp_dir, 'hp')
+        self.hp.save(path)
+        hp = HistoryPanel.load(path)
+        hp['close'] = 0.0
+        hp.values[0, 0, 0] = 123.0
+        self._assert_same_panel(HistoryPanel.load(path))
+
+    def test_invalid_save_and_load(self):
+        print('\n[TestHistoryPanelSaveLoad] errors')
+        with self.assertRaises(ValueError):
+            HistoryPanel().save(os.path.join(self.tmp_dir, 'empty'))
+        with self.assertRaises(FileNotFoundError):
+            HistoryPanel.load(os.path.join(self.tmp_dir, 'not_exist'))
+        path = os.path.join(self.tmp_dir, 'bad')
+        os.makedirs(path)
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            f.write('{"format": "other"}')
+        with self.assertRaises(ValueError):
+            HistoryPanel.load(path)
+
+
+class TestChunkedHistoryPanel(unittest.TestCase):
+    """ 测试 ChunkedHistoryPanel 按数据块计算的结果与普通面板一致。"""
+
+    def setUp(self):
+        import tempfile
+        from qteasy.history import ChunkedHistoryPanel
+        self.tmp_dir = tempfile.mkdtemp(prefix='temp_test_chunked_hp_')
+        rng = np.random.default_rng(30)
+        values = np.abs(rng.normal(size=(7, 50, 3))) + 1.0
+        values[rng.random(values.shape) < 0.05] = np.nan
+        self.hp = HistoryPanel(values,
+                               levels=[f'00000{i}.SZ' for i in range(7)],
+                               rows=pd.date_range('2020-01-01 09:31', periods=50, freq='min'),
+                               columns=['open', 'close', 'vol'])
+        # 数据块大小不能整除轴长度，确保最后一个不完整的数据块也被覆盖
+        self.chp = ChunkedHistoryPanel.from_panel(self.hp, os.path.join(self.tmp_dir, 'panel'),
+                                                  share_block=3, hdate_block=11,
+                                                  spill_dir=os.path.join(self.tmp_dir, 'spill'))
+
+    def tearDown(self):
+        del self.chp
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _assert_same_panel(self, res, expected, chunked=True):
+        from qteasy.history import ChunkedHistoryPanel
+        if chunked:
+            self.assertIsInstance(res, ChunkedHistoryPanel)
+        self.assertEqual(res.shares, expected.shares)
+        self.assertEqual(res.hdates, expected.hdates)
+        self.assertEqual(res.htypes, expected.htypes)
+        self.assertTrue(np.allclose(res.values, expected.values, equal_nan=True))
+
+    def test_accessors_and_blocks(self):
+        print('\n[TestChunkedHistoryPanel] accessors and iter_blocks')
+        self.assertIsInstance(self.chp.values, np.memmap)
+        sub = self.chp['close', '000002.SZ:000004.SZ']
+        self.assertTrue(np.allclose(sub.values, self.hp['close', '000002.SZ:000004.SZ'].values, equal_nan=True))
+        blocks = list(self.chp.iter_blocks(by='share'))
+        self.assertEqual([b.level_count for b in blocks], [3, 3, 1])
+        self.assertEqual(blocks[1].shares, self.hp.shares[3:6])
+        blocks = list(self.chp.iter_blocks(by='hdate'))
+        self.assertEqual([b.row_count for b in blocks], [11, 11, 11, 11, 6])
+        self.assertEqual(blocks[-1].hdates, self.hp.hdates[44:])
+        with self.assertRaises(ValueError):
+            list(self.chp.iter_blocks(by='htype'))
+
+    def test_block_computations_match_in_memory_panel(self):
+        print('\n[TestChunkedHistoryPanel] block computations vs HistoryPanel')
+        roller = dict(window=5, min_periods=2, center=True)
+        self._assert_same_panel(self.chp.rolling(**roller).mean(), self.hp.rolling(**roller).mean())
+        self._assert_same_panel(self.chp.rolling(window=4).apply(np.sum, raw=True),
+                                self.hp.rolling(window=4).apply(np.sum, raw=True))
+        self._assert_same_panel(self.chp.returns(as_panel=True), self.hp.returns(as_panel=True))
+        # dropna 的结果是分块结果面板上的视图
+        self._assert_same_panel(self.chp.returns(as_panel=True, dropna=True),
+                                self.hp.returns(as_panel=True, dropna=True), chunked=False)
+        pd.testing.assert_frame_equal(self.chp.returns(method='log'), self.hp.returns(method='log'))
+        self._assert_same_panel(self.chp.rank('close', method='min'), self.hp.rank('close', method='min'))
+        self._assert_same_panel(self.chp.zscore('close'), self.hp.zscore('close'))
+        self._assert_same_panel(self.chp.zscore('close', method='ts', window=4),
+                                self.hp.zscore('close', method='ts', window=4))
+        self._assert_same_panel(self.chp.apply_ta('sma', 'close', timeperiod=3),
+                                self.hp.apply_ta('sma', 'close', timeperiod=3))
+        shares = ['000005.SZ', '000001.SZ']
+        self._assert_same_panel(self.chp.apply_ta('sma', 'close', shares=shares, timeperiod=3),
+                                self.hp.apply_ta('sma', 'close', shares=shares, timeperiod=3))
+        self._assert_same_panel(self.chp.kline.sma(), self.hp.kline.sma())
+        with self.assertRaises(ValueError):
+            self.chp.apply_ta('sma', 'close', shares=['not_a_share'])
+
+    def test_writes_do_not_touch_read_only_source(self):
+        print('\n[TestChunkedHistoryPanel] copy on write to spill dir')
+        from qteasy.history import ChunkedHistoryPanel
+        source_path = self.chp.path
+        self.chp['close'] = 2.0
+        self.chp['twice'] = self.chp['close'].values * 2
+        self.assertNotEqual(self.chp.path, source_path)
+        self.assertEqual(self.chp.htypes, ['open', 'close', 'vol', 'twice'])
+        self.assertTrue(np.all(self.chp.values[:, :, 3] == 4.0))
+        reloaded = HistoryPanel.load(source_path)
+        self.assertTrue(np.allclose(reloaded.values, self.hp.values, equal_nan=True))
+
+        created = ChunkedHistoryPanel.create(os.path.join(self.tmp_dir, 'created'),
+                                             shares=self.hp.shares, hdates=self.hp.hdates, htypes=['close'])
+        self.assertTrue(np.all(np.isnan(created.values)))
+        created.values[:, :, 0] = 1.0
+        created['close'] = 3.0
+        self.assertEqual(created.path, os.path.join(self.tmp_dir, 'created'))
+        self.assertTrue(np.all(HistoryPanel.load(created.path).values == 3.0))
+
+    def test_inplace_methods_copy_on_write(self):
+        print('\n[TestChunkedHistoryPanel] ffill, fillna and in-place arithmetic on read-only panels')
+        source_path = self.chp.path
+        expected = self.hp.copy().ffill()
+        self.chp.ffill()
+        self.assertNotEqual(self.chp.path, source_path)
+        self.assertIsInstance(self.chp.values, np.memmap)
+        self.assertTrue(np.allclose(self.chp.values, expected.values, equal_nan=True))
+        self.chp += 1.
+        self.chp *= 2.
+        self.chp.fillna(0.)
+        expected = (expected.values + 1.) * 2.
+        expected[np.isnan(expected)] = 0.
+        self.assertTrue(np.allclose(self.chp.values, expected))
+        reloaded = HistoryPanel.load(source_path)
+        self.assertTrue(np.allclose(reloaded.values, self.hp.values, equal_nan=True))
+
+    def test_spill_files_are_removed(self):
+        print('\n[TestChunkedHistoryPanel] spill files are removed with their panel')
+        import gc
+        import tempfile
+        from qteasy.history import ChunkedHistoryPanel
+        res = self.chp.rank('close')
+        res_path = res.path
+        self.assertTrue(os.path.exists(res_path))
+        del res
+        gc.collect()
+        self.assertFalse(os.path.exists(res_path))
+        # 写时复制得到的文件由原对象接管，随原对象关闭而删除
+        self.chp['close'] = 1.0
+        spill_path = self.chp.path
+        gc.collect()
+        self.assertTrue(os.path.exists(spill_path))
+        self.chp.close()
+        self.assertTrue(self.chp.is_empty)
+        self.assertFalse(os.path.exists(spill_path))
+        self.assertTrue(os.path.exists(os.path.join(self.tmp_dir, 'panel')))
+        # 未指定 spill_dir 时自动创建的临时目录在结果全部删除后一并删除
+        chp = ChunkedHistoryPanel(os.path.join(self.tmp_dir, 'panel'))
+        res = chp.zscore('close')
+        spill_root = chp._spill_dir
+        self.assertTrue(spill_root.startswith(tempfile.gettempdir()))
+        del res
+        gc.collect()
+        self.assertFalse(os.path.exists(spill_root))
+
+    def test_float32_panels(self):
+        print('\n[TestChunkedHistoryPanel] float32 data stays single precision')
+        from qteasy.history import ChunkedHistoryPanel
+        created = ChunkedHistoryPanel.create(os.path.join(self.tmp_dir, 'created32'), shares=self.hp.shares,
+                                             hdates=self.hp.hdates, htypes=['close'], dtype='float32')
+        self.assertEqual(created.values.dtype, np.float32)
+        created.values[:, :, 0] = self.hp.values[:, :, 1]
+        res = created.rolling(window=3).mean()
+        self.assertEqual(res.values.dtype, np.float32)
+        created['twice'] = created.values[:, :, 0] * 2
+        self.assertEqual(created.values.dtype, np.float32)
+        with self.assertRaises(ValueError):
+            ChunkedHistoryPanel.create(os.path.join(self.tmp_dir, 'created16'), shares=self.hp.shares,
+                                       hdates=self.hp.hdates, htypes=['close'], dtype='float16')
+
+    def test_invalid_arguments(self):
+        print('\n[TestChunkedHistoryPanel] invalid arguments')
+        from qteasy.history import ChunkedHistoryPanel
+        with self.assertRaises(ValueError):
+            ChunkedHistoryPanel(self.chp.path, share_block=0)
+        with self.assertRaises(ValueError):
+            ChunkedHistoryPanel(self.chp.path, mode='w')
+        path = os.path.join(self.tmp_dir, 'compressed')
+        self.hp.save(path, compress=True)
+        with self.assertRaises(ValueError):
+            ChunkedHistoryPanel(path)
+
+
+class TestHistoryPanelCrossSectionEngine(unittest.TestCase):
+    """ 测试向量化截面算子 （qteasy.csfuncs）及 HistoryPanel 截面方法与 pandas 逐日计算结果一致。"""
+
+    def setUp(self):
+        rng = np.random.default_rng(31)
+        # 取整数值以制造大量并列值，并随机加入 NaN
+        values = rng.integers(0, 6, size=(9, 25, 2)).astype(float)
+        values[rng.random(values.shape) < 0.2] = np.nan
+        self.shares = [f'00000{i}.SZ' for i in range(9)]
+        self.hp = HistoryPanel(values,
+                               levels=self.shares,
+                               rows=pd.date_range('2021-01-04', periods=25),
+                               columns=['pe', 'close'])
+        self.x = values[:, :, 0]
+        # 每列为一个截面 （日期），行为 share
+        self.df = pd.DataFrame(self.x, index=self.shares)
+
+    def test_cs_rank_matches_pandas(self):
+        print('\n[TestHistoryPanelCrossSectionEngine] cs_rank vs pandas rank')
+        from qteasy.csfuncs import cs_rank, CS_RANK_METHODS
+        for method in CS_RANK_METHODS:
+            for ascending in (True, False):
+                for pct in (False, True):
+                    expected = self.df.rank(method=method, ascending=ascending, pct=pct, na_option='keep').values
+                    res = cs_rank(self.x, method=method, ascending=ascending, pct=pct)
+                    self.assertTrue(np.allclose(res, expected, equal_nan=True), msg=(method, ascending, pct))
+                    # 策略数据窗口形状为 (date, share)，截面在 axis=1
+                    res_t = cs_rank(self.x.T, method=method, ascending=ascending, pct=pct, axis=1)
+                    self.assertTrue(np.allclose(res_t, expected.T, equal_nan=True))
+        self.assertTrue(np.allclose(cs_rank(np.array([3., 1., np.nan, 3.])),
+                                    [2.5, 1., np.nan, 2.5], equal_nan=True))
+        with self.assertRaises(ValueError):
+            cs_rank(self.x, method='bad')
+        with self.assertRaises(ValueError):
+            cs_rank(np.zeros((2, 2, 2)))
+
+    def test_cs_zscore_demean_winsorize(self):
+        print('\n[TestHistoryPanelCrossSectionEngine] cs_zscore / cs_demean / cs_winsorize')
+        from qteasy.csfuncs import cs_zscore, cs_demean, cs_winsorize
+        mu = self.df.mean(axis=0)
+        sigma = self.df.std(axis=0).replace(0., np.nan)
+        self.assertTrue(np.allclose(cs_zscore(self.x), ((self.df - mu) / sigma).values, equal_nan=True))
+        self.assertTrue(np.allclose(cs_demean(self.x), (self.df - mu).values, equal_nan=True))
+        lo = self.df.quantile(0.1, axis=0)
+        hi = self.df.quantile(0.9, axis=0)
+        expected = self.df.clip(lower=lo, upper=hi, axis=1).values
+        self.assertTrue(np.allclose(cs_winsorize(self.x, lower=0.1, upper=0.9), expected, equal_nan=True))
+        # 常数截面的标准差为 0，标准化结果为 NaN
+        self.assertTrue(np.all(np.isnan(cs_zscore(np.ones((4, 2))))))
+        with self.assertRaises(ValueError):
+            cs_winsorize(self.x, lower=0.9, upper=0.1)
+
+    def test_cs_neutralize(self):
+        print('\n[TestHistoryPanelCrossSectionEngine] cs_neutralize vs pandas groupby')
+        from qteasy.csfuncs import cs_neutralize
+        groups = ['bank', 'bank', 'tech', 'tech', 'tech', 'estate', 'estate', None, 'bank']
+        res = cs_neutralize(self.x, groups)
+        group_series = pd.Series(groups, index=self.shares)
+        for j in range(self.x.shape[1]):
+            s = self.df[j]
+            expected = s - s.groupby(group_series).transform('mean')
+            self.assertTrue(np.allclose(res[:, j], expected.values, equal_nan=True))
+        # 没有分组的 share 结果为 NaN
+        self.assertTrue(np.all(np.isnan(res[7])))
+        # 随时间变化的分组，与数据同形
+        rng = np.random.default_rng(0)
+        dyn_groups = rng.integers(0, 3, size=self.x.shape)
+        res = cs_neutralize(self.x, dyn_groups)
+        for j in range(self.x.shape[1]):
+            s = self.df[j]
+            expected = s - s.groupby(dyn_groups[:, j]).transform('mean')
+            self.assertTrue(np.allclose(res[:, j], expected.values, equal_nan=True))
+        self.assertTrue(np.allclose(cs_neutralize(self.x.T, dyn_groups.T, axis=1), res.T, equal_nan=True))
+        with self.assertRaises(ValueError):
+            cs_neutralize(self.x, groups[:3])
+
+    def test_history_panel_methods(self):
+        print('\n[TestHistoryPanelCrossSectionEngine] HistoryPanel rank / zscore / demean / winsorize / neutralize')
+        from qteasy.csfuncs import cs_rank, cs_demean, cs_winsorize, cs_neutralize
+        hp = self.hp.rank(by='pe', method='dense', ascending=False, pct=True)
+        expected = self.df.rank(method='dense', ascending=False, pct=True).values
+        self.assertTrue(np.allclose(hp['rank_pe'].values[:, :, 0], expected, equal_nan=True))
+        hp = self.hp.zscore(by='pe')
+        mu = self.df.mean(axis=0)
+        sigma = self.df.std(axis=0).replace(0., np.nan)
+        self.assertTrue(np.allclose(hp['cs_z_pe'].values[:, :, 0], ((self.df - mu) / sigma).values, equal_nan=True))
+
+        hp = self.hp.demean(by='pe')
+        self.assertEqual(hp.htypes, ['pe', 'close', 'cs_demean_pe'])
+        self.assertTrue(np.allclose(hp['cs_demean_pe'].values[:, :, 0], cs_demean(self.x), equal_nan=True))
+        hp = self.hp.winsorize(by='pe', lower=0.2, upper=0.8, new_htype='pe_w')
+        self.assertTrue(np.allclose(hp['pe_w'].values[:, :, 0], cs_winsorize(self.x, 0.2, 0.8), equal_nan=True))
+        with self.assertRaises(ValueError):
+            self.hp.winsorize(by='pe', lower=-0.1)
+
+        groups = ['bank', 'bank', 'tech', 'tech', 'tech', 'estate', 'estate', 'bank', 'bank']
+        expected = cs_neutralize(self.x, groups)
+        hp = self.hp.neutralize(by='pe', groups=groups)
+        self.assertTrue(np.allclose(hp['cs_neu_pe'].values[:, :, 0], expected, equal_nan=True))
+        hp = self.hp.neutralize(by='pe', groups=dict(zip(self.shares, groups)))
+        self.assertTrue(np.allclose(hp['cs_neu_pe'].values[:, :, 0], expected, equal_nan=True))
+        # 使用面板中的分组编码列
+        hp_codes = self.hp.assign(ind=lambda p: np.tile(np.arange(9)[:, np.newaxis] % 3, (1, 25)))
+        hp = hp_codes.neutralize(by='pe', groups='ind')
+        expected = cs_neutralize(self.x, np.arange(9) % 3)
+        self.assertTrue(np.allclose(hp['cs_neu_pe'].values[:, :, 0], expected, equal_nan=True))
+        with self.assertRaises(ValueError):
+            self.hp.neutralize(by='pe', groups=groups[:4])
+        with self.assertRaises(ValueError):
+            self.hp.neutralize(by='pe', groups='not_a_htype')
+        with self.assertRaises(TypeError):
+            self.hp.neutralize(by='pe', groups=3)
+        with self.assertRaises(ValueError):
+            self.hp.demean(by='pe', new_htype='close')
+        self.assertTrue(HistoryPanel().demean(by='pe').is_empty)
+
+    def test_chunked_panel(self):
+        print('\n[TestHistoryPanelCrossSectionEngine] ChunkedHistoryPanel cross-sectional methods')
+        import tempfile
+        from qteasy.history import ChunkedHistoryPanel
+        tmp_dir = tempfile.mkdtemp(prefix='temp_test_cs_engine_')
+        try:
+            chp = ChunkedHistoryPanel.from_panel(self.hp, os.path.join(tmp_dir, 'panel'), share_block=4,
+                                                 hdate_block=7, spill_dir=os.path.join(tmp_dir, 'spill'))
+            groups = ['a', 'a', 'b', 'b', 'b', 'c', 'c', 'a', 'a']
+            for res, expected in [
+                (chp.demean(by='pe'), self.hp.demean(by='pe')),
+                (chp.winsorize(by='pe', lower=0.1, upper=0.9), self.hp.winsorize(by='pe', lower=0.1, upper=0.9)),
+                (chp.neutralize(by='pe', groups=groups), self.hp.neutralize(by='pe', groups=groups)),
+                (chp.rank(by='pe', pct=True), self.hp.rank(by='pe', pct=True)),
+            ]:
+                self.assertIsInstance(res, ChunkedHistoryPanel)
+                self.assertEqual(res.htypes, expected.htypes)
+                self.assertTrue(np.allclose(res.values, expected.values, equal_nan=True))
+            del chp, res
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+class TestHistoryPanelHtypeCapacity(unittest.TestCase):
+    """ 测试追加 htype 列时预留空余容量、就地写入以及共享缓冲的面板之间互不影响。"""
+
+    def setUp(self):
+        rng = np.random.default_rng(33)
+        self.data = rng.random((4, 30, 3))
+        self.hp = HistoryPanel(self.data.copy(),
+                               levels=['s1', 's2', 's3', 's4'],
+                               rows=pd.date_range('2022-01-01', periods=30),
+                               columns=['open', 'close', 'vol'])
+
+    def test_append_reuses_spare_capacity(self):
+        print('\n[TestHistoryPanelHtypeCapacity] appending columns reuses spare capacity')
+        from qteasy.history import HP_HTYPE_MIN_SPARE
+        hp1 = self.hp._append_columns(['a'], [self.data[:, :, 0] * 2])
+        buffer = hp1._htype_buffer
+        self.assertIsNotNone(buffer)
+        self.assertGreaterEqual(buffer.data.shape[2], 4 + HP_HTYPE_MIN_SPARE)
+        hp2 = hp1._append_columns(['b'], [self.data[:, :, 1] * 3])
+        # 末端面板继续追加时写入同一缓冲的空余容量，不分配新缓冲
+        self.assertIs(hp2._htype_buffer, buffer)
+        self.assertTrue(np.shares_memory(hp1.values, hp2.values))
+        self.assertEqual(hp2.htypes, ['open', 'close', 'vol', 'a', 'b'])
+        self.assertTrue(np.allclose(hp2.values[:, :, :3], self.data))
+        self.assertTrue(np.allclose(hp2.values[:, :, 3], self.data[:, :, 0] * 2))
+        self.assertTrue(np.allclose(hp2.values[:, :, 4], self.data[:, :, 1] * 3))
+        # 原面板不受影响
+        self.assertEqual(self.hp.htypes, ['open', 'close', 'vol'])
+        self.assertEqual(hp1.shape, (4, 30, 4))
+
+        # 多次派生列：结果与逐列拼接一致，缓冲只在容量不足时重新分配
+        hp_many = self.hp
+        buffers = set()
+        for i in range(12):
+            hp_many = hp_many.rank(by='close', new_htype=f'r{i}') if i % 2 else \
+                hp_many.zscore(by='close', new_htype=f'z{i}')
+            buffers.add(id(hp_many._htype_buffer))
+        self.assertEqual(hp_many.shape, (4, 30, 15))
+        self.assertLess(len(buffers), 12)
+        self.assertTrue(np.allclose(hp_many.values[:, :, 3], self.hp.zscore(by='close').values[:, :, 3],
+                                    equal_nan=True))
+        self.assertTrue(np.allclose(hp_many.values[:, :, 4], self.hp.rank(by='close').values[:, :, 3]))
+
+    def test_branches_do_not_overwrite_each_other(self):
+        print('\n[TestHistoryPanelHtypeCapacity] panels sharing a buffer stay independent')
+        base = self.hp._append_columns(['a'], [np.ones((4, 30))])
+        left = base._append_columns(['b'], [np.full((4, 30), 2.)])
+        # base 已不在缓冲末端，再次追加时分配新缓冲，不会覆盖 left 的新列
+        right = base._append_columns(['c'], [np.full((4, 30), 3.)])
+        self.assertIsNot(right._htype_buffer, left._htype_buffer)
+        self.assertTrue(np.all(left.values[:, :, 4] == 2.))
+        self.assertTrue(np.all(right.values[:, :, 4] == 3.))
+
+        # 覆盖已有列时写时复制，共享已有列的面板互不影响
+        left['close'] = 0.
+        self.assertTrue(np.all(left.values[:, :, 1] == 0.))
+        self.assertTrue(np.allclose(base.values[:, :, 1], self.data[:, :, 1]))
+        base['a'] = 5.
+        self.assertTrue(np.all(base.values[:, :, 3] == 5.))
+        self.assertTrue(np.all(left.values[:, :, 3] == 1.))
+
+        # __setitem__ 追加新列：末端面板就地写入空余容量
+        tip = right._htype_buffer
+        right['d'] = 4.
+        self.assertIs(right._htype_buffer, tip)
+        self.assertEqual(right.htypes, ['open', 'close', 'vol', 'a', 'c', 'd'])
+        self.assertTrue(np.all(right.values[:, :, 5] == 4.))
+
+    def test_inplace_writers_do_not_modify_sharing_panels(self):
+        print('\n[TestHistoryPanelHtypeCapacity] in-place writers copy buffers shared with derived panels')
+        data = self.data.copy()
+        data[:, 3:6, :] = np.nan
+        hp = HistoryPanel(data, levels=self.hp.shares, rows=self.hp.hdates, columns=self.hp.htypes)
+        d = hp.rank('close')
+        e = d.kline.sma(window=2)
+        self.assertTrue(np.shares_memory(d.values, e.values))
+        d_before = d.values.copy()
+        e.ffill()
+        self.assertTrue(np.allclose(d.values, d_before, equal_nan=True))
+        e += 100.
+        e *= 2.
+        e.fillna(0.)
+        self.assertTrue(np.allclose(d.values, d_before, equal_nan=True))
+        self.assertFalse(np.shares_memory(d.values, e.values))
+
+        # 反向：派生面板保持不变，修改较早的面板
+        f = d.kline.sma(window=3)
+        f_before = f.values.copy()
+        d -= 1.
+        d.ffill()
+        self.assertTrue(np.allclose(f.values, f_before, equal_nan=True))
+
+    def test_assign_does_not_copy_or_modify_source(self):
+        print('\n[TestHistoryPanelHtypeCapacity] assign shares data and keeps the source intact')
+        res = self.hp.assign(x=lambda p: p.values[:, :, 1] * 2, close=0., y=1.)
+        self.assertEqual(res.htypes, ['open', 'close', 'vol', 'x', 'y'])
+        self.assertTrue(np.all(res.values[:, :, 1] == 0.))
+        self.assertTrue(np.allclose(res.values[:, :, 3], self.data[:, :, 1] * 2))
+        self.assertTrue(np.allclose(self.hp.values, self.data))
+        self.assertEqual(self.hp.htypes, ['open', 'close', 'vol'])
+        # 整数数据：追加列时提升为 float64
+        hp_int = HistoryPanel(np.arange(24).reshape(2, 4, 3), levels=['a', 'b'],
+                              rows=pd.date_range('2022-01-01', periods=4), columns=['o', 'c', 'v'])
+        res = hp_int.assign(z=1)
+        self.assertEqual(res.values.dtype, np.float64)
+        self.assertEqual(hp_int.values.dtype.kind, 'i')
+
+
+class TestHistoryPanelLabelIndexes(unittest.TestCase):
+    """ 测试缓存的时间索引 hdate_index 以及基于二分查找的时间标签切片。"""
+
+    def setUp(self):
+        self.data = np.arange(2 * 10 * 2, dtype=float).reshape(2, 10, 2)
+        self.hp = HistoryPanel(self.data.copy(),
+                               levels=['000001.SZ', '000002.SZ'],
+                               rows=pd.date_range('2021-03-01', periods=10),
+                               columns=['open', 'close'])
+
+    def test_hdate_index_cache(self):
+        print('\n[TestHistoryPanelLabelIndexes] cached hdate_index and invalidation')
+        idx = self.hp.hdate_index
+        self.assertIsInstance(idx, pd.DatetimeIndex)
+        self.assertEqual(list(idx), self.hp.hdates)
+        self.assertIs(self.hp.hdate_index, idx)
+        # 修改 htypes / shares 标签不影响时间索引缓存
+        self.hp.htypes = ['o', 'c']
+        self.hp.shares = ['a', 'b']
+        self.assertIs(self.hp.hdate_index, idx)
+        # 修改时间轴标签后缓存失效
+        self.hp.hdates = list(pd.date_range('2022-01-01', periods=10))
+        new_idx = self.hp.hdate_index
+        self.assertIsNot(new_idx, idx)
+        self.assertEqual(new_idx[0], pd.Timestamp('2022-01-01'))
+        # 切片与派生列得到的面板带有与自身时间轴一致的索引缓存
+        sub = self.hp[:, :, 2:5]
+        self.assertEqual(list(sub.hdate_index), sub.hdates)
+        derived = self.hp.rank(by='c')
+        self.assertIs(derived.hdate_index, new_idx)
+        self.assertEqual(len(HistoryPanel().hdate_index), 0)
+
+    def test_label_slicing_and_segment(self):
+        print('\n[TestHistoryPanelLabelIndexes] date label slicing with searchsorted')
+        sub = self.hp[:, :, '2021-03-03':'2021-03-05']
+        self.assertEqual(sub.hdates, list(pd.date_range('2021-03-03', periods=3)))
+        self.assertTrue(np.allclose(sub.values, self.data[:, 2:5, :]))
+        # 边界不必恰好位于时间轴上；None 表示从头或到尾
+        sub = self.hp[:, :, pd.Timestamp('2021-03-02 12:00'):None]
+        self.assertEqual(sub.hdates[0], pd.Timestamp('2021-03-03'))
+        self.assertEqual(sub.row_count, 8)
+        self.assertEqual(self.hp.loc['2021-03-09':].row_count, 2)
+        self.assertTrue(self.hp[:, :, '2030-01-01':'2030-02-01'].is_empty)
+        seg = self.hp.segment('2021-03-04', '2021-03-06')
+        self.assertEqual(seg.hdates, list(pd.date_range('2021-03-04', periods=3)))
+        self.assertEqual(self.hp.segment().row_count, 10)
+        self.assertEqual(self.hp.segment(end_date='2021-03-02').row_count, 2)
+
+        unsorted = HistoryPanel(self.data.copy(), levels=['a', 'b'],
+                                rows=list(pd.date_range('2021-03-01', periods=10))[::-1],
+                                columns=['open', 'close'])
+        with self.assertRaises(ValueError):
+            unsorted.segment('2021-03-02', '2021-03-04')
+        with self.assertRaises(ValueError):
+            unsorted[:, :, '2021-03-02':'2021-03-04']
+
+
+class TestHistoryPanelSortMergeJoin(unittest.TestCase):
+    """ 测试基于 int64 时间键排序合并与 shares 哈希查找的 join / align_to。"""
+
+    @staticmethod
+    def _reference_join(hp1, hp2, fill_value=np.nan):
+        """逐格点计算的参考结果：标签重叠的位置以 hp1 的数据为准。"""
+        shares = sorted(set(hp1.shares) | set(hp2.shares))
+        hdates = sorted(set(hp1.hdates) | set(hp2.hdates))
+        htypes = sorted(set(hp1.htypes) | set(hp2.htypes))
+        res = np.full((len(shares), len(hdates), len(htypes)), fill_value, dtype=float)
+        for hp in (hp2, hp1):
+            for i, share in enumerate(shares):
+                for j, hdate in enumerate(hdates):
+                    for k, htype in enumerate(htypes):
+                        if share in hp.shares and hdate in hp.hdates and htype in hp.htypes:
+                            res[i, j, k] = hp.values[hp.shares.index(share),
+                                                     hp.hdates.index(hdate),
+                                                     hp.htypes.index(htype)]
+        return shares, hdates, htypes, res
+
+    def setUp(self):
+        rng = np.random.default_rng(35)
+        self.hp1 = HistoryPanel(rng.random((3, 6, 2)),
+                                levels=['000003', '000001', '000002'],
+                                rows=pd.date_range('2021-01-01', periods=6),
+                                columns=['close', 'open'])
+        self.hp2 = HistoryPanel(rng.random((3, 5, 2)),
+                                levels=['000002', '000004', '000001'],
+                                rows=pd.date_range('2021-01-04', periods=5),
+                                columns=['high', 'close'])
+
+    def test_join_matches_reference(self):
+        print('\n[TestHistoryPanelSortMergeJoin] join equals cell-by-cell reference')
+        joined = self.hp1.join(self.hp2, fill_value=-1.)
+        shares, hdates, htypes, expected = self._reference_join(self.hp1, self.hp2, fill_value=-1.)
+        self.assertEqual(joined.shares, shares)
+        self.assertEqual(joined.hdates, hdates)
+        self.assertEqual(joined.htypes, htypes)
+        self.assertTrue(np.array_equal(joined.values, expected))
+        # 重叠位置以调用join的面板为准
+        joined = self.hp2.join(self.hp1)
+        _, _, _, expected = self._reference_join(self.hp2, self.hp1)
+        self.assertTrue(np.allclose(joined.values, expected, equal_nan=True))
+
+    def test_join_same_labels(self):
+        print('\n[TestHistoryPanelSortMergeJoin] join with same shares / htypes / hdates')
+        hp3 = HistoryPanel(np.ones((3, 4, 2)),
+                           levels=self.hp1.shares,
+                           rows=pd.date_range('2021-01-05', periods=4),
+                           columns=self.hp1.htypes)
+        joined = self.hp1.join(hp3, same_shares=True, same_htypes=True)
+        self.assertEqual(joined.shares, self.hp1.shares)
+        self.assertEqual(joined.row_count, 8)
+        self.assertTrue(np.array_equal(joined.values[:, :6], self.hp1.values))
+        self.assertTrue(np.array_equal(joined.values[:, 6:], np.ones((3, 2, 2))))
+        hp4 = HistoryPanel(np.zeros((3, 6, 1)),
+                           levels=self.hp1.shares,
+                           rows=self.hp1.hdates,
+                           columns=['amount'])
+        joined = self.hp1.join(hp4, same_shares=True, same_hdates=True)
+        self.assertEqual(joined.htypes, ['amount', 'close', 'open'])
+        self.assertTrue(np.array_equal(joined.values[:, :, 1:], self.hp1.values))
+        with self.assertRaises(AssertionError):
+            self.hp1.join(self.hp2, same_hdates=True)
+
+    def test_hp_join_multiple_panels(self):
+        print('\n[TestHistoryPanelSortMergeJoin] hp_join combines all panels')
+        hp3 = HistoryPanel(np.full((1, 2, 1), 7.),
+                           levels=['000009'],
+                           rows=pd.date_range('2021-02-01', periods=2),
+                           columns=['close'])
+        joined = hp_join(self.hp1, self.hp2, hp3)
+        self.assertEqual(joined.shares, ['000001', '000002', '000003', '000004', '000009'])
+        self.assertEqual(joined.row_count, 10)
+        self.assertTrue(np.array_equal(joined.values[-1, -2:, 0], [7., 7.]))
+
+    def test_align_to_keeps_stable_order(self):
+        print('\n[TestHistoryPanelSortMergeJoin] align_to keeps self-first order with unsorted hdates')
+        dates = list(pd.date_range('2021-01-01', periods=4))
+        hp1 = HistoryPanel(np.arange(8, dtype=float).reshape(2, 4, 1),
+                           levels=['b', 'a'], rows=dates[::-1], columns=['x'])
+        hp2 = HistoryPanel(np.arange(100, 106, dtype=float).reshape(2, 3, 1),
+                           levels=['c', 'b'], rows=[dates[1], pd.Timestamp('2021-01-09'), dates[3]],
+                           columns=['x'])
+        a1, a2 = hp1.align_to(hp2, join='outer', fill_value=-1.)
+        self.assertEqual(a1.shares, ['b', 'a', 'c'])
+        self.assertEqual(a1.hdates, dates[::-1] + [pd.Timestamp('2021-01-09')])
+        self.assertTrue(np.array_equal(a1.values[:2, :4], hp1.values))
+        self.assertTrue(np.all(a1.values[2] == -1.))
+        # b 在 hp2 中位于第 1 层，2021-01-04 / 2021-01-02 / 2021-01-09 分别位于第 2 / 0 / 1 行
+        self.assertTrue(np.array_equal(a2.values[0, :, 0], [105., -1., 103., -1., 104.]))
+        i1, i2 = hp1.align_to(hp2, join='inner')
+        self.assertEqual(i1.shares, ['b'])
+        self.assertEqual(i1.hdates, [dates[3], dates[1]])
+        self.assertTrue(np.array_equal(i1.values[0, :, 0], [0., 2.]))
+        self.assertTrue(np.array_equal(i2.values[0, :, 0], [105., 103.]))
+
+
+class TestHistoryPanelFloat32(unittest.TestCase):
+    """ 测试 float32 精度的 HistoryPanel：存储与派生列保持单精度，累积类计算以 float64 进行。"""
+
+    def setUp(self):
+        rng = np.random.default_rng(36)
+        self.data = rng.random((3, 40, 2)) + 1.
+        self.hp = HistoryPanel(self.data.copy(),
+                               levels=['000001.SZ', '000002.SZ', '000003.SZ'],
+                               rows=pd.date_range('2021-01-01', periods=40),
+                               columns=['close', 'open'],
+                               dtype='float32')
+
+    def test_values_and_derived_columns(self):
+        print('\n[TestHistoryPanelFloat32] float32 storage is kept by derived columns')
+        self.assertEqual(self.hp.values.dtype, np.float32)
+        self.assertTrue(np.allclose(self.hp.values, self.data, rtol=1e-6))
+        ranked = self.hp.rank(by='close')
+        self.assertEqual(ranked.values.dtype, np.float32)
+        sma = self.hp.kline.sma()
+        self.assertEqual(sma.values.dtype, np.float32)
+        assigned = self.hp.assign(spread=lambda p: p['close'].values[:, :, 0] - p['open'].values[:, :, 0])
+        self.assertEqual(assigned.values.dtype, np.float32)
+        self.hp['one'] = 1.
+        self.assertEqual(self.hp.values.dtype, np.float32)
+        self.assertEqual(self.hp[:, :, :5].values.dtype, np.float32)
+        # 默认仍为 float64，非浮点数组写入派生列时升级为 float64
+        hp_int = HistoryPanel(np.ones((1, 3, 1), dtype=int), columns=['x'])
+        hp_int['y'] = 0.5
+        self.assertEqual(hp_int.values.dtype, np.float64)
+
+    def test_accumulating_methods_use_float64(self):
+        print('\n[TestHistoryPanelFloat32] cum_return and portfolio compute in float64')
+        hp64 = HistoryPanel(self.hp.values.astype(np.float64),
+                            levels=self.hp.shares, rows=self.hp.hdates, columns=self.hp.htypes)
+        cum32 = self.hp.cum_return()
+        cum64 = hp64.cum_return()
+        self.assertEqual(cum32.values.dtype, np.float64)
+        self.assertTrue(np.allclose(cum32.values, cum64.values, equal_nan=True))
+        port = self.hp.portfolio(mode='weighted', weights=[0.5, 0.3, 0.2])
+        self.assertEqual(port.values.dtype, np.float64)
+
+    def test_dtype_arguments(self):
+        print('\n[TestHistoryPanelFloat32] dtype arguments of constructor, stack_dataframes and as_type')
+        df = pd.DataFrame(self.data[:, :, 0].T, columns=self.hp.shares, index=self.hp.hdates)
+        stacked = stack_dataframes({'close': df}, dataframe_as='htypes', dtype='float32')
+        self.assertEqual(stacked.values.dtype, np.float32)
+        self.assertEqual(stack_dataframes({'close': df}, dataframe_as='htypes').values.dtype, np.float64)
+        self.assertEqual(self.hp.copy().as_type('float64').values.dtype, np.float64)
+        self.assertEqual(HistoryPanel(self.data, dtype=np.float32).values.dtype, np.float32)
+        self.assertEqual(HistoryPanel(self.data).values.dtype, np.float64)
+        with self.assertRaises(ValueError):
+            HistoryPanel(self.data, dtype='int32')
+        with self.assertRaises(ValueError):
+            stack_dataframes({'close': df}, dataframe_as='htypes', dtype='float16')
+
+
+class TestHistoryPanelQuickStatKernels(unittest.TestCase):
+    """ 测试 cum_return / normalize / portfolio / returns / alpha_beta 的整块向量化计算与逐序列定义一致。"""
+
+    def setUp(self):
+        rng = np.random.default_rng(37)
+        data = rng.random((4, 30, 2)) * 10. + 1.
+        data[0, 0:3, 0] = np.nan  # 首个有效价格晚于起点
+        data[1, 10, 0] = np.nan  # 路径中途断开
+        data[2, 5, 1] = -1.  # 非正价格
+        data[3, :, 0] = np.nan  # 全部缺失
+        self.data = data
+        self.shares = ['000001.SZ', '000002.SZ', '000003.SZ', '000004.SZ']
+        self.hp = HistoryPanel(data.copy(),
+                               levels=self.shares,
+                               rows=pd.date_range('2021-01-01', periods=30),
+                               columns=['close', 'open'])
+        self.mask = rng.random((4, 30)) > 0.1
+
+    @staticmethod
+    def _cum_return_ref(p, method):
+        out = np.full(p.size, np.nan)
+        starts = [t for t in range(p.size) if np.isfinite(p[t]) and p[t] > 0]
+        if not starts:
+            return out
+        t0 = starts[0]
+        for t in range(t0, p.size):
+            if not (np.isfinite(p[t]) and p[t] > 0):
+                break
+            out[t] = p[t] / p[t0] - 1. if method == 'simple' else np.log(p[t]) - np.log(p[t0])
+        return out
+
+    def test_cum_return_and_normalize(self):
+        print('\n[TestHistoryPanelQuickStatKernels] cum_return and normalize match per-series definitions')
+        for method in ('simple', 'log'):
+            for mask in (None, self.mask):
+                res = self.hp.cum_return(['close', 'open'], method=method, mask=mask)
+                m = np.ones((4, 30), dtype=bool) if mask is None else mask
+                for i in range(4):
+                    for k in range(2):
+                        p = np.where(m[i], self.data[i, :, k], np.nan)
+                        self.assertTrue(np.allclose(res.values[i, :, k], self._cum_return_ref(p, method),
+                                                    equal_nan=True))
+        res = self.hp.normalize(['close', 'open'], base_index=4, mask=self.mask)
+        for i in range(4):
+            for k in range(2):
+                p = np.where(self.mask[i], self.data[i, :, k], np.nan)
+                expected = p / p[4] if np.isfinite(p[4]) and p[4] != 0 else np.full(30, np.nan)
+                self.assertTrue(np.allclose(res.values[i, :, k], expected, equal_nan=True))
+        with self.assertRaises(ValueError):
+            self.hp.normalize(base_index=30)
+
+    def test_portfolio(self):
+        print('\n[TestHistoryPanelQuickStatKernels] portfolio aggregates every cell in one pass')
+        weights = np.array([0.4, 0.3, 0.2, 0.1])
+        weights_2d = np.random.default_rng(7).random((4, 30))
+        for mode, w in (('equal', None), ('weighted', weights), ('weighted', weights_2d)):
+            for normalize_weights in (True, False):
+                res = self.hp.portfolio(['close', 'open'], mode=mode, weights=w, mask=self.mask,
+                                        normalize_weights=normalize_weights)
+                for t in range(30):
+                    for k in range(2):
+                        col = self.data[:, t, k]
+                        ok = self.mask[:, t] & np.isfinite(col)
+                        if not ok.any():
+                            self.assertTrue(np.isnan(res.values[0, t, k]))
+                            continue
+                        if mode == 'equal':
+                            expected = col[ok].mean()
+                        else:
+                            wt = w[ok] if w.ndim == 1 else w[ok, t]
+                            expected = np.sum(wt * col[ok]) / np.sum(wt)
+                        self.assertAlmostEqual(res.values[0, t, k], expected)
+        res = self.hp.portfolio(mode='weighted', weights=np.array([1., -1., 0., 0.]),
+                                groups={'A': self.shares[:2], 'B': self.shares[2:]})
+        self.assertEqual(res.shares, ['A', 'B'])
+        # 权重之和为 0 时结果为 NaN
+        self.assertTrue(np.isnan(res.values[0, 15, 0]))
+
+    def test_returns_and_alpha_beta(self):
+        print('\n[TestHistoryPanelQuickStatKernels] returns and alpha_beta are computed for all shares at once')
+        ret = self.hp.returns(periods=2)
+        for i in range(4):
+            p = self.data[i, :, 0]
+            for t in range(30):
+                if t < 2 or np.isnan(p[t]) or np.isnan(p[t - 2]) or p[t - 2] <= 0:
+                    self.assertTrue(np.isnan(ret.values[t, i]))
+                else:
+                    self.assertAlmostEqual(ret.values[t, i], p[t] / p[t - 2] - 1.)
+
+        bench = pd.Series(np.random.default_rng(11).random(30) + 5., index=self.hp.hdates)
+        bench.iloc[6] = np.nan
+        ab = self.hp.alpha_beta(bench, annualize=False)
+        stock_ret = self.hp.returns()
+        bench_ret = bench / bench.shift(1) - 1.
+        for share in self.shares:
+            y, x = stock_ret[share], bench_ret
+            ok = y.notna() & x.notna()
+            self.assertEqual(ab.loc[share, 'n_obs'], ok.sum())
+            if ok.sum() < 2:
+                self.assertTrue(np.isnan(ab.loc[share, 'beta']))
+                continue
+            beta, alpha = np.polyfit(x[ok].values, y[ok].values, 1)
+            y_hat = alpha + beta * x[ok].values
+            r2 = 1. - np.sum((y[ok].values - y_hat) ** 2) / np.sum((y[ok].values - y[ok].mean()) ** 2)
+            self.assertAlmostEqual(ab.loc[share, 'beta'], beta)
+            self.assertAlmostEqual(ab.loc[share, 'alpha'], alpha)
+            self.assertAlmostEqual(ab.loc[share, 'r2'], r2)
+
+@unittest.skipIf(_pyarrow is None, 'pyarrow is not installed')
+class TestHistoryPanelArrow(unittest.TestCase):
+    """ 测试 HistoryPanel 与 Arrow 列式表之间的导出与导入。"""
+
+    def setUp(self):
+        rng = np.random.default_rng(38)
+        data = rng.random((3, 5, 2))
+        data[1, 2, 0] = np.nan
+        self.hp = HistoryPanel(data,
+                               levels=['000001.SZ', '000002.SZ', '000003.SZ'],
+                               rows=pd.date_range('2021-01-01', periods=5),
+                               columns=['close', 'open'])
+
+    def test_long_and_wide_round_trip(self):
+        print('\n[TestHistoryPanelArrow] long and wide layouts round trip without pandas')
+        long_table = self.hp.to_arrow(layout='long')
+        self.assertEqual(long_table.column_names, ['share', 'hdate', 'close', 'open'])
+        self.assertEqual(long_table.num_rows, 15)
+        flat = self.hp.flatten_to_dataframe(along='row')
+        self.assertTrue(np.allclose(long_table.column('close').to_numpy(), flat['close'].values, equal_nan=True))
+        wide_table = self.hp.to_arrow(layout='wide')
+        self.assertEqual(wide_table.num_rows, 5)
+        self.assertEqual(wide_table.column_names[:3], ['hdate', '000001.SZ.close', '000001.SZ.open'])
+        for table in (long_table, wide_table, self.hp.to_arrow(layout='wide', as_batch=True)):
+            restored = HistoryPanel.from_arrow(table)
+            self.assertEqual(restored.shares, self.hp.shares)
+            self.assertEqual(restored.htypes, self.hp.htypes)
+            self.assertEqual(list(restored.hdates), list(self.hp.hdates))
+            self.assertTrue(np.allclose(restored.values, self.hp.values, equal_nan=True))
+        hp32 = HistoryPanel(self.hp.values, levels=[1, 2, 3], rows=self.hp.hdates,
+                            columns=self.hp.htypes, dtype='float32')
+        restored = HistoryPanel.from_arrow(hp32.to_arrow())
+        self.assertEqual(restored.values.dtype, np.float32)
+        self.assertEqual(restored.shares, [1, 2, 3])
+        with self.assertRaises(ValueError):
+            self.hp.to_arrow(layout='stacked')
+        with self.assertRaises(ValueError):
+            HistoryPanel().to_arrow()
+
+    def test_import_foreign_long_table(self):
+        print('\n[TestHistoryPanelArrow] long tables from other tools are imported with NaN fill')
+        table = _pyarrow.table({
+            'share': ['B', 'A', 'B', 'A'],
+            'hdate': _pyarrow.array(np.array(['2021-01-02', '2021-01-01', '2021-01-01', '2021-01-03'],
+                                             dtype='datetime64[us]')),
+            'close': [2., 1., 3., 4.],
+        })
+        hp = HistoryPanel.from_arrow(table)
+        self.assertEqual(hp.shares, ['B', 'A'])
+        self.assertEqual(hp.htypes, ['close'])
+        self.assertEqual(list(hp.hdates), list(pd.date_range('2021-01-01', periods=3)))
+        expected = np.array([[3., 2., np.nan], [1., np.nan, 4.]])
+        self.assertTrue(np.allclose(hp.values[:, :, 0], expected, equal_nan=True))
+        duplicated = _pyarrow.table({'share': ['A', 'A'],
+                                     'hdate': _pyarrow.array(np.array(['2021-01-01'] * 2, dtype='datetime64[us]')),
+                                     'close': [1., 2.]})
+        with self.assertRaises(ValueError):
+            HistoryPanel.from_arrow(duplicated)
+        with self.assertRaises(ValueError):
+            HistoryPanel.from_arrow(_pyarrow.table({'close': [1.]}))
+
+class TestHistoryPanelAppendRows(unittest.TestCase):
+    """ 测试 append_rows：固定容量的滚动窗口与 kline 派生列的增量更新。"""
+
+    def setUp(self):
+        rng = np.random.default_rng(39)
+        self.full = rng.random((3, 80, 4)) + 10.
+        self.dates = pd.date_range('2021-01-04 09:31', periods=80, freq='min')
+        self.shares = ['000001.SZ', '000002.SZ', '000003.SZ']
+        self.htypes = ['open', 'high', 'low', 'close']
+
+    def _panel(self, start, stop):
+        return HistoryPanel(self.full[:, start:stop].copy(), levels=self.shares,
+                            rows=self.dates[start:stop], columns=self.htypes)
+
+    def test_ring_buffer_window(self):
+        print('\n[TestHistoryPanelAppendRows] appended bars roll a fixed capacity window')
+        hp = self._panel(0, 20)
+        snapshot = hp['close']
+        snapshot_values = snapshot.values.copy()
+        for t in range(20, 80):
+            res = hp.append_rows(self.full[:, t, :], self.dates[t])
+            self.assertIs(res, hp)
+        self.assertEqual(hp.shape, (3, 20, 4))
+        self.assertEqual(hp.hdates, list(self.dates[60:80]))
+        self.assertTrue(np.allclose(hp.values, self.full[:, 60:80]))
+        self.assertEqual(hp.hdate_index[-1], self.dates[-1])
+        self.assertTrue(np.allclose(hp.close.values[:, :, 0], self.full[:, 60:80, 3]))
+        # 此前得到的切片视图不会被后续追加改写
+        self.assertTrue(np.allclose(snapshot.values, snapshot_values))
+
+        # 多根 bar 一次追加、窗口容量扩大，以及只给出部分列
+        hp = self._panel(0, 10)
+        hp.append_rows(self.full[:, 10:15, :], self.dates[10:15], capacity=12)
+        self.assertEqual(hp.shape, (3, 12, 4))
+        self.assertTrue(np.allclose(hp.values, self.full[:, 3:15]))
+        hp.append_rows(self.full[:, 15:16, 3:], self.dates[15:16], htypes='close')
+        self.assertEqual(hp.hdates[-1], self.dates[15])
+        self.assertTrue(np.allclose(hp.values[:, -1, 3], self.full[:, 15, 3]))
+        self.assertTrue(np.isnan(hp.values[:, -1, :3]).all())
+
+    def test_append_rows_errors(self):
+        print('\n[TestHistoryPanelAppendRows] invalid appends raise errors')
+        hp = self._panel(0, 10)
+        with self.assertRaises(ValueError):
+            hp.append_rows(self.full[:, 5, :], self.dates[5])
+        with self.assertRaises(ValueError):
+            hp.append_rows(self.full[:2, 10, :], self.dates[10])
+        with self.assertRaises(ValueError):
+            hp.append_rows(self.full[:, 10:12, :], [self.dates[11], self.dates[10]])
+        with self.assertRaises(ValueError):
+            hp.append_rows(self.full[:, 10, :], self.dates[10], capacity=0)
+        with self.assertRaises(ValueError):
+            hp.append_rows(self.full[:, 10, :1], self.dates[10], htypes='vol')
+        with self.assertRaises(ValueError):
+            HistoryPanel().append_rows(self.full[:, 10, :], self.dates[10])
+        self.assertEqual(hp.shape, (3, 10, 4))
+
+    def test_incremental_kline_columns(self):
+        print('\n[TestHistoryPanelAppendRows] kline derived columns are updated on appended bars only')
+        hp = self._panel(0, 40)
+        hp.kline.sma(window=5, inplace=True)
+        hp = hp.kline.bbands(window=10)
+        hp.kline.kdj(inplace=True)
+        hp.kline.ema(span=3, inplace=True)
+        for t in range(40, 80):
+            hp.append_rows(self.full[:, t, :], self.dates[t])
+        expected = self._panel(40, 80).kline.sma(window=5).kline.bbands(window=10).kline.kdj().kline.ema(span=3)
+        self.assertEqual(hp.htypes, expected.htypes)
+        # 窗口指标与在当前窗口上重新计算一致 （窗口开头的预热区除外）
+        self.assertTrue(np.allclose(hp.values[:, 20:, :-1], expected.values[:, 20:, :-1]))
+        # 指数平滑指标与完整历史的结果一致
+        ema_full = self._panel(0, 80).kline.ema(span=3)
+        self.assertTrue(np.allclose(hp.values[:, :, -1], ema_full.values[:, 40:, -1]))
+
+        not_updated = self._panel(0, 10).kline.sma(window=3)
+        not_updated.append_rows(self.full[:, 10, :], self.dates[10], update_kline=False)
+        self.assertTrue(np.isnan(not_updated.values[:, -1, -1]).all())
+
+    def test_hdate_labels_are_updated_incrementally(self):
+        print('\n[TestHistoryPanelAppendRows] hdate labels are a view on the ring buffer')
+        hp = self._panel(0, 20)
+        hp.append_rows(self.full[:, 20, :], self.dates[20])
+        rows = hp.rows
+        label_maps = set()
+        for t in range(21, 60):
+            hp.append_rows(self.full[:, t, :], self.dates[t])
+            label_maps.add(id(hp._row_buffer.positions))
+        # 只在缓冲的空余容量用完时重建标签字典，其余追加只登记新标签
+        self.assertLessEqual(len(label_maps), 3)
+        positions = hp._row_buffer.positions
+        self.assertEqual(len(hp.rows), 20)
+        self.assertEqual(list(hp.rows), list(self.dates[40:60]))
+        self.assertEqual(hp.rows[self.dates[40]], 0)
+        self.assertEqual(hp.rows[self.dates[59]], 19)
+        self.assertNotIn(self.dates[39], hp.rows)
+        self.assertEqual(hp.rows, dict(zip(self.dates[40:60], range(20))))
+        # 此前得到的标签字典保持原来的窗口
+        self.assertEqual(list(rows), list(self.dates[1:21]))
+        self.assertEqual(rows[self.dates[1]], 0)
+        # segment 基于增量标签字典生成的时间索引
+        self.assertTrue(np.allclose(hp.segment(self.dates[45], self.dates[49]).values, self.full[:, 45:50]))
+        # 整体替换时间标签后不再就地追加，而是重新分配缓冲
+        hp.hdates = list(self.dates[60:80])
+        hp.append_rows(self.full[:, 0, :], pd.Timestamp(self.dates[-1]) + pd.Timedelta(minutes=1))
+        self.assertEqual(hp.hdates[:19], list(self.dates[61:80]))
+        self.assertIsNot(hp._row_buffer.positions, positions)
+
+    def test_capacity_shorter_than_kline_lookback_warns(self):
+        print('\n[TestHistoryPanelAppendRows] capacity shorter than kline warm-up warns')
+        hp = self._panel(0, 40).kline.macd()
+        with self.assertWarns(UserWarning):
+            hp.append_rows(self.full[:, 40, :], self.dates[40], capacity=30)
+        self.assertTrue(np.isnan(hp.values[:, -1, 4:]).all())
+        hp = self._panel(0, 40).kline.macd()
+        import warnings
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            for t in range(40, 45):
+                hp.append_rows(self.full[:, t, :], self.dates[t])
+        self.assertFalse(np.isnan(hp.values[:, -1, 4:]).any())
+
+class TestHistoryPanelStatsCache(unittest.TestCase):
+    """ 测试 describe / mean / std / min / max 的一次性矩计算与按面板缓存。"""
+
+    def setUp(self):
+        rng = np.random.default_rng(40)
+        self.data = rng.random((3, 25, 3))
+        self.data[0, 4, 1] = np.nan
+        self.data[2, :, 2] = np.nan
+        self.hp = HistoryPanel(self.data.copy(),
+                               levels=['000001.SZ', '000002.SZ', '000003.SZ'],
+                               rows=pd.date_range('2021-01-01', periods=25),
+                               columns=['open', 'close', 'vol'])
+
+    def test_stats_match_numpy_and_pandas(self):
+        print('\n[TestHistoryPanelStatsCache] summary statistics match numpy and pandas.describe')
+        v = self.data
+        with np.errstate(all='ignore'):
+            self.assertTrue(np.allclose(self.hp.mean().values, np.nanmean(v, axis=1), equal_nan=True))
+            self.assertTrue(np.allclose(self.hp.std().values, np.nanstd(v, axis=1, ddof=1), equal_nan=True))
+            self.assertTrue(np.allclose(self.hp.min(by='htype').values, np.nanmin(v, axis=1).T, equal_nan=True))
+            self.assertTrue(np.allclose(self.hp.max(skipna=False).values, v.max(axis=1), equal_nan=True))
+        self.assertEqual(list(self.hp.mean(htypes='close,open').columns), ['close', 'open'])
+        with self.assertRaises(ValueError):
+            self.hp.mean(htypes='amount')
+
+        desc = self.hp.describe(percentiles=(0.1, 0.9))
+        expected = self.hp.slice_to_dataframe(share='000001.SZ').describe(percentiles=(0.1, 0.9))
+        for htype in self.hp.htypes:
+            self.assertEqual(list(desc[htype].columns), list(expected.index))
+            self.assertTrue(np.allclose(desc.loc['000001.SZ', htype].values, expected[htype].values))
+        desc_htype = self.hp.describe(by='htype')
+        close = v[:, :, 1].ravel()
+        expected = pd.Series(close[~np.isnan(close)]).describe()
+        self.assertTrue(np.allclose(desc_htype.loc['close'].values, expected.values))
+        self.assertEqual(desc_htype.loc['vol', 'count'], 50)
+        desc_all = self.hp.describe(by=None, ddof=0)
+        pool = v.ravel()
+        pool = pool[~np.isnan(pool)]
+        self.assertAlmostEqual(desc_all.loc[0, 'std'], pool.std(ddof=0))
+        self.assertAlmostEqual(desc_all.loc[0, '50%'], np.median(pool))
+
+    def test_cache_is_reused_and_invalidated(self):
+        print('\n[TestHistoryPanelStatsCache] cached results are reused until the panel is modified')
+        desc = self.hp.describe()
+        mean = self.hp.mean()
+        # 缓存命中时返回独立的副本，修改返回值不影响后续结果
+        mean.iloc[0, 0] = -1.
+        self.assertFalse(self.hp.mean().equals(mean))
+        self.assertTrue(self.hp.describe().equals(desc))
+        self.assertEqual(len(self.hp._stats_cache[4]), 3)  # 矩计算结果、describe、mean
+
+        self.hp['open'] = 10.
+        self.assertTrue(np.allclose(self.hp.mean()['open'].values, 10.))
+        self.assertEqual(self.hp.describe()[('open', 'max')].tolist(), [10., 10., 10.])
+        self.hp.fillna(0.)
+        self.assertEqual(self.hp.min()['vol'].tolist()[2], 0.)
+        self.hp.append_rows(np.full((3, 3), 100.), '2021-01-26')
+        self.assertEqual(self.hp.max()['close'].tolist(), [100., 100., 100.])
+        self.hp.htypes = ['o', 'c', 'v']
+        self.assertEqual(list(self.hp.std().columns), ['o', 'c', 'v'])
+
+    def test_inplace_operators_invalidate_cache(self):
+        print('\n[TestHistoryPanelStatsCache] in-place operators and kline updates invalidate the cache')
+        hp = HistoryPanel(self.data.copy(), levels=self.hp.shares, rows=self.hp.hdates, columns=self.hp.htypes)
+        self.assertFalse(hp._shared_buffer)
+        mean = hp.mean()
+        hp += 100.
+        self.assertTrue(np.allclose(hp.mean().values, mean.values + 100., equal_nan=True))
+        hp *= 2.
+        self.assertTrue(np.allclose(hp.mean().values, (mean.values + 100.) * 2., equal_nan=True))
+        hp.ffill()
+        self.assertAlmostEqual(hp.mean()['close'].tolist()[0], np.nanmean(hp.values[0, :, 1]))
+
+        hp = HistoryPanel(self.data[:, :, :2].copy(), levels=self.hp.shares, rows=self.hp.hdates,
+                          columns=['open', 'close'])
+        hp = hp.kline.sma(window=3, price_htype='close', inplace=True)
+        hp.append_rows(np.zeros((3, 2)), '2021-01-26')
+        col = hp.htypes[-1]
+        before = hp.max()[col].tolist()
+        hp.append_rows(np.full((3, 2), 1000.), '2021-01-27')
+        self.assertNotEqual(hp.max()[col].tolist(), before)
+        self.assertTrue(np.allclose(hp.max()[col].values, np.nanmax(hp.values[:, :, 2], axis=1)))
+
 if __name__ == '__main__':
     unittest.main()
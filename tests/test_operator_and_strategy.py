@@ -26,6 +26,8 @@ from qteasy.built_in import (
     DMA,
     MACD,
     CDL,
+    CROSSLINE,
+    SAREXT,
 )
 from qteasy.strategy import (
     BaseStrategy,
@@ -2674,6 +2676,82 @@ class TestOperatorAndStrategy(unittest.TestCase):
                         target_data_indices[stg_id][dtype],
                 ))
 
+    def test_operator_float32_data_buffer(self):
+        """测试以float32精度准备数据缓冲区，策略的数据窗口保持单精度"""
+        op = qt.Operator()
+        op.add_strategies([TestGenStg, TestFactorSorter])
+        op.add_strategies([TestRuleIter], run_freq='h')
+        op.set_parameter('custom', use_latest_data_cycle=False)
+        op.set_parameter('custom_1', use_latest_data_cycle=False)
+        op.set_parameter('custom_2', use_latest_data_cycle=False)
+        op.prepare_running_schedule(
+                start_date='2023-01-10',
+                end_date='2023-01-31',
+                include_start_am=False,
+                include_start_pm=False,
+        )
+        data_package = {
+            'close_E_15min': close_15min_df,
+            'close_E_d':     close_d_df,
+            'close_E_h':     close_h_df,
+            'close_E_w':     close_w_df,
+        }
+        op.prepare_data_buffer(
+                start_date='2023-01-11',
+                end_date='2023-01-31',
+                data_package=data_package,
+                dtype='float32',
+        )
+        for dtype_id, buffered_data in op.data_buffers.items():
+            self.assertTrue(all(buffered_data.dtypes == np.float32))
+            self.assertTrue(np.allclose(buffered_data.values, data_package[dtype_id].values))
+        # 原数据包不受影响
+        self.assertTrue(all(close_d_df.dtypes == np.float64))
+        op.create_data_windows()
+        # ta-lib只接受float64数据，单精度的数据缓冲区一次性转换为float64后交给策略
+        for stg_id, windows in op.data_window_views.items():
+            for dtype_id, data_window in windows.items():
+                self.assertEqual(data_window.dtype, np.float64)
+        for dtype_id, buffered_data in op.data_buffers.items():
+            self.assertTrue(all(buffered_data.dtypes == np.float32))
+        with self.assertRaises(ValueError):
+            op.prepare_data_buffer(
+                    start_date='2023-01-11',
+                    end_date='2023-01-31',
+                    data_package=data_package,
+                    dtype='int64',
+            )
+
+        # 基于ta-lib的内置策略可以使用单精度数据缓冲区，结果与双精度相同
+        np.random.seed(5)
+        index = pd.date_range('2022-01-01', periods=200, freq='D') + pd.Timedelta(hours=15)
+        close = 10 * np.exp(np.cumsum(np.random.normal(0, 0.02, (200, 3)), axis=0))
+        close_df = pd.DataFrame(close, index=index, columns=['A', 'B', 'C'])
+        run_index = index[100:] + pd.Timedelta(hours=1)
+        signals = {}
+        for dtype in ['float32', 'float64']:
+            op = qt.Operator('dma')
+            op.set_parameter(0, par_values=(10, 20, 5), window_length=60)
+            op.set_shares(['A', 'B', 'C'])
+            timing_table = pd.DataFrame(1, index=run_index, columns=op.group_names)
+            op.group_timing_table = timing_table
+            op.group_schedules = {name: timing_table[[name]] for name in op.group_names}
+            op.prepare_data_buffer(
+                    start_date=run_index[0],
+                    end_date=run_index[-1],
+                    data_package={'close_ANY_d': close_df},
+                    dtype=dtype,
+            )
+            self.assertTrue(all(op.data_buffers['close_ANY_d'].dtypes == dtype))
+            op.create_data_windows()
+            signals[dtype] = np.array([signal for _, _, signal in
+                                       op.run_strategies(steps=range(len(op.group_timing_table)))])
+        self.assertEqual(signals['float32'].shape, (100, 3))
+        self.assertTrue(np.any(signals['float64'] != signals['float64'][0]))
+        # 单精度舍入只可能在极少数临界点改变信号
+        mismatch = ~np.isclose(signals['float32'], signals['float64'], atol=1e-4, equal_nan=True)
+        self.assertLess(mismatch.mean(), 0.02)
+
     def test_set_opt_par(self):
         """ test setting opt pars in batch"""
         print(f'--------- Testing setting Opt Pars: set_opt_par_values -------')
@@ -5173,5 +5251,778 @@ class TestOperatorSetParameter(unittest.TestCase):
         self.assertEqual(self.op[self.dma_id].window_lengths['close_ANY_d'], 95)
 
 
+class TestOperatorRunPlan(unittest.TestCase):
+    """测试由运行时间表编译得到的运行计划，以及run_strategy()对运行计划的使用"""
+
+    def setUp(self):
+        self.op = qt.Operator()
+        self.op.add_strategies('dma', run_freq='d', run_timing='close')
+        self.op.add_strategies('macd', run_freq='w', run_timing='close')
+        self.op.add_strategies('trix', run_freq='h', run_timing='close')
+        np.random.seed(41)
+        self.timing = pd.DataFrame(
+                np.random.randint(0, 2, size=(50, 3)),
+                columns=self.op.group_names,
+                index=pd.date_range('2023-01-01', periods=50),
+        )
+
+    def test_compile_run_plan(self):
+        """运行计划与逐行读取运行时间表的结果一致"""
+        print('\n[TestOperatorRunPlan] compiled plan matches timing table')
+        self.assertEqual(len(self.op.groups), 3)
+        self.assertRaises(ValueError, self.op.compile_run_plan)
+        self.op.group_timing_table = self.timing
+        table, group_ptr, group_ids = self.op.compile_run_plan()
+        self.assertIs(table, self.timing)
+        self.assertEqual(group_ptr.shape, (51,))
+        values = self.timing.values
+        for step in range(len(self.timing)):
+            self.assertEqual(group_ptr[step], values[:step].sum())
+            expected = [self.op.groups_by_index[i] for i in range(3) if values[step, i]]
+            self.assertEqual(self.op.get_running_groups(step), expected)
+        self.assertEqual(group_ptr[-1], values.sum())
+        self.assertEqual(len(group_ids), values.sum())
+
+    def test_run_plan_follows_timing_table(self):
+        """重新赋值运行时间表后运行计划自动重新编译"""
+        print('\n[TestOperatorRunPlan] plan is rebuilt when timing table is replaced')
+        self.op.group_timing_table = self.timing
+        groups = self.op.groups_by_index
+        self.assertEqual(self.op.get_running_groups(0),
+                         [groups[i] for i in range(3) if self.timing.values[0, i]])
+        new_timing = self.timing.copy()
+        new_timing.iloc[0] = [1, 0, 1]
+        self.op.group_timing_table = new_timing
+        self.assertEqual(self.op.get_running_groups(0), [groups[0], groups[2]])
+        new_timing.iloc[0] = [0, 1, 0]
+        self.assertEqual(self.op.get_running_groups(0), [groups[0], groups[2]])
+        self.op.compile_run_plan()
+        self.assertEqual(self.op.get_running_groups(0), [groups[1]])
+        # 运行时间表的列数多于策略组数量时，多余的列被忽略
+        wide_timing = self.timing.copy()
+        wide_timing['extra'] = 1
+        self.op.group_timing_table = wide_timing
+        self.assertEqual(self.op.get_running_groups(3),
+                         [groups[i] for i in range(3) if self.timing.values[3, i]])
+
+
+class TestOperatorRunAllSteps(unittest.TestCase):
+    """测试Operator.run_all_steps()：实现了realize_all()的策略一次性生成整段时间轴的信号，结果与逐步运行相同"""
+
+    def setUp(self):
+        np.random.seed(42)
+        self.n_rows = 600
+        index = pd.date_range('2020-01-01', periods=self.n_rows, freq='D') + pd.Timedelta(hours=15)
+        self.shares = ['000001.SZ', '000002.SZ', '000003.SZ', '000004.SZ']
+        close = 10 * np.exp(np.cumsum(np.random.normal(0, 0.02, (self.n_rows, 4)), axis=0))
+        high = close * (1 + np.random.uniform(0, 0.02, close.shape))
+        low = close * (1 - np.random.uniform(0, 0.02, close.shape))
+        volume = np.random.uniform(1e5, 1e6, close.shape)
+        self.data_package = {
+            f'{name}_ANY_d': pd.DataFrame(data, index=index, columns=self.shares)
+            for name, data in [('close', close), ('high', high), ('low', low), ('volume', volume)]
+        }
+        self.run_index = index[300:] + pd.Timedelta(hours=1)
+
+    def prepare_op(self, op):
+        """ 不依赖交易日历，手动设置运行时间表并准备数据缓存和数据窗口"""
+        op.set_shares(self.shares)
+        timing_table = pd.DataFrame(1, index=self.run_index, columns=op.group_names)
+        for i in range(1, len(op.group_names)):
+            timing_table.iloc[i::i + 2, i] = 0
+        op.group_timing_table = timing_table
+        op.group_schedules = {name: timing_table[[name]] for name in op.group_names}
+        op.prepare_data_buffer(start_date=self.run_index[0],
+                               end_date=self.run_index[-1],
+                               data_package=self.data_package)
+        op.create_data_windows()
+
+    @staticmethod
+    def run_stepwise(op, share_count):
+        """ 逐步调用run_strategy()生成的交易信号"""
+        signal_types, step_indices, signals = [], [], []
+        for stype, s_index, signal in op.run_strategies(steps=range(len(op.group_timing_table))):
+            signal_types.append(stype)
+            step_indices.append(s_index)
+            signals.append(np.ones(share_count) * signal)
+        return signal_types, np.array(step_indices), np.array(signals)
+
+    def check_same_as_stepwise(self, op):
+        signal_types, step_indices, signals = op.run_all_steps(share_count=len(self.shares))
+        expected_types, expected_indices, expected_signals = self.run_stepwise(op, len(self.shares))
+        self.assertEqual(signal_types, expected_types)
+        self.assertTrue(np.array_equal(step_indices, expected_indices))
+        self.assertEqual(signals.shape, expected_signals.shape)
+        self.assertTrue(np.allclose(signals, expected_signals, equal_nan=True))
+
+    def test_built_in_realize_all(self):
+        """内置策略的realize_all()与逐步运行realize()的结果相同"""
+        print('\n[TestOperatorRunAllSteps] built-in strategies with realize_all()')
+        for stg_id in ['dma', 'crossline', 'bband', 'ssma', 'dsma', 'slsma', 'aroon', 'cci', 'mfi', 'willr',
+                       'sellrate', 'ndaylast', 'ndayavg', 'ndaychg', 'ndayrate']:
+            op = qt.Operator(stg_id)
+            self.prepare_op(op)
+            self.assertTrue(op.strategies[0].has_realize_all)
+            self.check_same_as_stepwise(op)
+
+    def test_built_in_realize_all_interior_nan(self):
+        """数据中间有nan值时，内置策略一次性运行的结果仍与逐步运行相同"""
+        print('\n[TestOperatorRunAllSteps] built-in strategies with interior nan data')
+        for name, df in self.data_package.items():
+            df = df.copy()
+            df.iloc[320:323, 1] = np.nan
+            df.iloc[450, 2] = np.nan
+            self.data_package[name] = df
+        for stg_id in ['dma', 'crossline', 'bband', 'ssma', 'dsma', 'slsma', 'aroon', 'cci', 'mfi', 'willr',
+                       'sellrate', 'ndaylast', 'ndayavg', 'ndaychg', 'ndayrate']:
+            op = qt.Operator(stg_id)
+            self.prepare_op(op)
+            self.check_same_as_stepwise(op)
+
+    def test_built_in_float32_data(self):
+        """基于ta-lib的内置策略在单精度数据缓冲上逐步运行和一次性运行，结果与双精度相同"""
+        print('\n[TestOperatorRunAllSteps] built-in ta-lib strategies with float32 data')
+        for stg_id in ['dma', 'crossline', 'bband', 'ssma', 'macd', 'willr', 'cci', 'mfi', 'aroon']:
+            results = {}
+            for dtype in ['float32', 'float64']:
+                op = qt.Operator(stg_id)
+                op.set_shares(self.shares)
+                timing_table = pd.DataFrame(1, index=self.run_index, columns=op.group_names)
+                op.group_timing_table = timing_table
+                op.group_schedules = {name: timing_table[[name]] for name in op.group_names}
+                op.prepare_data_buffer(start_date=self.run_index[0],
+                                       end_date=self.run_index[-1],
+                                       data_package=self.data_package,
+                                       dtype=dtype)
+                op.create_data_windows()
+                results[dtype] = self.run_stepwise(op, len(self.shares))[2]
+                if op.strategies[0].has_realize_all:
+                    signals = op.run_all_steps(share_count=len(self.shares))[2]
+                    self.assertTrue(np.allclose(signals, results[dtype], equal_nan=True))
+            self.assertEqual(results['float32'].shape, results['float64'].shape)
+            # 单精度舍入只可能在极少数临界点改变信号
+            mismatch = ~np.isclose(results['float32'], results['float64'], atol=1e-4, equal_nan=True)
+            self.assertLess(mismatch.mean(), 0.02)
+
+    def test_mixed_groups_and_merge_types(self):
+        """实现与未实现realize_all()的策略混合在多个策略组中，三种组合并方式下结果相同"""
+        print('\n[TestOperatorRunAllSteps] mixed strategy groups and merge types')
+        for merge_type in ['None', 'OR', 'AND']:
+            op = qt.Operator(group_merge_type=merge_type)
+            op.add_strategies(['dma', 'macd'], run_freq='d', run_timing='close')
+            op.add_strategies(['ndaylast'], run_freq='w', run_timing='close')
+            op.add_strategies(['ssma'], run_freq='h', run_timing='close')
+            self.assertFalse(op.strategies[1].has_realize_all)
+            self.prepare_op(op)
+            self.check_same_as_stepwise(op)
+
+    def test_realize_all_fallback(self):
+        """数据窗口不足或realize_all()返回None时，策略回到逐步运行"""
+        print('\n[TestOperatorRunAllSteps] fall back to stepwise generation')
+        op = qt.Operator('ssma')
+        op.set_parameter(0, par_values=(100,), window_length=60)
+        self.prepare_op(op)
+        stg = op.strategies[0]
+        buffers = {dtype_id: op.data_buffers[dtype_id].values for dtype_id in stg.data_types}
+        self.assertIsNone(stg.generate_all(buffers, rows=np.arange(300, 310)))
+        self.check_same_as_stepwise(op)
+        signals = op.run_all_steps(share_count=len(self.shares))[2]
+        self.assertTrue(np.all(signals == -1))
+
+
+class TestRuleIteratorVectorized(unittest.TestCase):
+    """测试RuleIterator的vectorized模式：同一组参数的所有股票在一次realize()中计算，结果与逐个股票计算相同"""
+
+    def setUp(self):
+        np.random.seed(42)
+        self.shares = ['000001.SZ', '000002.SZ', '000003.SZ', '000004.SZ', '000005.SZ']
+        n_rows = 270
+        self.close = 10 * np.exp(np.cumsum(np.random.normal(0, 0.02, (n_rows, 5)), axis=0))
+        self.high = self.close * (1 + np.random.uniform(0, 0.02, self.close.shape))
+        self.low = self.close * (1 - np.random.uniform(0, 0.02, self.close.shape))
+
+    def prepare_stg(self, stg, multi_pars=None):
+        """ 不经过Operator，直接为策略设置股票和数据窗口"""
+        stg._share_names = self.shares
+        data = {'close': self.close, 'high': self.high, 'low': self.low}
+        stg._data_windows = {
+            dtype_id: data[dtype_id.split('_')[0]][-stg.get_window_length(dtype_id):] for dtype_id in stg.data_types
+        }
+        stg.multi_pars = multi_pars
+        return stg
+
+    def test_share_groups(self):
+        """股票按照multi_pars中的参数分组"""
+        print('\n[TestRuleIteratorVectorized] group shares by parameters')
+        stg = self.prepare_stg(CROSSLINE())
+        self.assertTrue(stg.vectorized)
+        self.assertEqual(stg.get_share_groups(), [(None, slice(None))])
+        stg.multi_pars = ((20, 100, 0.01),) * 5
+        self.assertEqual(stg.get_share_groups(), [((20, 100, 0.01), slice(None))])
+        stg.multi_pars = ((20, 100, 0.01), (30, 60, 0.), (20, 100, 0.01), (30, 60, 0.), (40, 80, 0.02))
+        groups = stg.get_share_groups()
+        self.assertIs(stg.get_share_groups(), groups)
+        self.assertEqual([par for par, _ in groups], [(20, 100, 0.01), (30, 60, 0.), (40, 80, 0.02)])
+        self.assertEqual([list(indices) for _, indices in groups], [[0, 2], [1, 3], [4]])
+
+    def test_built_in_vectorized(self):
+        """内置的crossline、macd和sarext策略与逐个股票使用talib计算的结果相同"""
+        print('\n[TestRuleIteratorVectorized] built-in vectorized strategies')
+        from qteasy.tafuncs import sma, ema, sarext
+
+        def crossline(i, s, l, m):
+            diff = (sma(self.close[:, i], l) - sma(self.close[:, i], s))[-1]
+            return 1 if diff < -m * l else (-1 if diff > m * l else 0)
+
+        def macd(i, s, l, m):
+            diff = ema(self.close[:, i], s) - ema(self.close[:, i], l)
+            return 1 if 2 * (diff - ema(diff, m))[-1] > 0 else 0
+
+        def sar(i, a, m):
+            value = sarext(self.high[-200:, i], self.low[-200:, i], a, m)[-1]
+            return 1 if value > 0 else (-1 if value < 0 else 0)
+
+        cases = [
+            (CROSSLINE, crossline, [(20, 100, 0.01), (30, 60, 0.), (35, 120, 0.002)]),
+            (MACD, macd, [(26, 12, 9), (60, 20, 15), (12, 26, 9)]),
+            (SAREXT, sar, [(0, 0.), (2, 1.5), (-3, 0.5)]),
+        ]
+        for stg_class, expected_func, pars in cases:
+            stg = self.prepare_stg(stg_class())
+            self.assertTrue(stg.vectorized)
+            stg.update_par_values(*pars[0])
+            expected = [expected_func(i, *pars[0]) for i in range(5)]
+            self.assertTrue(np.array_equal(stg.generate(), expected))
+            # 不同股票使用不同的参数
+            multi_pars = tuple(pars[i % 3] for i in range(5))
+            self.prepare_stg(stg, multi_pars=multi_pars)
+            expected = [expected_func(i, *multi_pars[i]) for i in range(5)]
+            self.assertTrue(np.array_equal(stg.generate(), expected))
+
+    def test_user_defined_vectorized(self):
+        """用户自定义的vectorized策略与逐个股票运行的相同策略结果相同"""
+        print('\n[TestRuleIteratorVectorized] user defined vectorized strategy')
+
+        class MomStg(RuleIterator):
+            def __init__(self, vectorized):
+                super().__init__(
+                        pars=[Parameter((1, 100), par_type='int', name='n')],
+                        name='MOM',
+                        window_length=100,
+                        data_types=DataType('close', freq='d', asset_type='ANY'),
+                        vectorized=vectorized,
+                )
+
+            def realize(self):
+                close = self.get_data('close_ANY_d')
+                return np.sign(close[-1] - close[-1 - self.n])
+
+        vec_stg = self.prepare_stg(MomStg(vectorized=True), multi_pars=((5,), (20,), (5,), (60,), (20,)))
+        loop_stg = self.prepare_stg(MomStg(vectorized=False), multi_pars=((5,), (20,), (5,), (60,), (20,)))
+        self.assertTrue(np.array_equal(vec_stg.generate(), loop_stg.generate()))
+        buffers = {'close_ANY_d': self.close}
+        vec_stg.realize_all = lambda: np.ones_like(vec_stg.close_ANY_d[:, 0])
+        with self.assertRaises(ValueError):
+            vec_stg.generate_all(buffers, rows=np.arange(100, 110))
+
+
+class TestIndicatorCache(unittest.TestCase):
+    """测试技术指标缓存：indicator()从缓存中取得的技术指标与在数据窗口上直接计算的结果相同"""
+
+    def setUp(self):
+        np.random.seed(42)
+        n_rows = 600
+        index = pd.date_range('2020-01-01', periods=n_rows, freq='D') + pd.Timedelta(hours=15)
+        self.shares = ['000001.SZ', '000002.SZ', '000003.SZ']
+        self.close = 10 * np.exp(np.cumsum(np.random.normal(0, 0.02, (n_rows, 3)), axis=0))
+        self.data_package = {'close_ANY_d': pd.DataFrame(self.close, index=index, columns=self.shares)}
+        self.run_index = index[300:] + pd.Timedelta(hours=1)
+
+    def prepare_op(self, op):
+        """ 不依赖交易日历，手动设置运行时间表并准备数据缓存和数据窗口"""
+        op.set_shares(self.shares)
+        timing_table = pd.DataFrame(1, index=self.run_index, columns=op.group_names)
+        op.group_timing_table = timing_table
+        op.group_schedules = {name: timing_table[[name]] for name in op.group_names}
+        op.prepare_data_buffer(start_date=self.run_index[0],
+                               end_date=self.run_index[-1],
+                               data_package=self.data_package)
+        op.create_data_windows()
+
+    @staticmethod
+    def run_stepwise(op):
+        return np.array([signal for _, _, signal in op.run_strategies(steps=range(len(op.group_timing_table)))])
+
+    def test_built_in_strategies(self):
+        """使用indicator()的内置策略在有无缓存时结果相同，同一个技术指标只计算一次"""
+        print('\n[TestIndicatorCache] built-in strategies with and without indicator cache')
+        for stg_id, cache_size in [('ssma', 1), ('dsma', 2), ('dwma', 2), ('slsma', 1), ('bband', 1)]:
+            op = qt.Operator(stg_id)
+            self.prepare_op(op)
+            signals = self.run_stepwise(op)
+            self.assertEqual(len(op._indicator_cache), cache_size)
+            for stg in op.strategies:
+                stg.set_indicator_cache(None)
+            expected = self.run_stepwise(op)
+            self.assertTrue(np.array_equal(signals, expected))
+        # 数据窗口短于前置数据量时，与在数据窗口上计算一样得不到有效的指标值
+        op = qt.Operator('ssma')
+        op.set_parameter(0, par_values=(100,), window_length=60)
+        self.prepare_op(op)
+        self.assertTrue(np.all(self.run_stepwise(op) == -1))
+
+    def test_indicator_alignment(self):
+        """indicator()的结果与数据窗口对齐，前置数据不足的行为NaN，递归指标使用全部历史数据"""
+        print('\n[TestIndicatorCache] indicator values aligned with data windows')
+        from qteasy.tafuncs import sma, ema, bbands
+        op = qt.Operator('ssma')
+        op.set_parameter(0, par_values=(20,), window_length=100)
+        self.prepare_op(op)
+        stg = op.strategies[0]
+        stg.update_running_data_window(
+                data_windows=op.data_window_views[stg.strategy_id],
+                window_indices=op.data_window_indices[stg.strategy_id],
+                window_index=10,
+        )
+        window = stg._data_windows['close_ANY_d']
+        self.assertEqual(window.shape, (100, 3))
+        res = stg.indicator('sma', 'close', 20)
+        self.assertEqual(res.shape, (100, 3))
+        self.assertFalse(res.flags.writeable)
+        for i in range(3):
+            self.assertTrue(np.allclose(res[:, i], sma(window[:, i], 20), equal_nan=True))
+        upper, middle, lower = stg.indicator('bbands', 'close_ANY_d', timeperiod=20)
+        self.assertTrue(np.allclose(lower[:, 1], bbands(window[:, 1], 20)[2], equal_nan=True))
+        # 递归指标使用了数据窗口之前的历史数据
+        end_row = stg._indicator_rows['close_ANY_d']
+        expected = ema(self.close[:end_row + 1, 0], 20)[-1]
+        self.assertAlmostEqual(stg.indicator('ema', 'close', 20)[-1, 0], expected)
+        # 逐个股票计算时只取当前股票的结果
+        stg._indicator_share = 2
+        self.assertTrue(np.allclose(stg.indicator('sma', 'close', 20), sma(window[:, 2], 20), equal_nan=True))
+
+    def test_interior_nan_data(self):
+        """数据中间有nan值时，indicator()的结果与在各个数据窗口上计算的结果相同"""
+        print('\n[TestIndicatorCache] indicator values with interior nan data')
+        from qteasy.strategy import IndicatorCache
+        self.close[320:323, 1] = np.nan
+        self.close[450, 2] = np.nan
+        self.close[:5, 0] = np.nan  # 前导的nan不影响缓存的使用
+        self.data_package['close_ANY_d'].iloc[:, :] = self.close
+        cache = IndicatorCache({'close_ANY_d': self.close})
+        self.assertEqual(cache.interior_nan_rows(('close_ANY_d',)).tolist(), [600, 320, 450])
+        for stg_id in ['ssma', 'dsma', 'slsma', 'dwma']:
+            op = qt.Operator(stg_id)
+            self.prepare_op(op)
+            signals = self.run_stepwise(op)
+            for stg in op.strategies:
+                stg.set_indicator_cache(None)
+            expected = self.run_stepwise(op)
+            self.assertTrue(np.array_equal(signals, expected))
+
+        from qteasy.tafuncs import sma
+        op = qt.Operator('ssma')
+        op.set_parameter(0, par_values=(20,), window_length=100)
+        self.prepare_op(op)
+        stg = op.strategies[0]
+        for window_index in [0, 50, 150, 299]:
+            stg.update_running_data_window(
+                    data_windows=op.data_window_views[stg.strategy_id],
+                    window_indices=op.data_window_indices[stg.strategy_id],
+                    window_index=window_index,
+            )
+            window = stg._data_windows['close_ANY_d']
+            setattr(stg, 'close_ANY_d', window)
+            res = stg.indicator('sma', 'close', 20)
+            for i in range(3):
+                self.assertTrue(np.allclose(res[:, i], sma(window[:, i], 20), equal_nan=True))
+
+    def test_compute_outside_lock(self):
+        """技术指标在锁外计算：计算中的指标不阻塞其他线程，同时计算的同一个指标只保留一个结果"""
+        print('\n[TestIndicatorCache] indicators computed outside the cache lock')
+        import threading
+        from qteasy.strategy import IndicatorCache
+        cache = IndicatorCache({'close_ANY_d': self.close}, max_size=4)
+        started, release = threading.Event(), threading.Event()
+
+        def slow(x):
+            started.set()
+            release.wait(5)
+            return x * 2
+
+        def fast(x):
+            return x + 1
+
+        slow_thread = threading.Thread(target=cache.get, args=(slow, ('close_ANY_d',), (), {}))
+        slow_thread.start()
+        self.assertTrue(started.wait(5))
+        key, values = cache.get(fast, ('close_ANY_d',), (), {})
+        self.assertFalse(release.is_set())  # 慢速指标仍在计算时，其他指标可以计算并写入缓存
+        self.assertTrue(np.allclose(values[0], self.close + 1))
+        release.set()
+        slow_thread.join()
+        self.assertEqual(len(cache), 2)
+
+        # 两个线程同时计算同一个指标，得到同一个结果
+        barrier = threading.Barrier(2, timeout=5)
+
+        def together(x):
+            barrier.wait()
+            return x - 1
+
+        results = [None, None]
+
+        def get(i):
+            results[i] = cache.get(together, ('close_ANY_d',), (), {})[1]
+
+        threads = [threading.Thread(target=get, args=(i,)) for i in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertIs(results[0], results[1])
+        self.assertEqual(len(cache), 3)
+
+    def test_cache_and_errors(self):
+        """缓存的容量限制，以及没有缓存时直接在当前数据上计算"""
+        print('\n[TestIndicatorCache] cache size and fall back without cache')
+        from qteasy.strategy import IndicatorCache
+        from qteasy.tafuncs import sma
+        cache = IndicatorCache({'close_ANY_d': self.close}, max_size=2)
+        key, values = cache.get(sma, ('close_ANY_d',), (10,), {})
+        self.assertEqual(values[0].shape, self.close.shape)
+        self.assertEqual(cache.lookback(key, 100), 9)
+        self.assertEqual(cache.lookback(key, 5), 5)
+        self.assertIs(cache.get(sma, ('close_ANY_d',), (10,), {})[1], values)
+        cache.get(sma, ('close_ANY_d',), (20,), {})
+        cache.get(sma, ('close_ANY_d',), (10,), {})
+        cache.get(sma, ('close_ANY_d',), (30,), {})
+        self.assertEqual(len(cache), 2)
+        self.assertIs(cache.get(sma, ('close_ANY_d',), (10,), {})[1], values)
+        with self.assertRaises(ValueError):
+            IndicatorCache({}, max_size=0)
+
+        stg = qt.built_in.SCRSSMA()
+        stg.close_ANY_d = self.close[:50, 0]
+        self.assertTrue(np.allclose(stg.indicator('sma', 'close', 10), sma(self.close[:50, 0], 10), equal_nan=True))
+        stg.close_ANY_d = self.close[:50]
+        self.assertEqual(stg.indicator(lambda x, n: x * n, 'close_ANY_d', 2).shape, (50, 3))
+        with self.assertRaises(ValueError):
+            stg.indicator('not_a_function', 'close', 10)
+        with self.assertRaises(ValueError):
+            stg.indicator('sma', 'open', 10)
+        with self.assertRaises(TypeError):
+            stg.indicator(10, 'close', 10)
+
+
+
+class TestOperatorRunAllStepsBatch(unittest.TestCase):
+    """测试Operator.run_all_steps_batch()：一次生成多组优化参数的交易信号，结果与逐组运行相同"""
+
+    def setUp(self):
+        np.random.seed(42)
+        index = pd.date_range('2020-01-01', periods=600, freq='D') + pd.Timedelta(hours=15)
+        self.shares = ['000001.SZ', '000002.SZ', '000003.SZ', '000004.SZ']
+        close = 10 * np.exp(np.cumsum(np.random.normal(0, 0.02, (600, 4)), axis=0))
+        self.data_package = {'close_ANY_d': pd.DataFrame(close, index=index, columns=self.shares)}
+        self.run_index = index[300:] + pd.Timedelta(hours=1)
+
+    def prepare_op(self, op):
+        """ 不依赖交易日历，手动设置运行时间表并准备数据缓存和数据窗口"""
+        op.set_shares(self.shares)
+        timing_table = pd.DataFrame(1, index=self.run_index, columns=op.group_names)
+        for i in range(1, len(op.group_names)):
+            timing_table.iloc[i::i + 2, i] = 0
+        op.group_timing_table = timing_table
+        op.group_schedules = {name: timing_table[[name]] for name in op.group_names}
+        op.prepare_data_buffer(start_date=self.run_index[0],
+                               end_date=self.run_index[-1],
+                               data_package=self.data_package)
+        op.create_data_windows()
+
+    def check_same_as_loop(self, op, par_values_list):
+        op.set_opt_par_values(par_values_list[-1])
+        original_par_values = [stg.par_values for stg in op.strategies]
+        results = op.run_all_steps_batch(par_values_list, share_count=len(self.shares))
+        self.assertEqual([stg.par_values for stg in op.strategies], original_par_values)
+        self.assertEqual(len(results), len(par_values_list))
+        for par_values, (signal_types, step_indices, signals) in zip(par_values_list, results):
+            op.set_opt_par_values(par_values)
+            expected_types, expected_indices, expected_signals = op.run_all_steps(share_count=len(self.shares))
+            self.assertEqual(signal_types, expected_types)
+            self.assertTrue(np.array_equal(step_indices, expected_indices))
+            self.assertTrue(np.allclose(signals, expected_signals, equal_nan=True))
+
+    def test_batch_merge_types(self):
+        """多个策略组、部分策略参与优化时，三种组合并方式下结果与逐组运行相同"""
+        print('\n[TestOperatorRunAllStepsBatch] batched signals with merge types')
+        for merge_type in ['None', 'OR', 'AND']:
+            op = qt.Operator(group_merge_type=merge_type)
+            op.add_strategies(['mom', 'macd'], run_freq='d', run_timing='close')
+            op.add_strategies(['ndaychg', 'dma'], run_freq='w', run_timing='close')
+            op.set_parameter(0, opt_tag=1, window_length=60)
+            op.set_parameter(2, opt_tag=1)
+            op.set_parameter(3, opt_tag=1)
+            self.prepare_op(op)
+            self.check_same_as_loop(op, [(5, 10, 12, 26, 9), (30, 20, 12, 26, 9),
+                                         (70, 10, 40, 80, 20), (5, 10, 12, 26, 9)])
+
+    def test_user_defined_realize_batch(self):
+        """用户自定义策略的realize_batch()在每个运行时间点上只调用一次"""
+        print('\n[TestOperatorRunAllStepsBatch] user defined realize_batch()')
+
+        class MomStg(RuleIterator):
+            batch_calls = 0
+
+            def __init__(self):
+                super().__init__(
+                        pars=[Parameter((1, 100), par_type='int', name='n')],
+                        name='MOM',
+                        window_length=100,
+                        data_types=DataType('close', freq='d', asset_type='ANY'),
+                )
+
+            def realize(self):
+                close = self.get_data('close_ANY_d')
+                return np.sign(close[-1] - close[-1 - self.n])
+
+            def realize_batch(self, par_batch):
+                MomStg.batch_calls += 1
+                close = self.get_data('close_ANY_d')
+                return np.sign(close[-1] - close[-1 - par_batch['n']])
+
+        op = qt.Operator([MomStg(), 'ndaylast'])
+        op.set_parameter(0, opt_tag=1)
+        self.prepare_op(op)
+        self.assertTrue(op.strategies[0].has_realize_batch)
+        self.assertFalse(op.strategies[0].has_realize_all)
+        self.check_same_as_loop(op, [(5,), (20,), (60,)])
+        # 每个运行时间点、每个股票调用一次
+        self.assertEqual(MomStg.batch_calls, len(self.run_index) * len(self.shares))
+
+    def test_batch_fallback(self):
+        """启用追踪时逐组设置参数并运行，结果仍与逐组运行相同"""
+        print('\n[TestOperatorRunAllStepsBatch] fall back to per-parameter runs')
+        op = qt.Operator(['mom', 'ndaychg'])
+        op.set_parameter(0, opt_tag=1)
+        self.prepare_op(op)
+        op.enable_tracing()
+        self.check_same_as_loop(op, [(5,), (20,)])
+        op.disable_tracing()
+        # realize_batch()输出的形状不正确时报错
+        with self.assertRaises(ValueError):
+            op.strategies[1]._check_batch_output(np.ones((3, 2)), batch_size=2)
+
+
+
+class TestOperatorConcurrency(unittest.TestCase):
+    """测试Operator.enable_concurrency()：在线程池中并发运行策略，生成的交易信号与逐个运行相同"""
+
+    def setUp(self):
+        np.random.seed(7)
+        index = pd.date_range('2020-01-01', periods=400, freq='D') + pd.Timedelta(hours=15)
+        self.shares = ['000001.SZ', '000002.SZ', '000003.SZ']
+        close = 10 * np.exp(np.cumsum(np.random.normal(0, 0.02, (400, 3)), axis=0))
+        self.data_package = {'close_ANY_d': pd.DataFrame(close, index=index, columns=self.shares)}
+        self.run_index = index[300:] + pd.Timedelta(hours=1)
+
+    def prepare_op(self, op):
+        """ 不依赖交易日历，手动设置运行时间表并准备数据缓存和数据窗口"""
+        op.set_shares(self.shares)
+        timing_table = pd.DataFrame(1, index=self.run_index, columns=op.group_names)
+        for i in range(1, len(op.group_names)):
+            timing_table.iloc[i::i + 2, i] = 0
+        op.group_timing_table = timing_table
+        op.group_schedules = {name: timing_table[[name]] for name in op.group_names}
+        op.prepare_data_buffer(start_date=self.run_index[0],
+                               end_date=self.run_index[-1],
+                               data_package=self.data_package)
+        op.create_data_windows()
+
+    @staticmethod
+    def run_steps(op):
+        return [(stype, s_index, np.array(signal, dtype=float))
+                for stype, s_index, signal in op.run_strategies(steps=range(len(op.group_timing_table)))]
+
+    def check_same_results(self, op):
+        expected_steps = self.run_steps(op)
+        expected_all = op.run_all_steps(share_count=len(self.shares))
+        op.enable_concurrency(max_workers=4)
+        self.assertTrue(op.concurrency_enabled)
+        try:
+            steps = self.run_steps(op)
+            all_steps = op.run_all_steps(share_count=len(self.shares))
+        finally:
+            op.disable_concurrency()
+        self.assertEqual(len(steps), len(expected_steps))
+        for (stype, s_index, signal), (e_type, e_index, e_signal) in zip(steps, expected_steps):
+            self.assertEqual((stype, s_index), (e_type, e_index))
+            self.assertTrue(np.allclose(signal, e_signal, equal_nan=True))
+        self.assertEqual(all_steps[0], expected_all[0])
+        self.assertTrue(np.allclose(all_steps[2], expected_all[2], equal_nan=True))
+
+    def test_concurrent_groups_and_members(self):
+        """多个策略组及其成员策略并发运行，三种组合并方式下结果与逐个运行相同"""
+        print('\n[TestOperatorConcurrency] concurrent groups and members')
+        for merge_type in ['None', 'OR', 'AND']:
+            op = qt.Operator(group_merge_type=merge_type)
+            op.add_strategies(['mom', 'macd', 'ssma'], run_freq='d', run_timing='close')
+            op.add_strategies(['ndaychg', 'dma'], run_freq='w', run_timing='close')
+            self.prepare_op(op)
+            self.check_same_results(op)
+
+    def test_deterministic_order(self):
+        """成员策略完成的先后顺序不影响信号的混合顺序"""
+        print('\n[TestOperatorConcurrency] deterministic signal order')
+        import time
+
+        class SlowStg(GeneralStg):
+            def __init__(self, value, delay):
+                super().__init__(
+                        pars=[Parameter((0, 10), par_type='float', name='value', value=value)],
+                        name='SLOW',
+                        window_length=5,
+                        data_types=DataType('close', freq='d', asset_type='ANY'),
+                )
+                self.delay = delay
+
+            def realize(self):
+                time.sleep(self.delay)
+                return np.full(len(self.get_data('close_ANY_d')[-1]), self.value)
+
+        op = qt.Operator([SlowStg(1., 0.002), SlowStg(2., 0.), SlowStg(3., 0.001)])
+        op.set_blender('s0 - s1 * s2')
+        self.prepare_op(op)
+        self.check_same_results(op)
+        self.assertTrue(np.allclose(op.run_all_steps(share_count=len(self.shares))[2], -5.))
+
+    def test_settings_and_errors(self):
+        """参数检查、策略出错时的异常，以及序列化时不保存线程池"""
+        print('\n[TestOperatorConcurrency] settings and errors')
+        import pickle
+        op = qt.Operator(['mom', 'dma'])
+        self.assertFalse(op.concurrency_enabled)
+        with self.assertRaises(TypeError):
+            op.enable_concurrency(max_workers=2.5)
+        with self.assertRaises(ValueError):
+            op.enable_concurrency(max_workers=0)
+        op.enable_concurrency()
+        self.assertTrue(op.concurrency_enabled)
+        self.prepare_op(op)
+        list(op.run_strategies(steps=range(3)))
+        self.assertIsNotNone(op._strategy_executor)
+        op_copy = pickle.loads(pickle.dumps(op))
+        self.assertIsNone(op_copy._strategy_executor)
+        self.assertTrue(op_copy.concurrency_enabled)
+        # 启用追踪时策略组逐个运行
+        self.assertTrue(op._can_run_groups_concurrently())
+        op.enable_tracing()
+        self.assertFalse(op._can_run_groups_concurrently())
+        op.disable_tracing()
+        # 策略中的异常在主线程中抛出
+        op.strategies[1].realize = lambda: 1 / 0
+        with self.assertRaises(ZeroDivisionError):
+            list(op.run_strategies(steps=range(3)))
+        op.disable_concurrency()
+        self.assertFalse(op.concurrency_enabled)
+        self.assertIsNone(op._strategy_executor)
+
+
+class TestOperatorProfiling(unittest.TestCase):
+    """测试Operator.enable_profiling()：按策略和运行阶段统计调用次数与耗时"""
+
+    def setUp(self):
+        np.random.seed(7)
+        index = pd.date_range('2020-01-01', periods=400, freq='D') + pd.Timedelta(hours=15)
+        self.shares = ['000001.SZ', '000002.SZ', '000003.SZ']
+        close = 10 * np.exp(np.cumsum(np.random.normal(0, 0.02, (400, 3)), axis=0))
+        self.data_package = {'close_ANY_d': pd.DataFrame(close, index=index, columns=self.shares)}
+        self.run_index = index[300:] + pd.Timedelta(hours=1)
+
+    def prepare_op(self, op):
+        """ 不依赖交易日历，手动设置运行时间表并准备数据缓存和数据窗口"""
+        op.set_shares(self.shares)
+        timing_table = pd.DataFrame(1, index=self.run_index, columns=op.group_names)
+        op.group_timing_table = timing_table
+        op.group_schedules = {name: timing_table[[name]] for name in op.group_names}
+        op.prepare_data_buffer(start_date=self.run_index[0],
+                               end_date=self.run_index[-1],
+                               data_package=self.data_package)
+        op.create_data_windows()
+
+    def test_run_profiler(self):
+        """RunProfiler按(category, name)汇总调用次数、总耗时与分位数"""
+        print('\n[TestOperatorProfiling] run profiler summary')
+        from qteasy.utilfuncs import RunProfiler
+        profiler = RunProfiler()
+        self.assertTrue(profiler.summary().empty)
+        for elapsed in [0.1, 0.2, 0.3, 0.4]:
+            profiler.record('generate', 'a', elapsed)
+        profiler.record('generate', 'b', 2.0)
+        profiler.record('blend', 'g', 0.5)
+        self.assertEqual(len(profiler), 3)
+        summary = profiler.summary()
+        print(summary)
+        self.assertEqual(list(summary.columns), ['count', 'total', 'mean', 'p50', 'p95', 'max'])
+        self.assertEqual(list(summary.index), [('blend', 'g'), ('generate', 'b'), ('generate', 'a')])
+        row = summary.loc[('generate', 'a')]
+        self.assertEqual(row['count'], 4)
+        self.assertAlmostEqual(row['total'], 1.0)
+        self.assertAlmostEqual(row['mean'], 0.25)
+        self.assertAlmostEqual(row['p50'], 0.25)
+        self.assertAlmostEqual(row['max'], 0.4)
+        profiler.reset()
+        self.assertEqual(len(profiler), 0)
+
+    def test_step_by_step_profile(self):
+        """逐步运行时统计数据窗口、信号生成、realize()与信号混合的次数"""
+        print('\n[TestOperatorProfiling] step by step profile')
+        op = qt.Operator()
+        op.add_strategies(['mom', 'ssma'], run_freq='d', run_timing='close')
+        self.prepare_op(op)
+        self.assertFalse(op.profiling_enabled)
+        self.assertIsNone(op.get_profile())
+
+        op.enable_profiling()
+        self.assertTrue(op.profiling_enabled)
+        step_count = len(op.group_timing_table)
+        list(op.run_strategies(steps=range(step_count)))
+        profile = op.get_profile()
+        print(profile)
+        for stg_id in ['mom', 'ssma']:
+            self.assertEqual(profile.loc[('data_window', stg_id), 'count'], step_count)
+            self.assertEqual(profile.loc[('generate', stg_id), 'count'], step_count)
+            # 非向量化的RuleIterator对每个标的分别调用一次realize()
+            self.assertEqual(profile.loc[('realize', stg_id), 'count'], step_count * len(self.shares))
+        self.assertEqual(profile.loc[('blend', op.group_names[0]), 'count'], step_count)
+        self.assertTrue((profile['total'] >= 0).all())
+
+        op.disable_profiling()
+        self.assertIsNone(op.get_profile())
+        list(op.run_strategies(steps=range(step_count)))
+        self.assertIsNone(op.get_profile())
+
+    def test_all_steps_profile(self):
+        """一次性生成整段时间轴信号时记录generate_all，生成的信号与未启用统计时相同"""
+        print('\n[TestOperatorProfiling] all steps profile')
+        op = qt.Operator()
+        op.add_strategies(['mom', 'ssma'], run_freq='d', run_timing='close')
+        self.prepare_op(op)
+        expected = op.run_all_steps(share_count=len(self.shares))
+        op.enable_profiling()
+        result = op.run_all_steps(share_count=len(self.shares))
+        self.assertTrue(np.allclose(result[2], expected[2], equal_nan=True))
+        profile = op.get_profile()
+        print(profile)
+        self.assertIn('generate_all', profile.index.get_level_values('category'))
+        self.assertEqual(profile.loc[('generate_all', 'ssma'), 'count'], 1)
+
+        from qteasy.visual import _profile_report_str
+        report = _profile_report_str(profile)
+        self.assertIn('strategy profile', report)
+        self.assertIn('generate_all', report)
+        self.assertEqual(_profile_report_str(None), '')
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -18,6 +18,7 @@ from qteasy.parameter import Parameter
 from qteasy.blender import (
     blender_parser,
     signal_blend,
+    compile_blender,
     human_blender,
     _exp_to_token,
 )
@@ -565,6 +566,24 @@ class TestParameter(unittest.TestCase):
                              ['clip_-1_1(', 'pos_5_0.2(', '0', ',', '1', ',', '2', ',', '3', ',', '4', ')', ')'])
         print(_exp_to_token('clip_-1_1(pos_5_0.2(0, 1, 2, 3, 4))'))
 
+    def test_compile_blender(self):
+        """ 编译后的混合函数与signal_blend()结果相同，且可以一次混合多个运行时间点的信号矩阵"""
+        np.random.seed(0)
+        blender_strings = ['s0 + s1 * s2', 's0 & s1 | s2', '~(0-1)/s2 + s0', 'avgpos_2_0.5(s0, s1, s2)',
+                           'clip_-0.5_0.5(s0 - s1)', 'unify(abs(s0) + abs(s1))', 'max(s0, s1, s2 * 2) + pow(s2, 2)']
+        signals = [np.random.normal(size=(10, 4)) for _ in range(3)]
+        for blender_str in blender_strings:
+            blender = blender_parser(blender_str)
+            blend = compile_blender(blender)
+            stepwise = np.array([signal_blend([sig[i] for sig in signals], blender) for i in range(10)])
+            self.assertTrue(np.allclose(blend([sig[0] for sig in signals]), stepwise[0]))
+            self.assertTrue(np.allclose(blend(signals), stepwise))
+        self.assertEqual(compile_blender(blender_parser('(s0 + s1) * s2'))([1, 2, 3]), 9)
+        with self.assertRaises(KeyError):
+            compile_blender(blender_parser('unknown(s0, s1)'))
+        with self.assertRaises(ValueError):
+            compile_blender(blender_parser('s0 ^ s1'))([1, 2])
+
     def test_all_blending_funcs(self):
         """ 测试其他信号组合函数是否正常工作"""
         # 生成五个示例交易信号
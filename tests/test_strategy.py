@@ -25,6 +25,66 @@ from qteasy.parameter import Parameter
 from qteasy.utilfuncs import rolling_window
 
 
+def _reference_select_by_factors(factors, max_sel_count, condition, lbound, ubound, sort_ascending, weighting):
+    """ 批量选股之前FactorSorter逐行选股的算法，作为批量选股内核的参照"""
+    factors = np.array(factors, dtype=float)
+    share_count = factors.shape[0]
+    pct = int(share_count * max_sel_count) if max_sel_count < 1 else int(max_sel_count)
+    if pct < 1:
+        pct = 1
+    chosen = np.zeros_like(factors)
+    if condition == 'greater':
+        factors[np.where(factors < ubound)] = np.nan
+    elif condition == 'less':
+        factors[np.where(factors > lbound)] = np.nan
+    elif condition == 'between':
+        factors[np.where((factors < lbound) | (factors > ubound))] = np.nan
+    elif condition == 'not_between':
+        factors[np.where((factors > lbound) & (factors < ubound))] = np.nan
+    nan_count = np.isnan(factors).astype('int').sum()
+    if nan_count == share_count:
+        return chosen
+    pos = max(share_count - pct - nan_count, 0) if not sort_ascending else pct
+    if weighting == 'even':
+        share_found = factors.argpartition(pos)[pos:] if not sort_ascending else factors.argpartition(pos)[:pos]
+    else:
+        share_found = factors.argsort()[pos:] if not sort_ascending else factors.argsort()[:pos]
+    share_nan = np.where(np.isnan(factors))[0]
+    args = np.setdiff1d(share_found, share_nan, assume_unique=True)
+    arg_count = len(args)
+    if arg_count == 0:
+        return chosen
+    if weighting == 'ones':
+        chosen[args] = 1.
+    elif weighting == 'linear':
+        dist = np.arange(1, 3, 2. / arg_count)
+        chosen[args] = dist / dist.sum()
+    elif weighting == 'distance':
+        dist = factors[args]
+        d_max = dist[-1]
+        d_min = dist[0]
+        d = d_max - d_min
+        if not sort_ascending:
+            dist = dist - d_min + d / 10.
+        else:
+            dist = d_max - dist + d / 10.
+        d_sum = dist.sum()
+        if ~np.any(dist):
+            chosen[args] = 1 / len(dist)
+        elif d_sum == 0:
+            chosen[args] = dist / len(dist)
+        else:
+            chosen[args] = dist / d_sum
+    elif weighting == 'proportion':
+        f = factors[args]
+        f = np.where(f < 0, 0, f)
+        chosen[args] = f / f.sum()
+    elif weighting == 'even':
+        chosen[args] = 1. / arg_count
+    return chosen
+
+
+
 class TestStrategy(unittest.TestCase):
     def setUp(self):
 
@@ -1410,6 +1470,65 @@ class TestStrategy(unittest.TestCase):
         stg.condition = 'not_correct'
         self.assertRaises(ValueError, stg.generate)
 
+    def test_factor_sorter_matrix_selection(self):
+        """测试FactorSorter对因子矩阵的批量选股，结果与逐行选股相同"""
+        stg = self.factor_sorter_stg
+        factors = np.array([[3., 1., 4., 1.5, 9., 2.],
+                            [np.nan, 5., -1., 2., np.nan, 0.5],
+                            [np.nan, np.nan, np.nan, np.nan, np.nan, np.nan],
+                            [-2., -1., -3., -0.5, -4., -5.]])
+        stg.max_sel_count = 3
+        stg.condition = 'any'
+        stg.sort_ascending = False
+
+        stg.weighting = 'even'
+        res = stg._select_by_factor_matrix(factors)
+        self.assertTrue(np.allclose(res[0], [1 / 3, 0, 1 / 3, 0, 1 / 3, 0]))
+        self.assertTrue(np.allclose(res[1], [0, 1 / 3, 0, 1 / 3, 0, 1 / 3]))
+        self.assertTrue(np.allclose(res[2], 0))
+        self.assertTrue(np.allclose(res[3], [1 / 3, 1 / 3, 0, 1 / 3, 0, 0]))
+
+        # linear：按因子从小到大分配线性递增的权重
+        stg.weighting = 'linear'
+        res = stg._select_by_factor_matrix(factors)
+        self.assertTrue(np.allclose(res[0], np.array([3, 0, 5, 0, 7, 0]) / 15))
+
+        # 筛选后剩余的因子少于选股数量时，选中全部剩余的因子
+        stg.weighting = 'ones'
+        stg.condition = 'greater'
+        stg.ubound = 4.
+        res = stg._select_by_factor_matrix(factors)
+        self.assertTrue(np.allclose(res[0], [0, 0, 1, 0, 1, 0]))
+        self.assertTrue(np.allclose(res[1], [0, 1, 0, 0, 0, 0]))
+        self.assertTrue(np.allclose(res[3], 0))
+
+        # 所有选股条件和权重分配方式下，批量选股与原有的逐行选股算法结果相同，且不修改输入的因子
+        np.random.seed(5)
+        factors = np.random.normal(size=(20, 30))
+        factors[np.random.random(factors.shape) < 0.2] = np.nan
+        original = factors.copy()
+        stg.lbound = -0.5
+        stg.ubound = 0.5
+        for condition in ['any', 'greater', 'less', 'between', 'not_between']:
+            for weighting in ['even', 'linear', 'distance', 'proportion', 'ones']:
+                for sort_ascending in [True, False]:
+                    stg.condition = condition
+                    stg.weighting = weighting
+                    stg.sort_ascending = sort_ascending
+                    res = stg._select_by_factor_matrix(factors)
+                    for i in range(len(factors)):
+                        expected = _reference_select_by_factors(factors[i], stg.max_sel_count, condition,
+                                                                stg.lbound, stg.ubound, sort_ascending, weighting)
+                        self.assertTrue(np.allclose(res[i], expected, equal_nan=True))
+                        self.assertTrue(np.allclose(stg._select_by_factors(factors[i]), expected, equal_nan=True))
+        self.assertTrue(np.allclose(factors, original, equal_nan=True))
+
+        stg.condition = 'not_correct'
+        self.assertRaises(ValueError, stg._select_by_factor_matrix, factors)
+        stg.condition = 'any'
+        stg.weighting = 'wrong type'
+        self.assertRaises(KeyError, stg._select_by_factor_matrix, factors)
+
     def test_rule_iterator(self):
         """测试rule_iterator类型策略"""
         stg = self.rule_iterator_stg
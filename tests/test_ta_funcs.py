@@ -12,6 +12,7 @@ import unittest
 import numpy as np
 
 from qteasy.tafuncs import bbands, dema, ema, ht, kama, ma, mama, mavp, mid_point, sma_no_ta, ema_no_ta
+from qteasy.tafuncs import sma_2d, sum_2d, ema_2d, sarext_2d
 from qteasy.tafuncs import mid_price, sar, sarext, sma, t3, tema, trima, wma, adx, adxr, trix_no_ta
 from qteasy.tafuncs import apo, bop, cci, cmo, dx, macd, macdext, aroon, aroonosc
 from qteasy.tafuncs import macdfix, mfi, minus_di, minus_dm, mom, plus_di, plus_dm
@@ -81,6 +82,33 @@ class TestTAFuncs(unittest.TestCase):
         upper, middle, lower = bbands(self.close, timeperiod=5)
         print(f'results are\nupper:\n{upper}\nmiddle:\n{middle}\nlower:\n{lower}')
 
+    def test_2d_batch_functions(self):
+        """ 测试二维批量版本：每列的结果与逐列调用一维函数相同，开头的nan被跳过 """
+        print(f'test TA function: 2-D batch functions\n'
+              f'=====================================')
+        np.random.seed(3)
+        close = 10 + np.cumsum(np.random.normal(0, 0.2, (120, 3)), axis=0)
+        close[:4, 1] = np.nan
+        high = close + np.random.uniform(0, 0.5, close.shape)
+        low = close - np.random.uniform(0, 0.5, close.shape)
+        res_sma, res_sum, res_ema = sma_2d(close, 10), sum_2d(close, 10), ema_2d(close, 10)
+        res_sar = sarext_2d(high, low, 0, 0.01)
+        for res in [res_sma, res_sum, res_ema, res_sar]:
+            self.assertEqual(res.shape, close.shape)
+        for i in range(3):
+            self.assertTrue(np.allclose(res_sma[:, i], sma(close[:, i], 10), equal_nan=True))
+            self.assertTrue(np.allclose(res_sum[:, i], sum(close[:, i], 10), equal_nan=True))
+            self.assertTrue(np.allclose(res_ema[:, i], ema(close[:, i], 10), equal_nan=True))
+            self.assertTrue(np.allclose(res_sar[:, i], sarext(high[:, i], low[:, i], 0, 0.01), equal_nan=True))
+        self.assertTrue(np.allclose(sma_2d(close.astype('float32'), 10), res_sma, equal_nan=True))
+        for func in [sma_2d, sum_2d, ema_2d]:
+            with self.assertRaises(ValueError):
+                func(close, 1)
+            with self.assertRaises(ValueError):
+                func(close, 2.5)
+        with self.assertRaises(ValueError):
+            sarext_2d(high, low[:-1])
+
     def test_dema(self):
         print(f'test TA function: dema\n'
               f'======================')
@@ -22,7 +22,7 @@ from qteasy.utilfuncs import weekday_name, nearest_market_trade_day, is_number_l
 from qteasy.utilfuncs import match_ts_code, _lev_ratio, _partial_lev_ratio, _wildcard_match, rolling_window
 from qteasy.utilfuncs import reindent, adjust_string_length, is_float_like, is_integer_like
 from qteasy.utilfuncs import is_cn_stock_symbol_like, is_complete_cn_stock_symbol_like
-from qteasy.utilfuncs import sanitize_filename
+from qteasy.utilfuncs import sanitize_filename, update_hash
 
 
 class RetryableError(Exception):
@@ -783,6 +783,44 @@ class TestUtilityFuncs(unittest.TestCase):
         self.assertRaises(TypeError, reindent, '123', '123')
         self.assertRaises(ValueError, reindent, '123', 123)
 
+    def test_update_hash(self):
+        """ 测试update_hash函数"""
+        import hashlib
+
+        def digest(value):
+            hasher = hashlib.sha256()
+            update_hash(hasher, value)
+            return hasher.hexdigest()
+
+        df = pd.DataFrame([[1., 2.], [3., 4.]], columns=['a', 'b'], index=pd.date_range('2023-01-01', periods=2))
+        value = {'pars': (10, 0.5), 'data': df, 'arr': np.arange(4), 'name': 'stg'}
+        self.assertEqual(digest(value), digest(dict(reversed(list(value.items())))))
+        self.assertEqual(digest(value), digest({**value, 'data': df.copy()}))
+        self.assertNotEqual(digest(value), digest({**value, 'pars': (11, 0.5)}))
+        self.assertNotEqual(digest(value), digest({**value, 'data': df * 2}))
+        self.assertNotEqual(digest(value), digest({**value, 'data': df.set_axis(['a', 'c'], axis=1)}))
+        self.assertNotEqual(digest(value), digest({**value, 'arr': np.arange(4).astype(float)}))
+        self.assertNotEqual(digest([1, 2]), digest([[1, 2]]))
+        self.assertNotEqual(digest(1), digest('1'))
+
+        def f(x):
+            return x + 1
+
+        def g(x):
+            return x + 2
+
+        self.assertEqual(digest(f.__code__), digest(f.__code__.replace(co_firstlineno=100)))
+        self.assertNotEqual(digest(f.__code__), digest(g.__code__))
+        self.assertNotEqual(digest(f), digest(g))
+
+        # 其他对象按pickle序列化的内容写入，无法序列化时报错
+        from types import SimpleNamespace
+        import threading
+        self.assertEqual(digest(SimpleNamespace(w=[1, 2])), digest(SimpleNamespace(w=[1, 2])))
+        self.assertNotEqual(digest(SimpleNamespace(w=[1, 2])), digest(SimpleNamespace(w=[1, 3])))
+        with self.assertRaises(TypeError):
+            digest(threading.Lock())
+
     def test_truncate_string(self):
         """ 测试函数truncates_string"""
         self.assertEqual(adjust_string_length('this is a long string', 23), 'this is a long string  ')